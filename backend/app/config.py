@@ -0,0 +1,89 @@
+"""
+App settings, read from the environment/.env file
+
+MODULES:
+    - os: getenv function
+    - json: loads, parse json settings
+    - dotenv: load_dotenv function, load env variables
+
+"""
+import os
+import json
+from dotenv import load_dotenv
+
+load_dotenv()  # Load the .env file
+
+# Database
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.getenv("DB_NAME", "collabo-app")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 10))  # connections opened at startup and kept open
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))  # max wait for a free pooled connection
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")  # in order of preference, unavailable ones are skipped
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+MONGO_WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN", "majority")
+# Per collection overrides, e.g {"notifications": {"read_preference": "secondaryPreferred", "w": 1}}
+MONGO_COLLECTION_OPTIONS = json.loads(os.getenv("MONGO_COLLECTION_OPTIONS", "{}"))
+MONGO_COMMAND_MONITORING = os.getenv("MONGO_COMMAND_MONITORING", "true").lower() == "true"  # per command latency, documents and bytes metrics
+MONGO_SLOW_QUERY_MS = int(os.getenv("MONGO_SLOW_QUERY_MS", 100))  # commands slower than this are logged with their filter shape, 0 disables the log
+MONGO_REPLY_SIZE_SAMPLE_RATE = float(os.getenv("MONGO_REPLY_SIZE_SAMPLE_RATE", 0))  # share of replies encoded again to measure their size, 0 disables it
+
+# Notifications
+NOTIFICATION_QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", 1000))  # pending fan-outs before new ones are dropped
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", 1000))  # notifications per insert_many
+NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", 1))
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", 30))  # age of read notifications kept in the hot collection, 0 keeps them forever
+NOTIFICATION_RETENTION_MODE = os.getenv("NOTIFICATION_RETENTION_MODE", "archive")  # "archive" moves them to notifications_archive, "ttl" lets mongodb delete them
+NOTIFICATION_ARCHIVE_INTERVAL = int(os.getenv("NOTIFICATION_ARCHIVE_INTERVAL", 3600))  # seconds between archive runs
+
+# Entity cache of users and projects
+ENTITY_CACHE_ENABLED = os.getenv("ENTITY_CACHE_ENABLED", "true").lower() == "true"
+ENTITY_CACHE_MAX_MB = int(os.getenv("ENTITY_CACHE_MAX_MB", 32))  # per process budget of each entity, least recently used documents are evicted past it
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", 300))  # seconds a cached document is served, bounds staleness of writes missed by the invalidation
+ENTITY_CACHE_SHARED = os.getenv("ENTITY_CACHE_SHARED", "none")  # shared tier: "none" or "local", the in-process stand-in
+ENTITY_CACHE_CHANGE_STREAM = os.getenv("ENTITY_CACHE_CHANGE_STREAM", "false").lower() == "true"  # invalidate on writes of other nodes, needs a replica set
+
+# Denormalized counters of users and projects, repaired from the collections they count
+COUNTER_RECONCILE_INTERVAL = int(os.getenv("COUNTER_RECONCILE_INTERVAL", 86400))  # seconds between reconciliation runs, 0 disables them
+COUNTER_RECONCILE_BATCH_SIZE = int(os.getenv("COUNTER_RECONCILE_BATCH_SIZE", 500))  # documents checked per query
+
+# Projections, read models kept current from the change streams of the collections, or by polling them on a standalone server
+PROJECTIONS_ENABLED = os.getenv("PROJECTIONS_ENABLED", "true").lower() == "true"  # starts the consumers of the collections with projectors
+PROJECTIONS_MODE = os.getenv("PROJECTIONS_MODE", "auto")  # "stream", "poll" or "auto": change streams, polling when the server has none
+PROJECTIONS_POLL_INTERVAL = float(os.getenv("PROJECTIONS_POLL_INTERVAL", 5))  # seconds between two polls, each reads every document of the collection
+PROJECTIONS_CHECKPOINT_EVERY = int(os.getenv("PROJECTIONS_CHECKPOINT_EVERY", 100))  # events between two saves of the resume token
+PROJECTIONS_CHECKPOINT_INTERVAL = float(os.getenv("PROJECTIONS_CHECKPOINT_INTERVAL", 10))  # seconds after which a pending resume token is saved
+
+# HTTP caching, Cache-Control sent by the conditional GET routes, by route template. no-cache lets clients keep bodies but revalidate with If-None-Match
+HTTP_CACHE_CONTROL = json.loads(os.getenv("HTTP_CACHE_CONTROL", json.dumps({
+    "/projects/{project_id}": "private, no-cache",
+    "/users/profile/{user_id}": "private, no-cache",
+    "/suggestions/projects/": "private, no-cache",
+    "/suggestions/users/": "private, no-cache",
+})))
+
+# HTTP compression, codings in order of preference, br and zstd are skipped unless the brotli and zstandard libraries are installed
+HTTP_COMPRESSION_ENABLED = os.getenv("HTTP_COMPRESSION_ENABLED", "true").lower() == "true"
+HTTP_COMPRESSION_ENCODINGS = os.getenv("HTTP_COMPRESSION_ENCODINGS", "zstd,br,gzip")
+HTTP_COMPRESSION_MIN_SIZE = int(os.getenv("HTTP_COMPRESSION_MIN_SIZE", 1024))  # bodies smaller than this are sent as is
+HTTP_COMPRESSION_LEVELS = json.loads(os.getenv("HTTP_COMPRESSION_LEVELS", json.dumps({"gzip": 6, "br": 4, "zstd": 3})))
+HTTP_COMPRESSION_CACHE_MB = int(os.getenv("HTTP_COMPRESSION_CACHE_MB", 16))  # compressed bodies kept by ETag
+
+# Event loop watchdog
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() == "true"
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", 0.1))  # seconds between two lag measurements
+LOOP_BLOCK_THRESHOLD_MS = int(os.getenv("LOOP_BLOCK_THRESHOLD_MS", 100))  # callbacks holding the loop longer are logged with their stack
+
+# Admin
+ADMIN_USER_IDS = [user_id.strip() for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()]
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"  # mounts the /admin/profile routes
+EXPORTS_ENABLED = os.getenv("EXPORTS_ENABLED", "true").lower() == "true"  # mounts the /admin/exports routes, admins only
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 2000))  # documents fetched per round trip by the NDJSON exports
+EXPORT_CHUNK_KB = int(os.getenv("EXPORT_CHUNK_KB", 64))  # NDJSON gathered before it is written to the response
+IMPORTS_ENABLED = os.getenv("IMPORTS_ENABLED", "true").lower() == "true"  # mounts the /admin/imports routes, admins only
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 1000))  # JSONL rows validated, hashed and inserted together
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", os.cpu_count() or 1))  # processes hashing the passwords of imported users
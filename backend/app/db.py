@@ -1,30 +1,258 @@
 """
 Setup the database connection via a mongodb client
 
+The client and its connection pool are configured from config.py. Pool and command listeners export their measurements through utils.metrics,
+commands slower than MONGO_SLOW_QUERY_MS are logged with the shape of their filter. The pool is opened and warmed by connect() and released by close(),
+both called from the app lifespan in main.py. Collection handles are held by the repositories (see repositories/)
+
+MODULES:
+    - motor.motor_asyncio: AsyncIOMotorClient
+    - pymongo: monitoring, read preferences
+    - asyncio: gather
+    - importlib.util: find_spec, check the optional compression libraries
+    - logging: getLogger
+    - random: random, sampled reply sizes
+    - bson: encode, measure reply sizes
+    - config: database settings
+    - utils.metrics: registry, SIZE_BUCKETS
+    - utils.request_context: current_route
+
 """
 from motor.motor_asyncio import AsyncIOMotorClient  # AsyncIOMotorClient is the async version of the pymongo MongoClient
-import os
-from dotenv import load_dotenv
+from pymongo import monitoring
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+import asyncio
+import importlib.util
+import logging
+import random
+import bson
+from config import (
+    MONGO_URL, DB_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_COMPRESSORS, MONGO_READ_PREFERENCE,
+    MONGO_WRITE_CONCERN, MONGO_COMMAND_MONITORING, MONGO_SLOW_QUERY_MS, MONGO_REPLY_SIZE_SAMPLE_RATE
+)
+from utils.metrics import (
+    registry, SIZE_BUCKETS
+)
+from utils.request_context import current_route
+
+
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}  # python module each compressor needs
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener exporting pool usage and the time spent waiting to check out a connection
+    """
+    checkout_wait = registry.histogram(
+        "mongo_pool_checkout_wait_seconds", "Time spent waiting to check out a pooled connection"
+    )
+    checkout_failures = registry.counter(
+        "mongo_pool_checkout_failures_total", "Connection check outs that failed", ("reason",)
+    )
+    checked_out = registry.gauge("mongo_pool_checked_out", "Connections currently checked out")
+    open_connections = registry.gauge("mongo_pool_connections", "Connections currently open")
+
+    def connection_checked_out(self, event):
+        self.checkout_wait.observe(event.duration or 0)
+        self.checked_out.inc()
+
+    def connection_check_out_failed(self, event):
+        self.checkout_wait.observe(event.duration or 0)
+        self.checkout_failures.inc(event.reason)
+
+    def connection_checked_in(self, event):
+        self.checked_out.dec()
+
+    def connection_created(self, event):
+        self.open_connections.inc()
+
+    def connection_closed(self, event):
+        self.open_connections.dec()
 
-load_dotenv()  # Load the .env file
+    # Events that are not measured
+    def pool_created(self, event):
+        pass
 
-MONGO_URL = os.getenv("MONGO_URL")
-DB_NAME = os.getenv("DB_NAME")
+    def pool_ready(self, event):
+        pass
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client["Test"]  # create/get database instance from the client, revert to DB_NAME after testing
+    def pool_cleared(self, event):
+        pass
 
+    def pool_closed(self, event):
+        pass
 
-async def get_collection(name: str):
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+def query_shape(value):
     """
-    Get a collection from the database
+    Strip the values out of a query, keeping its fields and operators, e.g {"name": {"$regex": "ada"}} -> {"name": {"$regex": "?"}}
 
     ARGUMENTS:
-        - name: str
+        - value: query, sort or pipeline
 
     RETURNS:
-        - collection: Collection
+        - the same structure with every value replaced by "?", lists are reduced to their distinct shapes
+
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def command_filter(command_name: str, command: dict):
+    """Filter of a command, None for commands that do not select documents"""
+    if command_name in ("find", "delete", "update"):
+        if command_name == "find":
+            return command.get("filter", {})
+        statements = command.get("deletes" if command_name == "delete" else "updates") or [{}]
+        return statements[0].get("q", {})
+    if command_name in ("count", "distinct", "findAndModify"):
+        return command.get("query", {})
+    if command_name == "aggregate":
+        return command.get("pipeline", [])
+    return None
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Command listener exporting the latency and documents returned of every command per collection, operation and route.
+    The route is read from the request context, which motor copies into the thread running the command. Reply sizes are measured on a
+    sample of the replies only: the event holds the decoded reply, so measuring it means encoding every batch again in the driver thread
+
+    ATTRIBUTES:
+        - slow_ms: int, commands slower than this are logged with their filter shape, 0 disables the log
+        - reply_sample_rate: float, share of the replies whose size is measured, 0 for none
+        - pending: dict, request id -> (collection, route, filter) of started commands
+
+    """
+    duration = registry.histogram(
+        "mongo_command_duration_seconds", "Time to run a command", ("collection", "command", "route")
+    )
+    documents = registry.counter(
+        "mongo_documents_returned_total", "Documents returned by commands", ("collection", "command", "route")
+    )
+    reply_bytes = registry.histogram(
+        "mongo_reply_size_bytes", "Size of a sample of the command replies", ("collection", "command", "route"), buckets=SIZE_BUCKETS
+    )
+    failures = registry.counter("mongo_command_failures_total", "Commands that failed", ("collection", "command"))
+
+    def __init__(self, slow_ms: int = MONGO_SLOW_QUERY_MS, reply_sample_rate: float = MONGO_REPLY_SIZE_SAMPLE_RATE):
+        """Object initializer"""
+        self.slow_ms = slow_ms
+        self.reply_sample_rate = reply_sample_rate
+        self.pending = {}
 
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):  # admin and server commands e.g ping
+            collection = "-"
+        self.pending[event.request_id] = (collection, current_route(), command_filter(event.command_name, event.command))
+
+    def succeeded(self, event):
+        collection, route, query = self.pending.pop(event.request_id, ("-", current_route(), None))
+        seconds = event.duration_micros / 1e6
+        labels = (collection, event.command_name, route)
+        self.duration.observe(seconds, *labels)
+        if self.reply_sample_rate and random.random() < self.reply_sample_rate:
+            self.reply_bytes.observe(len(bson.encode(event.reply)), *labels)
+
+        cursor = event.reply.get("cursor")
+        returned = 0
+        if cursor:
+            returned = len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+        elif event.command_name == "findAndModify":
+            returned = 1 if event.reply.get("value") else 0
+        if returned:
+            self.documents.inc(*labels, amount=returned)
+
+        if self.slow_ms and seconds * 1000 >= self.slow_ms:
+            logger.warning(
+                "Slow %s on %s from %s: %.1f ms, %d docs, filter %s",
+                event.command_name, collection, route, seconds * 1000, returned, query_shape(query)
+            )
+
+    def failed(self, event):
+        collection, _, _ = self.pending.pop(event.request_id, ("-", None, None))
+        self.failures.inc(collection, event.command_name)
+
+
+def available_compressors(names: str) -> list:
+    """
+    Filter a comma separated list of wire compressors down to those whose library is installed
+
+    ARGUMENTS:
+        - names: str, e.g "zstd,snappy,zlib"
+
+    RETURNS:
+        - list: compressor names, in the same order
+
+    """
+    return [
+        name.strip() for name in names.split(",")
+        if name.strip() in COMPRESSOR_MODULES and importlib.util.find_spec(COMPRESSOR_MODULES[name.strip()])
+    ]
+
+
+def write_acknowledgement(w):
+    """Parse a w setting, numeric strings are node counts e.g "1" and the rest are tag names e.g "majority" """
+    return int(w) if str(w).isdigit() else w
+
+
+def read_preference(name: str):
+    """Build a read preference from its name e.g "secondaryPreferred" """
+    return make_read_preference(read_pref_mode_from_name(name), None)
+
+
+event_listeners = [PoolMetrics()]
+if MONGO_COMMAND_MONITORING:
+    event_listeners.append(CommandMetrics())
+
+client = AsyncIOMotorClient(
+    MONGO_URL,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    compressors=available_compressors(MONGO_COMPRESSORS) or None,
+    read_preference=read_preference(MONGO_READ_PREFERENCE),
+    w=write_acknowledgement(MONGO_WRITE_CONCERN),
+    event_listeners=event_listeners,
+)
+db = client[DB_NAME]  # create/get database instance from the client
+
+
+async def connect():
+    """
+    Verify the server is reachable and open the minimum pool of connections, so the first requests do not pay for the connection handshakes
+    """
+    await client.admin.command("ping")
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(MONGO_MIN_POOL_SIZE)))
+
+
+def close():
+    """
+    Close the client and its pooled connections
     """
-    collection = db[name]
-    return collection
\ No newline at end of file
+    client.close()
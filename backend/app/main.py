@@ -2,10 +2,22 @@
 fastAPI app entry point
 
 MODULES:
-    - fastapi: FastAPI class
+    - fastapi: FastAPI class, PlainTextResponse
+    - contextlib: asynccontextmanager
+    - asyncio: create_task
+    - repositories.registry: ensure_indexes
+    - repositories.leases: Lease, one worker runs the periodic jobs
+    - middleware.metrics: RequestMetricsMiddleware
+    - middleware.compression: CompressionMiddleware
+    - services.cache_invalidation: cache_invalidator
+    - services.counter_services: CounterServices, reconciliation of the denormalized counters
+    - services.projections: projection_service
 
 """
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
@@ -19,13 +31,72 @@ from routes.application_routes import application_router
 from routes.invitation_routes import invitation_router
 from routes.message_routes import message_router
 from routes.message_routes import conversation_router
-from app.routes.notifications import router as notifications_router
+from routes.admin_routes import admin_router
+from routes.export_routes import export_router
+from routes.import_routes import import_router, import_services
+from app.routes.notifications import router as notifications_router, get_notification_service
+from services.notification_fanout import notification_fanout
+from services.cache_invalidation import cache_invalidator
+from services.counter_services import CounterServices
+from services.projections import projection_service
+from config import (
+    NOTIFICATION_RETENTION_DAYS, NOTIFICATION_RETENTION_MODE, NOTIFICATION_ARCHIVE_INTERVAL, PROFILING_ENABLED, EXPORTS_ENABLED,
+    IMPORTS_ENABLED, LOOP_WATCHDOG_ENABLED, ENTITY_CACHE_CHANGE_STREAM, HTTP_COMPRESSION_ENABLED, COUNTER_RECONCILE_INTERVAL,
+    COUNTER_RECONCILE_BATCH_SIZE, PROJECTIONS_ENABLED
+)
+from utils.metrics import registry
+from utils.loop_watchdog import loop_watchdog
+from middleware.metrics import RequestMetricsMiddleware
+from middleware.compression import CompressionMiddleware
+from repositories import registry as repositories
+from repositories.leases import Lease
+import db
 
 load_dotenv()  # Load the .env file
 FRONTEND_URL = os.getenv("FRONTEND_URL")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup and shutdown tasks of the app
+    """
+    if LOOP_WATCHDOG_ENABLED:
+        await loop_watchdog.start()
+    await db.connect()  # fails fast if mongodb is unreachable
+    await repositories.ensure_indexes()
+    notification_service = get_notification_service()
+    await notification_fanout.start()
+    if ENTITY_CACHE_CHANGE_STREAM:
+        await cache_invalidator.start()
+    if PROJECTIONS_ENABLED:
+        await projection_service.start()
+
+    archiver = None
+    if NOTIFICATION_RETENTION_DAYS and NOTIFICATION_RETENTION_MODE == "archive":
+        archiver = asyncio.create_task(notification_service.archive_periodically(
+            NOTIFICATION_RETENTION_DAYS, NOTIFICATION_ARCHIVE_INTERVAL, Lease(repositories.leases, "notification_archiving")
+        ))
+    reconciler = None
+    if COUNTER_RECONCILE_INTERVAL:
+        reconciler = asyncio.create_task(CounterServices().reconcile_periodically(
+            COUNTER_RECONCILE_INTERVAL, COUNTER_RECONCILE_BATCH_SIZE, Lease(repositories.leases, "counter_reconciliation")
+        ))
+    yield
+    if archiver:
+        archiver.cancel()
+    if reconciler:
+        reconciler.cancel()
+    await notification_fanout.stop()
+    await cache_invalidator.stop()
+    await projection_service.stop()
+    import_services.close()
+    db.close()
+    await loop_watchdog.stop()
+
+
 # Initialize the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # frontend origins
 origins = [
@@ -41,12 +112,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+if HTTP_COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestMetricsMiddleware)  # added last so it is the outermost middleware and times the whole stack
 
 # Homepage
 app.get('/')
 async def root():
     return {"message": "Welcome to the Collabo app"}
 
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    """Process metrics in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Map other routes to the fastAPI app
 app.include_router(auth_router, prefix='/auth', tags=['Auth'])
 app.include_router(user_router, prefix='/users', tags=['Users'])
@@ -59,6 +138,12 @@ app.include_router(invitation_router, prefix='/invitations', tags=['Invitations'
 app.include_router(message_router, prefix='/messages', tags=['Messages'])
 app.include_router(conversation_router, prefix='/conversations', tags=['Conversations'])
 app.include_router(notifications_router, prefix="/notifications", tags=["Notifications"])
+if PROFILING_ENABLED:  # not mounted at all otherwise
+    app.include_router(admin_router, prefix="/admin", tags=["Admin"], include_in_schema=False)
+if EXPORTS_ENABLED:
+    app.include_router(export_router, prefix="/admin/exports", tags=["Admin"], include_in_schema=False)
+if IMPORTS_ENABLED:
+    app.include_router(import_router, prefix="/admin/imports", tags=["Admin"], include_in_schema=False)
 
 
 # Run the app via uvicorn in a shell terminal
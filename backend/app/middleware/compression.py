@@ -0,0 +1,166 @@
+"""
+Response compression middleware
+Compresses response bodies with the best content coding the client accepts (utils.compression). Bodies under the size threshold are sent as
+is, compressing them costs more CPU than it saves bytes. Bodies sent in one piece are compressed whole; streamed bodies are compressed chunk by
+chunk and flushed after each so the client keeps receiving as they are produced.
+
+A body with an ETag (utils.http_cache) is fully identified by its path and tag, so its compressed bytes are kept in an LRU under that key and
+served again without recompressing, e.g to every client polling the same project
+
+MODULES:
+    - starlette.datastructures: Headers, MutableHeaders
+    - starlette.types: ASGIApp, Scope, Receive, Send, Message
+    - config: HTTP_COMPRESSION_* settings
+    - repositories.cache: LRUCache
+    - utils.compression: StreamCompressor, available_encodings, negotiate
+    - utils.metrics: registry
+
+"""
+from typing import (
+    Dict, List, Optional
+)
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import (
+    ASGIApp, Scope, Receive, Send, Message
+)
+from config import (
+    HTTP_COMPRESSION_ENCODINGS, HTTP_COMPRESSION_LEVELS, HTTP_COMPRESSION_MIN_SIZE, HTTP_COMPRESSION_CACHE_MB
+)
+from repositories.cache import LRUCache
+from utils.compression import (
+    StreamCompressor, available_encodings, negotiate
+)
+from utils.metrics import registry
+
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "application/xml", "image/svg+xml")
+DEFAULT_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+
+compressed_bytes = registry.counter(
+    "http_compression_bytes_total", "Response body bytes before (in) and after (out) compression", ("encoding", "stage")
+)
+cache_lookups = registry.counter("http_compression_cache_total", "Lookups of compressed bodies by ETag", ("result",))
+
+
+def compressible(headers: Headers) -> bool:
+    """If a response is worth compressing: a text type that is not already encoded"""
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip()
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing http response bodies
+
+    ATTRIBUTES:
+        - app: ASGIApp, the wrapped application
+        - encodings: list, codings offered, in order of preference
+        - levels: dict, coding -> compression level
+        - minimum_size: int, bodies sent in one piece under this no of bytes are not compressed
+        - cache: LRUCache, compressed bodies by (path, ETag, coding)
+
+    """
+    def __init__(self, app: ASGIApp, encodings: Optional[List[str]] = None, levels: Optional[Dict[str, int]] = None,
+                 minimum_size: int = HTTP_COMPRESSION_MIN_SIZE, cache_bytes: int = HTTP_COMPRESSION_CACHE_MB * 2 ** 20):
+        """Object initializer"""
+        self.app = app
+        self.encodings = encodings if encodings is not None else available_encodings(HTTP_COMPRESSION_ENCODINGS)
+        self.levels = {**DEFAULT_LEVELS, **HTTP_COMPRESSION_LEVELS, **(levels or {})}
+        self.minimum_size = minimum_size
+        self.cache = LRUCache(cache_bytes, ttl=3600)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None  # held until the first body chunk shows if the response gets compressed
+        compressor: Optional[StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:  # first chunk
+                headers = MutableHeaders(raw=start["headers"])
+                if not compressible(headers) or start["status"] in (204, 304):
+                    passthrough = True
+                    await send_compressed(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send_compressed(message)
+                    return
+
+                headers["Content-Encoding"] = encoding
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"  # the compressed bytes differ from the ones the strong tag names
+                if not more_body:
+                    compressed = self.compress_whole(scope, body, etag, encoding)
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(start)
+                    start = None
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                del headers["Content-Length"]
+                await send(start)
+                start = None
+                compressor = StreamCompressor(encoding, self.levels[encoding])
+
+            compressed_bytes.inc(encoding, "in", amount=len(body))
+            chunk = compressor.compress(body) + (compressor.flush() if more_body else compressor.finish())
+            compressed_bytes.inc(encoding, "out", amount=len(chunk))
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def compress_whole(self, scope: Scope, body: bytes, etag: Optional[str], encoding: str) -> bytes:
+        """
+        Compress a body sent in one piece, reusing the bytes compressed for the same path and ETag
+
+        ARGUMENTS:
+            - scope: Scope, the request
+            - body: bytes, the response body
+            - etag: str, ETag of the response, None if it has none
+            - encoding: str, content coding
+
+        RETURNS:
+            - bytes: the compressed body
+
+        """
+        key = None
+        if etag:
+            key = f"{scope['path']}?{scope.get('query_string', b'').decode()}|{etag}|{encoding}"
+            cached = self.cache.get(key)
+            cache_lookups.inc("hit" if cached is not None else "miss")
+            if cached is not None:
+                compressed_bytes.inc(encoding, "in", amount=len(body))
+                compressed_bytes.inc(encoding, "out", amount=len(cached))
+                return cached
+
+        compressor = StreamCompressor(encoding, self.levels[encoding])
+        compressed = compressor.compress(body) + compressor.finish()
+        compressed_bytes.inc(encoding, "in", amount=len(body))
+        compressed_bytes.inc(encoding, "out", amount=len(compressed))
+        if key:
+            self.cache.set(key, compressed)
+        return compressed
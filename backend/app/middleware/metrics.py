@@ -0,0 +1,83 @@
+"""
+Request metrics middleware
+Records the latency, response size and status of every http request, labelled by the route template (e.g /projects/{project_id}) rather than
+the raw path so the no of series stays bounded. Written as a plain ASGI middleware so the response body is passed through untouched.
+The scope of the request is also published in utils.request_context for the rest of the app
+
+MODULES:
+    - time: perf_counter
+    - starlette.types: ASGIApp, Scope, Receive, Send, Message
+    - utils.metrics: registry, SIZE_BUCKETS
+    - utils.request_context: request_scope, route_template
+
+"""
+from time import perf_counter
+from starlette.types import (
+    ASGIApp, Scope, Receive, Send, Message
+)
+from utils.metrics import (
+    registry, SIZE_BUCKETS
+)
+from utils.request_context import (
+    request_scope, route_template
+)
+
+
+request_latency = registry.histogram(
+    "http_request_duration_seconds", "Time to send the full response", ("method", "route")
+)
+response_size = registry.histogram(
+    "http_response_size_bytes", "Size of the response body", ("method", "route"), buckets=SIZE_BUCKETS
+)
+responses = registry.counter("http_responses_total", "Responses sent", ("method", "route", "status"))
+in_flight = registry.gauge("http_requests_in_flight", "Requests being handled", ("method",))
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording per route metrics of http requests
+
+    ATTRIBUTES:
+        - app: ASGIApp, the wrapped application
+
+    """
+    def __init__(self, app: ASGIApp):
+        """Object initializer"""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "lifespan":  # tasks started by the lifespan are background work, not a request
+            await self.app(scope, receive, send)
+            return
+        if scope["type"] != "http":
+            token = request_scope.set(scope)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                request_scope.reset(token)
+            return
+
+        method = scope["method"]
+        status = 500  # reported if the app fails before starting the response
+        size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        token = request_scope.set(scope)
+        in_flight.inc(method)
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec(method)
+            request_scope.reset(token)
+            route = route_template(scope)
+            request_latency.observe(perf_counter() - start, method, route)
+            response_size.observe(size, method, route)
+            responses.inc(method, route, str(status))
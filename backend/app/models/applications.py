@@ -62,7 +62,7 @@ class ApplicationResponse(BaseModel):
     project_id: str
     applicant_id: str
     status: Literal["pending", "accepted", "rejected"] = "pending"
-    created_at: str = datetime.now().isoformat()
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
     model_config = ConfigDict(
         # populate_by_name=True,  # Not sure if this is necessary, but it allows an instance to be created with the name insteead of its alias
         json_scheme_extra={
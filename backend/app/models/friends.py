@@ -3,12 +3,12 @@ Friends models for connecting users as friends
 Comprises the FriendRequestModel, FriendResponseModel, and FriendshipResponse models
 
 MODULES:
-    - pydantic: BaseModel
+    - pydantic: BaseModel, Field
     - typing: List, Optional
     - datetime: datetime class
 
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import (
     Literal, Optional
 )
@@ -42,7 +42,7 @@ class FriendRequestResponse(BaseModel):
     sender_id: str
     recipient_id: str
     status: Literal["pending", "accepted", "rejected"] = "pending"
-    created_at: str = datetime.now().isoformat()
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
 
 
 class FriendshipResponse(BaseModel):
@@ -50,8 +50,8 @@ class FriendshipResponse(BaseModel):
     Model to define and display a friendship relationship between users
 
     ATTRIBUTED:
-         - user1_id: str, id of the sender in the friendship
-         - user2_id: str, id of the receiver in the friendship
+         - user1_id: str, lower of the two user ids in the friendship
+         - user2_id: str, higher of the two user ids in the friendship
          - name: str, name of friend
          - created_at: str, datetime
     """
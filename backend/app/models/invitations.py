@@ -67,7 +67,7 @@ class InvitationResponse(BaseModel):
     inviter_id: str
     invitee_id: str
     status: Literal["pending", "accepted", "declined"] = "pending"
-    created_at: str = datetime.now().isoformat()
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
     model_config = ConfigDict(
         # populate_by_name=True,  # Not sure if this is necessary, but it allows an instance to be created with the name insteead of its alias
         json_scheme_extra={
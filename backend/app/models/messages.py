@@ -30,7 +30,7 @@ class MessageCreate(BaseModel):
     """
     receiver_id: str
     text: str
-    timestamp: str = datetime.now().isoformat()
+    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
 
 
 class MessageResponse(BaseModel):
@@ -66,4 +66,4 @@ class ConversationResponse(BaseModel):
     conversation_id: str = Field(alias="_id")
     users: List[str]
     messages: List[MessageResponse]
-    created_at: str = datetime.now().isoformat()
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
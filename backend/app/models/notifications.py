@@ -1,7 +1,7 @@
 """
 Notifications model.
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 
@@ -13,7 +13,7 @@ class Notification(BaseModel):
     type: str # ??Use Enum to define acceptable notification types??
     content: str
     is_read: Optional[bool] = False
-    created_at: str = datetime.now().isoformat()
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
 
 
 class FriendRequestNotification(Notification):
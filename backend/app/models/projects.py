@@ -9,8 +9,8 @@ MODULES:
 
 """
 from typing import (
-    Optional, List,
-    Union
+    ClassVar, Optional, List,
+    Tuple, Union
 )
 from pydantic import (
     BaseModel,
@@ -53,7 +53,7 @@ class ProjectCreate(BaseModel):
     title: str = Field(..., min_length=4, max_length=100)
     description: Optional[str] = Field(max_length=1000)
     created_by: str = None
-    created_at: str = datetime.now().isoformat()
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
 
     # Optional attr
     updated_at: Optional[str] = None
@@ -101,7 +101,7 @@ class ProjectUpdate(BaseModel):
     """
     title: Optional[str] = Field(None, min_length=4, max_length=100)
     description: Optional[str] = Field(None, max_length=1000)
-    updated_at: Optional[str] = datetime.now().isoformat()  # potential security issue, user shouldnt be able to manipulate update time
+    updated_at: Optional[str] = Field(default_factory=lambda: datetime.now().isoformat())  # potential security issue, user shouldnt be able to manipulate update time
     deadline: Optional[str] = None
     type: Optional[str] = None
     skills: Optional[Union[List[str], str]] = []  # skills required by any intending collaborator/collabee
@@ -142,6 +142,9 @@ class ProjectResponse(BaseModel):
     - project_location
     - project_tools: list, list of technologies/tools to be used in the project
     - followers: list
+    - followers_count, collaborators_count, applications_count, invitations_count: int, counters kept by the writes, shown on project cards
+    - version: int, incremented by every update, None for projects never updated since versions were introduced
+    - unversioned_fields: tuple, fields written without moving the version (follows, collaborators joining, counters), tagged apart
 
     FUTURE IMPROVEMENTS:
         - starting
@@ -150,18 +153,26 @@ class ProjectResponse(BaseModel):
     """
     project_id: str
     title: str
-    description: Optional[str]
+    description: Optional[str] = None
     created_at: str
     created_by: str
-    updated_at: Optional[str]
-    deadline: Optional[str]
-    type: Optional[str]
+    updated_at: Optional[str] = None
+    deadline: Optional[str] = None
+    type: Optional[str] = None
     #skills: Optional[List]
-    tags: Optional[list]  # List[str] is almost analogous to Optional[list] but the former is more explicit
-    collaborators: Optional[List[str]]
-    followers: Optional[List[str]]
+    tags: Optional[list] = None  # List[str] is almost analogous to Optional[list] but the former is more explicit
+    collaborators: Optional[List[str]] = None
+    followers: Optional[List[str]] = None
     #project_tools: Optional[List[str]]
-    location: Optional[str]
+    location: Optional[str] = None
+    followers_count: int = 0
+    collaborators_count: int = 0
+    applications_count: int = 0
+    invitations_count: int = 0
+    version: Optional[int] = None
+    unversioned_fields: ClassVar[Tuple[str, ...]] = (
+        "followers", "collaborators", "followers_count", "collaborators_count", "applications_count", "invitations_count"
+    )
     model_config = ConfigDict(
         # Example of expected format,
         # extra="forbid",
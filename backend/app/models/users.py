@@ -2,13 +2,13 @@
 Users model for fastapi app
 
 MODULES:
-    - typing: Optional
+    - typing: ClassVar, List, Optional, Tuple
     - pydantic: BaseModel, EmailStr, Field, ConfigDict
     - datetime: datetime class
 
 """
 from typing import (
-    Optional
+    ClassVar, List, Optional, Tuple
 )
 from pydantic import (
     BaseModel,
@@ -83,13 +83,10 @@ class UserCreate(BaseModel):
         - profile_pic: bytes
         - bio: str
         - skills: list
-        - friends: list
-        - collabees: list
         - objs: list
         - interests: list
-        - projects: list
-        - followers: list
-        - following: list
+        - friends_count, collabees_count, projects_count, followers_count, following_count: int, sizes of the relations of the user,
+          the relations themselves are stored in their own collections (services.relation_services)
         - language: str
         - location: str
         - timezone: str
@@ -99,18 +96,18 @@ class UserCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
     email: EmailStr
     password: str = Field(..., min_length=8)  # hashed password, real password are never stored
-    created_at: str = datetime.now().isoformat()
-    updated_at: Optional[str] = datetime.now().isoformat()
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+    updated_at: Optional[str] = Field(default_factory=lambda: datetime.now().isoformat())
     profile_pic: Optional[bytes] = None
     bio: Optional[str] = None
     skills: Optional[list] = []
-    friends: Optional[list] = []
-    collabees: Optional[list] = []  # list of users the user is currently collaborating with
     objs: Optional[list] = []
     interests: Optional[list] = []
-    projects: Optional[list] = []
-    followers: Optional[list] = []
-    following: Optional[list] = []
+    friends_count: int = 0
+    collabees_count: int = 0  # no of users the user is currently collaborating with
+    projects_count: int = 0
+    followers_count: int = 0
+    following_count: int = 0
     language: Optional[str] = 'eng'
     location: Optional[str] = None
     timezone: Optional[str] = 'UTC'
@@ -142,33 +139,35 @@ class UserResponse(BaseModel):
         - profile_pic: bytes
         - bio: str
         - skills: list
-        - friends: list
-        - collabees: list
         - objs: list
         - interests: list
-        - projects: list
-        - followers: list
-        - following: list
+        - friends_count, collabees_count, projects_count, followers_count, following_count: int, the relations are paged by their own routes
+        - version: int, incremented by every update, None for users never updated since versions were introduced
+        - unversioned_fields: tuple, the counters, written without moving the version and tagged apart
 
     """
-    user_id: Optional[str] # unique user id, same as db insertion id
+    user_id: Optional[str] = None # unique user id, same as db insertion id
     name: str
     email: EmailStr
     created_at: str
-    updated_at: Optional[str]
-    profile_pic: Optional[bytes]
-    bio: Optional[str]
-    skills: Optional[list]
-    friends: Optional[list]
-    collabees: Optional[list] # list of users the user is currently collaborating with
-    objs: Optional[list]
-    interests: Optional[list]
-    projects: Optional[list]
-    followers: Optional[list]
-    following: Optional[list]
-    language: Optional[str]
-    location: Optional[str]
-    timezone: Optional[str]
+    updated_at: Optional[str] = None
+    profile_pic: Optional[bytes] = None
+    bio: Optional[str] = None
+    skills: Optional[list] = None
+    objs: Optional[list] = None
+    interests: Optional[list] = None
+    friends_count: int = 0
+    collabees_count: int = 0 # no of users the user is currently collaborating with
+    projects_count: int = 0
+    followers_count: int = 0
+    following_count: int = 0
+    language: Optional[str] = None
+    location: Optional[str] = None
+    timezone: Optional[str] = None
+    version: Optional[int] = None
+    unversioned_fields: ClassVar[Tuple[str, ...]] = (
+        "friends_count", "collabees_count", "projects_count", "followers_count", "following_count"
+    )
     model_config = ConfigDict(
         extra="forbid",
         # Example of expected model format
@@ -195,17 +194,15 @@ class UserUpdate(BaseModel):
         - profile_pic: bytes
         - bio: str
         - skills: list
-        - friends: list
-        - collabees: list
         - objs: list
         - interests: list
-        - projects: list
-        - followers: list
-        - following: list
         - language: str
         - location: str
         - timezone: str
 
+    NOTE:
+        - friends, followers, following, collabees and projects are changed through their own routes, not by updating the user
+
     """
     name: Optional[str] = Field(None, min_length=1, max_length=100)
     email: Optional[EmailStr] = None
@@ -214,13 +211,8 @@ class UserUpdate(BaseModel):
     profile_pic: Optional[bytes] = None
     bio: Optional[str] = None
     skills: Optional[list] = []
-    friends: Optional[list] = []
-    collabees: Optional[list] = []  # list of users the user is currently collaborating with
     objs: Optional[list] = []
     interests: Optional[list] = []
-    projects: Optional[list] = []
-    followers: Optional[list] = []
-    following: Optional[list] = []
     language: Optional[str] = 'eng'
     location: Optional[str] = None
     timezone: Optional[str] = 'UTC'
@@ -238,3 +230,30 @@ class UserUpdate(BaseModel):
             }
         }
     )
+
+
+# USER RELATIONS
+class RelatedUser(BaseModel):
+    """
+    A user on the other end of a relation, e.g a follower
+
+    ATTRIBUTES:
+        - user_id: str
+        - created_at: str, when the relation was made
+
+    """
+    user_id: str
+    created_at: str
+
+
+class RelationPage(BaseModel):
+    """
+    One page of a relation of a user, newest first
+
+    ATTRIBUTES:
+        - users: list, the related users of the page
+        - next_cursor: str, cursor of the next page, None on the last page
+
+    """
+    users: List[RelatedUser]
+    next_cursor: Optional[str] = None
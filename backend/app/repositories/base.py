@@ -0,0 +1,207 @@
+"""
+Repository base class
+A repository stands for one collection: it owns the collection handle, resolved once with its codec options, read preference and write concern, and
+the indexes the collection is expected to have. Services receive repositories instead of looking collections up by name on every call.
+Collections read by id on hot paths also get an EntityCache, which services read through and report their writes to
+
+MODULES:
+    - typing: Awaitable, Callable, Optional, Sequence, Tuple
+    - datetime: datetime class
+    - bson.codec_options: CodecOptions
+    - pymongo: IndexModel, ReturnDocument, WriteConcern
+    - motor.motor_asyncio: AsyncIOMotorCollection
+    - config: MONGO_COLLECTION_OPTIONS
+    - db: database, read_preference, write_acknowledgement
+    - repositories.cache: EntityCache
+    - repositories.updates: compile_update, fields_changed
+    - utils.single_flight: single_flight
+
+"""
+from typing import (
+    Awaitable, Callable, Optional, Sequence, Tuple
+)
+from datetime import datetime
+from bson.codec_options import CodecOptions
+from pymongo import IndexModel, ReturnDocument
+from pymongo.write_concern import WriteConcern
+from motor.motor_asyncio import AsyncIOMotorCollection
+from config import MONGO_COLLECTION_OPTIONS
+from repositories.cache import EntityCache
+from repositories.updates import compile_update, fields_changed
+from utils.single_flight import single_flight
+import db
+
+CONFLICT = -1  # returned instead of a version when the document moved past the version given, or does not meet the conditions of the update
+
+
+class Repository:
+    """
+    One collection of the database with its options and declared indexes
+
+    ATTRIBUTES:
+        - name: str, name of the collection
+        - indexes: list, IndexModel of every index the collection should have
+        - codec_options: CodecOptions, None to inherit the database codec options
+        - read_preference: read preference, None to inherit the client one
+        - write_concern: WriteConcern, None to inherit the client one
+        - cache: EntityCache, cache of the documents read by id, None to always read from the database
+
+    The read_preference and w keys of MONGO_COLLECTION_OPTIONS override the declared read preference and write concern
+
+    """
+    def __init__(self, name: str, indexes: Sequence[IndexModel] = (), codec_options: Optional[CodecOptions] = None,
+                 read_preference=None, write_concern: Optional[WriteConcern] = None, cache: Optional[EntityCache] = None):
+        """Object initializer"""
+        self.name = name
+        self.indexes = list(indexes)
+        self.codec_options = codec_options
+        self.read_preference = read_preference
+        self.write_concern = write_concern
+        self.cache = cache
+        self._collection = None
+
+    @property
+    def collection(self) -> AsyncIOMotorCollection:
+        """The collection handle, built on first use and reused afterwards"""
+        if self._collection is None:
+            self._collection = self._resolve()
+        return self._collection
+
+    def bind(self, collection) -> "Repository":
+        """
+        Replace the collection handle, e.g with a MemoryCollection in tests and benchmarks
+
+        PARAMETERS:
+            - collection: any object with the motor collection api
+
+        RETURNS:
+            - Repository: self
+
+        """
+        self._collection = collection
+        return self
+
+    async def read_through(self, _id: str, load: Callable[..., Awaitable[Optional[dict]]], *args) -> Optional[dict]:
+        """
+        Document with _id from the cache, or from load(*args) when it is not cached
+
+        PARAMETERS:
+            - _id: str, id of the document
+            - load: coroutine function reading the document from the collection
+
+        RETURNS:
+            - dict: the document, None if it does not exist
+
+        """
+        if self.cache is None:
+            return await load(*args)
+        return await self.cache.get(_id, load, *args)
+
+    async def changed(self, *ids: str):
+        """
+        Report a write: reads in flight on the collection are not joined anymore and the cached documents of ids are invalidated
+
+        PARAMETERS:
+            - ids: ids of the documents written, none for inserts
+
+        """
+        single_flight.forget(self)
+        if self.cache is not None:
+            for _id in ids:
+                await self.cache.invalidate(_id)
+
+    async def update_versioned(self, _id: str, update: dict, version: Optional[int] = None, match: Optional[dict] = None) -> Optional[int]:
+        """
+        Update a document and increment its version, only if it is still at version when one is given.
+        Every update of the fields the version covers must go through here so the version moves with each change; denormalized counters and
+        memberships are written around it (see services.counter_services)
+
+        PARAMETERS:
+            - _id: str, id of the document
+            - update: dict, mongodb update operators
+            - version: int, version the caller last read, 0 for a document without version, None to update whatever the current version is
+            - match: dict, further conditions the document must meet to be updated, e.g that an array does not hold the id added to it
+
+        RETURNS:
+            - int: the new version, CONFLICT if the document is at another version or does not meet match, None if it does not exist
+
+        """
+        query = {"_id": _id} if version is None else {"_id": _id, "version": version or None}  # None matches a missing version
+        if match:
+            query.update(match)
+        update = {**update, "$inc": {**update.get("$inc", {}), "version": 1}}  # a document without version starts at 1
+        document = await self.collection.find_one_and_update(
+            query, update, projection={"version": 1}, return_document=ReturnDocument.AFTER
+        )
+        if document is not None:
+            await self.changed(_id)
+            return document["version"]
+        if (version is not None or match) and await self.collection.find_one({"_id": _id}, {"_id": 1}):
+            return CONFLICT  # written by someone else since the caller read it, or not meeting match
+        return None
+
+    async def apply_changes(self, _id: str, changes: dict, version: Optional[int] = None, timestamp: Optional[str] = "updated_at",
+                            retries: int = 3) -> Optional[Tuple[int, int]]:
+        """
+        Write the fields of changes that differ from the stored document, with the minimal update of repositories.updates.
+        The update is made conditional on the version the diff was computed against, and computed again if another write got in between
+
+        PARAMETERS:
+            - _id: str, id of the document
+            - changes: dict, field -> submitted value, None clears the field
+            - version: int, version the caller last read (If-Match), None to apply the changes to the current version
+            - timestamp: str, field set to the time of the write when anything changed, None for none
+            - retries: int, diffs computed again after losing a race with another write
+
+        RETURNS:
+            - tuple: (version, no of fields changed), version is the new one, or the current one when nothing changed (0 for a document
+              written before versions), and CONFLICT if the document is at another version than the one given. None if it does not exist
+
+        """
+        projection = {field: 1 for field in changes}
+        projection["version"] = 1
+        for _ in range(retries + 1):
+            document = await self.collection.find_one({"_id": _id}, projection)
+            if document is None:
+                return None
+            current = document.get("version") or 0
+            if version is not None and current != version:
+                return CONFLICT, 0
+
+            update = compile_update(document, changes)
+            if not update:
+                return current, 0  # no-op, nothing is written
+            changed = fields_changed(update)
+            if timestamp:
+                update.setdefault("$set", {})[timestamp] = datetime.now().isoformat()
+
+            new_version = await self.update_versioned(_id, update, current)
+            if new_version != CONFLICT:
+                return (new_version, changed) if new_version is not None else None
+            if version is not None:
+                return CONFLICT, 0
+        return CONFLICT, 0
+
+    async def ensure_indexes(self):
+        """
+        Create the declared indexes, indexes that already exist are left as they are
+        """
+        if self.indexes:
+            await self.collection.create_indexes(self.indexes)
+
+    def _resolve(self) -> AsyncIOMotorCollection:
+        """Build the collection handle with the declared options and their overrides from the settings"""
+        options = MONGO_COLLECTION_OPTIONS.get(self.name, {})
+        read_preference = self.read_preference
+        if "read_preference" in options:
+            read_preference = db.read_preference(options["read_preference"])
+        write_concern = self.write_concern
+        if "w" in options:
+            write_concern = WriteConcern(w=db.write_acknowledgement(options["w"]))
+
+        return db.db.get_collection(
+            self.name, codec_options=self.codec_options, read_preference=read_preference, write_concern=write_concern
+        )
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
@@ -0,0 +1,244 @@
+"""
+Read-through entity cache
+Documents read by id are kept as BSON in two tiers: a per-process LRU bounded in bytes, then an optional shared tier (SharedCache) that every
+process of the app reads and writes. A lookup goes through the local tier, the shared tier and the database in that order and fills the tiers it
+missed. Entries expire after a TTL, which bounds how long a write missed by the invalidation (e.g made by another node without a change stream
+listener) stays visible.
+
+Writes invalidate the entry in both tiers. A read that started before an invalidation does not fill the cache with what it read, since that may
+predate the write: every invalidation bumps a generation and fills carrying an older generation are dropped
+
+MODULES:
+    - abc: ABC, abstractmethod
+    - time: monotonic
+    - collections: OrderedDict
+    - typing: Awaitable, Callable, Optional
+    - bson: encode, decode
+    - utils.metrics: registry
+
+"""
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import (
+    Awaitable, Callable, Optional
+)
+import bson
+from utils.metrics import registry
+
+
+class SharedCache(ABC):
+    """
+    Interface of the shared tier, a key value store of bytes with expiry shared by the processes of the app (e.g redis or memcached)
+    """
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Value of key, None if missing or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float):
+        """Store value under key for ttl seconds"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Remove key"""
+
+
+class LocalSharedCache(SharedCache):
+    """
+    Stand-in shared tier living in the process, for development, tests and single process deployments
+
+    ATTRIBUTES:
+        - entries: dict, key -> (expiry, value)
+
+    """
+    def __init__(self):
+        """Object initializer"""
+        self.entries = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[key]
+            return None
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self.entries[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, key: str):
+        self.entries.pop(key, None)
+
+
+class LRUCache:
+    """
+    Least recently used entries of BSON bytes, bounded by their total size
+
+    ATTRIBUTES:
+        - max_bytes: int, budget of the values, the least recently used entries are evicted past it
+        - ttl: float, seconds an entry is served
+        - size: int, bytes held
+        - entries: OrderedDict, key -> (expiry, value), least recently used first
+
+    """
+    def __init__(self, max_bytes: int, ttl: float):
+        """Object initializer"""
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Value of key, None if missing or expired"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self.delete(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: bytes) -> int:
+        """
+        Store value under key
+
+        RETURNS:
+            - int: no of entries evicted to make room
+
+        """
+        if len(value) > self.max_bytes:
+            return 0  # would evict everything else and still not fit
+        self.delete(key)
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.size += len(value)
+        evicted = 0
+        while self.size > self.max_bytes:
+            _, (_, oldest) = self.entries.popitem(last=False)
+            self.size -= len(oldest)
+            evicted += 1
+        return evicted
+
+    def delete(self, key: str):
+        """Remove key"""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        """Remove every entry"""
+        self.entries.clear()
+        self.size = 0
+
+
+class EntityCache:
+    """
+    Two tier cache of the documents of one collection, keyed by _id
+
+    ATTRIBUTES:
+        - name: str, entity name, the metrics label and the shared tier key prefix
+        - local: LRUCache, first tier
+        - shared: SharedCache, second tier, None to only cache in process
+        - ttl: float, seconds an entry is served
+        - generation: int, no of invalidations so far
+
+    """
+    requests = registry.counter("entity_cache_requests_total", "Entity cache lookups", ("entity", "tier", "result"))
+    hit_ratio = registry.gauge("entity_cache_hit_ratio", "Share of entity lookups served without a database read", ("entity",))
+    size = registry.gauge("entity_cache_bytes", "Bytes held by the local entity cache", ("entity",))
+    entries = registry.gauge("entity_cache_entries", "Entries of the local entity cache", ("entity",))
+    evictions = registry.counter("entity_cache_evictions_total", "Entries evicted from the local entity cache for room", ("entity",))
+    invalidations = registry.counter("entity_cache_invalidations_total", "Entity cache entries invalidated", ("entity",))
+
+    def __init__(self, name: str, max_bytes: int, ttl: float, shared: Optional[SharedCache] = None):
+        """Object initializer"""
+        self.name = name
+        self.local = LRUCache(max_bytes, ttl)
+        self.shared = shared
+        self.ttl = ttl
+        self.generation = 0
+        self._hits = 0
+        self._lookups = 0
+
+    async def get(self, key: str, load: Callable[..., Awaitable[Optional[dict]]], *args) -> Optional[dict]:
+        """
+        Document of key, read through the tiers
+
+        ARGUMENTS:
+            - key: str, _id of the document
+            - load: coroutine function reading the document from the database, called with args on a miss of every tier
+
+        RETURNS:
+            - dict: a new copy of the document, None if load found none (misses are not cached)
+
+        """
+        self._lookups += 1
+        value = self.local.get(key)
+        if value is not None:
+            return self._hit(value, "local")
+        self.requests.inc(self.name, "local", "miss")
+
+        generation = self.generation
+        if self.shared is not None:
+            value = await self.shared.get(self._shared_key(key))
+            if value is not None:
+                self._fill_local(key, value, generation)
+                return self._hit(value, "shared")
+            self.requests.inc(self.name, "shared", "miss")
+
+        self.hit_ratio.set(self._hits / self._lookups, self.name)
+        document = await load(*args)
+        if document is not None:
+            value = bson.encode(document)
+            if self._fill_local(key, value, generation) and self.shared is not None:
+                await self.shared.set(self._shared_key(key), value, self.ttl)
+        return document
+
+    async def invalidate(self, key: str):
+        """
+        Drop key from both tiers, called after every write to the document
+
+        ARGUMENTS:
+            - key: str, _id of the document
+
+        """
+        self.generation += 1
+        self.invalidations.inc(self.name)
+        self.local.delete(key)
+        self._report_size()
+        if self.shared is not None:
+            await self.shared.delete(self._shared_key(key))
+
+    def clear(self):
+        """Empty the local tier"""
+        self.generation += 1
+        self.local.clear()
+        self._report_size()
+
+    def _hit(self, value: bytes, tier: str) -> dict:
+        """Count a hit and decode the value"""
+        self._hits += 1
+        self.requests.inc(self.name, tier, "hit")
+        self.hit_ratio.set(self._hits / self._lookups, self.name)
+        return bson.decode(value)
+
+    def _fill_local(self, key: str, value: bytes, generation: int) -> bool:
+        """Store value in the local tier unless the cache was invalidated since generation, returns if it was stored"""
+        if generation != self.generation:
+            return False
+        evicted = self.local.set(key, value)
+        if evicted:
+            self.evictions.inc(self.name, amount=evicted)
+        self._report_size()
+        return True
+
+    def _report_size(self):
+        """Update the memory gauges"""
+        self.size.set(self.local.size, self.name)
+        self.entries.set(len(self.local.entries), self.name)
+
+    def _shared_key(self, key: str) -> str:
+        """Key of the shared tier"""
+        return f"{self.name}:{key}"
@@ -0,0 +1,64 @@
+"""
+Leases
+A lease is a document of the leases collection naming the process that holds it until a time. Periodic jobs of the app (counter reconciliation,
+notification archiving) take one before each run, so a deployment of several workers runs each job once per interval instead of once per
+worker. The holder renews the lease on its next run; when it stops, the lease expires and another worker takes it over
+
+MODULES:
+    - os: getpid
+    - socket: gethostname
+    - time: time
+    - uuid: uuid4
+    - pymongo: ReturnDocument
+    - pymongo.errors: DuplicateKeyError
+    - repositories.base: Repository
+
+"""
+import os
+import socket
+import time
+from uuid import uuid4
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from repositories.base import Repository
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"  # this process, unique across restarts reusing a pid
+
+
+class Lease:
+    """
+    Named lease, held by one process at a time
+
+    ATTRIBUTES:
+        - repository: Repository, the leases collection
+        - name: str, _id of the lease document, e.g the job it guards
+        - owner: str, id of this process
+
+    """
+    def __init__(self, repository: Repository, name: str, owner: str = OWNER):
+        """Object initializer"""
+        self.repository = repository
+        self.name = name
+        self.owner = owner
+
+    async def acquire(self, seconds: float) -> bool:
+        """
+        Take the lease, or renew it when this process holds it already
+
+        PARAMETERS:
+            - seconds: float, time the lease is held for, longer than the interval between two renewals
+
+        RETURNS:
+            - bool: True if this process holds the lease for the next seconds, False if another process does
+
+        """
+        now = time.time()
+        try:
+            lease = await self.repository.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + seconds}},
+                upsert=True, return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:  # the upsert collided with the lease of another process
+            return False
+        return lease is not None
@@ -0,0 +1,786 @@
+"""
+In-memory collections
+MemoryCollection implements the part of the motor collection api used by the services over a dict of documents, so services run in tests and
+benchmarks without a mongodb server. Every call completes without awaiting anything, so a write is atomic with respect to other tasks, like a
+single document write on the server. Operators that are not supported raise NotImplementedError instead of being silently ignored
+
+MODULES:
+    - copy: deepcopy
+    - re: regex queries
+    - datetime: datetime class
+    - typing: Any, Dict, List, Optional
+    - bson: ObjectId
+    - pymongo: IndexModel, ReturnDocument, write operations, results and errors
+    - repositories.base: Repository
+
+QUERY OPERATORS:
+    $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $all, $exists, $regex, $size, $elemMatch, $not, $and, $or, $nor
+
+UPDATE OPERATORS:
+    $set, $unset, $inc, $min, $max, $push, $addToSet ($each for both), $pull, $setOnInsert
+
+AGGREGATION STAGES:
+    $match, $group ($sum, $min, $max, $push), $sort, $skip, $limit, $project, $count
+
+"""
+import copy
+import re
+from datetime import datetime
+from typing import (
+    Any, Dict, List, Optional
+)
+from bson import ObjectId
+from pymongo import (
+    IndexModel, ReturnDocument, InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+)
+from pymongo.errors import (
+    BulkWriteError, DuplicateKeyError
+)
+from pymongo.results import (
+    BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+)
+from repositories.base import Repository
+
+
+def resolve(document: dict, path: str) -> list:
+    """
+    Values found at a dotted path. Paths go through arrays like mongodb does, so a path can resolve to several values
+
+    PARAMETERS:
+        - document: dict
+        - path: str, e.g "counts.friends" or "messages.sender_id"
+
+    RETURNS:
+        - list: values found, empty if the path is missing
+
+    """
+    values = [document]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit():
+                    if int(part) < len(value):
+                        found.append(value[int(part)])
+                else:
+                    found.extend(item[part] for item in value if isinstance(item, dict) and part in item)
+        values = found
+    return values
+
+
+def candidates(document: dict, path: str) -> list:
+    """Values a condition on path is tested against: each resolved value and the elements of resolved arrays"""
+    values = []
+    for value in resolve(document, path):
+        values.append(value)
+        if isinstance(value, list):
+            values.extend(value)
+    return values
+
+
+def sort_key(value: Any) -> tuple:
+    """Key ordering values of different types the way mongodb does: null, numbers, strings, objects, arrays, ObjectId, bool, dates"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (6, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (5, value)
+    if isinstance(value, datetime):
+        return (7, value.timestamp())
+    if isinstance(value, list):
+        return (4, [sort_key(item) for item in value])
+    return (3, str(value))
+
+
+def _compare(value: Any, other: Any, operator: str) -> bool:
+    """Order comparison that is False between values of incomparable types"""
+    if isinstance(value, bool) != isinstance(other, bool):
+        return False
+    try:
+        if operator == "$gt":
+            return value > other
+        if operator == "$gte":
+            return value >= other
+        if operator == "$lt":
+            return value < other
+        return value <= other
+    except TypeError:
+        return False
+
+
+def _equals(document: dict, path: str, value: Any) -> bool:
+    """Equality as mongodb matches it: a missing field equals None and an array matches any of its elements"""
+    if isinstance(value, re.Pattern):
+        return any(isinstance(item, str) and value.search(item) for item in candidates(document, path))
+    if value is None and not resolve(document, path):
+        return True
+    return any(item == value for item in candidates(document, path))
+
+
+def _is_operator_dict(condition: Any) -> bool:
+    """True for a condition made of operators e.g {"$gt": 1}, False for a plain value"""
+    return isinstance(condition, dict) and bool(condition) and all(key.startswith("$") for key in condition)
+
+
+def _match_condition(document: dict, path: str, condition: Any) -> bool:
+    """Test the condition on a field"""
+    if not _is_operator_dict(condition):
+        return _equals(document, path, condition)
+
+    for operator, argument in condition.items():
+        if operator == "$options":
+            continue
+        if operator == "$eq":
+            matched = _equals(document, path, argument)
+        elif operator == "$ne":
+            matched = not _equals(document, path, argument)
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            matched = any(_compare(item, argument, operator) for item in candidates(document, path))
+        elif operator == "$in":
+            matched = any(_equals(document, path, item) for item in argument)
+        elif operator == "$nin":
+            matched = not any(_equals(document, path, item) for item in argument)
+        elif operator == "$all":
+            matched = all(_equals(document, path, item) for item in argument)
+        elif operator == "$exists":
+            matched = bool(resolve(document, path)) == bool(argument)
+        elif operator == "$regex":
+            pattern = argument
+            if not isinstance(pattern, re.Pattern):
+                flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+                pattern = re.compile(argument, flags)
+            matched = _equals(document, path, pattern)
+        elif operator == "$size":
+            matched = any(isinstance(value, list) and len(value) == argument for value in resolve(document, path))
+        elif operator == "$elemMatch":
+            matched = any(
+                isinstance(value, list) and any(_match_element(item, argument) for item in value)
+                for value in resolve(document, path)
+            )
+        elif operator == "$not":
+            matched = not _match_condition(document, path, argument)
+        else:
+            raise NotImplementedError(f"query operator {operator} is not supported by MemoryCollection")
+
+        if not matched:
+            return False
+    return True
+
+
+def _match_element(item: Any, condition: Any) -> bool:
+    """Test an array element against an $elemMatch or $pull condition"""
+    if isinstance(item, dict) and isinstance(condition, dict) and not _is_operator_dict(condition):
+        return matches(item, condition)
+    return _match_condition({"item": item}, "item", condition)
+
+
+def matches(document: dict, query: Optional[dict]) -> bool:
+    """
+    Test a document against a query
+
+    PARAMETERS:
+        - document: dict
+        - query: dict, mongodb query, None or {} match everything
+
+    RETURNS:
+        - bool
+
+    """
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            matched = all(matches(document, sub_query) for sub_query in condition)
+        elif key == "$or":
+            matched = any(matches(document, sub_query) for sub_query in condition)
+        elif key == "$nor":
+            matched = not any(matches(document, sub_query) for sub_query in condition)
+        elif key.startswith("$"):
+            raise NotImplementedError(f"query operator {key} is not supported by MemoryCollection")
+        else:
+            matched = _match_condition(document, key, condition)
+
+        if not matched:
+            return False
+    return True
+
+
+def _set_path(document: dict, path: str, value: Any):
+    """Set the value at a dotted path, creating the missing embedded documents"""
+    *parents, last = path.split(".")
+    for part in parents:
+        if isinstance(document, list):
+            document = document[int(part)]
+        else:
+            document = document.setdefault(part, {})
+    if isinstance(document, list):
+        document[int(last)] = value
+    else:
+        document[last] = value
+
+
+def _unset_path(document: dict, path: str):
+    """Remove the field at a dotted path if it exists"""
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.get(part) if isinstance(document, dict) else None
+        if document is None:
+            return
+    if isinstance(document, dict):
+        document.pop(last, None)
+
+
+def _get_path(document: dict, path: str, default: Any = None) -> Any:
+    """The single value at a dotted path"""
+    values = resolve(document, path)
+    return values[0] if values else default
+
+
+def _each(value: Any) -> list:
+    """Items added by $push and $addToSet, either the value or its $each list"""
+    if isinstance(value, dict) and "$each" in value:
+        return list(value["$each"])
+    return [value]
+
+
+def apply_update(document: dict, update: dict, inserting: bool = False) -> dict:
+    """
+    Apply an update to a document in place, a document without operators replaces the fields of the document
+
+    PARAMETERS:
+        - document: dict, the stored document
+        - update: dict, update operators or a replacement document
+        - inserting: bool, True when the update creates the document in an upsert, so $setOnInsert applies
+
+    RETURNS:
+        - dict: the updated document
+
+    """
+    if update and not any(key.startswith("$") for key in update):
+        replacement = copy.deepcopy(update)
+        replacement["_id"] = document["_id"]
+        document.clear()
+        document.update(replacement)
+        return document
+
+    for operator, fields in update.items():
+        if operator == "$setOnInsert" and not inserting:
+            continue
+        for path, value in fields.items():
+            if operator in ("$set", "$setOnInsert"):
+                _set_path(document, path, copy.deepcopy(value))
+            elif operator == "$unset":
+                _unset_path(document, path)
+            elif operator == "$inc":
+                _set_path(document, path, _get_path(document, path, 0) + value)
+            elif operator == "$min":
+                current = _get_path(document, path)
+                if current is None or value < current:
+                    _set_path(document, path, copy.deepcopy(value))
+            elif operator == "$max":
+                current = _get_path(document, path)
+                if current is None or value > current:
+                    _set_path(document, path, copy.deepcopy(value))
+            elif operator in ("$push", "$addToSet"):
+                array = _get_path(document, path)
+                if array is None:
+                    array = []
+                    _set_path(document, path, array)
+                for item in _each(value):
+                    if operator == "$push" or item not in array:
+                        array.append(copy.deepcopy(item))
+            elif operator == "$pull":
+                array = _get_path(document, path)
+                if isinstance(array, list):
+                    array[:] = [item for item in array if not _match_element(item, value)]
+            else:
+                raise NotImplementedError(f"update operator {operator} is not supported by MemoryCollection")
+    return document
+
+
+def project(document: dict, projection: Optional[dict]) -> dict:
+    """
+    Apply an inclusion or exclusion projection to a copy of a document
+
+    PARAMETERS:
+        - document: dict
+        - projection: dict, e.g {"password": 0} or {"user_id": 1}, None keeps every field
+
+    RETURNS:
+        - dict
+
+    """
+    if not projection:
+        return copy.deepcopy(document)
+
+    included = [path for path, flag in projection.items() if flag and path != "_id"]
+    if included:
+        projected = {}
+        if projection.get("_id", 1) and "_id" in document:
+            projected["_id"] = copy.deepcopy(document["_id"])
+        for path in included:
+            values = resolve(document, path)
+            if values:
+                _set_path(projected, path, copy.deepcopy(values[0]))
+        return projected
+
+    projected = copy.deepcopy(document)
+    for path, flag in projection.items():
+        if not flag:
+            _unset_path(projected, path)
+    return projected
+
+
+def _sort_spec(key_or_list, direction=None) -> list:
+    """Normalize the pymongo sort arguments to a list of (field, direction)"""
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+def sort_documents(documents: List[dict], spec: list) -> List[dict]:
+    """Sort documents in place by a list of (field, direction), the first field being the primary key"""
+    for path, direction in reversed(spec):
+        documents.sort(key=lambda document: sort_key(_get_path(document, path)), reverse=direction == -1)
+    return documents
+
+
+def _index_keys(keys) -> list:
+    """Normalize create_index keys to a list of (field, direction)"""
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    if isinstance(keys, dict):
+        return list(keys.items())
+    return list(keys)
+
+
+class MemoryCursor:
+    """
+    Cursor over the result of MemoryCollection.find, evaluated when it is consumed
+
+    ATTRIBUTES:
+        - collection: MemoryCollection, the queried collection
+        - query: dict, the find filter
+        - projection: dict, the find projection
+
+    """
+    def __init__(self, collection: "MemoryCollection", query: Optional[dict], projection: Optional[dict]):
+        """Object initializer"""
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort: list = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[dict]] = None
+
+    def sort(self, key_or_list, direction=None) -> "MemoryCursor":
+        """Sort the results, same arguments as the motor cursor"""
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int) -> "MemoryCursor":
+        """Skip the first results"""
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "MemoryCursor":
+        """Return at most limit results, 0 means no limit"""
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int) -> "MemoryCursor":
+        """Accepted for compatibility, results are already in memory"""
+        return self
+
+    def _evaluate(self) -> List[dict]:
+        """Run the query once and keep the results"""
+        if self._results is None:
+            documents = self.collection._find(self.query)
+            if self._sort:
+                sort_documents(documents, self._sort)
+            documents = documents[self._skip:]
+            if self._limit:
+                documents = documents[:self._limit]
+            self._results = [project(document, self.projection) for document in documents]
+        return self._results
+
+    async def close(self):
+        """Drop the remaining results"""
+        self._results = []
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        """Return the remaining results, at most length of them"""
+        results = self._evaluate()
+        count = len(results) if length is None else length
+        batch, self._results = results[:count], results[count:]
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        results = self._evaluate()
+        if not results:
+            raise StopAsyncIteration
+        return results.pop(0)
+
+
+def _expression(document: dict, expression: Any) -> Any:
+    """Value of an aggregation expression: "$path" reads a field, documents of expressions are evaluated field by field"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _get_path(document, expression[1:])
+    if isinstance(expression, dict):
+        return {key: _expression(document, value) for key, value in expression.items()}
+    return expression
+
+
+def group(documents: List[dict], spec: dict) -> List[dict]:
+    """
+    Documents of a $group stage, in the order their group first appears
+
+    PARAMETERS:
+        - documents: list, input of the stage
+        - spec: dict, {"_id": expression, field: {accumulator: expression}}
+
+    RETURNS:
+        - list: one document per distinct _id
+
+    """
+    groups: Dict[str, dict] = {}  # keyed by the repr of the group _id, which may be an unhashable document
+    for document in documents:
+        key = _expression(document, spec["_id"])
+        result = groups.setdefault(repr(key), {"_id": key})
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (operator, expression), = accumulator.items()
+            value = _expression(document, expression)
+            if operator == "$sum":
+                result[field] = result.get(field, 0) + (value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0)
+            elif operator == "$push":
+                result.setdefault(field, []).append(copy.deepcopy(value))
+            elif operator in ("$min", "$max"):
+                current = result.get(field)
+                if value is not None and (current is None or _compare(value, current, "$lt" if operator == "$min" else "$gt")):
+                    result[field] = copy.deepcopy(value)
+            else:
+                raise NotImplementedError(f"accumulator {operator} is not supported by MemoryCollection")
+    return list(groups.values())
+
+
+class MemoryCommandCursor:
+    """
+    Cursor over the result of MemoryCollection.aggregate, computed when the pipeline is submitted like the server does
+    """
+    def __init__(self, results: List[dict]):
+        """Object initializer"""
+        self._results = results
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        """Return the remaining results, at most length of them"""
+        count = len(self._results) if length is None else length
+        batch, self._results = self._results[:count], self._results[count:]
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if not self._results:
+            raise StopAsyncIteration
+        return self._results.pop(0)
+
+
+class MemoryCollection:
+    """
+    Collection kept in a dict, keyed by _id in insertion order
+
+    ATTRIBUTES:
+        - name: str, name of the collection
+        - documents: dict, _id -> stored document
+        - indexes: dict, index name -> index document as passed to create_index, unique indexes are enforced
+
+    """
+    def __init__(self, name: str = "memory"):
+        """Object initializer"""
+        self.name = name
+        self.documents: Dict[Any, dict] = {}
+        self.indexes: Dict[str, dict] = {"_id_": {"key": [("_id", 1)], "unique": True}}
+
+    # Reads
+    def _find(self, query: Optional[dict]) -> List[dict]:
+        """Stored documents matching a query, looked up directly when the query is on a plain _id"""
+        if query and "_id" in query and not isinstance(query["_id"], (dict, re.Pattern)):
+            document = self.documents.get(query["_id"])
+            return [document] if document is not None and matches(document, query) else []
+        return [document for document in self.documents.values() if matches(document, query)]
+
+    def _find_first(self, query: Optional[dict], sort=None) -> Optional[dict]:
+        """First stored document matching a query in the given sort order"""
+        documents = self._find(query)
+        if sort:
+            sort_documents(documents, _sort_spec(sort))
+        return documents[0] if documents else None
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, sort=None,
+             skip: int = 0, limit: int = 0) -> MemoryCursor:
+        """Cursor over the documents matching filter"""
+        cursor = MemoryCursor(self, filter, projection).skip(skip).limit(limit)
+        return cursor.sort(sort) if sort else cursor
+
+    async def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None, sort=None) -> Optional[dict]:
+        """First document matching filter, None if there is none"""
+        document = self._find_first(filter, sort)
+        return project(document, projection) if document is not None else None
+
+    async def count_documents(self, filter: dict, skip: int = 0, limit: int = 0) -> int:
+        """No of documents matching filter"""
+        count = max(len(self._find(filter)) - skip, 0)
+        return min(count, limit) if limit else count
+
+    async def estimated_document_count(self) -> int:
+        """No of documents in the collection"""
+        return len(self.documents)
+
+    async def distinct(self, key: str, filter: Optional[dict] = None) -> list:
+        """Distinct values of a field among the documents matching filter"""
+        values = []
+        for document in self._find(filter):
+            for value in resolve(document, key):
+                for item in value if isinstance(value, list) else [value]:
+                    if item not in values:
+                        values.append(item)
+        return values
+
+    def aggregate(self, pipeline: List[dict]) -> MemoryCommandCursor:
+        """Cursor over the result of an aggregation pipeline, see AGGREGATION STAGES"""
+        stages = list(pipeline)
+        if stages and "$match" in stages[0]:  # a leading $match uses the _id lookup of find
+            documents = self._find(stages.pop(0)["$match"])
+        else:
+            documents = list(self.documents.values())
+        documents = [copy.deepcopy(document) for document in documents]
+        for stage in stages:
+            (name, spec), = stage.items()
+            if name == "$match":
+                documents = [document for document in documents if matches(document, spec)]
+            elif name == "$group":
+                documents = group(documents, spec)
+            elif name == "$sort":
+                documents = sort_documents(documents, list(spec.items()))
+            elif name == "$skip":
+                documents = documents[spec:]
+            elif name == "$limit":
+                documents = documents[:spec]
+            elif name == "$project":
+                documents = [project(document, spec) for document in documents]
+            elif name == "$count":
+                documents = [{spec: len(documents)}] if documents else []
+            else:
+                raise NotImplementedError(f"aggregation stage {name} is not supported by MemoryCollection")
+        return MemoryCommandCursor(documents)
+
+    # Writes
+    def _check_unique(self, document: dict, ignore: Any = None):
+        """Raise DuplicateKeyError if document collides with another document on a unique index"""
+        for name, index in self.indexes.items():
+            if not index.get("unique"):
+                continue
+            key = [_get_path(document, path) for path, _ in index["key"]]
+            for other in self.documents.values():
+                if other["_id"] != ignore and [_get_path(other, path) for path, _ in index["key"]] == key:
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: {self.name} index: {name} dup key: {key}",
+                        11000, {"code": 11000, "keyPattern": dict(index["key"])}
+                    )
+
+    def _insert(self, document: dict) -> Any:
+        """Store a copy of a document, adding an _id to the caller's document like pymongo does"""
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        stored = copy.deepcopy(document)
+        self._check_unique(stored)
+        self.documents[stored["_id"]] = stored
+        return stored["_id"]
+
+    def _update(self, query: dict, update: dict, upsert: bool, many: bool) -> dict:
+        """Apply an update to the first or every matching document, returns the raw result counts"""
+        documents = self._find(query)
+        if not many:
+            documents = documents[:1]
+
+        if not documents:
+            if not upsert:
+                return {"n": 0, "nModified": 0}
+            document = {}
+            for path, condition in query.items():
+                if not path.startswith("$") and not _is_operator_dict(condition):
+                    _set_path(document, path, copy.deepcopy(condition))
+            apply_update(document, update, inserting=True)
+            document.setdefault("_id", ObjectId())
+            self._insert(document)
+            return {"n": 1, "nModified": 0, "upserted": document["_id"]}
+
+        modified = 0
+        for document in documents:
+            updated = apply_update(copy.deepcopy(document), update)
+            if updated != document:
+                self._check_unique(updated, ignore=document["_id"])
+                document.clear()
+                document.update(updated)
+                modified += 1
+        return {"n": len(documents), "nModified": modified}
+
+    async def insert_one(self, document: dict) -> InsertOneResult:
+        """Insert a document"""
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True) -> InsertManyResult:
+        """Insert documents, an ordered insert stops at the first error and an unordered one carries on"""
+        inserted_ids, errors = [], []
+        for index, document in enumerate(documents):
+            try:
+                inserted_ids.append(self._insert(document))
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "writeConcernErrors": [], "nInserted": len(inserted_ids),
+                "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+            })
+        return InsertManyResult(inserted_ids, True)
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False) -> UpdateResult:
+        """Update the first document matching filter"""
+        return UpdateResult(self._update(filter, update, upsert, many=False), True)
+
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False) -> UpdateResult:
+        """Update every document matching filter"""
+        return UpdateResult(self._update(filter, update, upsert, many=True), True)
+
+    async def replace_one(self, filter: dict, replacement: dict, upsert: bool = False) -> UpdateResult:
+        """Replace the first document matching filter"""
+        return UpdateResult(self._update(filter, replacement, upsert, many=False), True)
+
+    async def find_one_and_update(self, filter: dict, update: dict, projection: Optional[dict] = None, sort=None,
+                                  upsert: bool = False, return_document: bool = ReturnDocument.BEFORE) -> Optional[dict]:
+        """Update the first document matching filter and return it as it was before or after the update"""
+        document = self._find_first(filter, sort)
+        if document is None:
+            result = self._update(filter, update, upsert, many=False)
+            if "upserted" in result and return_document == ReturnDocument.AFTER:
+                return project(self.documents[result["upserted"]], projection)
+            return None
+
+        before = project(document, projection)
+        self._update({"_id": document["_id"]}, update, upsert=False, many=False)
+        return project(document, projection) if return_document == ReturnDocument.AFTER else before
+
+    async def find_one_and_delete(self, filter: dict, projection: Optional[dict] = None, sort=None) -> Optional[dict]:
+        """Delete the first document matching filter and return it"""
+        document = self._find_first(filter, sort)
+        if document is None:
+            return None
+        del self.documents[document["_id"]]
+        return project(document, projection)
+
+    async def delete_one(self, filter: dict) -> DeleteResult:
+        """Delete the first document matching filter"""
+        documents = self._find(filter)[:1]
+        for document in documents:
+            del self.documents[document["_id"]]
+        return DeleteResult({"n": len(documents)}, True)
+
+    async def delete_many(self, filter: dict) -> DeleteResult:
+        """Delete every document matching filter"""
+        documents = self._find(filter)
+        for document in documents:
+            del self.documents[document["_id"]]
+        return DeleteResult({"n": len(documents)}, True)
+
+    async def bulk_write(self, requests: list, ordered: bool = True) -> BulkWriteResult:
+        """Apply a list of pymongo write operations"""
+        result = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []}
+        errors = []
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    result["nInserted"] += 1
+                elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+                    raw = self._update(request._filter, request._doc, request._upsert, many=isinstance(request, UpdateMany))
+                    if "upserted" in raw:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": raw["upserted"]})
+                    else:
+                        result["nMatched"] += raw["n"]
+                        result["nModified"] += raw["nModified"]
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    documents = self._find(request._filter)
+                    if isinstance(request, DeleteOne):
+                        documents = documents[:1]
+                    for document in documents:
+                        del self.documents[document["_id"]]
+                    result["nRemoved"] += len(documents)
+                else:
+                    raise NotImplementedError(f"{type(request).__name__} is not supported by MemoryCollection")
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({**result, "writeErrors": errors, "writeConcernErrors": []})
+        return BulkWriteResult(result, True)
+
+    # Indexes
+    async def create_index(self, keys, **kwargs) -> str:
+        """Record an index, unique indexes are enforced on later writes"""
+        keys = _index_keys(keys)
+        name = kwargs.pop("name", None) or "_".join(f"{path}_{direction}" for path, direction in keys)
+        if kwargs.get("unique"):
+            seen = []
+            for document in self.documents.values():
+                key = [_get_path(document, path) for path, _ in keys]
+                if key in seen:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", 11000)
+                seen.append(key)
+        self.indexes[name] = {"key": keys, **kwargs}
+        return name
+
+    async def create_indexes(self, indexes: List[IndexModel]) -> List[str]:
+        """Record a list of IndexModel"""
+        names = []
+        for index in indexes:
+            document = dict(index.document)
+            names.append(await self.create_index(list(document.pop("key").items()), **document))
+        return names
+
+    async def index_information(self) -> dict:
+        """The recorded indexes"""
+        return copy.deepcopy(self.indexes)
+
+    async def drop(self):
+        """Remove every document and index"""
+        self.documents.clear()
+        self.indexes = {"_id_": {"key": [("_id", 1)], "unique": True}}
+
+
+class MemoryRepository(Repository):
+    """
+    Repository bound to a new, empty MemoryCollection
+    """
+    def __init__(self, name: str, indexes=()):
+        """Object initializer"""
+        super().__init__(name, indexes)
+        self.bind(MemoryCollection(name))
@@ -0,0 +1,103 @@
+"""
+Repositories of the app collections
+Every collection used by the services is declared here once, with the indexes its queries rely on. The services take these repositories as
+constructor defaults and the app lifespan creates the indexes at startup. Users and projects, read by id on most requests, have an entity cache.
+Relations between users are edge collections (friendships, follows, collaborations) rather than arrays in the user documents, so a user
+document stays the same size however popular the user gets
+
+MODULES:
+    - asyncio: gather
+    - pymongo: IndexModel, ASCENDING, DESCENDING
+    - typing: Optional
+    - config: notification retention and entity cache settings
+    - repositories.base: Repository
+    - repositories.cache: EntityCache, LocalSharedCache
+    - repositories.memory: MemoryCollection
+
+"""
+import asyncio
+from pymongo import (
+    IndexModel, ASCENDING, DESCENDING
+)
+from typing import Optional
+from config import (
+    NOTIFICATION_RETENTION_DAYS, NOTIFICATION_RETENTION_MODE,
+    ENTITY_CACHE_ENABLED, ENTITY_CACHE_MAX_MB, ENTITY_CACHE_TTL, ENTITY_CACHE_SHARED
+)
+from repositories.base import Repository
+from repositories.cache import EntityCache, LocalSharedCache
+from repositories.memory import MemoryCollection
+
+
+notification_indexes = [
+    IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),  # inbox pages, in their sort order
+    IndexModel([("user_id", ASCENDING), ("is_read", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),  # unread pages
+    IndexModel([("is_read", ASCENDING), ("read_at", ASCENDING)]),  # archiving of notifications read long ago
+]
+if NOTIFICATION_RETENTION_DAYS and NOTIFICATION_RETENTION_MODE == "ttl":  # let mongodb expire read notifications instead of archiving them
+    notification_indexes.append(IndexModel(
+        [("read_at", ASCENDING)], expireAfterSeconds=NOTIFICATION_RETENTION_DAYS * 86400,
+        partialFilterExpression={"is_read": True},
+    ))
+
+shared_cache = LocalSharedCache() if ENTITY_CACHE_SHARED == "local" else None
+
+
+def entity_cache(name: str) -> Optional[EntityCache]:
+    """Entity cache of a collection with the configured budget and shared tier, None when caching is disabled"""
+    if not ENTITY_CACHE_ENABLED:
+        return None
+    return EntityCache(name, ENTITY_CACHE_MAX_MB * 2 ** 20, ENTITY_CACHE_TTL, shared_cache)
+
+
+users = Repository("users", [IndexModel([("email", ASCENDING)])], cache=entity_cache("users"))  # login and signup look users up by email
+projects = Repository("projects", [
+    IndexModel([("created_by", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),  # projects of a user, newest first
+], cache=entity_cache("projects"))
+applications = Repository("applications", [IndexModel([("project_id", ASCENDING)])])
+invitations = Repository("invitations", [IndexModel([("invitee_id", ASCENDING)])])
+friend_requests = Repository("friend_requests", [IndexModel([("sender_id", ASCENDING), ("recipient_id", ASCENDING)])])
+friendships = Repository("friendships", [
+    IndexModel([("user1_id", ASCENDING), ("user2_id", ASCENDING)], unique=True),  # one doc per pair
+    IndexModel([("user1_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),  # friends pages, merged with the next one
+    IndexModel([("user2_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+])
+follows = Repository("follows", [
+    IndexModel([("follower_id", ASCENDING), ("followee_id", ASCENDING)], unique=True),  # one edge per pair
+    IndexModel([("followee_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),  # followers pages
+    IndexModel([("follower_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),  # following pages
+])
+collaborations = Repository("collaborations", [  # one doc per pair of collabees, lower id as user1_id like friendships
+    IndexModel([("user1_id", ASCENDING), ("user2_id", ASCENDING)], unique=True),
+    IndexModel([("user1_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+    IndexModel([("user2_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+])
+conversations = Repository("conversations", [IndexModel([("users", ASCENDING)])])
+notifications = Repository("notifications", notification_indexes)
+notification_counters = Repository("notification_counters")  # keyed by user id
+notifications_archive = Repository("notifications_archive")
+leases = Repository("leases")  # periodic jobs run by one worker at a time, see repositories.leases
+projection_checkpoints = Repository("projection_checkpoints")  # change stream resume token of each projected collection, keyed by name
+
+repositories = [
+    users, projects, applications, invitations, friend_requests, friendships, follows, collaborations, conversations,
+    notifications, notification_counters, notifications_archive, leases, projection_checkpoints,
+]
+
+
+async def ensure_indexes():
+    """
+    Create the declared indexes of every repository
+    """
+    await asyncio.gather(*(repository.ensure_indexes() for repository in repositories))
+
+
+def use_memory():
+    """
+    Bind every repository to an empty MemoryCollection, for tests and benchmarks that run without mongodb.
+    Objects holding a collection handle directly (e.g the notification fan-out worker) must be created after this call
+    """
+    for repository in repositories:
+        repository.bind(MemoryCollection(repository.name))
+        if repository.cache is not None:
+            repository.cache.clear()
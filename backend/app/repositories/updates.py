@@ -0,0 +1,76 @@
+"""
+Update compiler
+Turns the fields submitted in an update model into the smallest mongodb update taking the stored document to them: fields that already hold
+the submitted value are left out, cleared fields are unset, and arrays are patched with $addToSet/$pull of the items that differ instead of
+rewritten whole, which matters for the collaborators and followers arrays of projects that grow to thousands of ids.
+An update with nothing left in it is not sent at all
+
+MODULES:
+    - typing: Any, List
+
+"""
+from typing import (
+    Any, List
+)
+
+
+def _distinct(items: List[Any]) -> bool:
+    """If items holds no duplicates, hashable items are compared by hash and the others by equality"""
+    try:
+        return len(set(items)) == len(items)
+    except TypeError:  # e.g embedded documents
+        return all(item not in items[:i] for i, item in enumerate(items))
+
+
+def _difference(items: List[Any], others: List[Any]) -> List[Any]:
+    """Items of items missing from others, in order"""
+    try:
+        others = set(others)
+    except TypeError:
+        pass
+    return [item for item in items if item not in others]
+
+
+def compile_update(document: dict, changes: dict) -> dict:
+    """
+    Minimal update taking document to changes
+
+    ARGUMENTS:
+        - document: dict, the stored document, only its fields named in changes are read
+        - changes: dict, field -> submitted value, None clears the field
+
+    RETURNS:
+        - dict: update operators, empty when the document already holds every submitted value
+
+    NOTE:
+        - arrays holding no duplicate on both sides are treated as sets: items added are sent with $addToSet/$each and items removed with
+          $pull/$in. An array with both additions and removals, whose order or duplicates matter, or that changes type is $set whole,
+          since one update cannot $addToSet and $pull the same field
+
+    """
+    update = {}
+    for field, value in changes.items():
+        current = document.get(field)
+        if value is None:
+            if current is not None:
+                update.setdefault("$unset", {})[field] = ""
+            continue
+        if current == value:
+            continue
+
+        if isinstance(value, list) and isinstance(current, list) and _distinct(value) and _distinct(current):
+            added = _difference(value, current)
+            removed = _difference(current, value)
+            if not removed and added and current + added == value:
+                update.setdefault("$addToSet", {})[field] = {"$each": added}
+                continue
+            if not added and removed and _difference(current, removed) == value:
+                update.setdefault("$pull", {})[field] = {"$in": removed}
+                continue
+        update.setdefault("$set", {})[field] = value
+    return update
+
+
+def fields_changed(update: dict) -> int:
+    """No of fields an update writes"""
+    return len({field for fields in update.values() for field in fields})
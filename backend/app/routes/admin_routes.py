@@ -0,0 +1,141 @@
+"""
+Admin Routes
+Profiling of the live worker. The router is only mounted when PROFILING_ENABLED is set and every route is restricted to ADMIN_USER_IDS
+
+MODULES:
+   - fastapi: APIRouter, Depends, HTTPException, Query
+   - fastapi.responses: PlainTextResponse
+   - fastapi.security: OAuth2PasswordBearer
+   - config: ADMIN_USER_IDS
+   - utils.auth.jwt_handler: verify_access_token
+   - utils.profiling: profile_loop, task_stacks, loop_lag, memory_profiler
+
+"""
+from fastapi import (
+    APIRouter, Depends, HTTPException, Query
+)
+from fastapi.responses import PlainTextResponse
+from fastapi.security import OAuth2PasswordBearer
+from config import ADMIN_USER_IDS
+from utils.auth.jwt_handler import verify_access_token
+from utils.profiling import (
+    profile_loop, task_stacks, loop_lag, memory_profiler
+)
+
+
+admin_router = APIRouter()
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+
+def require_admin(token: str = Depends(oauth2_scheme)) -> str:
+    """
+    Dependency letting only admins through
+
+    PARAMETERS:
+       - token: str, auth token
+
+    RETURNS:
+       - user_id: str, id of the admin
+
+    """
+    token = verify_access_token(token)
+    if not token:
+        failure = {"error": "Invalid token", "code": "UNAUTHORIZED"}
+        raise HTTPException(status_code=401, detail=failure)
+
+    if token.get("sub") not in ADMIN_USER_IDS:
+        failure = {"error": "Admins only", "code": "FORBIDDEN"}
+        raise HTTPException(status_code=403, detail=failure)
+    return token["sub"]
+
+
+@admin_router.get("/profile/cpu", response_class=PlainTextResponse)
+async def cpu_profile(
+        seconds: float = Query(10, gt=0, le=120), interval: float = Query(0.005, ge=0.001, le=1),
+        admin: str = Depends(require_admin)):
+    """
+    Sample the event loop thread for a while, the worker keeps serving requests meanwhile
+
+    PARAMETERS:
+       - seconds: float, duration of the profile
+       - interval: float, seconds between two samples
+
+    RETURNS:
+       - text: collapsed stacks, render with flamegraph.pl or speedscope
+
+    """
+    return PlainTextResponse(await profile_loop(seconds, interval))
+
+
+@admin_router.get("/profile/tasks", response_model=list)
+async def tasks(limit: int = Query(20, ge=1, le=200), admin: str = Depends(require_admin)):
+    """
+    Dump the stacks of the pending asyncio tasks
+
+    PARAMETERS:
+       - limit: int, max no of frames per task
+
+    RETURNS:
+       - list: name, coroutine and stack of each task
+
+    """
+    return task_stacks(limit)
+
+
+@admin_router.get("/profile/loop-lag", response_model=dict)
+async def event_loop_lag(
+        samples: int = Query(10, ge=1, le=100), interval: float = Query(0.1, gt=0, le=1),
+        admin: str = Depends(require_admin)):
+    """
+    Measure how late the event loop runs scheduled callbacks
+
+    PARAMETERS:
+       - samples: int, no of measurements
+       - interval: float, seconds between measurements
+
+    RETURNS:
+       - dict: mean and max lag in seconds
+
+    """
+    return await loop_lag(samples, interval)
+
+
+@admin_router.post("/profile/memory/start", response_model=dict)
+async def start_memory_profile(frames: int = Query(10, ge=1, le=100), admin: str = Depends(require_admin)):
+    """
+    Start tracing allocations with tracemalloc
+
+    PARAMETERS:
+       - frames: int, no of frames kept per allocation traceback
+
+    """
+    memory_profiler.start(frames)
+    return {"message": "Allocation tracing started"}
+
+
+@admin_router.post("/profile/memory/snapshot", response_model=list)
+async def memory_snapshot(top: int = Query(20, ge=1, le=500), admin: str = Depends(require_admin)):
+    """
+    Snapshot allocations and diff them with the previous snapshot
+
+    PARAMETERS:
+       - top: int, no of lines returned
+
+    RETURNS:
+       - list: top allocating lines with their size change
+
+    """
+    try:
+        return memory_profiler.snapshot(top)
+    except RuntimeError:
+        failure = {"error": "Allocation tracing is not started", "code": "CONFLICT"}
+        raise HTTPException(status_code=409, detail=failure)
+
+
+@admin_router.post("/profile/memory/stop", response_model=dict)
+async def stop_memory_profile(admin: str = Depends(require_admin)):
+    """
+    Stop tracing allocations
+    """
+    memory_profiler.stop()
+    return {"message": "Allocation tracing stopped"}
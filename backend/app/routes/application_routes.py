@@ -8,6 +8,7 @@ MODULES:
     - typing: List, Literal
     - typing_extensions: Annotated, TypedDict
     - services.application_services: ApplicationServices
+    - services.notification_fanout: notification_fanout
     - models.applications: ApplicationCreate, ApplicationResponse
     - utils.auth.jwt_handler: verify_access_token
 
@@ -25,6 +26,7 @@ from typing_extensions import (
 )
 from services.project_services import ProjectServices
 from services.application_services import ApplicationServices
+from services.notification_fanout import notification_fanout
 from models.applications import (
     ApplicationCreate, ApplicationResponse
 )
@@ -61,13 +63,16 @@ async def submit_application(application: ApplicationCreate, token: str = Depend
         failure = {"error": "Project not found", "code": "NOT_FOUND"}
         raise HTTPException(status_code=404, detail=failure)
 
-    application.applicant_id = token["sub"]
-    application_id = application_services.submit_application(application)
+    apply = application.model_dump(by_alias=True, exclude_none=True)  # _id is left out for the db to assign it
+    apply["applicant_id"] = token["sub"]
+    application_id = await application_services.submit_application(apply)
 
     if not application_id:
         failure = {"error": "Application submission failed", "code": "BAD_REQUEST"}
         raise HTTPException(status_code=400, detail=failure)
 
+    notification_fanout.enqueue([project.created_by], "application", f"New application to your project {project.title}")
+
     success = {"message": "Application submitted successfully", "application_id": application_id}
     return success
 
@@ -0,0 +1,60 @@
+"""
+Export Routes
+Full NDJSON dumps of projects, users and applications for admin and analytics consumers, streamed a chunk at a time. Mounted when
+EXPORTS_ENABLED is set and restricted to ADMIN_USER_IDS
+
+MODULES:
+   - typing: Literal, Optional
+   - fastapi: APIRouter, Depends, HTTPException, Query
+   - fastapi.responses: StreamingResponse
+   - config: EXPORT_BATCH_SIZE
+   - routes.admin_routes: require_admin
+   - services.export_services: ExportServices, resume_after
+
+"""
+from typing import (
+    Literal, Optional
+)
+from fastapi import (
+    APIRouter, Depends, HTTPException, Query
+)
+from fastapi.responses import StreamingResponse
+from config import EXPORT_BATCH_SIZE
+from routes.admin_routes import require_admin
+from services.export_services import (
+    ExportServices, resume_after
+)
+
+
+export_router = APIRouter()
+export_services = ExportServices()
+
+
+@export_router.get("/{collection}", response_class=StreamingResponse)
+async def export_collection(
+        collection: Literal["projects", "users", "applications"], fields: Optional[str] = None, after: Optional[str] = None,
+        batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000), admin: str = Depends(require_admin)):
+    """
+    Stream every document of a collection as NDJSON, in _id order
+
+    PARAMETERS:
+       - collection: str, projects, users or applications
+       - fields: str, comma separated fields exported, all fields when not given. _id is always exported
+       - after: str, _id of the last line received, as it appears in it (e.g "project1" or {"$oid": "..."}), to resume a cut export
+       - batch_size: int, documents fetched per round trip to the database
+
+    RETURNS:
+       - application/x-ndjson: one relaxed extended JSON document per line
+
+    """
+    try:
+        last_id = resume_after(after) if after else None
+    except ValueError:
+        failure = {"error": "Invalid resume token", "code": "BAD_REQUEST"}
+        raise HTTPException(status_code=400, detail=failure)
+
+    projection = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    return StreamingResponse(
+        export_services.export(collection, projection, last_id, batch_size), media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{collection}.ndjson"'},
+    )
@@ -8,6 +8,7 @@ MODULES:
    - typing: Literal, List
    - typing_extensions: Annotated, TypedDict
    - services.friend_services: FriendServices
+   - services.notification_fanout: notification_fanout
    - models.friends: FriendRequestCreate, FriendshipResponse
    - utils.auth.jwt_handler: verify_access_token
 
@@ -25,6 +26,7 @@ from typing_extensions import (
 )
 from services.friend_services import FriendServices
 from services.user_services import UserServices
+from services.notification_fanout import notification_fanout
 from models.friends import (
     FriendRequestCreate, FriendshipResponse
 )
@@ -63,6 +65,8 @@ async def send_request(request: FriendRequestCreate, token: str = Depends(oauth2
         failure = {"error": "Request exists already/Bad request", "code": "BAD_REQUEST"}
         raise HTTPException(status_code=400, detail=failure)
 
+    notification_fanout.enqueue([request.recipient_id], "friend_request", "You have a new friend request")
+
     success = {"message": "Request sent successfully", "request_id": request_id}
     return success
 
@@ -99,11 +103,19 @@ async def respond_to_request(
         failure = {"error": "You are not permitted to update this request", "code": "PERMISSION_DENIED"}  # To improve security, this should be obfuscated as a 404 err
         raise HTTPException(status_code=403, detail=failure)
 
+    status = status["status"]
     updated_response = await friend_services.update_friend_request_status(request_id, status)
-    if not updated_response:
+    if updated_response is None:
         failure = {"error": "Request not found", "code": "NOT_FOUND"}
         raise HTTPException(status_code=404, detail=failure)
 
+    if not updated_response:  # request was already answered with another status
+        failure = {"error": "Request has already been answered", "code": "CONFLICT"}
+        raise HTTPException(status_code=409, detail=failure)
+
+    if status == "accepted":
+        notification_fanout.enqueue([result["sender_id"]], "friend_request_accepted", "Your friend request was accepted")
+
     success = {"message": f"Request status updated successfully: {status}"}
     return success
 
@@ -0,0 +1,42 @@
+"""
+Import Routes
+Bulk imports of users and projects from a JSONL request body, streamed rather than read whole. Mounted when IMPORTS_ENABLED is set and
+restricted to ADMIN_USER_IDS
+
+MODULES:
+   - typing: Literal
+   - fastapi: APIRouter, Depends, Query, Request
+   - config: IMPORT_CHUNK_SIZE
+   - routes.admin_routes: require_admin
+   - services.import_services: ImportServices
+
+"""
+from typing import Literal
+from fastapi import (
+    APIRouter, Depends, Query, Request
+)
+from config import IMPORT_CHUNK_SIZE
+from routes.admin_routes import require_admin
+from services.import_services import ImportServices
+
+
+import_router = APIRouter()
+import_services = ImportServices()
+
+
+@import_router.post("/{kind}", response_model=dict)
+async def bulk_import(
+        kind: Literal["users", "projects"], request: Request, chunk_size: int = Query(IMPORT_CHUNK_SIZE, ge=1, le=10000),
+        admin: str = Depends(require_admin)):
+    """
+    Import users or projects, one JSON object per line of the body (application/x-ndjson)
+
+    PARAMETERS:
+       - kind: str, users, rows of name, email and password, or projects, rows of a project with created_by the id or email of its user
+       - chunk_size: int, rows validated, hashed and inserted together
+
+    RETURNS:
+       - dict: report, rows read and inserted, the line number and error of each row not imported, and rows per second
+
+    """
+    return await import_services.import_rows(kind, request.stream(), chunk_size)
@@ -7,6 +7,8 @@ MODULES:
     - typing: Literal
     - typing_extensions: Annotated, TypedDict
     - services.invitation_service: InvitationService
+    - services.notification_fanout: notification_fanout
+    - services.relation_services: RelationServices, collabees of the users
     - models.invitations: InvitationCreate, InvitationResponse
     - utils.auth.jwt_handler: verify_access_token
     - bson: ObjectId
@@ -24,6 +26,8 @@ from typing_extensions import (
 from services.user_services import UserServices
 from services.project_services import ProjectServices
 from services.invitation_services import InvitationServices
+from services.notification_fanout import notification_fanout
+from services.relation_services import RelationServices
 from models.invitations import (
     InvitationCreate, InvitationResponse
 )
@@ -35,6 +39,7 @@ invitation_router = APIRouter()
 user_services = UserServices()
 project_services = ProjectServices()
 invitation_services = InvitationServices()
+relation_services = RelationServices()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 Status = TypedDict("Status", {"status": Literal["accepted", "rejected"]})
 
@@ -59,17 +64,20 @@ async def send_invitation(invite: InvitationCreate, token: str = Depends(oauth2_
     # Ensure its the project owner sending the request
     project = await project_services.get_project_by_id(invite.project_id)
 
-    if not project or project["creator_id"] != token["sub"]:
+    if not project or project.created_by != token["sub"]:
         failure = {"error": "You are not permitted to send invites to other users on this project", "code": "PERMISSION_DENIED"}
         raise HTTPException(status_code=403, detail=failure)
 
-    invite.inviter_id = token["sub"]
-    invitation_id = await invitation_services.send_invitation(invite)
+    invitation = invite.model_dump(by_alias=True, exclude_none=True)  # _id is left out for the db to assign it
+    invitation["inviter_id"] = token["sub"]
+    invitation_id = await invitation_services.send_invitation(invitation)
 
     if not invitation_id:
         failure = {"error": "Invitation failed", "code": "BAD_REQUEST"}
         raise HTTPException(status_code=400, detail=failure)
 
+    notification_fanout.enqueue([invite.invitee_id], "invitation", f"You have been invited to join the project {project.title}")
+
     success = {"message": "Invitation sent successfully", "invitation_id": invitation_id}
     return success
 
@@ -131,11 +139,20 @@ async def update_invitation_status(status: Annotated[Status, Body()], invitation
         failure = {"error": "You are not permitted to update this invitation", "code": "PERMISSION_DENIED"}
         raise HTTPException(status_code=403, detail=failure)
 
+    status = status["status"]
     updated_response = await invitation_services.update_invitation_status(invitation_id, status)
 
-    if not updated_response:
+    if updated_response is None:
         failure = {"error": "Invitation not found", "code": "NOT_FOUND"}
         raise HTTPException(status_code=404, detail=failure)
 
+    if not updated_response:  # answered already, an acceptance joined the invitee to the project then
+        failure = {"error": "Invitation has already been answered", "code": "CONFLICT"}
+        raise HTTPException(status_code=409, detail=failure)
+
+    if status == "accepted":  # the invitee joins the project and becomes a collabee of the inviter
+        await project_services.add_collaborator(invitation["project_id"], invitation["invitee_id"])
+        await relation_services.add_collaboration(invitation["inviter_id"], invitation["invitee_id"])
+
     success = {"message": f"Invitation status updated successfully: {status}"} 
     return success
@@ -12,7 +12,7 @@ MODULES:
 """
 from fastapi import (
     APIRouter, WebSocket, WebSocketDisconnect, HTTPException,
-    WebSocketException, Depends
+    WebSocketException, Depends, Query, status
 )
 from fastapi.security import OAuth2PasswordBearer
 from typing import List
@@ -30,19 +30,19 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 @message_router.websocket("/")
-async def messaging_websocket(websocket: WebSocket, token: str = Depends(oauth2_scheme)):
+async def messaging_websocket(websocket: WebSocket, token: str = Query(...)):
     """
-    Establishes a websocket connection for messaging
+    Establishes a websocket connection for messaging.
+    The same socket also carries notification and presence frames, see services/connection_manager.py for the frame format
 
     ATTRIBUTES:
         - websocket: WebSocket, websocket connection
-        - token: str, JWT token
+        - token: str, JWT token, passed as a query param since browsers cannot set headers on websockets
     
     """
     token = verify_access_token(token)
     if not token:
-        failure = {"error": "Invalid token", "code": "UNAUTHORIZED"}
-        raise HTTPException(status_code=401, detail=failure)
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token")
 
     user_id = token["sub"]
     await messaging_service.connect(user_id, websocket)
@@ -52,9 +52,11 @@ async def messaging_websocket(websocket: WebSocket, token: str = Depends(oauth2_
             message = await messaging_service.receive_message(websocket)
 
             # Send the message to the recipient
-            await messaging_service.send_message(message)
+            await messaging_service.send_message(message, user_id)
     except (WebSocketDisconnect, WebSocketException):
-        messaging_service.disconnect(user_id, websocket)
+        pass  # the client went away
+    finally:  # on any error too, so the session is not left registered and counted
+        await messaging_service.disconnect(user_id, websocket)
 
 
 @message_router.post("/", response_model=dict)
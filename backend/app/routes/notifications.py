@@ -3,10 +3,13 @@ Defines a FastAPI router for managing notifications via HTTP endpoints.
 It integrates the NotificationService class to handle database operations
 and models defined in the application.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from db import db
+from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from typing import List, Optional
+from typing_extensions import Annotated
+from repositories import registry
 from models.notifications import Notification
 from services.notification_service import NotificationService
+from services.connection_manager import connection_manager
 
 router = APIRouter()
 
@@ -18,7 +21,10 @@ def get_notification_service() -> NotificationService:
     Returns:
         An instance of NotificationService
     """
-    return NotificationService(db)
+    return NotificationService(
+        registry.notifications.collection, registry.notification_counters.collection,
+        registry.notifications_archive.collection, publisher=connection_manager
+    )
 
 @router.post("/notifications/")
 async def create_notification(
@@ -54,33 +60,63 @@ async def create_notification(
 async def get_notifications(
     user_id: str,
     unread_only: bool = Query(False, description="Fetch only unread notifications"),
-    skip: int = Query(0, ge=0, description="Number of notifications to skip (for pagination)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (for pagination)"),
     limit: int = Query(100, ge=1, le=100, description="Maximum number of notifications to retrieve"),
     service: NotificationService = Depends(get_notification_service)
     ):
     """
-    Retrieves notification for a specific user.
+    Retrieves notification for a specific user, newest first.
     This endpoint fetches notifications from the database based on the user ID
 
     Args:
         user_id: ID of the user whose notifications are being retrieved
         unread_only: Boolean to filter only unread notifications
-        skip: Number of notifications to skip (for pagination)
+        cursor: Cursor of the page to retrieve, as returned in next_cursor
         limit: Number of notifications to retrieve
         service: The injected NotificationService instance
 
     Returns:
-        A dictionary containing a list of notifications
+        A dictionary containing a list of notifications and the cursor of the next page
 
     Raises:
-        HTTPException: If retrieval of notifications fails.
+        HTTPException: 400 for a malformed cursor, 500 if retrieval of notifications fails.
     """
+    connection_manager.record_poll(user_id)
     try:
-        notifications = await service.get_notification(user_id, unread_only, limit=limit)
-        return {"notifications": notifications}
+        notifications, next_cursor = await service.get_notification(
+            user_id, unread_only, limit=limit, cursor=cursor
+        )
+        return {"notifications": notifications, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve notifications: {str(e)}")
 
+@router.get("/{user_id}/summary", response_model=dict)
+async def get_summary(
+    user_id: str,
+    service: NotificationService = Depends(get_notification_service)
+    ):
+    """
+    Retrieves the inbox summary of a user.
+    Served from a maintained counter, so it is cheap enough to back an
+    unread badge.
+
+    Args:
+        user_id: ID of the user
+        service: The injected NotificationService instance
+
+    Returns:
+        A dictionary with the unread notification count.
+
+    Raises:
+        HTTPException: If retrieval of the summary fails.
+    """
+    try:
+        return await service.get_summary(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve notification summary: {str(e)}")
+
 @router.put("/notifications/{notification_id}/read", response_model=dict)
 async def mark_as_read(
     notification_id: str,
@@ -103,8 +139,61 @@ async def mark_as_read(
     """
     try:
         success = await service.mark_as_read(notification_id)
-        if not success:
-            raise HTTPException(status_code=404, detail="Notification not found")
-        return {"success": True}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to mark notification as read: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to mark notification as read: {str(e)}")
+    if not success:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    return {"success": True}
+
+@router.put("/notifications/{user_id}/read-batch", response_model=dict)
+async def mark_many_as_read(
+    user_id: str,
+    ids: Annotated[List[str], Body(embed=True)],
+    service: NotificationService = Depends(get_notification_service)
+    ):
+    """
+    Marks a batch of notifications of a user as read in one update.
+
+    Args:
+        user_id: ID of the user the notifications belong to
+        ids: IDs of the notifications to mark as read
+        service: The injected NotificationService instance
+
+    Returns:
+        A dictionary with the number of notifications marked as read.
+
+    Raises:
+        HTTPException: If the operation fails.
+    """
+    try:
+        marked = await service.mark_many_as_read(user_id, ids)
+        return {"success": True, "marked": marked}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to mark notifications as read: {str(e)}")
+
+@router.put("/notifications/{user_id}/read-all", response_model=dict)
+async def mark_all_read(
+    user_id: str,
+    before: Optional[str] = Query(None, description="Only mark notifications created before this time"),
+    service: NotificationService = Depends(get_notification_service)
+    ):
+    """
+    Marks all unread notifications of a user as read in one update.
+
+    Args:
+        user_id: ID of the user
+        before: Optional creation time upper bound, e.g the created_at of
+            the newest notification the client has displayed
+        service: The injected NotificationService instance
+
+    Returns:
+        A dictionary with the number of notifications marked as read.
+
+    Raises:
+        HTTPException: If the operation fails.
+    """
+    try:
+        marked = await service.mark_all_read(user_id, before)
+        return {"success": True, "marked": marked}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to mark notifications as read: {str(e)}")
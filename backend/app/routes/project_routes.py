@@ -2,11 +2,14 @@
 Routes for project endpoints
 
 MODULES:
-    - fastapi: APIRouter, Depends, HTTPException, status
+    - fastapi: APIRouter, Depends, HTTPException, Request, Response, status
     - fastapi.security: OAuth2PasswordBearer
     - services.project_services: ProjectServices
+    - services.notification_fanout: notification_fanout
     - models.project: Project, ProjectUpdate, ProjectResponse
     - utils.auth.jwt_handler: verify_access_token
+    - utils.http_cache: conditional_response, etag_of, if_match_version
+    - repositories.base: CONFLICT
 
 FUTURE IMPROVEMENTS:
     - utils.auth.jwt_handler: get_current_user
@@ -16,14 +19,19 @@ FUTURE IMPROVEMENTS:
 """
 from fastapi import (
     APIRouter, HTTPException,
-    status, Depends
+    status, Depends, Request, Response
 )
 from fastapi.security import OAuth2PasswordBearer
 from services.project_services import ProjectServices
+from services.notification_fanout import notification_fanout
 from models.projects import (
     ProjectCreate, ProjectResponse, ProjectUpdate
 )
 from utils.auth.jwt_handler import verify_access_token
+from utils.http_cache import (
+    conditional_response, etag_of, if_match_version
+)
+from repositories.base import CONFLICT
 
 
 project_router = APIRouter()
@@ -61,12 +69,13 @@ async def create_project(project: ProjectCreate, token: str = Depends(oauth2_sch
 
 
 @project_router.get("/{project_id}", response_model=ProjectResponse)
-async def get_project(project_id: str, token: str = Depends(oauth2_scheme)):
+async def get_project(project_id: str, request: Request, token: str = Depends(oauth2_scheme)):
     """
     Get a projects by its project_id
 
     ATTRIBUTES:
         - project_id: str, unique id of project
+        - request: Request, its If-None-Match is answered with a 304 when the project did not change
         - token: str, jwt auth token
     
     RETURNS:
@@ -84,23 +93,27 @@ async def get_project(project_id: str, token: str = Depends(oauth2_scheme)):
         failure = {"error": "Project not found", "code": "NOT_FOUND"}
         raise HTTPException(status_code=404, detail=failure)
     
-    return project
+    return conditional_response(request, project)
 
 @project_router.put("/{project_id}", response_model=dict)
-async def update_project(project_id: str, project: ProjectUpdate, token: str = Depends(oauth2_scheme)):
+async def update_project(project_id: str, project: ProjectUpdate, request: Request, response: Response,
+                         token: str = Depends(oauth2_scheme)):
     """
     Update a project
 
     ATTRIBUTES:
         - project_id: str, unique id of project
         - project: ProjectUpdate, model request
+        - request: Request, its If-Match holds the ETag of the project the update was made on, the update fails with a 409 if it changed since
+        - response: Response, gets the ETag of the updated project
         - token: str, jwt auth token
     
     RETURNS:
-        - message: JSON dict, response message or error
+        - message: JSON dict, response message, new version of the project and no of fields updated, or error
 
     NOTE:
-        - Irrespective of whether or not the fields in the project are actually updated, the updated_at field is always updated and a success message is returned
+        - Only the fields that differ from the stored project are written; an update changing nothing writes nothing, leaves updated_at and
+          the version as they are and notifies no one
 
     """
     token = verify_access_token(token)  # Decode and further verify token
@@ -108,13 +121,36 @@ async def update_project(project_id: str, project: ProjectUpdate, token: str = D
         failure = {"error": "Invalid token", "code": "UNAUTHORIZED"}
         raise HTTPException(status_code=401, detail=failure)
 
-    fields_updated = await project_services.update_project(project_id, project)
+    try:
+        version = if_match_version(request.headers.get("if-match"))
+    except ValueError:
+        failure = {"error": "If-Match does not hold a version of the project", "code": "PRECONDITION_FAILED"}
+        raise HTTPException(status_code=412, detail=failure)
+
+    updated = await project_services.update_project(project_id, project, version)
 
-    if fields_updated is None:
+    if updated is None:
         failure = {"error": "Project not found", "code": "BAD_REQUEST"}
         raise HTTPException(status_code=404, detail=failure)
-    
-    success = {"message": "Project updated successfully"}
+    new_version, fields_updated = updated
+    if new_version == CONFLICT:
+        failure = {"error": "Project was changed since it was read", "code": "CONFLICT"}
+        raise HTTPException(status_code=409, detail=failure)
+
+    updated_project = await project_services.get_project_by_id(project_id)  # tagged as a GET of the project is, with its followers
+    if updated_project:
+        response.headers["ETag"] = etag_of(updated_project)
+    if fields_updated == 0:
+        return {"message": "No project fields updated", "version": new_version, "fields_updated": 0}
+
+    # Let followers and collaborators know, delivered in the background
+    if updated_project:
+        notification_fanout.enqueue(
+            (updated_project.followers or []) + (updated_project.collaborators or []),
+            "project_update", f"Project {updated_project.title} was updated"
+        )
+
+    success = {"message": "Project updated successfully", "version": new_version, "fields_updated": fields_updated}
     return success
 
 @project_router.delete("/{project_id}", response_model=dict)
@@ -144,6 +180,60 @@ async def delete_project(project_id: str, token: str = Depends(oauth2_scheme)):
     success = {"message": "Project deleted successfully"}
     return success
 
+@project_router.put("/{project_id}/follow", response_model=dict)
+async def follow_project(project_id: str, token: str = Depends(oauth2_scheme)):
+    """
+    Follow a project, following a project already followed changes nothing
+
+    ATTRIBUTES:
+        - project_id: str, unique id of project
+        - token: str, jwt auth token
+
+    RETURNS:
+        - message: JSON dict, response message or error
+
+    """
+    token = verify_access_token(token)  # Decode and further verify token
+    if not token:
+        failure = {"error": "Invalid token", "code": "UNAUTHORIZED"}
+        raise HTTPException(status_code=401, detail=failure)
+
+    followed = await project_services.follow_project(project_id, token["sub"])
+
+    if followed is None:
+        failure = {"error": "Project not found", "code": "NOT_FOUND"}
+        raise HTTPException(status_code=404, detail=failure)
+
+    success = {"message": "Project followed successfully" if followed else "Project already followed"}
+    return success
+
+@project_router.delete("/{project_id}/follow", response_model=dict)
+async def unfollow_project(project_id: str, token: str = Depends(oauth2_scheme)):
+    """
+    Stop following a project
+
+    ATTRIBUTES:
+        - project_id: str, unique id of project
+        - token: str, jwt auth token
+
+    RETURNS:
+        - message: JSON dict, response message or error
+
+    """
+    token = verify_access_token(token)  # Decode and further verify token
+    if not token:
+        failure = {"error": "Invalid token", "code": "UNAUTHORIZED"}
+        raise HTTPException(status_code=401, detail=failure)
+
+    unfollowed = await project_services.unfollow_project(project_id, token["sub"])
+
+    if not unfollowed:
+        failure = {"error": "Project not found or not followed", "code": "NOT_FOUND"}
+        raise HTTPException(status_code=404, detail=failure)
+
+    success = {"message": "Project unfollowed successfully"}
+    return success
+
 @project_router.get("/me/{user_id}", response_model=list)
 async def get_all_projects_by_user_id(user_id: str, token: str = Depends(oauth2_scheme)):
     """
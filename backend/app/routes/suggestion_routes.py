@@ -2,18 +2,19 @@
 Suggestions routes for user feed generation
 
 MODULES:
-    - fastapi: APIRouter, Depends, HTTPException, status
+    - fastapi: APIRouter, Depends, HTTPException, Request, status
     - fastapi.security: OAuth2PasswordBearer
     - typing: List
     - services.suggestion_services: SuggestionServices
     - models.projects: ProjectResponse
     - models.user: UserResponse
     - utils.auth.jwt_handler: verify_access_token
+    - utils.http_cache: conditional_response
 
 """
 from fastapi import (
     APIRouter, Depends,
-    status, HTTPException
+    status, HTTPException, Request
 )
 from fastapi.security import OAuth2PasswordBearer
 from typing import List
@@ -21,6 +22,7 @@ from services.suggestion_services import SuggestionServices
 from models.projects import ProjectResponse
 from models.users import UserResponse
 from utils.auth.jwt_handler import verify_access_token
+from utils.http_cache import conditional_response
 
 suggestion_router = APIRouter()
 suggestion_services = SuggestionServices()
@@ -28,11 +30,12 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 @suggestion_router.get("/projects/", response_model=List[ProjectResponse])
-async def get_project_feed(token: str = Depends(oauth2_scheme)):
+async def get_project_feed(request: Request, token: str = Depends(oauth2_scheme)):
     """
     Route to get project suggestions for a user
 
     PARAMETERS:
+        - request: Request, its If-None-Match is answered with a 304 when the feed did not change
         - token: str, access token
 
     RETURNS:
@@ -44,15 +47,16 @@ async def get_project_feed(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail=failure)
     
     user_id = token.get("sub")
-    return await suggestion_services.get_project_suggestions(user_id)
+    return conditional_response(request, await suggestion_services.get_project_suggestions(user_id))
 
 
 @suggestion_router.get("/users/", response_model=List[UserResponse])
-async def get_user_feed(token: str = Depends(oauth2_scheme)):
+async def get_user_feed(request: Request, token: str = Depends(oauth2_scheme)):
     """
     Route to get user suggestions/recommendations for a collaboration
 
     PARAMETERS:
+        - request: Request, its If-None-Match is answered with a 304 when the feed did not change
         - token: str, access token
 
     RETURNS:
@@ -64,4 +68,4 @@ async def get_user_feed(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail=failure)
 
     user_id = token.get("sub")
-    return await suggestion_services.get_user_suggestions(user_id)
+    return conditional_response(request, await suggestion_services.get_user_suggestions(user_id))
@@ -2,11 +2,16 @@
 Routes for user endpoints
 
 MODULES:
-    - fastapi: APIRouter, Depends, HTTPException
+    - fastapi: APIRouter, Depends, HTTPException, Query, Request, Response
     - fastapi.security: OAuth2PasswordBearer
+    - typing: Awaitable, Callable, Optional
     - services.user_service: UserService
-    - models.user: User, UserResponse
+    - services.relation_services: RelationServices, followers, following, friends, collabees and projects of a user
+    - models.user: User, UserResponse, RelationPage
+    - models.projects: ProjectResponse
     - utils.auth.jwt_handler: verify_access_token
+    - utils.http_cache: conditional_response, etag_of, if_match_version
+    - repositories.base: CONFLICT
 
 FUTURE IMPROVEMENTS:
     - utils.auth.jwt_handler: get_current_user
@@ -16,28 +21,39 @@ FUTURE IMPROVEMENTS:
 """
 from fastapi import (
     APIRouter, Depends,
-    HTTPException
+    HTTPException, Query, Request, Response
 )
 from fastapi.security import OAuth2PasswordBearer
+from typing import (
+    Awaitable, Callable, Optional
+)
 from services.user_services import UserServices
+from services.relation_services import RelationServices
 from models.users import (
-    UserUpdate, UserResponse
+    UserUpdate, UserResponse, RelationPage
 )
+from models.projects import ProjectResponse
 from utils.auth.jwt_handler import verify_access_token
+from utils.http_cache import (
+    conditional_response, etag_of, if_match_version
+)
+from repositories.base import CONFLICT
 
 
 user_router = APIRouter()
 user_services = UserServices()
+relation_services = RelationServices()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 @user_router.get("/profile/{user_id}", response_model=UserResponse)
-async def get_user_profile(user_id: str, token: str = Depends(oauth2_scheme)):
+async def get_user_profile(user_id: str, request: Request, token: str = Depends(oauth2_scheme)):
     """
     Route to get a user profile
 
     PARAMETERS:
         - user_id: str, user id
+        - request: Request, its If-None-Match is answered with a 304 when the profile did not change
         - token: str, access token
 
     RETURNS:
@@ -54,26 +70,28 @@ async def get_user_profile(user_id: str, token: str = Depends(oauth2_scheme)):
         failure = {"error": "User not found", "code": "NOT_FOUND"}
         raise HTTPException(status_code=404, detail=failure)
 
-    return user
+    return conditional_response(request, user)
 
 
 @user_router.put("/profile/{user_id}", response_model=dict)
-async def update_user_profile(user_id: str, user: UserUpdate, token: str = Depends(oauth2_scheme)):
+async def update_user_profile(user_id: str, user: UserUpdate, request: Request, response: Response,
+                              token: str = Depends(oauth2_scheme)):
     """
     Route to update a user profile
 
     PARAMETERS:
         - user_id: str, user id
         - user: UserUpdate, json object with fields to be updated
+        - request: Request, its If-Match holds the ETag of the profile the update was made on, the update fails with a 409 if it changed since
+        - response: Response, gets the ETag of the updated profile
         - token: str, access token
 
     RETURNS:
-        - dict: update message
+        - dict: update message, new version of the profile and no of fields updated
 
     NOTE:
-    There is a "bug" in this implementation 🙃, the db storing users gets updated inspite no new data was passed innthe request.
-    For example, a user could pass the same data twice or even the original data stored in the user and still get a update successful message. 
-    So . . . .  🌚 whomever is reading this, Its yr turn to ensure that only requests with a change in data gets processsed and a diff message e.g "No data entries updated" when this happens. Be of good faith soldier  😂❤️
+    Only the fields that differ from the stored profile are written. Passing the same data twice, or the data already stored, writes nothing
+    and gets a "No data entries updated" message
 
     """
     token = verify_access_token(token)  # Decoded token
@@ -85,11 +103,178 @@ async def update_user_profile(user_id: str, user: UserUpdate, token: str = Depen
         failure = {"error": "Permission denied", "code": "PERMISSION_DENIED"}
         raise HTTPException(status_code=403, detail=failure)
 
-    fields_updated = await user_services.update_user(user_id, user)
+    try:
+        version = if_match_version(request.headers.get("if-match"))
+    except ValueError:
+        failure = {"error": "If-Match does not hold a version of the profile", "code": "PRECONDITION_FAILED"}
+        raise HTTPException(status_code=412, detail=failure)
+
+    updated = await user_services.update_user(user_id, user, version)
 
-    if fields_updated is None:  # user_id not found
+    if updated is None:  # user_id not found
         failure = {"error": "User not found", "code": "NOT_FOUND"}
         raise HTTPException(status_code=400, detail=failure)
+    new_version, fields_updated = updated
+    if new_version == CONFLICT:
+        failure = {"error": "Profile was changed since it was read", "code": "CONFLICT"}
+        raise HTTPException(status_code=409, detail=failure)
 
-    success = {"message": "profile updated successfully"}
+    current = await user_services.get_user_by_id(user_id)  # tagged as a GET of the profile is, with its counters
+    if current:
+        response.headers["ETag"] = etag_of(current)
+    if fields_updated == 0:
+        return {"message": "No data entries updated", "version": new_version, "fields_updated": 0}
+
+    success = {"message": "profile updated successfully", "version": new_version, "fields_updated": fields_updated}
     return success
+
+
+def authenticated(token: str) -> str:
+    """Id of the user of a token, 401 for an invalid token"""
+    payload = verify_access_token(token)
+    if not payload:
+        failure = {"error": "Invalid token", "code": "UNAUTHORIZED"}
+        raise HTTPException(status_code=401, detail=failure)
+    return payload.get("sub")
+
+
+async def relation_page(load: Callable[..., Awaitable[tuple]], user_id: str, cursor: Optional[str], limit: int) -> dict:
+    """
+    Page of a relation of a user
+
+    PARAMETERS:
+        - load: RelationServices method paging the relation
+        - user_id: str, user id
+        - cursor: str, next_cursor of the previous page
+        - limit: int, max no of users
+
+    RETURNS:
+        - dict: the users of the page and the cursor of the next one
+
+    """
+    try:
+        users, next_cursor = await load(user_id, cursor, limit)
+    except ValueError:
+        failure = {"error": "Invalid cursor", "code": "BAD_REQUEST"}
+        raise HTTPException(status_code=400, detail=failure)
+    return {"users": users, "next_cursor": next_cursor}
+
+
+@user_router.get("/{user_id}/followers", response_model=RelationPage)
+async def get_followers(
+        user_id: str, cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        limit: int = Query(50, ge=1, le=100), token: str = Depends(oauth2_scheme)):
+    """
+    Route to page through the followers of a user, newest first
+
+    PARAMETERS:
+        - user_id: str, user id
+        - cursor: str, next_cursor of the previous page
+        - limit: int, max no of users
+        - token: str, access token
+
+    RETURNS:
+        - RelationPage: users and cursor of the next page
+
+    """
+    authenticated(token)
+    return await relation_page(relation_services.followers, user_id, cursor, limit)
+
+
+@user_router.get("/{user_id}/following", response_model=RelationPage)
+async def get_following(
+        user_id: str, cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        limit: int = Query(50, ge=1, le=100), token: str = Depends(oauth2_scheme)):
+    """Route to page through the users a user follows, see get_followers"""
+    authenticated(token)
+    return await relation_page(relation_services.following, user_id, cursor, limit)
+
+
+@user_router.get("/{user_id}/friends", response_model=RelationPage)
+async def get_friends(
+        user_id: str, cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        limit: int = Query(50, ge=1, le=100), token: str = Depends(oauth2_scheme)):
+    """Route to page through the friends of a user, see get_followers"""
+    authenticated(token)
+    return await relation_page(relation_services.friends, user_id, cursor, limit)
+
+
+@user_router.get("/{user_id}/collabees", response_model=RelationPage)
+async def get_collabees(
+        user_id: str, cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        limit: int = Query(50, ge=1, le=100), token: str = Depends(oauth2_scheme)):
+    """Route to page through the users a user collaborates with, see get_followers"""
+    authenticated(token)
+    return await relation_page(relation_services.collabees, user_id, cursor, limit)
+
+
+@user_router.get("/{user_id}/projects", response_model=dict)
+async def get_user_projects(
+        user_id: str, cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        limit: int = Query(50, ge=1, le=100), token: str = Depends(oauth2_scheme)):
+    """
+    Route to page through the projects created by a user, newest first
+
+    PARAMETERS:
+        - user_id: str, user id
+        - cursor: str, next_cursor of the previous page
+        - limit: int, max no of projects
+        - token: str, access token
+
+    RETURNS:
+        - dict: projects (ProjectResponse) and cursor of the next page
+
+    """
+    authenticated(token)
+    try:
+        projects, next_cursor = await relation_services.user_projects(user_id, cursor, limit)
+    except ValueError:
+        failure = {"error": "Invalid cursor", "code": "BAD_REQUEST"}
+        raise HTTPException(status_code=400, detail=failure)
+    return {"projects": [ProjectResponse(**project) for project in projects], "next_cursor": next_cursor}
+
+
+@user_router.put("/{user_id}/follow", response_model=dict)
+async def follow_user(user_id: str, token: str = Depends(oauth2_scheme)):
+    """
+    Route to follow a user, following a user already followed changes nothing
+
+    PARAMETERS:
+        - user_id: str, id of the user to follow
+        - token: str, access token of the follower
+
+    RETURNS:
+        - dict: message
+
+    """
+    follower_id = authenticated(token)
+    if follower_id == user_id:
+        failure = {"error": "Users cannot follow themselves", "code": "BAD_REQUEST"}
+        raise HTTPException(status_code=400, detail=failure)
+
+    if not await user_services.get_user_by_id(user_id):
+        failure = {"error": "User not found", "code": "NOT_FOUND"}
+        raise HTTPException(status_code=404, detail=failure)
+
+    followed = await relation_services.follow(follower_id, user_id)
+    return {"message": "User followed successfully" if followed else "User already followed"}
+
+
+@user_router.delete("/{user_id}/follow", response_model=dict)
+async def unfollow_user(user_id: str, token: str = Depends(oauth2_scheme)):
+    """
+    Route to stop following a user
+
+    PARAMETERS:
+        - user_id: str, id of the user to unfollow
+        - token: str, access token of the follower
+
+    RETURNS:
+        - dict: message
+
+    """
+    follower_id = authenticated(token)
+    if not await relation_services.unfollow(follower_id, user_id):
+        failure = {"error": "User is not followed", "code": "NOT_FOUND"}
+        raise HTTPException(status_code=404, detail=failure)
+    return {"message": "User unfollowed successfully"}
@@ -3,12 +3,15 @@ Project Application services Module
 Handles business logic for applications to collaborate on a project
 
 MODULES:
-    - db: get_collection, get collections from db client
+    - repositories: Repository, registry.applications, registry.projects
+    - services.counter_services: adjust_counts, applications_count of the projects
     - bson: ObjectId
     - datetime: datetime
 
 """
-from db import get_collection
+from repositories.base import Repository
+from repositories import registry
+from services.counter_services import adjust_counts
 from bson import ObjectId
 from datetime import datetime
 
@@ -18,33 +21,36 @@ class ApplicationServices:
     Application services class: Includes methods to send an application, get applications and update an application.
 
     ATTRIBUTES:
-    - collection_name: name of collection where projects are stored in db
+    - applications: Repository, collection where applications are stored in db
+    - projects: Repository, projects, holding the applications_count of each project
 
     """
-    def __init__(self):
+    def __init__(self, applications: Repository = registry.applications, projects: Repository = registry.projects):
         """Object initializing method"""
-        self.collection_name = 'applications'
+        self.applications = applications
+        self.projects = projects
 
     async def submit_application(self, apply: dict) -> str:
         """
         Submits an application to join a project
 
         PARAMETERS:
-             - apply: ApplicationCreate/dict, application creation  obj holding prerequisite param(s) namely project_id
+             - apply: dict, dumped ApplicationCreate obj holding prerequisite param(s) namely project_id and applicant_id
 
         RETURNS:
             - application_id: stringified ObjectId, id of newly created and stored project object
 
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.applications.collection
 
         # Add the additional params req to create an ApplicationResponse during response creation
         apply["created_at"] = datetime.now().isoformat()
         apply["status"] = "pending"
 
-        # Insert the dict into the db, the 3 other attrs req to create a valid ApplicationResponse namely, application_id, project_id and applicant_id are still missing
-        insertion_id = collection.insert_one(apply.model_dump(by_alias=True))  # the application_id is aliased to _id so that the db auto assigns it
+        # Insert the dict into the db, the application_id is left out so that the db auto assigns it as _id
+        insertion_id = await collection.insert_one(apply)
         application_id = str(insertion_id.inserted_id)
+        await adjust_counts(self.projects, "applications", 1, apply["project_id"])  # repaired by the reconciliation job if this is lost
 
         return application_id  # this is the application_id to be used in creating the obj in the corresp. route
 
@@ -59,12 +65,12 @@ class ApplicationServices:
             - application: dict, with format of an ApplicationResponse obj
 
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.applications.collection
         
         if not ObjectId.is_valid(application_id):
             return None
 
-        application = await collection().find_one({"_id": ObjectId(application_id)})
+        application = await collection.find_one({"_id": ObjectId(application_id)})
         application["application_id"] = application.pop("_id")
 
         return application
@@ -80,9 +86,9 @@ class ApplicationServices:
             - list: application objs
 
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.applications.collection
 
-        cursor = collection().find({"project_id": project_id})
+        cursor = collection.find({"project_id": project_id})
         applications = await cursor.to_list(length=None)
 
         for application in applications:
@@ -104,7 +110,7 @@ class ApplicationServices:
         if not ObjectId.is_valid(application_id):
             return None
 
-        update_response = await self.applications_collection().update_one(
+        update_response = await self.applications.collection.update_one(
             {"_id": ObjectId(application_id)},
             {"$set": {"status": status}}
         )
@@ -7,7 +7,7 @@ MODULES:
     - models.users: UserCreate
     - utils.auth.password_utils: hash_password, verify_password
     - utils.auth.jwt_handler: create_access_token
-    - db: get_collection, get collections from db client
+    - repositories: Repository, registry.users
     - pydantic: ValidationError
     - uuid: uuid4 method
 
@@ -20,7 +20,8 @@ from models.users import (
 )
 from utils.auth.password_utils import hash_password, verify_password
 from utils.auth.jwt_handler import create_access_token
-from db import get_collection
+from repositories.base import Repository
+from repositories import registry
 from pydantic import ValidationError
 from uuid import uuid4
 
@@ -30,12 +31,12 @@ class AuthServices:
     Auth Services Class: Includes methods create/signup or login/authenticate users
 
     ATTRIBUTES:
-        - collection_name: name of collection where user data in stored in the database   
+        - users: Repository, collection where user data in stored in the database
 
     """
 
-    def __init__(self):
-        self.collection_name = "users"
+    def __init__(self, users: Repository = registry.users):
+        self.users = users
 
     async def create_user(self, signup: dict) -> str:
         """
@@ -49,7 +50,7 @@ class AuthServices:
 
         """
         # connect to collection
-        collection = await get_collection(self.collection_name)
+        collection = self.users.collection
 
         # Check if user already exists
         existing_user = await self.get_user_by_email(signup.email)
@@ -62,9 +63,11 @@ class AuthServices:
         
         user_data = user.model_dump(by_alias=True)  # user obj must first transformed into a simple dict, with the use of by_alias=True to use the alias name of user_id
         user_data["_id"] = 'user' + str(uuid4()) # optimise retrieval by setting user_id to the indexed _id
+        user_data["version"] = 1
         
         
         insertion = await collection.insert_one(user_data)
+        await self.users.changed()  # user searches in flight may not include the new user
 
         return str(insertion.inserted_id)  # new_id should now be the the same as insertion_id
 
@@ -101,7 +104,7 @@ class AuthServices:
             - dict: dict of user object
 
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.users.collection
         user = await collection.find_one({"email": email})
         if user:
             user["user_id"] = user.pop("_id")
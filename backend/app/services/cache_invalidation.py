@@ -0,0 +1,82 @@
+"""
+Change stream cache invalidation
+Services invalidate the entity cache of the writes they make, which only reaches the process that made them. With several app nodes, each node
+watches the change streams of the cached collections and invalidates the documents written by the others. Change streams need a replica set; a
+stream that fails is reopened after a delay and the local cache is emptied, since changes may have been missed in between
+
+MODULES:
+    - asyncio: create_task, sleep
+    - logging: getLogger
+    - typing: List
+    - repositories: Repository, registry
+
+"""
+import asyncio
+import logging
+from typing import List
+from repositories.base import Repository
+from repositories import registry
+
+
+logger = logging.getLogger(__name__)
+
+WRITES = [{"$match": {"operationType": {"$in": ["update", "replace", "delete"]}}}]  # inserts cannot be cached yet
+
+
+class CacheInvalidator:
+    """
+    One change stream listener per cached repository
+
+    ATTRIBUTES:
+        - repositories: list, repositories whose cache is invalidated
+        - retry: float, seconds before a failed stream is reopened, doubled on each failure up to max_retry
+        - max_retry: float
+
+    """
+    def __init__(self, repositories: List[Repository], retry: float = 1, max_retry: float = 60):
+        """Object initializer"""
+        self.repositories = [repository for repository in repositories if repository.cache is not None]
+        self.retry = retry
+        self.max_retry = max_retry
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """
+        Start listening to the change streams
+        """
+        self._tasks = [asyncio.create_task(self._listen(repository)) for repository in self.repositories]
+
+    async def stop(self):
+        """
+        Close the change streams
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _listen(self, repository: Repository):
+        """
+        Invalidate the documents changed in the collection of repository, reopening the stream when it fails
+
+        PARAMETERS:
+            - repository: Repository, a repository with a cache
+
+        """
+        delay = self.retry
+        while True:
+            try:
+                async with repository.collection.watch(WRITES) as stream:
+                    delay = self.retry
+                    async for change in stream:
+                        await repository.changed(change["documentKey"]["_id"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:  # e.g no replica set, a failover or a stream that cannot be resumed
+                logger.warning("Change stream of %s failed, retrying in %.0fs: %s", repository.name, delay, error)
+            repository.cache.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry)
+
+
+cache_invalidator = CacheInvalidator(registry.repositories)
@@ -0,0 +1,114 @@
+"""
+Websocket connection registry
+Holds the live websocket of every connected user. Chat messages, notifications and presence updates are all pushed through it as typed frames on that single socket
+
+MODULES:
+    - fastapi: WebSocket
+    - typing: Dict, Literal
+    - collections: Counter
+
+FRAME FORMAT:
+    {"type": "chat" | "notification" | "presence", "data": {...}}
+
+"""
+from fastapi import WebSocket
+from typing import (
+    Dict, Literal
+)
+from collections import Counter
+
+
+FrameType = Literal["chat", "notification", "presence"]
+
+
+class ConnectionManager:
+    """
+    Registry of active websocket connections
+
+    ATTRIBUTES:
+        - active_connections: dict, key is the user_id and value is the websocket connection
+        - frames_sent: Counter, no of frames pushed per frame type
+        - polls: Counter, no of notification polls served, split by whether the polling user was connected
+
+    """
+    def __init__(self):
+        """Object initializer"""
+        self.active_connections: Dict[str, WebSocket] = {}
+        self.frames_sent: Counter = Counter()
+        self.polls: Counter = Counter()
+
+    async def connect(self, user_id: str, websocket: WebSocket):
+        """
+        Accept a websocket connection and register it as the user's active connection
+
+        PARAMETERS:
+            - user_id: str, id of the user
+            - websocket: WebSocket, websocket connection
+
+        """
+        await websocket.accept()
+        self.active_connections[user_id] = websocket
+
+    def disconnect(self, user_id: str, websocket: WebSocket):
+        """
+        Remove a user's connection, unless it was already replaced by a newer one
+
+        PARAMETERS:
+            - user_id: str, id of the user
+            - websocket: WebSocket, websocket connection being closed
+
+        """
+        if self.active_connections.get(user_id) is websocket:
+            del self.active_connections[user_id]
+
+    def is_online(self, user_id: str) -> bool:
+        """
+        Check if a user currently has an open connection
+
+        PARAMETERS:
+            - user_id: str, id of the user
+
+        RETURNS:
+            - bool
+
+        """
+        return user_id in self.active_connections
+
+    async def send_frame(self, user_id: str, frame_type: FrameType, data: dict) -> bool:
+        """
+        Push a typed frame to a user if they are connected
+
+        PARAMETERS:
+            - user_id: str, id of the receiving user
+            - frame_type: str, one of chat, notification or presence
+            - data: dict, json serializable frame payload
+
+        RETURNS:
+            - bool: True if the frame was pushed, False if the user is offline or the socket failed
+
+        """
+        websocket = self.active_connections.get(user_id)
+        if not websocket:
+            return False
+
+        try:
+            await websocket.send_json({"type": frame_type, "data": data})
+        except Exception:  # socket died without a disconnect yet, the user is treated as offline
+            self.disconnect(user_id, websocket)
+            return False
+
+        self.frames_sent[frame_type] += 1
+        return True
+
+    def record_poll(self, user_id: str):
+        """
+        Count a notification poll, to measure the polling a connected client could have skipped
+
+        PARAMETERS:
+            - user_id: str, id of the polling user
+
+        """
+        self.polls["online" if self.is_online(user_id) else "offline"] += 1
+
+
+connection_manager = ConnectionManager()  # Shared by the messaging and notification services
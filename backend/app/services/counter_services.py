@@ -0,0 +1,181 @@
+"""
+Counter Services Module
+Handles the denormalized counters of users and projects: friends, followers, following, collabees and projects of a user, and followers,
+collaborators, applications and invitations of a project. Cards and profiles show these counts without counting anything per request: each
+write creating or removing what a counter counts moves it by the same amount. Counters of arrays of the document are moved in the same update
+as the array; counters of other collections are moved right after the insert or delete, so a crash in between leaves them off by one. The
+reconciliation job recounts them in bulk and repairs the ones that drifted.
+Counters are written without moving the version of the document: the version is what If-Match compares, and a follow must not turn the ETag
+an editor holds into a conflict. GET tags cover them through the unversioned_fields of the response models
+
+MODULES:
+    - asyncio: sleep
+    - logging: reconciliation runs
+    - random: uniform, jitter of the runs
+    - typing: Dict, List, Optional, Tuple
+    - pymongo: UpdateOne
+    - repositories: Repository, Lease, registry
+    - utils.metrics: registry, repaired counters
+
+"""
+import asyncio
+import logging
+import random
+from typing import (
+    Dict, List, Optional, Tuple
+)
+from pymongo import UpdateOne
+from repositories.base import Repository
+from repositories.leases import Lease
+from repositories import registry
+from utils.metrics import registry as metrics
+
+logger = logging.getLogger(__name__)
+
+counters_repaired = metrics.counter(
+    "denormalized_counters_repaired_total", "Counters found off their recount and repaired", ("collection", "counter")
+)
+
+
+async def adjust_counts(repository: Repository, relation: str, amount: int, *ids: str):
+    """
+    Move the counter of a relation of users or projects in one write, leaving their version alone. Cached documents are invalidated
+
+    PARAMETERS:
+        - repository: Repository, users or projects
+        - relation: str, e.g followers for followers_count
+        - amount: int, +1 for an edge or document created, -1 for one removed
+        - ids: ids of the documents counting it
+
+    """
+    await repository.collection.update_many({"_id": {"$in": list(ids)}}, {"$inc": {f"{relation}_count": amount}})
+    await repository.changed(*ids)
+
+
+class CounterServices:
+    """
+    Counter Services class: Includes methods to recount the denormalized counters and repair the ones that drifted
+
+    ATTRIBUTES:
+        - counted: dict, repository -> list of (counter, collection counted, fields holding the id of the document counting it)
+        - arrays: dict, repository -> list of (counter, array of the document it is the length of)
+
+    """
+    def __init__(self, users: Repository = registry.users, projects: Repository = registry.projects,
+                 friendships: Repository = registry.friendships, follows: Repository = registry.follows,
+                 collaborations: Repository = registry.collaborations, applications: Repository = registry.applications,
+                 invitations: Repository = registry.invitations):
+        """Object initializing method"""
+        self.counted: Dict[Repository, List[Tuple[str, Repository, Tuple[str, ...]]]] = {
+            users: [
+                ("friends_count", friendships, ("user1_id", "user2_id")),
+                ("collabees_count", collaborations, ("user1_id", "user2_id")),
+                ("followers_count", follows, ("followee_id",)),
+                ("following_count", follows, ("follower_id",)),
+                ("projects_count", projects, ("created_by",)),
+            ],
+            projects: [
+                ("applications_count", applications, ("project_id",)),
+                ("invitations_count", invitations, ("project_id",)),
+            ],
+        }
+        self.arrays: Dict[Repository, List[Tuple[str, str]]] = {
+            projects: [("followers_count", "followers"), ("collaborators_count", "collaborators")],
+        }
+
+    async def reconcile(self, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Recount the counters of every user and project and repair the ones that drifted
+
+        PARAMETERS:
+            - batch_size: int, documents checked per query
+
+        RETURNS:
+            - dict: collection name -> no of documents repaired
+
+        """
+        return {repository.name: await self.reconcile_collection(repository, batch_size) for repository in self.counted}
+
+    async def reconcile_collection(self, repository: Repository, batch_size: int = 500) -> int:
+        """
+        Recount the counters of the documents of a collection, a batch at a time in _id order. The counts of a batch are grouped by the server
+        in one aggregation per counted field, and the drifted documents repaired in one bulk write
+
+        PARAMETERS:
+            - repository: Repository, users or projects
+            - batch_size: int, documents checked per query
+
+        RETURNS:
+            - int: no of documents repaired
+
+        NOTE:
+            - a repair is conditional on the counters still holding the values read, so an increment made while the batch was counted is not
+              overwritten; that document is left for the next run. Documents written before the counters existed get them here
+        """
+        counted = self.counted.get(repository, [])
+        arrays = self.arrays.get(repository, [])
+        projection = {counter: 1 for counter, _, _ in counted}
+        projection.update({counter: 1 for counter, _ in arrays})
+        projection.update({array: 1 for _, array in arrays})
+
+        repaired, last_id = 0, None
+        while True:
+            query = {} if last_id is None else {"_id": {"$gt": last_id}}
+            documents = await repository.collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+            if not documents:
+                return repaired
+            last_id = documents[-1]["_id"]
+            ids = [document["_id"] for document in documents]
+
+            counts = {counter: await self._count(collection, fields, ids) for counter, collection, fields in counted}
+            requests, drifted_ids = [], []
+            for document in documents:
+                actual = {counter: counts[counter].get(document["_id"], 0) for counter, _, _ in counted}
+                actual.update({counter: len(document.get(array) or []) for counter, array in arrays})
+                drifted = {counter: value for counter, value in actual.items() if document.get(counter) != value}
+                if not drifted:
+                    continue
+                for counter in drifted:
+                    counters_repaired.inc(repository.name, counter)
+                stored = {counter: document.get(counter) for counter in drifted}  # None matches a counter never written
+                requests.append(UpdateOne({"_id": document["_id"], **stored}, {"$set": drifted}))
+                drifted_ids.append(document["_id"])
+
+            if requests:
+                result = await repository.collection.bulk_write(requests, ordered=False)
+                repaired += result.modified_count
+                await repository.changed(*drifted_ids)
+
+    async def reconcile_periodically(self, interval: float, batch_size: int = 500, lease: Optional[Lease] = None) -> None:
+        """
+        Run reconcile every interval seconds until cancelled, the first run one interval after the start rather than on every deploy
+
+        PARAMETERS:
+            - interval: float, seconds between two runs, up to a tenth more so workers started together spread out
+            - batch_size: int, documents checked per query
+            - lease: Lease, taken before each run so one worker of the deployment reconciles, None to run in every process
+
+        """
+        while True:
+            await asyncio.sleep(interval + random.uniform(0, interval / 10))
+            try:
+                if lease is not None and not await lease.acquire(interval * 2):
+                    continue  # another worker holds it
+                repaired = await self.reconcile(batch_size)
+                if any(repaired.values()):
+                    logger.info("Repaired denormalized counters: %s", repaired)
+            except Exception:
+                logger.exception("Reconciling denormalized counters failed")
+
+    @staticmethod
+    async def _count(collection: Repository, fields: Tuple[str, ...], ids: list) -> Dict[str, int]:
+        """No of documents of collection holding each of ids in one of fields, grouped by the server"""
+        counts: Dict[str, int] = {}
+        for field in fields:
+            groups = collection.collection.aggregate([
+                {"$match": {field: {"$in": ids}}},
+                {"$group": {"_id": f"${field}", "n": {"$sum": 1}}},
+            ])
+            async for counted in groups:
+                counts[counted["_id"]] = counts.get(counted["_id"], 0) + counted["n"]
+        return counts
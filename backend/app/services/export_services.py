@@ -0,0 +1,124 @@
+"""
+Export Services Module
+Handles full dumps of collections for admin and analytics consumers. Documents are read from a cursor in _id order, a server batch at a time,
+and written as NDJSON, one MongoDB relaxed extended JSON document per line like mongoexport writes them. Lines are grouped in chunks of a few
+tens of KB handed to the response as they fill up, so an export holds one batch and one chunk in memory however large the collection is, and
+a slow client pauses the cursor instead of growing a buffer. An export that was cut can be resumed after the _id of the last line received
+
+MODULES:
+    - json: dumps
+    - functools: partial
+    - typing: AsyncIterator, Dict, List, Optional
+    - bson: json_util, extended JSON of the BSON types
+    - config: EXPORT_BATCH_SIZE, EXPORT_CHUNK_KB
+    - repositories: Repository, registry
+    - utils.metrics: registry, exported documents and bytes
+
+"""
+import json
+from functools import partial
+from typing import (
+    AsyncIterator, Dict, List, Optional
+)
+from bson import json_util
+from config import (
+    EXPORT_BATCH_SIZE, EXPORT_CHUNK_KB
+)
+from repositories.base import Repository
+from repositories import registry
+from utils.metrics import registry as metrics
+
+exported_documents = metrics.counter("export_documents_total", "Documents written by the NDJSON exports", ("collection",))
+exported_bytes = metrics.counter("export_bytes_total", "Bytes of NDJSON written by the exports, before compression", ("collection",))
+
+HIDDEN_FIELDS = {"users": ("password",)}  # never exported, whatever the projection asked for
+
+# json.dumps falls back to json_util only for the BSON types it cannot write (ObjectId, datetime, Decimal128...), which is much faster
+# than json_util.dumps converting every value of the document first, and writes the same relaxed extended JSON
+encode = partial(
+    json.dumps, default=partial(json_util.default, json_options=json_util.RELAXED_JSON_OPTIONS), separators=(",", ":"), ensure_ascii=False
+)
+
+
+def resume_after(token: str):
+    """
+    _id to resume an export after, from the _id of the last line received as it appears in it, e.g "project1" or {"$oid": "..."}
+
+    PARAMETERS:
+        - token: str, JSON of the _id
+
+    RETURNS:
+        - the _id, with its BSON type. Raises ValueError for a token that is not JSON
+
+    """
+    return json_util.loads(token, json_options=json_util.RELAXED_JSON_OPTIONS)
+
+
+class ExportServices:
+    """
+    Export Services class: Includes a method to stream a collection as NDJSON
+
+    ATTRIBUTES:
+        - collections: dict, name -> Repository of the collections that can be exported
+
+    """
+    def __init__(self, collections: Optional[Dict[str, Repository]] = None):
+        """Object initializing method"""
+        self.collections = collections or {
+            "projects": registry.projects, "users": registry.users, "applications": registry.applications,
+        }
+
+    def projection(self, name: str, fields: Optional[List[str]] = None) -> dict:
+        """
+        Projection of an export: the fields asked for, or every field, without the hidden ones. _id is always kept to resume on
+
+        PARAMETERS:
+            - name: str, name of the collection
+            - fields: list, fields exported, None for all
+
+        RETURNS:
+            - dict: mongodb projection
+
+        """
+        hidden = HIDDEN_FIELDS.get(name, ())
+        if fields:
+            return {field: 1 for field in fields if field not in hidden and field != "_id"} or {"_id": 1}
+        return {field: 0 for field in hidden}
+
+    async def export(self, name: str, fields: Optional[List[str]] = None, after=None,
+                     batch_size: int = EXPORT_BATCH_SIZE, chunk_size: int = EXPORT_CHUNK_KB * 1024) -> AsyncIterator[bytes]:
+        """
+        Stream the documents of a collection as NDJSON chunks, in _id order
+
+        PARAMETERS:
+            - name: str, name of the collection, a key of collections
+            - fields: list, fields exported, None for all
+            - after: _id of the last document already received, None to start from the first
+            - batch_size: int, documents fetched per round trip to the server
+            - chunk_size: int, bytes of lines gathered before a chunk is yielded
+
+        RETURNS:
+            - async iterator of bytes, each made of whole lines
+
+        """
+        query = {} if after is None else {"_id": {"$gt": after}}
+        cursor = self.collections[name].collection.find(query, self.projection(name, fields)).sort("_id", 1).batch_size(batch_size)
+        lines: List[bytes] = []
+        size = count = 0
+        try:
+            async for document in cursor:
+                line = (encode(document) + "\n").encode()
+                lines.append(line)
+                size += len(line)
+                count += 1
+                if size >= chunk_size:
+                    yield b"".join(lines)
+                    exported_documents.inc(name, amount=count)
+                    exported_bytes.inc(name, amount=size)
+                    lines, size, count = [], 0, 0
+            if lines:
+                yield b"".join(lines)
+                exported_documents.inc(name, amount=count)
+                exported_bytes.inc(name, amount=size)
+        finally:
+            await cursor.close()  # the client may leave before the end, the server cursor is not left open
@@ -3,20 +3,26 @@ Friend services
 Handles logic to send, receive and response to friend requests
 
 MODULES:
-   - db: get_collection
+   - repositories: Repository, registry.friend_requests, registry.friendships, registry.users
    - bson: ObjectId
+   - pymongo: ReturnDocument, DuplicateKeyError
    - datetime: datetime class
    - models.friends: FriendRequestResponse, FriendshipResponse
    - services.user_services: UserServices
+   - services.counter_services: adjust_counts, friends_count of the users
 
 """
-from db import get_collection
+from repositories.base import Repository
+from repositories import registry
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from models.friends import (
     FriendRequestResponse, FriendshipResponse
 )
 from services.user_services import UserServices
+from services.counter_services import adjust_counts
 
 
 user_services = UserServices()
@@ -27,14 +33,17 @@ class FriendServices:
     Comprises methods to send, receuve and update friend request status as well as get the friends list for a user
 
     ATTRIBUTES:
-        - requests: name of friend requests collection
-        - friendship: name of friendship relationship collection
+        - requests: Repository, friend requests collection
+        - friendships: Repository, friendship relationship collection
+        - users: Repository, users, whose friends_count moves with the friendships
 
     """
-    def __init__(self):
+    def __init__(self, requests: Repository = registry.friend_requests, friendships: Repository = registry.friendships,
+                 users: Repository = registry.users):
         """Object initializer"""
-        self.requests_collection = "friend_requests"
-        self.friendship_collection = "friendships"
+        self.requests = requests
+        self.friendships = friendships
+        self.users = users
 
     async def send_friend_request(self, sender_id: str, recipient_id: str):
         """
@@ -47,7 +56,7 @@ class FriendServices:
         RETURNS:
            - id: str, id of new request
         """
-        collection = await get_collection(self.requests_collection)
+        collection = self.requests.collection
         existing_request = await collection.find_one({"sender_id": sender_id, "recipient_id": recipient_id})
         if existing_request:
             return None  # Avoid sending multiple requests
@@ -77,7 +86,7 @@ class FriendServices:
         if not ObjectId.is_valid(request_id):
             return None
 
-        collection = await get_collection(self.requests_collection)
+        collection = self.requests.collection
         request = await collection.find_one({"_id": ObjectId(request_id)})
 
         return request
@@ -85,35 +94,64 @@ class FriendServices:
 
     async def update_friend_request_status(self, request_id: str, status: str ):
         """
-        Updates the status of a friend request
+        Updates the status of a friend request.
+        The status flip is guarded by status "pending" so only one caller can answer a request, accepting then upserts a single friendship keyed on the ordered pair of user ids.
+        Repeating an answer that was already applied (e.g two concurrent accepts) is idempotent
 
         PARAMETERS:
             - request_id: str, id of a friend request
             - status: str, new status of the update
 
         RETURNS:
-           - int: no of obj in db updated, expected = 1
-        
+           - int: no of obj in db updated, expected = 1. 0 if the request was already answered with a different status
+
         """
-        request = self.get_request_by_id(request_id)
-        if not request:  # id is valid but dosent match any request in the db
-            return None  # 404 err
-        
-        if status == "accepted":  # create a friendship
-            collection = await get_collection(self.friendship_collection)
-            friendship = {
-                "user1_id": request["sender_id"],
-                "user2_id": request["recipient_id"],
-                "created_at": datetime.now().isoformat()
-            }
-            await collection.insert_one(friendship)
-
-        updated = await collection.update(
-            {"_id": ObjectId(request_id)},
-            {"$set": {"status": status}}
+        if not ObjectId.is_valid(request_id):
+            return None
+
+        collection = self.requests.collection
+        request = await collection.find_one_and_update(
+            {"_id": ObjectId(request_id), "status": "pending"},
+            {"$set": {"status": status}},
+            return_document=ReturnDocument.AFTER
         )
-        return updated.modified_count
 
+        if not request:  # request was either answered already or dosent exist at all
+            request = await collection.find_one({"_id": ObjectId(request_id)})
+            if not request:
+                return None  # 404 err
+            if request["status"] != status:
+                return 0  # e.g accepting a rejected request
+
+        if status == "accepted":  # create the friendship, safe to repeat
+            await self.create_friendship(request["sender_id"], request["recipient_id"])
+
+        return 1
+
+    async def create_friendship(self, user_id: str, other_id: str):
+        """
+        Create a friendship between two users if it dosent exist already.
+        The lower id is always stored as user1_id, the unique index on (user1_id, user2_id) makes concurrent calls collapse into a single doc
+
+        PARAMETERS:
+           - user_id: str, id of a user in the friendship
+           - other_id: str, id of the other user
+
+        """
+        collection = self.friendships.collection
+        user1_id, user2_id = sorted((user_id, other_id))
+
+        try:
+            result = await collection.update_one(
+                {"user1_id": user1_id, "user2_id": user2_id},
+                {"$setOnInsert": {"created_at": datetime.now().isoformat()}},
+                upsert=True
+            )
+        except DuplicateKeyError:  # a concurrent upsert won the race, the friendship exists
+            return
+
+        if result.upserted_id is not None:  # only the call that created the friendship counts it
+            await adjust_counts(self.users, "friends", 1, user1_id, user2_id)
 
     async def get_friend_list(self, user_id: str):
         """
@@ -126,7 +164,7 @@ class FriendServices:
            - list: list of friendships(format of FriendshipResponse)
 
         """
-        collection = await get_collection(self.friendship_collection)
+        collection = self.friendships.collection
         friends = await collection.find(
             {"$or": [{"user1_id": user_id}, {"user2_id": user_id}]}
         ).to_list()  # a length arg can be passed to to_list() for pagination
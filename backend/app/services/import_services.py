@@ -0,0 +1,255 @@
+"""
+Import Services Module
+Handles bulk imports of users and projects from JSONL, e.g to onboard a partner organisation. Rows are read from a stream of bytes and
+handled a chunk at a time: each row is validated with the signup or project model, user emails are checked against the emails seen so far
+in the file and the stored ones, fetched with one query per chunk, passwords are hashed by a pool of processes since bcrypt costs a few
+hundred ms per password, and the valid rows are written with one unordered insert_many. A bad row is reported with its line number and
+never stops the import
+
+MODULES:
+    - asyncio: get_running_loop, gather
+    - json: loads
+    - math: ceil
+    - multiprocessing: spawn context of the hashing pool
+    - time: perf_counter
+    - concurrent.futures: ProcessPoolExecutor
+    - typing: AsyncIterator, Dict, List, Optional, Tuple
+    - uuid: uuid4
+    - pydantic: ValidationError
+    - pymongo: UpdateOne
+    - pymongo.errors: BulkWriteError
+    - config: IMPORT_CHUNK_SIZE, IMPORT_HASH_WORKERS
+    - models: UserSignup, UserCreate, ProjectCreate
+    - repositories: Repository, registry
+    - utils.auth.password_utils: hash_passwords
+    - utils.metrics: registry, imported rows
+
+"""
+import asyncio
+import json
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    AsyncIterator, Dict, List, Optional, Tuple
+)
+from uuid import uuid4
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from config import (
+    IMPORT_CHUNK_SIZE, IMPORT_HASH_WORKERS
+)
+from models.users import (
+    UserSignup, UserCreate
+)
+from models.projects import ProjectCreate
+from repositories.base import Repository
+from repositories import registry
+from utils.auth.password_utils import hash_passwords
+from utils.metrics import registry as metrics
+
+imported_rows = metrics.counter("import_rows_total", "Rows of the bulk imports by outcome", ("kind", "result"))
+
+Row = Tuple[int, bytes]  # line number and content of a row
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    """
+    Non-empty lines of a stream of bytes with their line number, whatever the chunks are cut on
+
+    PARAMETERS:
+        - chunks: async iterator of bytes, e.g a request body or a file read a block at a time
+
+    RETURNS:
+        - async iterator of (line number from 1, line)
+
+    """
+    number, rest = 0, b""
+    async for chunk in chunks:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, line
+    if rest.strip():
+        yield number + 1, rest
+
+
+def describe(error: ValidationError) -> str:
+    """One line description of a validation error, e.g email: value is not a valid email address"""
+    return "; ".join(f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors())
+
+
+class ImportServices:
+    """
+    Import Services class: Includes methods to import users and projects from JSONL
+
+    ATTRIBUTES:
+        - users: Repository, users
+        - projects: Repository, projects
+        - workers: int, processes hashing passwords
+
+    """
+    def __init__(self, users: Repository = registry.users, projects: Repository = registry.projects, workers: int = IMPORT_HASH_WORKERS):
+        """Object initializing method"""
+        self.users = users
+        self.projects = projects
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def import_rows(self, kind: str, chunks: AsyncIterator[bytes], chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+        """
+        Import users or projects from JSONL, one object per line
+
+        PARAMETERS:
+            - kind: str, users (rows of UserSignup) or projects (rows of ProjectCreate, created_by being the id or the email of a user)
+            - chunks: async iterator of bytes, the JSONL
+            - chunk_size: int, rows validated, hashed and inserted together
+
+        RETURNS:
+            - dict: report, rows read, rows inserted, errors with the line number of each failed row, seconds and rows per second
+
+        """
+        import_chunk = {"users": self._import_users, "projects": self._import_projects}[kind]
+        start = time.perf_counter()
+        errors: List[dict] = []
+        seen: set = set()  # emails imported so far, duplicates within the file
+        rows = inserted = 0
+        chunk: List[Row] = []
+        async for row in iter_lines(chunks):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                inserted += await import_chunk(chunk, errors, seen)
+                rows += len(chunk)
+                chunk = []
+        if chunk:
+            inserted += await import_chunk(chunk, errors, seen)
+            rows += len(chunk)
+
+        imported_rows.inc(kind, "inserted", amount=inserted)
+        imported_rows.inc(kind, "failed", amount=rows - inserted)
+        seconds = time.perf_counter() - start
+        return {
+            "kind": kind, "rows": rows, "inserted": inserted, "failed": rows - inserted,
+            "errors": sorted(errors, key=lambda error: error["line"]),
+            "seconds": round(seconds, 3), "rows_per_second": round(rows / seconds, 1) if seconds else 0.0,
+        }
+
+    def close(self):
+        """Stop the hashing processes"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    async def _import_users(self, chunk: List[Row], errors: List[dict], seen: set) -> int:
+        """Validate, deduplicate, hash and insert a chunk of users, returns the no inserted"""
+        signups = self._validate(chunk, UserSignup, errors)
+        emails = [signup.email for _, signup in signups]
+        existing = set(await self.users.collection.distinct("email", {"email": {"$in": emails}})) if emails else set()
+
+        accepted = []
+        for line, signup in signups:
+            if signup.email in existing or signup.email in seen:
+                errors.append({"line": line, "error": "User already exists"})
+                continue
+            seen.add(signup.email)
+            accepted.append((line, signup))
+
+        hashes = await self._hash([signup.password for _, signup in accepted])
+        documents = []
+        for (line, signup), p_hash in zip(accepted, hashes):
+            user_data = UserCreate(name=signup.name, email=signup.email, password=p_hash).model_dump(by_alias=True)
+            user_data["_id"] = 'user' + str(uuid4())
+            user_data["version"] = 1
+            documents.append((line, user_data))
+
+        inserted = await self._insert(self.users, documents, errors)
+        await self.users.changed()
+        return inserted
+
+    async def _import_projects(self, chunk: List[Row], errors: List[dict], seen: set) -> int:
+        """Validate, resolve the creators of and insert a chunk of projects, returns the no inserted"""
+        projects = self._validate(chunk, ProjectCreate, errors)
+        creators = {project.created_by for _, project in projects if project.created_by}
+        owners = await self.users.collection.find(
+            {"$or": [{"_id": {"$in": list(creators)}}, {"email": {"$in": list(creators)}}]}, {"email": 1}
+        ).to_list(length=None) if creators else []
+        user_ids = {owner["_id"]: owner["_id"] for owner in owners}
+        user_ids.update({owner["email"]: owner["_id"] for owner in owners if owner.get("email")})
+
+        documents = []
+        for line, project in projects:
+            user_id = user_ids.get(project.created_by)
+            if user_id is None:
+                errors.append({"line": line, "error": f"created_by: no user with id or email {project.created_by}"})
+                continue
+            project_data = project.model_dump(by_alias=True)
+            project_data["_id"] = 'project' + str(uuid4())
+            project_data["created_by"] = user_id
+            project_data["version"] = 1
+            project_data["followers_count"] = len(project_data["followers"])
+            project_data["collaborators_count"] = len(project_data["collaborators"])
+            project_data["applications_count"] = project_data["invitations_count"] = 0
+            documents.append((line, project_data))
+
+        inserted_ids = set()
+        inserted = await self._insert(self.projects, documents, errors, inserted_ids)
+        await self.projects.changed()
+
+        counts: Dict[str, int] = {}
+        for _, project_data in documents:
+            if project_data["_id"] in inserted_ids:
+                counts[project_data["created_by"]] = counts.get(project_data["created_by"], 0) + 1
+        if counts:  # projects_count of the creators, one bulk write per chunk
+            await self.users.collection.bulk_write([
+                UpdateOne({"_id": user_id}, {"$inc": {"projects_count": count}}) for user_id, count in counts.items()
+            ], ordered=False)
+            await self.users.changed(*counts)
+        return inserted
+
+    @staticmethod
+    def _validate(chunk: List[Row], model, errors: List[dict]) -> list:
+        """(line, model) of the rows of a chunk that are JSON objects valid for model, the others are added to errors"""
+        valid = []
+        for line, content in chunk:
+            try:
+                valid.append((line, model.model_validate(json.loads(content))))
+            except ValidationError as e:
+                errors.append({"line": line, "error": describe(e)})
+            except ValueError as e:  # not JSON, or not UTF-8
+                errors.append({"line": line, "error": f"invalid JSON: {e}"})
+        return valid
+
+    async def _hash(self, passwords: List[str]) -> List[str]:
+        """Hash passwords in the worker processes, split in one slice per worker"""
+        if not passwords:
+            return []
+        if self._pool is None:  # spawned rather than forked, the app process runs an event loop and driver threads
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        loop = asyncio.get_running_loop()
+        step = math.ceil(len(passwords) / self.workers)
+        slices = await asyncio.gather(*(
+            loop.run_in_executor(self._pool, hash_passwords, passwords[i:i + step]) for i in range(0, len(passwords), step)
+        ))
+        return [p_hash for hashes in slices for p_hash in hashes]
+
+    @staticmethod
+    async def _insert(repository: Repository, documents: List[Tuple[int, dict]], errors: List[dict],
+                      inserted_ids: Optional[set] = None) -> int:
+        """Insert documents with one unordered insert_many, the rows of the documents refused are added to errors"""
+        if not documents:
+            return 0
+        refused = {}
+        try:
+            await repository.collection.insert_many([document for _, document in documents], ordered=False)
+        except BulkWriteError as e:
+            refused = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        for index, (line, document) in enumerate(documents):
+            if index in refused:
+                errors.append({"line": line, "error": refused[index]})
+            elif inserted_ids is not None:
+                inserted_ids.add(document["_id"])
+        return len(documents) - len(refused)
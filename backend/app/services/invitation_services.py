@@ -3,12 +3,15 @@ Project Invitation services Module
 Handles business logic for invitations to collaborate on a project
 
 MODULES:
-    - db: get_collection, get collections from db client
+    - repositories: Repository, registry.invitations, registry.projects
+    - services.counter_services: adjust_counts, invitations_count of the projects
     - bson: ObjectId
     - datetime: datetime
 
 """
-from db import get_collection
+from repositories.base import Repository
+from repositories import registry
+from services.counter_services import adjust_counts
 from bson import ObjectId
 from datetime import datetime
 
@@ -18,12 +21,14 @@ class InvitationServices:
     Invitation services class: Includes methods to send an invitation, get invitations and update an invitation.
 
     ATTRIBUTES:
-    - collection_name: name of collection where projects are stored in db
+    - invitations: Repository, collection where invitations are stored in db
+    - projects: Repository, projects, holding the invitations_count of each project
 
     """
-    def __init__(self):
+    def __init__(self, invitations: Repository = registry.invitations, projects: Repository = registry.projects):
         """Object initializing method"""
-        self.collection_name = 'invitations'
+        self.invitations = invitations
+        self.projects = projects
 
     async def send_invitation(self, invite: dict) -> str:
         """
@@ -36,15 +41,16 @@ class InvitationServices:
             - invitation_id: stringified ObjectId, id of newly created and stored project object
 
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.invitations.collection
 
         # Add the additional params req to create an InvitationResponse during response creation
         # i.e project_id, invitee_id and inviter_id should already be in the dict
         invite["created_at"] = datetime.now().isoformat()
         invite["status"] = "pending"
         
-        insertion_id = await collection.insert_one(invite.model_dump(by_alias=True))  # the invitation_id is aliased to _id so that the db auto assigns it
+        insertion_id = await collection.insert_one(invite)  # the invitation_id is left out so that the db auto assigns it as _id
         invitation_id = str(insertion_id.inserted_id)
+        await adjust_counts(self.projects, "invitations", 1, invite["project_id"])  # repaired by the reconciliation job if this is lost
 
         return invitation_id
     
@@ -59,7 +65,7 @@ class InvitationServices:
             - invitation: dict, with the format of a InvitationResponse obj
 
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.invitations.collection
 
         if not ObjectId.is_valid(invitation_id):
             return None
@@ -81,7 +87,7 @@ class InvitationServices:
             - list: invitation objs
 
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.invitations.collection
 
         cursor = collection.find({"invitee_id": user_id})
         invitations = await cursor.to_list(length=None)
@@ -93,24 +99,25 @@ class InvitationServices:
 
     async def update_invitation_status(self, invitation_id: str, status: str):
         """
-        Update the status of an invitation
+        Answer an invitation. The write is guarded by status "pending" so an invitation is answered once, and what follows an
+        acceptance runs once whatever the no of answers sent
 
         PARAMETERS:
            - invitation_id: str, id of invitation
-           - status: str
+           - status: str, accepted or rejected
 
         RETURNS:
-          - None
+          - int: 1 if the invitation was answered by this call, 0 if it was answered already, None if it does not exist
         """
         if not ObjectId.is_valid(invitation_id):
             return None
 
-        update_response = await self.invitations_collection().update_one(
-            {"_id": ObjectId(invitation_id)},
+        update_response = await self.invitations.collection.update_one(
+            {"_id": ObjectId(invitation_id), "status": "pending"},
             {"$set": {"status": status}}
         )
 
         if not update_response.matched_count:
-            return None
+            return 0 if await self.invitations.collection.find_one({"_id": ObjectId(invitation_id)}, {"_id": 1}) else None
 
         return update_response.modified_count
@@ -10,6 +10,10 @@ MODULES:
     - uuid: uuid4
     - datetime: datetime
     - models.messages: MessageCreate, MessageResponse, ConversationResponse
+    - repositories: Repository, registry.conversations
+    - services.connection_manager: connection_manager, shared websocket registry
+    - services.friend_services: FriendServices
+    - utils.metrics: registry
 
 """
 from fastapi import (
@@ -25,7 +29,18 @@ from datetime import datetime
 from models.messages import (
     MessageCreate, MessageResponse, ConversationResponse
 )
-from db import get_collection
+from repositories.base import Repository
+from repositories import registry as repositories
+from services.connection_manager import (
+    ConnectionManager, connection_manager
+)
+from services.friend_services import FriendServices
+from utils.metrics import registry
+
+
+friend_services = FriendServices()
+websocket_sessions = registry.gauge("websocket_sessions", "Open messaging websocket sessions")
+websocket_messages = registry.counter("websocket_messages_total", "Chat messages handled over websockets", ("direction",))  # received or pushed
 
 
 class MessagingService:
@@ -34,41 +49,61 @@ class MessagingService:
     Contains the logic to send and receive messages and conversations
 
     ATTRIBUTES:
-        - collection: str, name of the collection in the database
-        - active_connections: dict, a dict of active connections, key is the user_id and value is the websocket connection
+        - conversations: Repository, collection of the conversations
+        - connections: ConnectionManager, registry of active connections shared with the notification service
 
     FUTURE IMPROVEMENTS:
-        - Add a method to notify a user when he receives a message    
         - Add a method to delete a message
         - Pagination support for conversation history
     
     """
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}  #  A dict of active connections, key is the user_id and value is the websocket connection
-        self.collection = "conversations"
+    def __init__(self, connections: ConnectionManager = connection_manager, conversations: Repository = repositories.conversations):
+        self.connections = connections
+        self.conversations = conversations
+
+    @property
+    def active_connections(self) -> Dict[str, WebSocket]:
+        """A dict of active connections, key is the user_id and value is the websocket connection"""
+        return self.connections.active_connections
 
     async def connect(self, user_id: str, websocket):
         """
-        Connects a user to a websocket connection and stores the connection as an active connection
+        Connects a user to a websocket connection, stores the connection as an active connection and tells the user's online friends
 
         PARAMETERS:
             - user_id: str, id of the user
             - websocket: WebSocket, websocket connection
 
         """
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
+        await self.connections.connect(user_id, websocket)
+        websocket_sessions.inc()
+        await self.broadcast_presence(user_id, "online")
 
     async def disconnect(self, user_id: str, websocket: WebSocket):
         """
-        Disconnects a user from a websocket connection by removing the user from the active connections dict
+        Disconnects a user from a websocket connection by removing the user from the active connections and tells the user's online friends
 
         PARAMETERS:
             - user_id: str, id of the user
             - websocket: WebSocket, websocket connection
         """
-        self.active_connections.pop(user_id, None)  # remove the user from the active connections but if the user wasnt even connected the pop method will return None (KeyError silenced)
-        websocket.close()  # close the websocket connection
+        self.connections.disconnect(user_id, websocket)
+        websocket_sessions.dec()
+        await self.broadcast_presence(user_id, "offline")
+
+    async def broadcast_presence(self, user_id: str, status: str):
+        """
+        Push a presence frame to the friends of a user who are online
+
+        PARAMETERS:
+            - user_id: str, id of the user whose presence changed
+            - status: str, "online" or "offline"
+
+        """
+        friendships = await friend_services.get_friend_list(user_id)
+        for friendship in friendships:
+            friend_id = friendship["user1_id"] if friendship["user2_id"] == user_id else friendship["user2_id"]
+            await self.connections.send_frame(friend_id, "presence", {"user_id": user_id, "status": status})
 
     async def send_message(self, message: dict, user_id: str):
         """
@@ -86,17 +121,19 @@ class MessagingService:
         if message["sender_id"] == receiver_id:
             raise ValidationError("Cannot send message to self")
 
-        if text and receiver_id in self.active_connections:
+        if text and self.connections.is_online(receiver_id):
             message["status"] = "delivered"  # message was sent and seen by receipient
             await self.store_message(message)
-            await self.active_connections[receiver_id].send_json(text)
-        else:       
+            if await self.connections.send_frame(receiver_id, "chat", message):
+                websocket_messages.inc("pushed")
+        else:
             message["status"] = "sent" # message was sent but not yet seen by receipient
             await self.store_message(message)
 
     async def receive_message(self, websocket: WebSocket):
         """
-        Receives a message from a websocket connection
+        Receives a chat message from a websocket connection.
+        Accepts both a bare message and a {"type": "chat", "data": message} frame, frames of any other type are skipped
 
         PARAMETERS:
             - websocket: WebSocket, websocket connection
@@ -106,9 +143,16 @@ class MessagingService:
         """
         try:
             message = await websocket.receive_json()
+            while "type" in message and "data" in message:  # typed frame
+                if message["type"] == "chat":
+                    message = message["data"]
+                    break
+                message = await websocket.receive_json()
+
             if "text" not in message or "receiver_id" not in message:
                 raise ValidationError("Invalid message")
             
+            websocket_messages.inc("received")
             # Store the message in the database
             message["timestamp"] = datetime.now().isoformat()
             return message
@@ -124,7 +168,7 @@ class MessagingService:
             - message: dict, obj with the req attr of MessageCreate model, contains the text message to be stored
 
         """
-        collection = await get_collection(self.collection)
+        collection = self.conversations.collection
 
         sender_id = message["sender_id"]
         receiver_id = message["receiver_id"]
@@ -159,7 +203,7 @@ class MessagingService:
             - dict, conversation dict
         
         """
-        collection = await get_collection(self.collection)
+        collection = self.conversations.collection
         conversation = await collection.find_one({"users": {"$all": [user_id, receiver_id]}})  # _id is the id attr name rather than conversation_id, not a valid ConversationResponse
 
     async def get_user_conversation_history(self, user_id: str) -> List[dict]:
@@ -173,5 +217,5 @@ class MessagingService:
             - List: list, list of conversations from db
         
         """
-        collection = await get_collection(self.collection)
+        collection = self.conversations.collection
         return await collection.find({"users": user_id}).to_list()
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+Notification fan-out worker
+Delivers one notification to many users in the background, so request handlers only enqueue the fan-out and return
+
+MODULES:
+    - asyncio: Queue, Task
+    - logging: getLogger
+    - typing: List, Optional
+    - config: NOTIFICATION_QUEUE_SIZE, NOTIFICATION_BATCH_SIZE, NOTIFICATION_WORKERS
+    - repositories: registry
+    - services.notification_service: NotificationService
+    - services.connection_manager: connection_manager
+
+"""
+import asyncio
+import logging
+from typing import (
+    List, Optional
+)
+from config import (
+    NOTIFICATION_QUEUE_SIZE, NOTIFICATION_BATCH_SIZE, NOTIFICATION_WORKERS
+)
+from repositories import registry
+from services.notification_service import NotificationService
+from services.connection_manager import connection_manager
+
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationFanout:
+    """
+    Bounded queue of pending fan-outs drained by a pool of worker tasks
+
+    ATTRIBUTES:
+        - service: NotificationService, used to bulk insert the notifications
+        - queue: asyncio.Queue, pending fan-outs, bounded by maxsize
+        - batch_size: int, notifications per insert_many round trip
+        - workers: int, no of worker tasks draining the queue
+        - dropped: int, no of fan-outs dropped because the queue was full
+
+    """
+    def __init__(self, service: NotificationService, maxsize: int = NOTIFICATION_QUEUE_SIZE,
+                 batch_size: int = NOTIFICATION_BATCH_SIZE, workers: int = NOTIFICATION_WORKERS):
+        """Object initializer"""
+        self.service = service
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.dropped = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def enqueue(self, user_ids: List[Optional[str]], notification_type: str, content: str) -> bool:
+        """
+        Queue a notification for a list of users without waiting for it to be stored
+
+        PARAMETERS:
+            - user_ids: list, ids of the users to notify, empty ids are ignored
+            - notification_type: str, type of the notification
+            - content: str, notification content
+
+        RETURNS:
+            - bool: False if the queue is full and the fan-out was dropped
+
+        """
+        user_ids = [user_id for user_id in user_ids if user_id]
+        if not user_ids:
+            return True
+
+        try:
+            self.queue.put_nowait((user_ids, notification_type, content))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Notification queue full, dropped %s fan-out to %d users", notification_type, len(user_ids))
+            return False
+        return True
+
+    async def start(self):
+        """
+        Start the worker tasks
+        """
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10):
+        """
+        Wait up to timeout seconds for queued fan-outs to be delivered, then cancel the workers
+
+        PARAMETERS:
+            - timeout: float, seconds to wait for the queue to drain
+
+        """
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Notification queue not drained, %d fan-outs lost", self.queue.qsize())
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self):
+        """
+        Worker loop: deliver queued fan-outs one at a time
+        """
+        while True:
+            user_ids, notification_type, content = await self.queue.get()
+            try:
+                await self.service.create_notifications_bulk(
+                    user_ids, notification_type, content, chunk_size=self.batch_size
+                )
+            except Exception:  # keep the worker alive, a failed fan-out must not stop the others
+                logger.exception("Notification fan-out of %s to %d users failed", notification_type, len(user_ids))
+            finally:
+                self.queue.task_done()
+
+
+notification_fanout = NotificationFanout(NotificationService(
+    registry.notifications.collection, registry.notification_counters.collection,
+    publisher=connection_manager
+))
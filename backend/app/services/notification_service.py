@@ -1,17 +1,43 @@
 """
 Notification Service Module
 """
-from datetime import datetime
-from typing import List, Dict, Optional
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
 from bson.objectid import ObjectId
 from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from repositories.leases import Lease
+from services.connection_manager import ConnectionManager
+
+
+logger = logging.getLogger(__name__)
 
 
 class NotificationService:
-    """Service for managing user notifications."""
+    """
+    Service for managing user notifications.
+
+    Alongside the notifications, a counters collection holds one
+    document per user with the number of unread notifications, so badge
+    counts never have to scan the notifications themselves.
 
-    def __init__(self, collection: AsyncIOMotorCollection):
+    When a publisher is given, every new notification is also pushed as
+    a "notification" frame to its user if they have a websocket open.
+    """
+
+    def __init__(
+            self, collection: AsyncIOMotorCollection,
+            counters: AsyncIOMotorCollection,
+            archive: Optional[AsyncIOMotorCollection] = None,
+            publisher: Optional[ConnectionManager] = None):
         self.collection: AsyncIOMotorCollection = collection
+        self.counters: AsyncIOMotorCollection = counters
+        self.archive: Optional[AsyncIOMotorCollection] = archive
+        self.publisher: Optional[ConnectionManager] = publisher
 
     async def create_notification(
             self, user_id: str, notification_type: str, content: str) -> str:
@@ -25,55 +51,169 @@ class NotificationService:
 
         Returns:
             The inserted notification ID.
-        
+
         Raises:
             RuntimeError: If notification creation fails.
         """
         try:
             notification: Dict[str, any] = {
-                "user_id": ObjectId(user_id),
+                "user_id": user_id,
                 "type": notification_type,
                 "content": content,
                 "is_read": False,
                 "created_at": datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
             }
             result = await self.collection.insert_one(notification)
+            await self._increment_unread(user_id, 1)
+            await self._publish(notification)
             return str(result.inserted_id)
         except Exception as e:
             raise RuntimeError(f"Error creating notification: {str(e)}")
-    
+
+    async def create_notifications_bulk(
+            self, user_ids: List[str], notification_type: str, content: str,
+            chunk_size: int = 1000) -> int:
+        """
+        Creates the same notification for many users.
+
+        Notifications are inserted with unordered insert_many calls of at
+        most chunk_size documents, a failed document does not stop the
+        rest of its chunk. Unread counters are bumped in one bulk write per
+        chunk for the notifications that were actually inserted.
+
+        Args:
+            - user_ids: IDs of the users to notify, duplicates are dropped
+            - notification_type: The type of notification
+            - content: The notification content
+            - chunk_size: Maximum number of documents per round trip
+
+        Returns:
+            The number of notifications inserted.
+
+        Raises:
+            RuntimeError: If notification creation fails.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        created_at = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+        inserted = 0
+        try:
+            for start in range(0, len(user_ids), chunk_size):
+                chunk = user_ids[start:start + chunk_size]
+                notifications = [
+                    {
+                        "user_id": user_id,
+                        "type": notification_type,
+                        "content": content,
+                        "is_read": False,
+                        "created_at": created_at,
+                    }
+                    for user_id in chunk
+                ]
+                failed = set()
+                try:
+                    await self.collection.insert_many(notifications, ordered=False)
+                except BulkWriteError as e:
+                    failed = {error["index"] for error in e.details["writeErrors"]}
+
+                notified = [user_id for i, user_id in enumerate(chunk) if i not in failed]
+                if notified:
+                    await self.counters.bulk_write(
+                        [UpdateOne({"_id": user_id}, {"$inc": {"unread": 1}}, upsert=True) for user_id in notified],
+                        ordered=False,
+                    )
+                for i, notification in enumerate(notifications):
+                    if i not in failed:
+                        await self._publish(notification)
+                inserted += len(notified)
+            return inserted
+        except Exception as e:
+            raise RuntimeError(f"Error creating notifications: {str(e)}")
+
     async def get_notification(
-            self, user_id: str, unread_only: bool = False, limit: int = 100) -> List[Dict]:
+            self, user_id: str, unread_only: bool = False, limit: int = 100,
+            cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
         """
-        Retrieves notifications for a user.
+        Retrieves notifications for a user, newest first.
+
+        Pages are keyed on (created_at, _id) rather than skipped over, so
+        fetching a deep page costs the same as fetching the first one.
 
         Args:
             - user_id: ID of the user
             - unread_only: If to fetch only unread notifications
             - limit: Maximum number of notifications to fetch
+            - cursor: The next_cursor returned with the previous page
 
         Returns:
-            A list of notifications.
-        
+            A list of notifications and the cursor of the next page, None
+            on the last page.
+
         Raises:
+            ValueError: If the cursor is not one returned by a previous page.
             RuntimeError: If it fails to retrieve notification.
         """
+        position = None
+        if cursor:
+            created_at, _, last_id = cursor.rpartition("|")
+            if not created_at or not ObjectId.is_valid(last_id):
+                raise ValueError(f"Invalid cursor: {cursor}")
+            position = (created_at, ObjectId(last_id))
+
         try:
-            query: Dict[str, any] = {"user_id": ObjectId(user_id)}
+            query: Dict[str, any] = {"user_id": user_id}
             if unread_only:
                 query["is_read"] = False
-            notifications = await self.collection.find(query).limit(limit).to_list(length=limit)
-            return notifications
+            if position:
+                created_at, last_id = position
+                query["$or"] = [
+                    {"created_at": {"$lt": created_at}},
+                    {"created_at": created_at, "_id": {"$lt": last_id}},
+                ]
+            notifications = await self.collection.find(query).sort(
+                [("created_at", DESCENDING), ("_id", DESCENDING)]
+            ).limit(limit).to_list(length=limit)
+
+            for notification in notifications:
+                notification["notification_id"] = str(notification.pop("_id"))
+
+            next_cursor = None
+            if len(notifications) == limit:
+                last = notifications[-1]
+                next_cursor = f"{last['created_at']}|{last['notification_id']}"
+            return notifications, next_cursor
         except Exception as e:
             raise RuntimeError(f"Error retrieving notifications: {str(e)}")
-    
+
+    async def get_summary(self, user_id: str) -> Dict[str, any]:
+        """
+        Retrieves the inbox summary of a user from the unread counter.
+
+        Args:
+            - user_id: ID of the user
+
+        Returns:
+            A dictionary with the unread count.
+
+        Raises:
+            RuntimeError: If it fails to retrieve the summary.
+        """
+        try:
+            counter = await self.counters.find_one({"_id": user_id})
+            unread = counter["unread"] if counter else 0
+            return {"user_id": user_id, "unread_count": max(unread, 0)}
+        except Exception as e:
+            raise RuntimeError(f"Error retrieving notification summary: {str(e)}")
+
     async def mark_as_read(self, notification_id: str) -> bool:
         """
         Mark a notification as read.
 
+        Only a notification that is still unread is flipped, so the unread
+        counter is decremented once even if the call is repeated.
+
         Args:
             - notification_id: ID of the notification to mark as read
-        
+
         Returns:
             True if the update was successful, otherwise False.
 
@@ -81,10 +221,158 @@ class NotificationService:
             RuntimeError: Fails to mark a notification as read.
         """
         try:
-            result = await self.collection.update_one(
-                {"_id": ObjectId(notification_id)},
-                {"$set": {"is_read": True}},
+            notification = await self.collection.find_one_and_update(
+                {"_id": ObjectId(notification_id), "is_read": False},
+                {"$set": {"is_read": True, "read_at": datetime.now(timezone.utc)}},
+                projection={"user_id": 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            if not notification:
+                return False
+            await self._increment_unread(notification["user_id"], -1)
+            return True
+        except Exception as e:
+            raise RuntimeError(f"Error marking notification as read: {str(e)}")
+
+    async def mark_many_as_read(self, user_id: str, notification_ids: List[str]) -> int:
+        """
+        Mark a batch of notifications of a user as read in one update.
+
+        Args:
+            - user_id: ID of the user the notifications belong to
+            - notification_ids: IDs of the notifications to mark as read
+
+        Returns:
+            The number of notifications that were unread and got marked.
+
+        Raises:
+            RuntimeError: Fails to mark the notifications as read.
+        """
+        try:
+            result = await self.collection.update_many(
+                {
+                    "_id": {"$in": [ObjectId(_id) for _id in notification_ids]},
+                    "user_id": user_id,
+                    "is_read": False,
+                },
+                {"$set": {"is_read": True, "read_at": datetime.now(timezone.utc)}},
             )
-            return result.modified_count > 0
+            if result.modified_count:
+                await self._increment_unread(user_id, -result.modified_count)
+            return result.modified_count
         except Exception as e:
-            raise RuntimeError(f"Error marking notification as read: {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"Error marking notifications as read: {str(e)}")
+
+    async def mark_all_read(self, user_id: str, before: Optional[str] = None) -> int:
+        """
+        Mark all unread notifications of a user as read in one update.
+
+        Args:
+            - user_id: ID of the user
+            - before: Only mark notifications created before this time
+
+        Returns:
+            The number of notifications that got marked.
+
+        Raises:
+            RuntimeError: Fails to mark the notifications as read.
+        """
+        try:
+            query: Dict[str, any] = {"user_id": user_id, "is_read": False}
+            if before:
+                query["created_at"] = {"$lt": before}
+            result = await self.collection.update_many(
+                query, {"$set": {"is_read": True, "read_at": datetime.now(timezone.utc)}}
+            )
+            if result.modified_count:
+                await self._increment_unread(user_id, -result.modified_count)
+            return result.modified_count
+        except Exception as e:
+            raise RuntimeError(f"Error marking notifications as read: {str(e)}")
+
+    async def archive_read(self, older_than_days: int, batch_size: int = 1000) -> int:
+        """
+        Moves notifications read more than older_than_days ago from the hot
+        collection to the archive collection, the same notifications the TTL
+        retention mode expires: age runs from read_at, in UTC, and
+        notifications read before read_at was recorded are kept in both modes.
+
+        Each batch is copied before it is deleted, and a copy that already
+        exists in the archive is skipped, so an interrupted run is simply
+        picked up by the next one.
+
+        Args:
+            - older_than_days: Age in days after which read notifications move
+            - batch_size: Number of notifications moved per round trip
+
+        Returns:
+            The number of notifications archived.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        archived = 0
+        while True:
+            notifications = await self.collection.find(
+                {"is_read": True, "read_at": {"$lt": cutoff}}
+            ).limit(batch_size).to_list(length=batch_size)
+            if not notifications:
+                return archived
+
+            try:
+                await self.archive.insert_many(notifications, ordered=False)
+            except BulkWriteError as e:  # only duplicates from an earlier interrupted run are acceptable
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+            await self.collection.delete_many({"_id": {"$in": [n["_id"] for n in notifications]}})
+            archived += len(notifications)
+
+    async def archive_periodically(self, older_than_days: int, interval: float, lease: Optional[Lease] = None) -> None:
+        """
+        Runs archive_read every interval seconds until cancelled, the first
+        run one interval after the start rather than on every deploy.
+
+        Args:
+            - older_than_days: Age in days after which read notifications move
+            - interval: Seconds between two runs, up to a tenth more so
+              workers started together spread out
+            - lease: Taken before each run so one worker of the deployment
+              archives, None to archive in every process
+        """
+        while True:
+            await asyncio.sleep(interval + random.uniform(0, interval / 10))
+            try:
+                if lease is not None and not await lease.acquire(interval * 2):
+                    continue  # another worker holds it
+                archived = await self.archive_read(older_than_days)
+                if archived:
+                    logger.info("Archived %d read notifications", archived)
+            except Exception:
+                logger.exception("Archiving read notifications failed")
+
+    async def _publish(self, notification: Dict[str, any]) -> None:
+        """
+        Pushes a stored notification to its user if they are connected.
+
+        Args:
+            - notification: The notification document, as inserted
+        """
+        if not self.publisher or not self.publisher.is_online(notification["user_id"]):
+            return
+        await self.publisher.send_frame(notification["user_id"], "notification", {
+            "notification_id": str(notification["_id"]),
+            "type": notification["type"],
+            "content": notification["content"],
+            "is_read": notification["is_read"],
+            "created_at": notification["created_at"],
+        })
+
+    async def _increment_unread(self, user_id: str, amount: int) -> None:
+        """
+        Atomically adds amount to the unread counter of a user.
+
+        Args:
+            - user_id: ID of the user
+            - amount: Number to add, negative to decrement
+        """
+        await self.counters.update_one(
+            {"_id": user_id}, {"$inc": {"unread": amount}}, upsert=True
+        )
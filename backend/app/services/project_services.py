@@ -3,26 +3,32 @@ Project Services Module
 Handles business logic for Projects
 
 MODULES:
-    - typing: List, Optional
+    - typing: List, Optional, Tuple
     - datetime: datetime method
     - models.project: project models
     - services.user_services: user manipulation mthds
+    - services.counter_services: adjust_counts, projects_count of the users
     - utils.auth.jwt_handler: verify_access_token
-    - db: get_collection, get collections from db client
+    - repositories: Repository, registry.projects
+    - utils.single_flight: single_flight, coalescing of identical concurrent reads
     - uuid: uuid4 method
 
 """
 from typing import (
     List,
     Optional,
+    Tuple,
 )
 from datetime import datetime
 from models.projects import (
     ProjectCreate, ProjectUpdate, ProjectResponse
 )
 from services.user_services import UserServices
+from services.counter_services import adjust_counts
 from utils.auth.jwt_handler import verify_access_token
-from db import get_collection
+from repositories.base import Repository
+from repositories import registry
+from utils.single_flight import single_flight
 from uuid import uuid4
 
 
@@ -31,15 +37,15 @@ user_services = UserServices()
 
 class ProjectServices:
     """
-    Project Services class: Includes methods to create, update, search, retrueve and delete a project from the db
+    Project Services class: Includes methods to create, update, follow, search, retrueve and delete a project from the db
 
     ATTRIBUTES:
-    - collection_name: name of collection where projects are stored in db
+    - projects: Repository, collection where projects are stored in db
 
     """
-    def __init__(self):
+    def __init__(self, projects: Repository = registry.projects):
         """Object initializing method"""
-        self.collection_name = 'projects'
+        self.projects = projects
 
     async def create_project(self, project: ProjectCreate, user_id: str) -> str:
         """
@@ -53,7 +59,7 @@ class ProjectServices:
             - project_id: id of newly created and stored project object
 
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.projects.collection
         
         # Assert the user_id is valid
         user = await user_services.get_user_by_id(user_id)
@@ -64,14 +70,18 @@ class ProjectServices:
         project_data = project.model_dump(by_alias=True)
         project_data["_id"] = 'project' + str(uuid4())  # Specify what I want the insertion and return id to be
         project_data["created_by"] = user_id
+        project_data["version"] = 1
+        project_data["followers_count"] = len(project_data["followers"])
+        project_data["collaborators_count"] = len(project_data["collaborators"])
+        project_data["applications_count"] = project_data["invitations_count"] = 0
 
         # insert project into db
         insertion = await collection.insert_one(project_data)
         insertion_id = insertion.inserted_id
+        await self.projects.changed()  # searches in flight may not include the new project
 
-        # Add the newly created project to user obj attrs
-        user.projects.append(insertion_id)  # insertion_id is the same as the project_id
-        user_services.update_user(user_id, user)
+        # Count the project in the user's projects_count, the projects of a user are listed from this collection by created_by
+        await adjust_counts(user_services.users, "projects", 1, user_id)
 
         # return new project id
         return insertion_id
@@ -87,15 +97,18 @@ class ProjectServices:
             - Project: coresponding project object
         
         """
-        collection = await get_collection(self.collection_name)
-
-        project = await collection.find_one({"_id": project_id})
+        project = await self.projects.read_through(project_id, self._find_project, project_id)  # entity cache first, then the db
 
         if project:
             project["project_id"] = project.pop("_id")
             return ProjectResponse(**project)
         return None
 
+    @single_flight.coalesce("projects")
+    async def _find_project(self, project_id: str) -> Optional[dict]:
+        """Read a project document, concurrent reads of the same project share one query"""
+        return await self.projects.collection.find_one({"_id": project_id})
+
     async def get_all_projects_by_user_id(self, user_id: str) -> List[ProjectResponse]:
         """
         Get all projects by a user.
@@ -108,7 +121,7 @@ class ProjectServices:
         RETURNS:
             - List[Project]: list of project objects
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.projects.collection
 
         cursor = collection.find({"created_by": user_id})
         projects = await cursor.to_list(length=None)
@@ -117,42 +130,71 @@ class ProjectServices:
             project["project_id"] = project.pop("_id")
         return [ProjectResponse(**project) for project in projects]
 
-    async def update_project(self, project_id: str, project: ProjectUpdate) -> Optional[int]:
+    async def update_project(self, project_id: str, project: ProjectUpdate, version: Optional[int] = None) -> Optional[Tuple[int, int]]:
         """
-        Update a project
+        Update a project, writing only the fields that differ from the stored project
 
         PARAMETERS:
             - project_id: str, db id of the project doc
             - project: Project, sample project object to be used to update the project in the database
+            - version: int, version of the project the update was made on (If-Match), None to update the current version
+
+        RETURNS:
+            - tuple: (version, no of fields updated), CONFLICT as version if the project changed since version. None if it does not exist
+
+        """
+        update_data = project.model_dump(exclude_unset=True)  # fields sent by the client, None clears a field
+        update_data.pop("version", None)  # only the repository moves the version
+        update_data.pop("updated_at", None)  # set by the server when something changed, not by the client
+        if "collaborators" in update_data:  # the counter is written in the same update as the array
+            update_data["collaborators_count"] = len(update_data["collaborators"] or [])
+
+        return await self.projects.apply_changes(project_id, update_data, version)
+
+    async def follow_project(self, project_id: str, user_id: str) -> Optional[bool]:
+        """
+        Add a user to the followers of a project, safe to repeat
+
+        PARAMETERS:
+            - project_id: str, db id of the project doc
+            - user_id: str, id of the user following
 
         RETURNS:
-            - int: no of fields updated
+            - bool: True if the user did not follow the project yet, None if the project does not exist
 
         """
-        collection = await get_collection(self.collection_name)
+        return await self._add_member(project_id, "followers", user_id)
 
-        update_data = project.model_dump(exclude_unset=True)  # exclude fields which are None
+    async def unfollow_project(self, project_id: str, user_id: str) -> Optional[bool]:
+        """Remove a user from the followers of a project, see follow_project"""
+        return await self._remove_member(project_id, "followers", user_id)
 
-        list_fields = {}
-        other_fields = {}
-        for key, value in update_data.items():
-            if isinstance(key, list):
-                list_fields.update({key: value})
-            else:  # key is a string, int or any other type
-                other_fields.update({key: value})
+    async def add_collaborator(self, project_id: str, user_id: str) -> Optional[bool]:
+        """Add a user to the collaborators of a project, see follow_project"""
+        return await self._add_member(project_id, "collaborators", user_id)
 
-        update_response = await collection.update_one(
-            {"_id": project_id},
-            {
-                "$addToSet": list_fields,
-                "$set": other_fields
-            }
+    async def _add_member(self, project_id: str, array: str, user_id: str) -> Optional[bool]:
+        """Add user_id to an array of a project and count it in {array}_count in the same write, unless the array holds it already"""
+        return await self._write_member(
+            project_id, {array: {"$ne": user_id}}, {"$push": {array: user_id}, "$inc": {f"{array}_count": 1}}
         )
 
-        if update_response.matched_count == 0:
-            return None # a document with req project_id was not found
+    async def _remove_member(self, project_id: str, array: str, user_id: str) -> Optional[bool]:
+        """Remove user_id from an array of a project and uncount it in the same write, if the array holds it"""
+        return await self._write_member(
+            project_id, {array: user_id}, {"$pull": {array: user_id}, "$inc": {f"{array}_count": -1}}
+        )
 
-        return update_response.modified_count  # no of fields changed in the modified document
+    async def _write_member(self, project_id: str, match: dict, update: dict) -> Optional[bool]:
+        """
+        Write a membership change of a project if it meets match. Like the counters, memberships leave the version alone, so following a
+        project does not conflict with an edit in progress. True if written, False if not meeting match, None if the project does not exist
+        """
+        result = await self.projects.collection.update_one({"_id": project_id, **match}, update)
+        if result.modified_count:
+            await self.projects.changed(project_id)
+            return True
+        return False if await self.projects.collection.find_one({"_id": project_id}, {"_id": 1}) else None
 
     async def delete_project(self, project_id: str) -> Optional[int]:
         """
@@ -165,12 +207,17 @@ class ProjectServices:
             - int: no of projrct doc deleted
         
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.projects.collection
 
-        delete_response = await collection.delete_one({"_id": project_id})
+        deleted = await collection.find_one_and_delete({"_id": project_id}, {"created_by": 1})
+        await self.projects.changed(project_id)
+        if deleted is None:
+            return None
 
-        return delete_response.deleted_count if delete_response.deleted_count == 1 else None  # every project has a unique id, so only one project should be deleted
+        await adjust_counts(user_services.users, "projects", -1, deleted["created_by"])
+        return 1  # every project has a unique id, so only one project is deleted
 
+    @single_flight.coalesce("projects")
     async def search_projects(self, filters: dict) -> list:
         """
         Search for projects
@@ -182,7 +229,7 @@ class ProjectServices:
             - list: list of project objects
 
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.projects.collection
 
         # create a custom query from the filters dict received
         query = {}
@@ -0,0 +1,351 @@
+"""
+Projection Service Module
+Keeps read models derived from the collections (inverted indexes, caches, counters, feeds) current without hooks in the services writing
+them. A background task per watched collection reads its change stream and hands each change, as a ChangeEvent, to the projectors
+registered for the collection. The resume token of the stream is checkpointed in projection_checkpoints every few events and at shutdown,
+so a restart carries on where the last run stopped rather than from now.
+Change streams need a replica set. On a standalone server, or the in-memory collections, the service falls back to polling: every interval
+it diffs a hash of every document against the previous poll and dispatches the inserts, updates and deletes it finds. Polling reads
+every document of the collection per interval, fine for small deployments and tests only, and cannot resume, so projectors are reset
+when it starts. Delivery is at least once in both modes: events after the last checkpoint are dispatched again after a restart, so
+projectors must be idempotent
+
+MODULES:
+    - abc: ABC, abstractmethod
+    - hashlib: blake2b, fingerprints of the polled documents
+    - asyncio: create_task, gather, sleep
+    - logging: getLogger
+    - time: monotonic, time
+    - typing: Any, Dict, List, Optional
+    - bson: encode
+    - pymongo.errors: OperationFailure
+    - config: PROJECTIONS_MODE, PROJECTIONS_POLL_INTERVAL, PROJECTIONS_CHECKPOINT_EVERY, PROJECTIONS_CHECKPOINT_INTERVAL
+    - repositories: Repository, registry
+    - utils.metrics: registry, dispatched events, projector errors, lag
+
+"""
+import asyncio
+import logging
+import time
+from abc import (
+    ABC, abstractmethod
+)
+from hashlib import blake2b
+from typing import (
+    Any, Dict, List, Optional
+)
+import bson
+from pymongo.errors import OperationFailure
+from config import (
+    PROJECTIONS_MODE, PROJECTIONS_POLL_INTERVAL, PROJECTIONS_CHECKPOINT_EVERY, PROJECTIONS_CHECKPOINT_INTERVAL
+)
+from repositories.base import Repository
+from repositories import registry
+from utils.metrics import registry as metrics
+
+logger = logging.getLogger(__name__)
+
+projected_events = metrics.counter("projection_events_total", "Change events dispatched to the projectors", ("collection", "operation"))
+projector_errors = metrics.counter("projection_errors_total", "Change events a projector failed to apply", ("projector",))
+projection_lag = metrics.gauge("projection_lag_seconds", "Seconds between a change and its dispatch, change streams only", ("collection",))
+
+OPERATIONS = ["insert", "update", "replace", "delete"]
+NOT_REPLICA_SET = 40573  # $changeStream is only supported on replica sets
+HISTORY_LOST = (280, 286)  # ChangeStreamFatalError, ChangeStreamHistoryLost: the resume token fell off the oplog
+
+
+def fingerprint(document: dict) -> bytes:
+    """Hash of the whole content of a document, any write to it changes it whether or not the write moved a version"""
+    return blake2b(bson.encode(document), digest_size=16).digest()
+
+
+class ChangeEvent:
+    """
+    A write to a watched collection, as dispatched to the projectors
+
+    ATTRIBUTES:
+        - collection: str, name of the collection written
+        - operation: str, insert, update, replace or delete
+        - document_id: _id of the document written
+        - document: dict, the document after the write, None for deletes or when it was deleted since
+        - updated_fields: dict, fields set by an update, empty when not known (replaces, polling)
+        - removed_fields: list, fields unset by an update
+        - token: dict, resume token of the change, None when polling
+        - cluster_time: float, epoch seconds of the write, None when polling
+
+    """
+    def __init__(self, collection: str, operation: str, document_id: Any, document: Optional[dict] = None,
+                 updated_fields: Optional[dict] = None, removed_fields: Optional[List[str]] = None, token: Optional[dict] = None,
+                 cluster_time: Optional[float] = None):
+        """Object initializer"""
+        self.collection = collection
+        self.operation = operation
+        self.document_id = document_id
+        self.document = document
+        self.updated_fields = updated_fields or {}
+        self.removed_fields = removed_fields or []
+        self.token = token
+        self.cluster_time = cluster_time
+
+    @classmethod
+    def from_change(cls, change: dict) -> "ChangeEvent":
+        """
+        Event of a change stream document
+
+        PARAMETERS:
+            - change: dict, as read from a change stream opened with full_document="updateLookup"
+
+        RETURNS:
+            - ChangeEvent
+
+        """
+        description = change.get("updateDescription") or {}
+        cluster_time = change.get("clusterTime")
+        return cls(
+            change["ns"]["coll"], change["operationType"], change["documentKey"]["_id"], change.get("fullDocument"),
+            description.get("updatedFields"), description.get("removedFields"), change.get("_id"),
+            cluster_time.time if cluster_time is not None else None,
+        )
+
+    def __repr__(self):
+        return f"ChangeEvent({self.collection}, {self.operation}, {self.document_id!r})"
+
+
+class Projector(ABC):
+    """
+    Read model kept current from the writes to some collections. An event may be dispatched more than once, applying it twice must be
+    harmless
+
+    ATTRIBUTES:
+        - collections: list, names of the collections whose events are dispatched to the projector
+
+    """
+    collections: List[str] = []
+
+    @property
+    def name(self) -> str:
+        """Name of the projector in logs and metrics"""
+        return type(self).__name__
+
+    @abstractmethod
+    async def project(self, event: ChangeEvent):
+        """
+        Apply a change to the read model
+
+        PARAMETERS:
+            - event: ChangeEvent
+
+        """
+
+    async def reset(self, collection: str):
+        """
+        Called when changes to collection may have been missed (no checkpoint, a token lost, polling started). A projector that cannot
+        tolerate gaps rebuilds its read model of the collection here
+        """
+
+
+class ProjectionService:
+    """
+    Background consumer of the changes of the watched collections, dispatching them to the registered projectors
+
+    ATTRIBUTES:
+        - repositories: dict, name -> Repository of the collections that can be watched
+        - checkpoints: Repository, resume token of each collection, keyed by collection name
+        - mode: str, "stream", "poll" or "auto": change streams, falling back to polling when the server has none
+        - poll_interval: float, seconds between two polls
+        - checkpoint_every: int, events dispatched between two checkpoints
+        - checkpoint_interval: float, seconds after which a pending checkpoint is saved whatever the no of events
+        - retry: float, seconds before a failed stream is reopened, doubled on each failure up to max_retry
+        - max_retry: float
+
+    """
+    def __init__(self, repositories: List[Repository] = registry.repositories, checkpoints: Repository = registry.projection_checkpoints,
+                 mode: str = PROJECTIONS_MODE, poll_interval: float = PROJECTIONS_POLL_INTERVAL,
+                 checkpoint_every: int = PROJECTIONS_CHECKPOINT_EVERY, checkpoint_interval: float = PROJECTIONS_CHECKPOINT_INTERVAL,
+                 retry: float = 1, max_retry: float = 60):
+        """Object initializer"""
+        self.repositories = {repository.name: repository for repository in repositories}
+        self.checkpoints = checkpoints
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.retry = retry
+        self.max_retry = max_retry
+        self.projectors: Dict[str, List[Projector]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, projector: Projector):
+        """
+        Dispatch the events of projector.collections to projector, from the next start
+
+        PARAMETERS:
+            - projector: Projector
+
+        NOTE:
+            - ValueError when a collection is not one of the repositories
+            - when polling, every write is seen, versioned or not, but only as the state of the document at the next poll: writes between
+              two polls come as one update with no updated_fields, and a document inserted and deleted between them is never seen
+
+        """
+        for collection in projector.collections:
+            if collection not in self.repositories:
+                raise ValueError(f"{projector.name} watches {collection}, which has no repository")
+            self.projectors.setdefault(collection, []).append(projector)
+
+    async def start(self):
+        """
+        Start one consumer per collection with projectors
+        """
+        self._tasks = [asyncio.create_task(self._consume(self.repositories[name])) for name in self.projectors]
+
+    async def stop(self):
+        """
+        Stop the consumers, streams save their last checkpoint on the way out
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def dispatch(self, event: ChangeEvent):
+        """
+        Hand an event to the projectors of its collection. A failing projector is logged and does not keep the others from the event
+
+        PARAMETERS:
+            - event: ChangeEvent
+
+        """
+        projected_events.inc(event.collection, event.operation)
+        if event.cluster_time is not None:
+            projection_lag.set(max(time.time() - event.cluster_time, 0), event.collection)
+        for projector in self.projectors.get(event.collection, []):
+            try:
+                await projector.project(event)
+            except Exception:
+                projector_errors.inc(projector.name)
+                logger.exception("%s failed to project %r", projector.name, event)
+
+    async def _reset(self, collection: str):
+        """Tell the projectors of collection that changes may have been missed"""
+        for projector in self.projectors.get(collection, []):
+            try:
+                await projector.reset(collection)
+            except Exception:
+                projector_errors.inc(projector.name)
+                logger.exception("%s failed to reset %s", projector.name, collection)
+
+    async def _consume(self, repository: Repository):
+        """
+        Consume the changes of a collection, from its change stream unless the mode or the server calls for polling
+
+        PARAMETERS:
+            - repository: Repository, a watched collection
+
+        """
+        if self.mode == "poll":
+            return await self._poll(repository)
+        delay = self.retry
+        while True:
+            try:
+                await self._stream(repository)
+                delay = self.retry
+            except asyncio.CancelledError:
+                raise
+            except (AttributeError, NotImplementedError) as error:  # no watch on this collection, e.g the in-memory one
+                if self.mode == "stream":
+                    raise
+                logger.info("No change stream on %s, polling every %.0fs: %s", repository.name, self.poll_interval, error)
+                return await self._poll(repository)
+            except OperationFailure as error:
+                if error.code == NOT_REPLICA_SET and self.mode == "auto":
+                    logger.info("No change stream on %s, polling every %.0fs: %s", repository.name, self.poll_interval, error)
+                    return await self._poll(repository)
+                if error.code in HISTORY_LOST:
+                    logger.warning("Resume token of %s lost, the projectors are reset: %s", repository.name, error)
+                    await self.checkpoints.collection.delete_one({"_id": repository.name})
+                    await self._reset(repository.name)
+                    continue
+                logger.warning("Change stream of %s failed, retrying in %.0fs: %s", repository.name, delay, error)
+            except Exception as error:  # e.g a failover, the stream is resumed from the last checkpoint
+                logger.warning("Change stream of %s failed, retrying in %.0fs: %s", repository.name, delay, error)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry)
+
+    async def _stream(self, repository: Repository):
+        """
+        Dispatch the change stream of a collection from its checkpoint, saving the resume token as it goes
+
+        PARAMETERS:
+            - repository: Repository
+
+        """
+        checkpoint = await self.checkpoints.collection.find_one({"_id": repository.name})
+        pipeline = [{"$match": {"operationType": {"$in": OPERATIONS}}}]
+        async with repository.collection.watch(
+                pipeline, full_document="updateLookup", resume_after=checkpoint["token"] if checkpoint else None) as stream:
+            if checkpoint is None:  # once the stream is open, a server without change streams is polled and reset there
+                await self._reset(repository.name)
+            pending, saved_at = 0, time.monotonic()
+            try:
+                async for change in stream:
+                    await self.dispatch(ChangeEvent.from_change(change))
+                    pending += 1
+                    if pending >= self.checkpoint_every or time.monotonic() - saved_at >= self.checkpoint_interval:
+                        await self._checkpoint(repository.name, stream.resume_token)
+                        pending, saved_at = 0, time.monotonic()
+            finally:
+                if pending:
+                    await self._checkpoint(repository.name, stream.resume_token)
+
+    async def _checkpoint(self, collection: str, token: Optional[dict]):
+        """Save the resume token of a collection"""
+        if token is not None:
+            await self.checkpoints.collection.update_one(
+                {"_id": collection}, {"$set": {"token": token, "saved_at": time.time()}}, upsert=True
+            )
+
+    async def _poll(self, repository: Repository):
+        """
+        Dispatch the changes of a collection found by diffing the fingerprints of its documents every poll_interval
+
+        PARAMETERS:
+            - repository: Repository
+
+        """
+        await self._reset(repository.name)
+        seen = {document["_id"]: fingerprint(document) async for document in repository.collection.find({})}
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                seen = await self.poll_once(repository, seen)
+            except Exception:
+                logger.exception("Polling %s failed", repository.name)
+
+    async def poll_once(self, repository: Repository, seen: Dict[Any, bytes]) -> Dict[Any, bytes]:
+        """
+        Dispatch the changes of a collection since a previous poll
+
+        PARAMETERS:
+            - repository: Repository
+            - seen: dict, _id -> fingerprint of the documents at the previous poll
+
+        RETURNS:
+            - dict: _id -> fingerprint of the documents now
+
+        """
+        current: Dict[Any, bytes] = {}
+        changed: List[dict] = []
+        async for document in repository.collection.find({}):
+            current[document["_id"]] = fingerprint(document)
+            if seen.get(document["_id"]) != current[document["_id"]]:
+                changed.append(document)
+        for document in changed:
+            operation = "insert" if document["_id"] not in seen else "update"
+            await self.dispatch(ChangeEvent(repository.name, operation, document["_id"], document))
+        for _id in seen.keys() - current.keys():
+            await self.dispatch(ChangeEvent(repository.name, "delete", _id))
+        return current
+
+
+projection_service = ProjectionService()
@@ -0,0 +1,299 @@
+"""
+Relation Services Module
+Handles the relations of users: friends, followers, following and collabees, and the projects a user created. Each relation is an edge
+collection with one document per pair instead of an array in the user document, so profile reads and writes stay the same size however
+popular a user gets. Relations are listed a page at a time, newest first, keyed on (created_at, _id) rather than skipped over so a deep page
+costs the same as the first one. User documents keep the size of each relation in a counter moved by the writes that created or removed an edge
+
+MODULES:
+    - typing: Callable, List, Optional, Tuple
+    - datetime: datetime class
+    - bson: ObjectId
+    - pymongo: DESCENDING
+    - pymongo.errors: DuplicateKeyError
+    - repositories: Repository, registry
+    - services.counter_services: adjust_counts, relation counters of the users
+
+"""
+from typing import (
+    Callable, List, Optional, Tuple
+)
+from datetime import datetime
+from bson import ObjectId
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+from repositories.base import Repository
+from repositories import registry
+from services.counter_services import adjust_counts
+
+
+EMBEDDED_RELATIONS = ("friends", "followers", "following", "collabees", "projects")  # arrays user documents used to hold
+
+
+def after(cursor: str) -> dict:
+    """
+    Query of the documents after a page cursor, in (created_at, _id) descending order
+
+    PARAMETERS:
+        - cursor: str, next_cursor of the previous page
+
+    RETURNS:
+        - dict: mongodb query, raises ValueError for a cursor that was not made by a page
+
+    """
+    created_at, _, last_id = cursor.rpartition("|")
+    if not created_at:
+        raise ValueError(f"invalid cursor {cursor}")
+    last_id = ObjectId(last_id) if ObjectId.is_valid(last_id) else last_id
+    return {"$or": [{"created_at": {"$lt": created_at}}, {"created_at": created_at, "_id": {"$lt": last_id}}]}
+
+
+async def page(repository: Repository, query: dict, cursor: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of the documents matching query, newest first
+
+    PARAMETERS:
+        - repository: Repository, collection paged
+        - query: dict, mongodb query
+        - cursor: str, next_cursor of the previous page, None for the first page
+        - limit: int, max no of documents
+
+    RETURNS:
+        - tuple: the documents and the cursor of the next page, None on the last page
+
+    """
+    if cursor:
+        query = {"$and": [query, after(cursor)]}
+    documents = await repository.collection.find(query).sort(
+        [("created_at", DESCENDING), ("_id", DESCENDING)]
+    ).limit(limit).to_list(length=limit)
+
+    next_cursor = None
+    if len(documents) == limit:
+        last = documents[-1]
+        next_cursor = f"{last['created_at']}|{last['_id']}"
+    return documents, next_cursor
+
+
+class RelationServices:
+    """
+    Relation Services class: Includes methods to follow, unfollow and collaborate with users, and to page through each relation of a user
+
+    ATTRIBUTES:
+        - users: Repository, users, holding the relation counters
+        - friendships: Repository, one doc per pair of friends, written by FriendServices
+        - follows: Repository, one doc per follower and followee
+        - collaborations: Repository, one doc per pair of collabees
+        - projects: Repository, projects, listed by created_by
+
+    """
+    def __init__(self, users: Repository = registry.users, friendships: Repository = registry.friendships,
+                 follows: Repository = registry.follows, collaborations: Repository = registry.collaborations,
+                 projects: Repository = registry.projects):
+        """Object initializing method"""
+        self.users = users
+        self.friendships = friendships
+        self.follows = follows
+        self.collaborations = collaborations
+        self.projects = projects
+
+    async def follow(self, follower_id: str, followee_id: str) -> bool:
+        """
+        Make a user follow another, safe to repeat
+
+        PARAMETERS:
+            - follower_id: str, id of the user following
+            - followee_id: str, id of the user followed
+
+        RETURNS:
+            - bool: True if the user did not follow the other yet
+
+        """
+        created = await self._add_edge(self.follows, {"follower_id": follower_id, "followee_id": followee_id})
+        if created:
+            await adjust_counts(self.users, "following", 1, follower_id)
+            await adjust_counts(self.users, "followers", 1, followee_id)
+        return created
+
+    async def unfollow(self, follower_id: str, followee_id: str) -> bool:
+        """
+        Make a user stop following another
+
+        PARAMETERS:
+            - follower_id: str, id of the user following
+            - followee_id: str, id of the user followed
+
+        RETURNS:
+            - bool: True if the user followed the other
+
+        """
+        deleted = await self.follows.collection.delete_one({"follower_id": follower_id, "followee_id": followee_id})
+        if deleted.deleted_count:
+            await adjust_counts(self.users, "following", -1, follower_id)
+            await adjust_counts(self.users, "followers", -1, followee_id)
+        return bool(deleted.deleted_count)
+
+    async def add_collaboration(self, user_id: str, other_id: str) -> bool:
+        """
+        Record two users as collabees, safe to repeat
+
+        PARAMETERS:
+            - user_id: str, id of a user
+            - other_id: str, id of the other user
+
+        RETURNS:
+            - bool: True if they were not collabees yet
+
+        """
+        user1_id, user2_id = sorted((user_id, other_id))
+        created = await self._add_edge(self.collaborations, {"user1_id": user1_id, "user2_id": user2_id})
+        if created:
+            await adjust_counts(self.users, "collabees", 1, user1_id, user2_id)
+        return created
+
+    async def remove_collaboration(self, user_id: str, other_id: str) -> bool:
+        """
+        Stop recording two users as collabees
+
+        PARAMETERS:
+            - user_id: str, id of a user
+            - other_id: str, id of the other user
+
+        RETURNS:
+            - bool: True if they were collabees
+
+        """
+        user1_id, user2_id = sorted((user_id, other_id))
+        deleted = await self.collaborations.collection.delete_one({"user1_id": user1_id, "user2_id": user2_id})
+        if deleted.deleted_count:
+            await adjust_counts(self.users, "collabees", -1, user1_id, user2_id)
+        return bool(deleted.deleted_count)
+
+    async def followers(self, user_id: str, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[dict], Optional[str]]:
+        """
+        Page of the followers of a user
+
+        PARAMETERS:
+            - user_id: str, id of the user
+            - cursor: str, next_cursor of the previous page
+            - limit: int, max no of users
+
+        RETURNS:
+            - tuple: list of {user_id, created_at} and the cursor of the next page
+
+        """
+        return await self._related(self.follows, {"followee_id": user_id}, lambda edge: edge["follower_id"], cursor, limit)
+
+    async def following(self, user_id: str, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[dict], Optional[str]]:
+        """Page of the users a user follows, see followers"""
+        return await self._related(self.follows, {"follower_id": user_id}, lambda edge: edge["followee_id"], cursor, limit)
+
+    async def friends(self, user_id: str, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[dict], Optional[str]]:
+        """Page of the friends of a user, see followers"""
+        return await self._related(self.friendships, *self._pair(user_id), cursor, limit)
+
+    async def collabees(self, user_id: str, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[dict], Optional[str]]:
+        """Page of the collabees of a user, see followers"""
+        return await self._related(self.collaborations, *self._pair(user_id), cursor, limit)
+
+    async def user_projects(self, user_id: str, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[dict], Optional[str]]:
+        """
+        Page of the projects created by a user, newest first
+
+        PARAMETERS:
+            - user_id: str, id of the user
+            - cursor: str, next_cursor of the previous page
+            - limit: int, max no of projects
+
+        RETURNS:
+            - tuple: list of project documents with project_id, and the cursor of the next page
+
+        """
+        projects, next_cursor = await page(self.projects, {"created_by": user_id}, cursor, limit)
+        for project in projects:
+            project["project_id"] = project.pop("_id")
+        return projects, next_cursor
+
+    async def recount(self, user_id: str, unset: Tuple[str, ...] = ()) -> Optional[int]:
+        """
+        Set the relation counters of a user from the edge collections
+
+        PARAMETERS:
+            - user_id: str, id of the user
+            - unset: tuple, fields removed from the user document in the same write
+
+        RETURNS:
+            - int: new version of the user, None if it does not exist
+
+        """
+        pairs, _ = self._pair(user_id)
+        counts = {
+            "friends_count": await self.friendships.collection.count_documents(pairs),
+            "followers_count": await self.follows.collection.count_documents({"followee_id": user_id}),
+            "following_count": await self.follows.collection.count_documents({"follower_id": user_id}),
+            "collabees_count": await self.collaborations.collection.count_documents(pairs),
+            "projects_count": await self.projects.collection.count_documents({"created_by": user_id}),
+        }
+        update = {"$set": counts}
+        if unset:
+            update["$unset"] = {field: "" for field in unset}
+        return await self.users.update_versioned(user_id, update)
+
+    async def migrate_embedded(self, batch_size: int = 500) -> int:
+        """
+        Move the relation arrays of user documents written before the edge collections into them, and replace the arrays by counters.
+        Safe to run again or on a live app: edges are upserted and counters recomputed from the edges
+
+        PARAMETERS:
+            - batch_size: int, users read at a time
+
+        RETURNS:
+            - int: no of users migrated
+
+        """
+        query = {"$or": [{field: {"$exists": True}} for field in EMBEDDED_RELATIONS]}
+        projection = {field: 1 for field in EMBEDDED_RELATIONS}
+        migrated = 0
+        while True:
+            users = await self.users.collection.find(query, projection).limit(batch_size).to_list(length=batch_size)
+            if not users:
+                return migrated
+            for user in users:
+                user_id = user["_id"]
+                for friend_id in user.get("friends") or []:
+                    await self._add_edge(self.friendships, dict(zip(("user1_id", "user2_id"), sorted((user_id, friend_id)))))
+                for collabee_id in user.get("collabees") or []:
+                    await self._add_edge(self.collaborations, dict(zip(("user1_id", "user2_id"), sorted((user_id, collabee_id)))))
+                for follower_id in user.get("followers") or []:
+                    await self._add_edge(self.follows, {"follower_id": follower_id, "followee_id": user_id})
+                for followee_id in user.get("following") or []:
+                    await self._add_edge(self.follows, {"follower_id": user_id, "followee_id": followee_id})
+                # projects are already listed from the projects collection by created_by
+                await self.recount(user_id, unset=EMBEDDED_RELATIONS)
+                migrated += 1
+
+    @staticmethod
+    def _pair(user_id: str) -> Tuple[dict, Callable[[dict], str]]:
+        """Query of the pair edges of a user and the function giving the other user of an edge"""
+        return (
+            {"$or": [{"user1_id": user_id}, {"user2_id": user_id}]},
+            lambda edge: edge["user2_id"] if edge["user1_id"] == user_id else edge["user1_id"],
+        )
+
+    @staticmethod
+    async def _add_edge(repository: Repository, edge: dict) -> bool:
+        """Upsert an edge, True if it did not exist. The unique index of the pair makes concurrent calls collapse into a single doc"""
+        try:
+            result = await repository.collection.update_one(
+                edge, {"$setOnInsert": {"created_at": datetime.now().isoformat()}}, upsert=True
+            )
+        except DuplicateKeyError:  # a concurrent upsert won the race, the edge exists
+            return False
+        return result.upserted_id is not None
+
+    @staticmethod
+    async def _related(repository: Repository, query: dict, other: Callable[[dict], str], cursor: Optional[str],
+                       limit: int) -> Tuple[List[dict], Optional[str]]:
+        """Page of the users at the other end of the edges matching query"""
+        edges, next_cursor = await page(repository, query, cursor, limit)
+        return [{"user_id": other(edge), "created_at": edge["created_at"]} for edge in edges], next_cursor
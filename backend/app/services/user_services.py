@@ -5,15 +5,29 @@ Handles all the business logic for the user model
 MODULES:
     - datetime: datetime class
     - models.user: UserUpdate, UserResponse
-    - db: get_collection, get collections from db client
+    - repositories: Repository, registry.users
+    - utils.single_flight: single_flight, coalescing of identical concurrent reads
+    - services.relation_services: EMBEDDED_RELATIONS
+    - utils.auth.password_utils: hash_password
 
 """
-from typing import Optional
+from typing import Optional, Tuple
 from datetime import datetime
 from models.users import (
     UserUpdate, UserResponse
 )
-from db import get_collection
+from repositories.base import Repository
+from repositories import registry
+from utils.single_flight import single_flight
+from services.relation_services import EMBEDDED_RELATIONS
+from utils.auth.password_utils import hash_password
+
+
+# users are read without their password, nor the relation arrays documents written before the edge collections may still hold
+PROFILE_PROJECTION = {"password": 0, **{field: 0 for field in EMBEDDED_RELATIONS}}
+
+# fields every user holds, an update sending null for one of them leaves it as it is instead of clearing it
+REQUIRED_FIELDS = ("name", "email", "password")
 
 
 class UserServices:
@@ -21,12 +35,12 @@ class UserServices:
     User Services Class: Includes methods to update, delete users and retrieve user data
 
     ATTRIBUTES:
-        - collection_name: name of collection where user data in stored in the database   
+        - users: Repository, collection where user data in stored in the database
 
     """
 
-    def __init__(self):
-        self.collection_name = "users"
+    def __init__(self, users: Repository = registry.users):
+        self.users = users
 
     async def get_user_by_id(self, user_id: str) -> Optional[UserResponse]:
         """
@@ -39,58 +53,47 @@ class UserServices:
             - User: user object
 
         """
-        collection = await get_collection(self.collection_name)
-
         #if not ObjectId.is_valid(user_id):  # validate that the id is first a valid objectid. ObjectId is the type used by mongodb to assign ids to its entries
         #    return None
 
-        user = await collection.find_one({"_id": user_id}, {"password": 0})
+        user = await self.users.read_through(user_id, self._find_user, user_id)  # entity cache first, then the db
         if user:
             user["user_id"] = user.pop("_id")
             return UserResponse(**user)
         return None
 
-    async def update_user(self, user_id: str, user: UserUpdate) -> Optional[int]:
+    @single_flight.coalesce("users")
+    async def _find_user(self, user_id: str) -> Optional[dict]:
+        """Read a user document without its password, concurrent reads of the same user share one query"""
+        return await self.users.collection.find_one({"_id": user_id}, PROFILE_PROJECTION)
+
+    async def update_user(self, user_id: str, user: UserUpdate, version: Optional[int] = None) -> Optional[Tuple[int, int]]:
         """
-        Method to update a user
+        Method to update a user, writing only the fields that differ from the stored user
 
         PARAMETERS:
             - user_id: str, db id of the user doc
             - user: User, sample user object to be used to update the user in the database
+            - version: int, version of the user the update was made on (If-Match), None to update the current version
 
         RETURNS:
-            - int: no of fields updated
+            - tuple: (version, no of fields updated), CONFLICT as version if the user changed since version. None if it does not exist
 
         """
-        collection = await get_collection(self.collection_name)
-
         # if not ObjectId.is_valid(user_id):
         #    return None
 
-        update_data = user.model_dump(exclude_unset=True)  # exclude fields which are None
-
-        list_fields = {}
-        other_fields = {}
-        for key, value in update_data.items():
-            if isinstance(key, list):
-                list_fields.update({key: value})
-            else:  # key is a string, int or any other type
-                other_fields.update({key: value})
-
-        # Update list and string values fields separately
-        update_response = await collection.update_one(
-            {"_id": user_id},
-            {
-                "$addToSet": list_fields,  # addToSet adds the value to the array field only if its not already present
-                "$set": other_fields
-            }
-        )  # update_one never returns none even if no document was flund with the user_id
-        
-        if update_response.matched_count == 0:
-            return None # document with user_id dosent exist
+        update_data = user.model_dump(exclude_unset=True)  # fields sent by the client, None clears a field
+        update_data.pop("version", None)  # only the repository moves the version
+        for field in REQUIRED_FIELDS:
+            if field in update_data and update_data[field] is None:
+                del update_data[field]
+        if "password" in update_data:  # stored hashed as on signup, a new salt makes it differ from the stored hash so it is always written
+            update_data["password"] = hash_password(update_data["password"])
 
-        return update_response.modified_count
+        return await self.users.apply_changes(user_id, update_data, version)
 
+    @single_flight.coalesce("users")
     async def search_users(self, filters: dict) -> list:
         """
         Method to search for users
@@ -102,7 +105,7 @@ class UserServices:
             - list: list of user objects
 
         """
-        collection = await get_collection(self.collection_name)
+        collection = self.users.collection
 
         # Create custom query dict from the filters dict received
         if not filters:
@@ -138,10 +141,9 @@ class UserServices:
                 if value:
                     query[key] = {"$regex": value, "$options": "i"}
 
-        users = await collection.find(query).to_list(length=None)
+        users = await collection.find(query, PROFILE_PROJECTION).to_list(length=None)
 
         for user in users:
-            user.pop("password")
             user["user_id"] = user.pop("_id")
 
         return [UserResponse(**user) for user in users]
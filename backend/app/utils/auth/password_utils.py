@@ -2,9 +2,11 @@
 Password management utilities/module
 
 MODULES:
+    - typing: List
     - bcrypt: checkpw, gensalt, hashpw functions
 
 """
+from typing import List
 from bcrypt import (
     checkpw,
     gensalt,
@@ -26,6 +28,20 @@ def hash_password(password: str) -> str:
     return hashpw(password.encode("utf-8"), gensalt()).decode("utf-8")
 
 
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash a batch of passwords, run in a worker process by bulk imports so the hashes of a chunk are computed on every core
+
+    ARGUMENTS:
+        - passwords: list, user passwords
+
+    RETURNS:
+        - list: hashed passwords, in the same order
+
+    """
+    return [hash_password(password) for password in passwords]
+
+
 def verify_password(password: str, hashed_password: str) -> bool:
     """
     Check if the password matches the hashed password
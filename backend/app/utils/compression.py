@@ -0,0 +1,149 @@
+"""
+HTTP content codings
+gzip comes with python, br and zstd are used when the brotli and zstandard libraries are installed and are skipped otherwise. Every coding is
+wrapped in the same streaming interface so responses can be compressed whole or chunk by chunk
+
+MODULES:
+    - importlib: import_module
+    - importlib.util: find_spec, check the optional libraries
+    - zlib: compressobj, gzip
+    - typing: Dict, List, Optional
+
+"""
+import importlib
+import importlib.util
+import zlib
+from typing import (
+    Dict, List, Optional
+)
+
+
+CODING_MODULES = {"zstd": "zstandard", "br": "brotli", "gzip": "zlib"}  # python module each content coding needs
+
+
+class StreamCompressor:
+    """
+    Compressor of one response body
+
+    ATTRIBUTES:
+        - encoding: str, content coding, e.g gzip
+        - level: int, compression level of the coding
+
+    """
+    def __init__(self, encoding: str, level: int):
+        """Object initializer"""
+        self.encoding = encoding
+        self.level = level
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header and trailer
+        elif encoding == "br":
+            self._compressor = importlib.import_module("brotli").Compressor(quality=level)
+        elif encoding == "zstd":
+            self._compressor = importlib.import_module("zstandard").ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"unsupported content coding {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        """Compressed bytes of data available so far, the compressor may hold some back"""
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        """Every byte held back, leaving the stream open, so a streamed chunk reaches the client without waiting for the next"""
+        if self.encoding == "gzip":
+            return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._compressor.flush()
+        return self._compressor.flush(importlib.import_module("zstandard").COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        """End of the stream"""
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compress a whole body
+
+    ARGUMENTS:
+        - data: bytes, the body
+        - encoding: str, content coding
+        - level: int, compression level
+
+    RETURNS:
+        - bytes: the encoded body
+
+    """
+    compressor = StreamCompressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+def available_encodings(names: str) -> List[str]:
+    """
+    Filter a comma separated list of content codings down to those whose library is installed
+
+    ARGUMENTS:
+        - names: str, e.g "zstd,br,gzip", in order of preference
+
+    RETURNS:
+        - list: codings, in the same order
+
+    """
+    return [
+        name.strip() for name in names.split(",")
+        if name.strip() in CODING_MODULES and importlib.util.find_spec(CODING_MODULES[name.strip()])
+    ]
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Quality of each coding of an Accept-Encoding header
+
+    ARGUMENTS:
+        - header: str, e.g "gzip, br;q=0.8, *;q=0"
+
+    RETURNS:
+        - dict: coding -> q value
+
+    """
+    qualities = {}
+    for item in header.split(","):
+        coding, _, parameters = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        parameter, _, value = parameters.strip().partition("=")
+        if parameter.strip() == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        qualities[coding.strip().lower()] = q
+    return qualities
+
+
+def negotiate(header: Optional[str], encodings: List[str]) -> Optional[str]:
+    """
+    Coding to answer a request with
+
+    ARGUMENTS:
+        - header: str, Accept-Encoding of the request
+        - encodings: list, codings the server offers, in order of preference
+
+    RETURNS:
+        - str: the accepted coding with the highest q, ties broken by the server preference, None to send the body as is
+
+    """
+    if not header:
+        return None
+    qualities = parse_accept_encoding(header)
+    wildcard = qualities.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = qualities.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
@@ -0,0 +1,158 @@
+"""
+HTTP conditional requests
+Routes serving documents return them through conditional_response, which tags the body with an ETag and answers a request whose If-None-Match
+already holds that tag with an empty 304. The tag comes from the document versions when the models carry one, so a 304 is decided without
+serializing anything; otherwise it is a hash of the body, serialized once and sent as is instead of going through the response_model encoding.
+Fields written without moving the version (the unversioned_fields of a model, e.g counters) are hashed into the tag after the version.
+Each route gets the Cache-Control policy configured for its template in HTTP_CACHE_CONTROL.
+Updates are made conditional the other way round: the version tag sent back in If-Match is the version the update must still find
+
+MODULES:
+    - hashlib: blake2b
+    - re: fullmatch, version tags
+    - typing: List, Optional, Union
+    - fastapi: Request, Response
+    - pydantic: BaseModel
+    - pydantic_core: to_json
+    - config: HTTP_CACHE_CONTROL
+    - utils.request_context: route_template
+
+"""
+import re
+from hashlib import blake2b
+from typing import (
+    List, Optional, Union
+)
+from fastapi import Request, Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+from config import HTTP_CACHE_CONTROL
+from utils.request_context import route_template
+
+
+def version_tag(content: Union[BaseModel, List[BaseModel]]) -> Optional[str]:
+    """
+    ETag built from the version of the models, without serializing them
+
+    ARGUMENTS:
+        - content: model or list of models
+
+    RETURNS:
+        - str: the tag, None if a model has no version
+
+    """
+    if isinstance(content, BaseModel):
+        version = version_of(content)
+        return tag_of(version) if version is not None else None
+
+    parts = []
+    for model in content:
+        version = version_of(model)
+        if version is None:
+            return None
+        parts.append(f"{getattr(model, 'project_id', None) or getattr(model, 'user_id', None)}:{version}")
+    return body_tag(",".join(parts).encode())
+
+
+def version_of(model: BaseModel) -> Optional[str]:
+    """
+    Version of a model as tagged: its version, followed by a hash of its unversioned_fields when it has some, e.g 3.5f0c2a1e
+
+    ARGUMENTS:
+        - model: BaseModel
+
+    RETURNS:
+        - str: the version, None if the model has no version
+
+    """
+    version = getattr(model, "version", None)
+    if version is None:
+        return None
+    fields = getattr(model, "unversioned_fields", ())
+    if not fields:
+        return str(version)
+    digest = blake2b(to_json([getattr(model, field, None) for field in fields]), digest_size=4).hexdigest()
+    return f"{version}.{digest}"
+
+
+def tag_of(version: Union[int, str]) -> str:
+    """ETag of a document version"""
+    return f'"v{version}"'
+
+
+def etag_of(content: Union[BaseModel, List[BaseModel]]) -> str:
+    """ETag conditional_response gives content, for writes answering with the tag a GET of what they wrote gets"""
+    return version_tag(content) or body_tag(to_json(content))
+
+
+def if_match_version(if_match: Optional[str]) -> Optional[int]:
+    """
+    Version an update must find, from its If-Match header
+
+    ARGUMENTS:
+        - if_match: str, header value, e.g "v3" or "v3.5f0c2a1e", only the version is compared; W/"v3" is accepted as well since compression
+          weakens the tags it sends
+
+    RETURNS:
+        - int: the version, None when the update is unconditional (no header or *)
+
+    NOTE:
+        - raises ValueError when the header does not hold a single version tag, e.g the body hash of a document without a version yet
+
+    """
+    if not if_match or if_match.strip() == "*":
+        return None
+    match = re.fullmatch(r'(?:W/)?"v(\d+)(?:\.[0-9a-f]+)?"', if_match.strip())
+    if match is None:
+        raise ValueError(f"If-Match {if_match} is not a version tag")
+    return int(match.group(1))
+
+
+def body_tag(body: bytes) -> str:
+    """ETag hashing a serialized body"""
+    return f'"{blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If an If-None-Match header holds etag, compared weakly as RFC 9110 requires for GET
+
+    ARGUMENTS:
+        - if_none_match: str, header value, e.g W/"a", "b"
+        - etag: str, current tag of the resource
+
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def conditional_response(request: Request, content: Union[BaseModel, List[BaseModel]]) -> Response:
+    """
+    Response of a GET serving models, 304 when the client already has them
+
+    ARGUMENTS:
+        - request: Request, the GET being answered
+        - content: model or list of models, serialized like response_model would
+
+    RETURNS:
+        - Response: 304 with no body, or 200 with the JSON body, both with ETag and Cache-Control
+
+    """
+    headers = {}
+    policy = HTTP_CACHE_CONTROL.get(route_template(request.scope))
+    if policy:
+        headers["Cache-Control"] = policy
+
+    etag = version_tag(content)
+    if etag is not None and matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+
+    body = to_json(content)
+    if etag is None:
+        etag = body_tag(body)
+        if matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={**headers, "ETag": etag})
+    return Response(body, media_type="application/json", headers={**headers, "ETag": etag})
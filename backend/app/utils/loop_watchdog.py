@@ -0,0 +1,140 @@
+"""
+Event loop watchdog
+A task wakes up every interval and records how late it woke up, the lag histogram. A thread watches the time of the last wake up: when the loop has
+not come back for longer than the threshold, a callback is blocking it, so the thread captures the stack of the loop thread while it is still
+blocked and logs it with the route being served. The route is found from the ASGI scope held by the middleware frames of that stack
+
+MODULES:
+    - asyncio: create_task, sleep
+    - logging: getLogger
+    - sys: _current_frames
+    - threading: Thread, Event, get_ident
+    - time: perf_counter
+    - traceback: format_stack
+    - typing: Optional
+    - config: LOOP_LAG_INTERVAL, LOOP_BLOCK_THRESHOLD_MS
+    - utils.metrics: registry
+    - utils.request_context: route_template
+
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+from config import (
+    LOOP_LAG_INTERVAL, LOOP_BLOCK_THRESHOLD_MS
+)
+from utils.metrics import registry
+from utils.request_context import route_template
+
+
+logger = logging.getLogger(__name__)
+
+
+def find_route(frame) -> str:
+    """
+    Route served by a stack, read from the first ASGI scope found in the locals of its frames
+
+    ARGUMENTS:
+        - frame: innermost frame of the stack
+
+    RETURNS:
+        - str: route template, "background" if the stack is not serving a request
+
+    """
+    while frame is not None:
+        scope = frame.f_locals.get("scope")
+        if isinstance(scope, dict) and scope.get("type") in ("http", "websocket"):
+            return route_template(scope)
+        frame = frame.f_back
+    return "background"
+
+
+class LoopWatchdog:
+    """
+    Measures event loop lag and logs the stack of callbacks blocking the loop
+
+    ATTRIBUTES:
+        - interval: float, seconds between two wake ups of the lag task
+        - threshold: float, seconds a callback may hold the loop before it is reported
+        - beat: float, perf_counter of the last wake up
+
+    """
+    lag = registry.histogram("event_loop_lag_seconds", "Delay of the event loop in waking up a sleeping task")
+    blocked = registry.counter(
+        "event_loop_blocked_total", "Callbacks that held the event loop longer than the threshold", ("route",)
+    )
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_BLOCK_THRESHOLD_MS / 1000):
+        """Object initializer"""
+        self.interval = interval
+        self.threshold = threshold
+        self.beat = time.perf_counter()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def start(self):
+        """
+        Start the lag task on the running loop and the watching thread
+        """
+        self._loop_thread_id = threading.get_ident()
+        self.beat = time.perf_counter()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        """
+        Stop the lag task and the watching thread
+        """
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._thread:
+            self._thread.join(timeout=1)
+        self._task = self._thread = None
+
+    async def _tick(self):
+        """Wake up every interval and record the lag"""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.beat = time.perf_counter()
+            self.lag.observe(max(self.beat - start - self.interval, 0))
+
+    def _watch(self):
+        """Thread loop: report each stall of the loop once, while it is happening"""
+        reported = None
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self.beat
+            stalled = time.perf_counter() - beat - self.interval
+            if stalled > self.threshold and beat != reported:
+                reported = beat
+                self.report(stalled)
+
+    def report(self, stalled: float):
+        """
+        Log the stack of the blocked loop thread and the route it is serving
+
+        ARGUMENTS:
+            - stalled: float, seconds the loop has been blocked so far
+
+        """
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        route = find_route(frame)
+        self.blocked.inc(route)
+        logger.warning(
+            "Event loop blocked for over %.0f ms serving %s:\n%s", stalled * 1000, route, "".join(traceback.format_stack(frame))
+        )
+
+
+loop_watchdog = LoopWatchdog()
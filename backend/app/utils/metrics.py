@@ -0,0 +1,180 @@
+"""
+In-process metrics rendered in the Prometheus text format
+
+Metrics are plain python counters updated without locks: the app runs on a single event loop, but driver threads (e.g pool and command
+events) update them too. A lost increment is not the worst those threads can do: they add label values while /metrics renders, which
+failed the render when it iterated over the live dicts, so rendering iterates over a snapshot of the values. The snapshot is a dict.copy,
+which allocates nothing per item, so unlike list(items()) it cannot start a garbage collection that lets another thread run mid-copy.
+A sample may still miss an increment, or a histogram be copied between its count and its buckets, which is acceptable for monitoring.
+Histograms use fixed buckets chosen up front so an observation is a bisect and two increments
+
+MODULES:
+    - bisect: bisect_left
+    - typing: Dict, List, Tuple, Sequence
+
+"""
+from bisect import bisect_left
+from typing import (
+    Dict, List, Tuple, Sequence
+)
+
+
+LABEL_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})  # label values escaped as the text format requires
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # bytes
+
+
+class Metric:
+    """
+    Base metric, holds one value per combination of label values
+
+    ATTRIBUTES:
+        - name: str, metric name
+        - help: str, description rendered as the HELP line
+        - labels: tuple, label names, values are passed positionally in the same order
+
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        """Object initializer"""
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def _label_str(self, values: Tuple[str, ...], extra: str = "") -> str:
+        """Render label values as {a="x",b="y"}, with backslashes, quotes and newlines escaped"""
+        pairs = [f'{name}="{str(value).translate(LABEL_ESCAPES)}"' for name, value in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        """Sample lines of the metric"""
+        return [f"{self.name}{self._label_str(key)} {value}" for key, value in self.values.copy().items()]  # snapshot, see module doc
+
+    def render(self) -> str:
+        """Render the metric with its HELP and TYPE lines"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        """Add amount to the counter of the given label values"""
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        """Set the gauge of the given label values"""
+        self.values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1):
+        """Add amount to the gauge of the given label values"""
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        """Subtract amount from the gauge of the given label values"""
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(Metric):
+    """
+    Distribution of observations over fixed buckets
+
+    ATTRIBUTES:
+        - buckets: tuple, sorted upper bounds of the buckets, +Inf is implied
+
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        """Object initializer"""
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self.values: Dict[Tuple[str, ...], list] = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels: str):
+        """Record an observation for the given label values"""
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = [0] * (len(self.buckets) + 2)
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def count(self, *labels: str) -> int:
+        """No of observations recorded for the given label values"""
+        state = self.values.get(labels)
+        return sum(state[:-1]) if state else 0
+
+    def quantile(self, q: float, *labels: str) -> float:
+        """Estimate the q quantile as the upper bound of the bucket it falls in"""
+        state = self.values.get(labels)
+        if not state:
+            return 0.0
+        target = q * sum(state[:-1])
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def samples(self) -> List[str]:
+        """Cumulative bucket, count and sum lines"""
+        lines = []
+        for key, state in self.values.copy().items():  # snapshot, see module doc
+            state = list(state)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), state[:-1]):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{self._label_str(key, le)} {cumulative}")
+            lines.append(f"{self.name}_count{self._label_str(key)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_str(key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds every metric of the process and renders them for the /metrics endpoint
+
+    ATTRIBUTES:
+        - metrics: dict, metric name -> metric
+
+    """
+    def __init__(self):
+        """Object initializer"""
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric, registering the same name twice returns the existing metric"""
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        """Create and register a counter"""
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        """Create and register a gauge"""
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Create and register a histogram"""
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format"""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()  # Process wide registry
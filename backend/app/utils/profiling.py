@@ -0,0 +1,175 @@
+"""
+On-demand profiling of the running process
+Nothing here runs until it is called: the sampler thread only exists for the duration of a profile and tracemalloc is only started on request
+
+MODULES:
+    - asyncio: all_tasks, get_running_loop, sleep
+    - collections: Counter
+    - sys: _current_frames
+    - threading: get_ident
+    - time: sleep, perf_counter
+    - tracemalloc: memory snapshots
+    - traceback: format stacks
+    - io: StringIO
+    - typing: Dict, List, Optional
+
+"""
+import asyncio
+import io
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import (
+    Dict, List, Optional
+)
+
+
+def frame_stack(frame) -> str:
+    """Collapse a frame and its callers into "outer;...;inner", each function rendered as module:function:line"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample_stacks(thread_id: int, seconds: float, interval: float = 0.005) -> Counter:
+    """
+    Sample the stack of a thread at a fixed interval. Meant to run in its own thread, e.g with asyncio.to_thread, while the profiled thread works
+
+    ARGUMENTS:
+        - thread_id: int, ident of the profiled thread
+        - seconds: float, duration of the profile
+        - interval: float, seconds between two samples
+
+    RETURNS:
+        - Counter: collapsed stack -> no of samples
+
+    """
+    stacks = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            stacks[frame_stack(frame)] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def collapsed(stacks: Counter) -> str:
+    """Render sampled stacks in the collapsed format read by flamegraph.pl and speedscope, one "stack count" line per stack"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+async def profile_loop(seconds: float, interval: float = 0.005) -> str:
+    """
+    Profile the thread running the event loop while it keeps serving requests
+
+    ARGUMENTS:
+        - seconds: float, duration of the profile
+        - interval: float, seconds between two samples
+
+    RETURNS:
+        - str: collapsed stacks
+
+    """
+    stacks = await asyncio.to_thread(sample_stacks, threading.get_ident(), seconds, interval)
+    return collapsed(stacks)
+
+
+def task_stacks(limit: int = 20) -> List[Dict]:
+    """
+    Stacks of the pending asyncio tasks of the running loop
+
+    ARGUMENTS:
+        - limit: int, max no of frames printed per task
+
+    RETURNS:
+        - list: one dict per task with its name, coroutine and printed stack
+
+    """
+    tasks = []
+    for task in asyncio.all_tasks():
+        stack = io.StringIO()
+        task.print_stack(limit=limit, file=stack)
+        tasks.append({"name": task.get_name(), "coro": repr(task.get_coro()), "stack": stack.getvalue()})
+    return tasks
+
+
+async def loop_lag(samples: int = 10, interval: float = 0.1) -> Dict[str, float]:
+    """
+    Measure how late the loop wakes up sleeping tasks, a busy or blocked loop wakes them up late
+
+    ARGUMENTS:
+        - samples: int, no of sleeps measured
+        - interval: float, length of each sleep in seconds
+
+    RETURNS:
+        - dict: mean and max lag in seconds
+
+    """
+    loop = asyncio.get_running_loop()
+    lags = []
+    for _ in range(samples):
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(loop.time() - start - interval, 0))
+    return {"mean": sum(lags) / len(lags), "max": max(lags)}
+
+
+class MemoryProfiler:
+    """
+    tracemalloc snapshots, each one diffed against the previous one
+
+    ATTRIBUTES:
+        - last: Snapshot, previous snapshot, None until the first one is taken
+
+    """
+    def __init__(self):
+        """Object initializer"""
+        self.last: Optional[tracemalloc.Snapshot] = None
+
+    def start(self, frames: int = 10):
+        """Start tracing allocations, tracing slows allocations down until stop() is called"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.last = None
+
+    def stop(self):
+        """Stop tracing and drop the snapshots"""
+        tracemalloc.stop()
+        self.last = None
+
+    def snapshot(self, top: int = 20) -> List[Dict]:
+        """
+        Take a snapshot and return the lines that allocated the most since the previous one (since start for the first one)
+
+        ARGUMENTS:
+            - top: int, no of lines returned
+
+        RETURNS:
+            - list: dicts with the line, its size and block count, and their change
+
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not started")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        if self.last is None:
+            stats = snapshot.statistics("lineno")
+            diff = [{"line": str(stat.traceback), "size": stat.size, "size_diff": stat.size, "count": stat.count,
+                     "count_diff": stat.count} for stat in stats[:top]]
+        else:
+            stats = snapshot.compare_to(self.last, "lineno")
+            diff = [{"line": str(stat.traceback), "size": stat.size, "size_diff": stat.size_diff, "count": stat.count,
+                     "count_diff": stat.count_diff} for stat in stats[:top]]
+        self.last = snapshot
+        return diff
+
+
+memory_profiler = MemoryProfiler()
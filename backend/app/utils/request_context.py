@@ -0,0 +1,33 @@
+"""
+Context of the request being handled
+The ASGI scope of the current request is kept in a context variable, so code far from the route (e.g database listeners) can tell which route
+it is working for. Motor copies the context into its executor threads, so the variable is also visible from pymongo event listeners
+
+MODULES:
+    - contextvars: ContextVar
+    - typing: Optional
+
+"""
+from contextvars import ContextVar
+from typing import Optional
+
+
+request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+
+def route_template(scope: dict) -> str:
+    """Path template of the route that handled the request, "unmatched" when no route did"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def current_route() -> str:
+    """
+    Route template of the request being handled
+
+    RETURNS:
+        - str: e.g "/projects/{project_id}", "background" outside of a request
+
+    """
+    scope = request_scope.get()
+    return route_template(scope) if scope is not None else "background"
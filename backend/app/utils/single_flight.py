@@ -0,0 +1,143 @@
+"""
+Request coalescing
+Identical reads issued while one of them is already running join it instead of querying the database again: the first caller (the leader) runs the
+read in a task of its own and every caller awaits that task. Nothing is kept once the read completes, so a result is never older than the
+requests sharing it. Writes forget the reads in flight on the collection they change, so a read starting after a write never joins one started
+before it
+
+MODULES:
+    - asyncio: create_task, shield
+    - copy: deepcopy
+    - functools: wraps
+    - typing: Any, Callable, Hashable
+    - utils.metrics: registry
+
+"""
+import asyncio
+import copy
+from functools import wraps
+from typing import Any, Callable, Hashable
+from utils.metrics import registry
+
+
+def freeze(value: Any) -> Hashable:
+    """Hashable equivalent of a call argument, dicts and lists (e.g search filters) become sorted tuples"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class Flight:
+    """
+    A read in flight
+
+    ATTRIBUTES:
+        - task: asyncio.Task, the read
+        - callers: int, callers awaiting the read
+        - collected: int, callers that got their result
+
+    """
+    def __init__(self, task: asyncio.Task):
+        """Object initializer"""
+        self.task = task
+        self.callers = 0
+        self.collected = 0
+
+    def result(self) -> Any:
+        """
+        Result of the read for one caller
+
+        Callers may mutate what they get (e.g create_project appends to user.projects), so all callers but the last get a deep copy; the
+        last one gets the original once every copy has been made
+
+        """
+        result = self.task.result()
+        self.collected += 1
+        return result if self.collected == self.callers else copy.deepcopy(result)
+
+
+class SingleFlight:
+    """
+    Group of reads in flight, keyed on the collection they read, the function and its arguments
+
+    ATTRIBUTES:
+        - flights: dict, key -> Flight
+
+    """
+    requests = registry.counter(
+        "single_flight_requests_total", "Coalesced reads by role, a shared read cost no database query", ("function", "role")
+    )
+
+    def __init__(self):
+        """Object initializer"""
+        self.flights = {}
+
+    async def do(self, key: tuple, function: Callable, *args, **kwargs) -> Any:
+        """
+        Run function(*args, **kwargs) or join the call already running under key
+
+        ARGUMENTS:
+            - key: tuple, hashable, its first item is the collection the read is forgotten with
+            - function: coroutine function doing the read
+
+        RETURNS:
+            - Any: result of the read, exceptions of the read are raised to every caller
+
+        """
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = Flight(asyncio.create_task(function(*args, **kwargs)))
+            self.flights[key] = flight
+            # registered before any caller awaits the task, so the flight is gone before they resume and their count is final
+            flight.task.add_done_callback(lambda task: self.flights.pop(key, None) if self.flights.get(key) is flight else None)
+            self.requests.inc(function.__qualname__, "leader")
+        else:
+            self.requests.inc(function.__qualname__, "shared")
+        flight.callers += 1
+        try:
+            # a cancelled caller (client gone) leaves the read running for the others
+            await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                flight.callers -= 1
+            raise
+        return flight.result()
+
+    def forget(self, collection: Hashable):
+        """
+        Stop new callers from joining the reads in flight on collection, called after a write to it
+
+        ARGUMENTS:
+            - collection: Hashable, first item of the keys to forget
+
+        """
+        for key in [key for key in self.flights if key[0] is collection]:
+            del self.flights[key]
+
+    def coalesce(self, attribute: str) -> Callable:
+        """
+        Decorator coalescing the calls of a service read method
+
+        ARGUMENTS:
+            - attribute: str, attribute of the service holding the Repository read, calls on different repositories never share
+
+        RETURNS:
+            - Callable: decorator
+
+        """
+        def decorator(method: Callable) -> Callable:
+            @wraps(method)
+            async def wrapper(service, *args, **kwargs):
+                key = (getattr(service, attribute), method.__qualname__, freeze(args), freeze(kwargs))
+                try:
+                    hash(key)
+                except TypeError:  # arguments that cannot be compared are never coalesced
+                    return await method(service, *args, **kwargs)
+                return await self.do(key, method, service, *args, **kwargs)
+            return wrapper
+        return decorator
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,157 @@
+"""
+Bandwidth against CPU of the response compression.
+Compresses JSON bodies shaped like the API responses (project and user feeds of benchmarks/dataset.py documents, and a conversation) with every
+content coding of utils.compression at several levels. Reports the compressed size, the compression and decompression time, and the time to
+deliver the body over a link of --bandwidth Mbit/s including the compression, next to sending it uncompressed, which shows the level past which
+the CPU spent costs more than the bytes saved. br and zstd are skipped unless the brotli and zstandard libraries are installed
+
+USAGE:
+    python benchmarks/compression.py
+    python benchmarks/compression.py --items 50 200 1000 --bandwidth 20
+    python benchmarks/compression.py --encodings gzip --levels 1 6 9
+
+MODULES:
+    - argparse: command line args
+    - importlib: decompressors of the optional codings
+    - json: response bodies
+    - time: perf_counter
+    - zlib: gzip decompression
+    - utils.compression: compress, available_encodings
+    - dataset: realistic documents
+
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.compression import compress, available_encodings, CODING_MODULES  # noqa: E402
+import dataset  # noqa: E402
+
+
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 11], "zstd": [1, 3, 19]}
+
+
+def bodies(items: list) -> dict:
+    """
+    JSON bodies of feeds of each size
+
+    ARGUMENTS:
+        - items: list, no of documents of each feed
+
+    RETURNS:
+        - dict: name -> bytes
+
+    """
+    rng = dataset.shard_rng(0, "compression", 0)
+    hash_ = dataset.password_hash(0)
+    result = {}
+    for size in items:
+        projects = list(dataset.projects(range(size), max(size, 10), rng))
+        users = [{key: value for key, value in user.items() if key != "password"} for user in dataset.users(range(size), rng, hash_)]
+        result[f"projects[{size}]"] = json.dumps(projects, default=str).encode()
+        result[f"users[{size}]"] = json.dumps(users, default=str).encode()
+    conversation = next(dataset.conversations(range(1), 100, rng, messages=max(items)))
+    result[f"conversation[{max(items)}]"] = json.dumps(conversation, default=str).encode()
+    return result
+
+
+def decompressor(encoding: str):
+    """Function decoding a body of encoding"""
+    if encoding == "gzip":
+        return lambda data: zlib.decompress(data, 31)
+    if encoding == "br":
+        return importlib.import_module("brotli").decompress
+    return importlib.import_module("zstandard").ZstdDecompressor().decompressobj().decompress
+
+
+def best_time(call, repeat: int) -> float:
+    """Fastest of repeat timed runs of call, in seconds, each run looping long enough to be measured"""
+    loops, elapsed = 1, 0.0
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            call()
+        elapsed = time.perf_counter() - start
+        if elapsed > 0.01:
+            break
+        loops *= 4
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            call()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+
+def run(items: list, encodings: list, levels: dict, bandwidth: float, repeat: int) -> list:
+    """
+    Measure every body, coding and level
+
+    ARGUMENTS:
+        - items: list, feed sizes
+        - encodings: list, codings to measure
+        - levels: dict, coding -> levels
+        - bandwidth: float, link speed in Mbit/s
+        - repeat: int, runs per case, the best is kept
+
+    RETURNS:
+        - list: one dict per case
+
+    """
+    bytes_per_second = bandwidth * 1e6 / 8
+    results = []
+    for name, body in bodies(items).items():
+        results.append({
+            "body": name, "encoding": "identity", "level": None, "bytes": len(body), "ratio": 1.0, "compress_us": 0.0,
+            "decompress_us": 0.0, "compress_mb_s": None, "deliver_ms": len(body) / bytes_per_second * 1000,
+        })
+        for encoding in encodings:
+            decode = decompressor(encoding)
+            for level in levels[encoding]:
+                compressed = compress(body, encoding, level)
+                assert decode(compressed) == body
+                compress_s = best_time(lambda: compress(body, encoding, level), repeat)
+                decompress_s = best_time(lambda: decode(compressed), repeat)
+                results.append({
+                    "body": name, "encoding": encoding, "level": level, "bytes": len(compressed), "ratio": len(body) / len(compressed),
+                    "compress_us": compress_s * 1e6, "decompress_us": decompress_s * 1e6, "compress_mb_s": len(body) / compress_s / 1e6,
+                    "deliver_ms": (compress_s + len(compressed) / bytes_per_second + decompress_s) * 1000,
+                })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[50, 200, 1000], help="documents per feed body")
+    parser.add_argument("--encodings", default="zstd,br,gzip", help="codings to measure, missing libraries are skipped")
+    parser.add_argument("--levels", type=int, nargs="+", help="levels of every coding, defaults to a fast, default and max level each")
+    parser.add_argument("--bandwidth", type=float, default=50, help="link speed in Mbit/s of the delivery time")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case, the best is kept")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    encodings = available_encodings(args.encodings)
+    for name in args.encodings.split(","):
+        if name.strip() in CODING_MODULES and name.strip() not in encodings:
+            print(f"{name.strip()}: skipped, {CODING_MODULES[name.strip()]} is not installed")
+    levels = {encoding: args.levels or LEVELS[encoding] for encoding in encodings}
+
+    results = run(args.items, encodings, levels, args.bandwidth, args.repeat)
+    print(f"{'body':<20}{'coding':<10}{'level':>6}{'bytes':>10}{'ratio':>8}{'comp us':>10}{'MB/s':>8}{'decomp us':>11}"
+          f"{f'@{args.bandwidth:g}Mbit ms':>16}")
+    for result in results:
+        level = "" if result["level"] is None else result["level"]
+        speed = "" if result["compress_mb_s"] is None else f"{result['compress_mb_s']:.0f}"
+        print(f"{result['body']:<20}{result['encoding']:<10}{level:>6}{result['bytes']:>10}{result['ratio']:>8.2f}"
+              f"{result['compress_us']:>10.0f}{speed:>8}{result['decompress_us']:>11.0f}{result['deliver_ms']:>16.2f}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
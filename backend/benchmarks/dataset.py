@@ -0,0 +1,394 @@
+"""
+Synthetic dataset generator.
+Every generator is a python generator yielding documents shaped like the ones the services store, so any amount of data is produced in constant
+memory. Distributions follow the ones of a real social app rather than uniform noise:
+    - skills, interests, tags, tools and locations are drawn from Zipf distributions, a few are very common and most are rare
+    - friendships grow by attachment to older users, giving a power-law degree distribution with a few very connected users
+    - activity (projects created, conversations, notifications) concentrates on a minority of users
+    - messages and notifications come in bursts, seconds apart within a burst and days apart between bursts
+
+Generators work on a range of ids so a collection can be split in shards, each generated from its own seed (see shard_rng) by a separate process.
+The output only depends on the seed, never on the number of workers. Ids are prefixed so a seeded dataset can be told apart from (and deleted
+without touching) real data.
+Run as a script to write JSONL/BSON files (mongoimport/mongorestore) or to bulk-load the mongodb configured in .env
+
+USAGE:
+    python benchmarks/dataset.py --users 1000000 --notifications 5000000 --output /tmp/dataset --workers 8
+    python benchmarks/dataset.py --users 100000 --load --batch-size 5000 --inflight 4
+
+MODULES:
+    - argparse: command line args
+    - asyncio: bulk loading
+    - concurrent.futures: ProcessPoolExecutor
+    - itertools: islice, accumulate
+    - json: JSONL output
+    - random: Random
+    - time: perf_counter
+    - collections: Counter
+    - datetime: datetime, timedelta
+    - typing: Iterator, Iterable
+    - bcrypt: hashpw, password of the users
+    - bson: encode, BSON output
+    - repositories.registry: collections of --load
+
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from typing import Iterable, Iterator
+import bcrypt
+import bson
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))  # repositories, for --load
+
+
+# Ordered from the most to the least popular, Zipf ranks
+SKILLS = [
+    "python", "javascript", "typescript", "react", "go", "rust", "java", "kotlin", "swift", "sql", "docker", "kubernetes",
+    "figma", "ui design", "data science", "machine learning", "devops", "c++", "php", "flutter",
+]
+TAGS = ["#creative", "#innovative", "#opensource", "#startup", "#education", "#health", "#fintech", "#climate", "#gaming", "#social"]
+TOOLS = ["github", "vscode", "figma", "slack", "notion", "docker", "jira", "trello", "discord", "postgres", "firebase", "aws"]
+LOCATIONS = ["Lagos", "Remote", "Abuja", "Nairobi", "Accra", "London", "Bangalore", "New York", "Berlin", "Toronto"]
+PROJECT_TYPES = ["web", "mobile", "research", "design", "hardware"]
+NOTIFICATION_TYPES = ["friend_request", "project_update", "invitation", "message", "application"]
+START = datetime(2024, 1, 1)
+DAYS = 365
+END = START + timedelta(days=DAYS)
+
+PASSWORD = "benchpassword"  # plain password of every seeded user
+
+# Collections in generation order, with the collection whose ids shard them and the size setting that gives their total
+COLLECTIONS = {
+    "users": "users",
+    "projects": "projects",
+    "friendships": "users",  # friendships of a range of users
+    "conversations": "conversations",
+    "notifications": "users",  # notifications of a range of users
+}
+
+
+class Zipf:
+    """
+    Zipf distribution over a list, the item of rank r being drawn with a weight of 1 / r ** exponent
+
+    ATTRIBUTES:
+        - items: list, items ordered by popularity
+        - cum_weights: list, cumulative weights for random.choices
+
+    """
+    def __init__(self, items: list, exponent: float = 1.1):
+        """Object initializer"""
+        self.items = items
+        self.cum_weights = list(accumulate(1 / rank ** exponent for rank in range(1, len(items) + 1)))
+
+    def choice(self, rng: random.Random):
+        """One item"""
+        return rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+    def sample(self, rng: random.Random, k: int) -> list:
+        """k distinct items, most popular first"""
+        k = min(k, len(self.items))
+        chosen = set()
+        while len(chosen) < k:
+            chosen.update(rng.choices(self.items, cum_weights=self.cum_weights, k=k - len(chosen)))
+        return [item for item in self.items if item in chosen]
+
+
+skills = Zipf(SKILLS)
+tags = Zipf(TAGS)
+tools = Zipf(TOOLS)
+locations = Zipf(LOCATIONS, 0.8)
+project_types = Zipf(PROJECT_TYPES)
+notification_types = Zipf(NOTIFICATION_TYPES, 0.7)
+
+
+def shard_rng(seed: int, collection: str, start: int) -> random.Random:
+    """Random generator of the shard of collection starting at start, the same whichever process generates it"""
+    return random.Random(f"{seed}:{collection}:{start}")
+
+
+def heavy_tailed(rng: random.Random, mean: float) -> int:
+    """Count with the given mean drawn from a Pareto distribution (alpha 2), most draws are small and a few are very large"""
+    return int(rng.paretovariate(2) * mean / 2)
+
+
+def active_user(rng: random.Random, n_users: int, skew: float = 2.0) -> int:
+    """Index of a user, lower indexes being more active: the index is n_users * u ** skew for a uniform u, a power law"""
+    return int(n_users * rng.random() ** skew)
+
+
+def timestamp(rng: random.Random, days: int = DAYS) -> datetime:
+    """Random datetime within days after START"""
+    return START + timedelta(seconds=rng.randrange(days * 86400))
+
+
+def bursts(rng: random.Random, start: datetime, burstiness: float = 0.85) -> Iterator[datetime]:
+    """Endless increasing datetimes, seconds apart within a burst and a couple of days apart between bursts"""
+    current = start
+    while True:
+        yield current
+        gap = rng.expovariate(1 / 40) if rng.random() < burstiness else rng.expovariate(1 / (2 * 86400))
+        current += timedelta(seconds=gap)
+
+
+def password_hash(seed: int) -> str:
+    """bcrypt hash of PASSWORD with a salt drawn from seed, so users documents are reproducible too"""
+    rng = random.Random(f"{seed}:password")
+    salt = "".join(rng.choice("./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789") for _ in range(21)) + rng.choice(".Oeu")
+    return bcrypt.hashpw(PASSWORD.encode("utf-8"), f"$2b$12${salt}".encode()).decode("utf-8")
+
+
+def user_id(prefix: str, i: int) -> str:
+    """Id of the i-th seeded user"""
+    return f"{prefix}user{i}"
+
+
+def users(ids: range, rng: random.Random, password_hash: str, prefix: str = "bench") -> Iterator[dict]:
+    """Users with Zipf skills and interests, all sharing the hash of PASSWORD"""
+    for i in ids:
+        created_at = timestamp(rng).isoformat()
+        yield {
+            "_id": user_id(prefix, i), "name": f"Bench User {i}", "email": f"{user_id(prefix, i)}@example.com",
+            "password": password_hash, "created_at": created_at, "updated_at": created_at, "profile_pic": None, "bio": None,
+            "skills": skills.sample(rng, 1 + heavy_tailed(rng, 3)), "objs": [], "interests": skills.sample(rng, heavy_tailed(rng, 2)),
+            "friends_count": 0, "collabees_count": 0, "projects_count": 0, "followers_count": 0, "following_count": 0,
+            "language": "eng", "location": locations.choice(rng), "timezone": "UTC",
+        }
+
+
+def projects(ids: range, n_users: int, rng: random.Random, prefix: str = "bench") -> Iterator[dict]:
+    """Projects mostly created by the active users, with Zipf skills, tags and tools"""
+    for i in ids:
+        created_at = timestamp(rng)
+        deadline = created_at + timedelta(days=rng.randrange(14, 180)) if rng.random() < 0.4 else None
+        created_by = user_id(prefix, active_user(rng, n_users))
+        project_type = project_types.choice(rng)
+        project_skills, project_tags = skills.sample(rng, 1 + heavy_tailed(rng, 2)), tags.sample(rng, 1 + heavy_tailed(rng, 1))
+        collaborators = [user_id(prefix, active_user(rng, n_users)) for _ in range(heavy_tailed(rng, 2))]
+        yield {
+            "_id": f"{prefix}project{i}", "title": f"Bench project {i}", "description": "A project seeded for benchmarks",
+            "created_by": created_by, "created_at": created_at.isoformat(), "updated_at": None,
+            "deadline": deadline.isoformat() if deadline else None, "type": project_type, "skills": project_skills, "tags": project_tags,
+            "collaborators": collaborators, "followers": [], "project_tools": tools.sample(rng, heavy_tailed(rng, 3)),
+            "location": locations.choice(rng), "followers_count": 0, "collaborators_count": len(collaborators),
+            "applications_count": 0, "invitations_count": 0,
+        }
+
+
+def friendships(ids: range, degree: float, rng: random.Random, prefix: str = "bench") -> Iterator[dict]:
+    """
+    Friendships of the users in ids, about degree per user on average
+
+    Each user befriends a heavy-tailed number of users that joined before it, picked with a preference for the oldest ones, so early users
+    gather most friendships: a power-law graph. Friendships are only made with earlier users, so every pair is generated once, by the shard of
+    its newest user, and is stored on the ordered pair of ids
+
+    """
+    for i in ids:
+        friends = set()
+        # every friendship made here is also one friend of an older user, so half the friends of a user are made by it
+        for _ in range(min(heavy_tailed(rng, degree / 2), i)):
+            friends.add(int(i * rng.random() ** 3))
+        for j in sorted(friends):
+            pair = sorted((user_id(prefix, i), user_id(prefix, j)))
+            yield {"user1_id": pair[0], "user2_id": pair[1], "created_at": timestamp(rng).isoformat()}
+
+
+def conversations(ids: range, n_users: int, rng: random.Random, prefix: str = "bench", messages: int = 20) -> Iterator[dict]:
+    """Conversations of active users with a heavy-tailed number of messages, about messages on average, sent in bursts"""
+    for i in ids:
+        first = active_user(rng, n_users)
+        second = (first + 1 + active_user(rng, n_users - 1)) % n_users if n_users > 1 else first
+        pair = [user_id(prefix, first), user_id(prefix, second)]
+        times = bursts(rng, timestamp(rng))
+        created_at = next(times).isoformat()
+        sender = 0
+        thread = []
+        for j in range(1 + heavy_tailed(rng, messages)):
+            sender = sender if rng.random() < 0.3 else 1 - sender  # replies mostly alternate
+            thread.append({
+                "sender_id": pair[sender], "receiver_id": pair[1 - sender], "text": f"message {j}",
+                "timestamp": next(times).isoformat(), "status": "sent",
+            })
+        yield {"_id": f"{prefix}conv{i}", "users": pair, "created_at": created_at, "messages": thread}
+
+
+def notifications(ids: range, per_user: float, rng: random.Random, prefix: str = "bench") -> Iterator[dict]:
+    """Notifications of the users in ids, a heavy-tailed number per user arriving in bursts, recent ones mostly unread"""
+    recent = END - timedelta(days=30)
+    for i in ids:
+        times = bursts(rng, timestamp(rng, DAYS - 30), 0.7)
+        for _ in range(heavy_tailed(rng, per_user)):
+            created_at = next(times)
+            yield {
+                "user_id": user_id(prefix, i), "type": notification_types.choice(rng), "content": "Seeded notification",
+                "is_read": rng.random() < (0.3 if created_at > recent else 0.9),
+                "created_at": created_at.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+
+
+def count_unread(documents: Iterable[dict], unread: Counter) -> Iterator[dict]:
+    """Pass notifications through, counting the unread ones of each user in unread"""
+    for document in documents:
+        if not document["is_read"]:
+            unread[document["user_id"]] += 1
+        yield document
+
+
+def counters(unread: Counter) -> Iterator[dict]:
+    """Unread notification counter documents"""
+    for user, count in unread.items():
+        yield {"_id": user, "unread": count}
+
+
+def generate(collection: str, ids: range, sizes: dict, rng: random.Random, password_hash: str, prefix: str = "bench") -> Iterator[dict]:
+    """
+    Documents of a shard of a collection
+
+    ARGUMENTS:
+        - collection: str, one of COLLECTIONS
+        - ids: range, the ids of the shard, of the collection in COLLECTIONS[collection]
+        - sizes: dict, total no of documents of each collection
+        - rng: random.Random, see shard_rng
+        - password_hash: str, hash of PASSWORD
+        - prefix: str, prefix of the ids
+
+    RETURNS:
+        - Iterator[dict]: documents
+
+    """
+    n_users = max(sizes["users"], 1)
+    if collection == "users":
+        return users(ids, rng, password_hash, prefix)
+    if collection == "projects":
+        return projects(ids, n_users, rng, prefix)
+    if collection == "friendships":
+        return friendships(ids, 2 * sizes["friendships"] / n_users, rng, prefix)
+    if collection == "conversations":
+        return conversations(ids, n_users, rng, prefix)
+    if collection == "notifications":
+        return notifications(ids, sizes["notifications"] / n_users, rng, prefix)
+    raise ValueError(f"unknown collection {collection}")
+
+
+def shards(sizes: dict, shard_size: int) -> Iterator[tuple]:
+    """(collection, ids) of every shard of the dataset"""
+    for collection, dimension in COLLECTIONS.items():
+        total = sizes[dimension]
+        for start in range(0, total, shard_size):
+            yield collection, range(start, min(start + shard_size, total))
+
+
+def batched(documents: Iterable[dict], size: int) -> Iterator[list]:
+    """Lists of up to size documents"""
+    documents = iter(documents)
+    while batch := list(islice(documents, size)):
+        yield batch
+
+
+def write_shard(collection: str, ids: range, settings: dict) -> dict:
+    """Generate a shard into a JSONL or BSON file, returns the no of documents written per collection"""
+    rng = shard_rng(settings["seed"], collection, ids.start)
+    documents = generate(collection, ids, settings["sizes"], rng, settings["password_hash"], settings["prefix"])
+    unread = Counter()
+    if collection == "notifications":
+        documents = count_unread(documents, unread)
+
+    written = Counter()
+    outputs = [(collection, documents), ("notification_counters", counters(unread))]
+    for name, docs in outputs:
+        path = os.path.join(settings["output"], f"{name}-{ids.start:010d}.{settings['format']}")
+        with open(path, "wb") as output:
+            for document in docs:
+                if settings["format"] == "bson":
+                    output.write(bson.encode(document))
+                else:
+                    output.write(json.dumps(document).encode() + b"\n")
+                written[name] += 1
+        if not written[name]:
+            os.remove(path)
+    return written
+
+
+def load_shard(collection: str, ids: range, settings: dict) -> dict:
+    """Generate a shard into the database with insert_many, keeping up to settings["inflight"] batches in flight"""
+    return asyncio.run(insert_shard(collection, ids, settings))
+
+
+async def insert_shard(collection: str, ids: range, settings: dict) -> dict:
+    """Async body of load_shard"""
+    from repositories import registry
+
+    rng = shard_rng(settings["seed"], collection, ids.start)
+    documents = generate(collection, ids, settings["sizes"], rng, settings["password_hash"], settings["prefix"])
+    unread = Counter()
+    if collection == "notifications":
+        documents = count_unread(documents, unread)
+
+    written = Counter()
+    for name, docs in [(collection, documents), ("notification_counters", counters(unread))]:
+        target = getattr(registry, name).collection
+        pending = set()
+        for batch in batched(docs, settings["batch_size"]):
+            if len(pending) >= settings["inflight"]:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()  # raise insert errors
+            pending.add(asyncio.create_task(target.insert_many(batch, ordered=False)))
+            written[name] += len(batch)
+        await asyncio.gather(*pending)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--users", type=int, default=10000, help="no of users")
+    parser.add_argument("--projects", type=int, default=5000, help="no of projects")
+    parser.add_argument("--friendships", type=int, default=50000, help="approximate no of friendships")
+    parser.add_argument("--conversations", type=int, default=10000, help="no of conversations")
+    parser.add_argument("--notifications", type=int, default=100000, help="approximate no of notifications")
+    parser.add_argument("--seed", type=int, default=42, help="seed, the same seed always gives the same documents")
+    parser.add_argument("--prefix", default="bench", help="prefix of the ids")
+    parser.add_argument("--shard-size", type=int, default=100000, help="no of ids generated by one task")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="no of processes")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--output", help="directory to write <collection>-<shard>.<format> files in")
+    target.add_argument("--load", action="store_true", help="insert into the mongodb configured in .env")
+    parser.add_argument("--format", choices=["jsonl", "bson"], default="jsonl", help="format of the --output files")
+    parser.add_argument("--batch-size", type=int, default=5000, help="documents per insert_many with --load")
+    parser.add_argument("--inflight", type=int, default=4, help="concurrent insert_many per process with --load")
+    args = parser.parse_args()
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    settings = {
+        "sizes": {name: getattr(args, name) for name in COLLECTIONS}, "seed": args.seed, "prefix": args.prefix,
+        "password_hash": password_hash(args.seed), "output": args.output, "format": args.format,
+        "batch_size": args.batch_size, "inflight": args.inflight,
+    }
+
+    start = time.perf_counter()
+    totals = Counter()
+    worker = load_shard if args.load else write_shard
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = [pool.submit(worker, collection, ids, settings) for collection, ids in shards(settings["sizes"], args.shard_size)]
+        for future in futures:
+            totals.update(future.result())
+    elapsed = time.perf_counter() - start
+
+    if args.load:
+        from repositories import registry
+        asyncio.run(registry.ensure_indexes())  # built once after the load rather than maintained on every insert
+
+    for name, count in totals.items():
+        print(f"{name:<24}{count:>12}")
+    print(f"{sum(totals.values())} documents in {elapsed:.1f}s, {sum(totals.values()) / elapsed:.0f} documents/s")
@@ -0,0 +1,124 @@
+"""
+Memory and throughput of the NDJSON exports.
+Exports --sizes projects (benchmarks/dataset.py documents, generated as the cursor is read like a server cursor hands out batches) twice: the way
+a dump would be written with to_list(length=None) and json_util.dumps of the whole list, and with services.export_services streaming chunks.
+Reports the documents and MB of JSON written per second and the peak memory allocated by the export (tracemalloc), which grows with the
+collection for to_list and stays at about one batch and one chunk for the stream
+
+USAGE:
+    python benchmarks/export_benchmarks.py
+    python benchmarks/export_benchmarks.py --sizes 10000 100000 --batch-size 1000
+
+MODULES:
+    - argparse: command line args
+    - asyncio: run
+    - time: perf_counter
+    - tracemalloc: peak memory of an export
+    - bson: json_util
+    - services.export_services: ExportServices
+    - dataset: realistic projects
+
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bson import json_util  # noqa: E402
+from services.export_services import ExportServices  # noqa: E402
+import dataset  # noqa: E402
+
+
+class GeneratedCursor:
+    """Cursor handing out size generated projects a batch at a time, holding only the current batch like a motor cursor"""
+    def __init__(self, size: int):
+        self.documents = dataset.projects(range(size), max(size // 10, 10), dataset.shard_rng(0, "export", size))
+        self.batch: list = []
+        self.size = 1000
+
+    def sort(self, *args) -> "GeneratedCursor":
+        """Generated in _id order already"""
+        return self
+
+    def batch_size(self, size: int) -> "GeneratedCursor":
+        """Documents generated per batch"""
+        self.size = size
+        return self
+
+    async def to_list(self, length=None) -> list:
+        """Every remaining document at once"""
+        return list(self.documents)
+
+    async def close(self):
+        """Nothing to release"""
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if not self.batch:
+            self.batch = [document for _, document in zip(range(self.size), self.documents)][::-1]
+            if not self.batch:
+                raise StopAsyncIteration
+        return self.batch.pop()
+
+
+class GeneratedCollection:
+    """Collection whose find returns a GeneratedCursor of size projects"""
+    def __init__(self, size: int):
+        self.size = size
+
+    def find(self, *args) -> GeneratedCursor:
+        """Cursor over the generated projects, the query and projection are ignored"""
+        return GeneratedCursor(self.size)
+
+
+class GeneratedRepository:
+    """Stand-in for the projects repository"""
+    def __init__(self, size: int):
+        self.collection = GeneratedCollection(size)
+
+
+async def to_list_export(size: int, batch_size: int) -> int:
+    """Bytes of a dump loading the whole collection, then writing it"""
+    documents = await GeneratedCursor(size).batch_size(batch_size).to_list(length=None)
+    body = "\n".join(json_util.dumps(document) for document in documents).encode()
+    return len(body)
+
+
+async def streamed_export(size: int, batch_size: int) -> int:
+    """Bytes of a streamed export, chunks are dropped as a response would send them"""
+    services = ExportServices({"projects": GeneratedRepository(size)})
+    written = 0
+    async for chunk in services.export("projects", batch_size=batch_size):
+        written += len(chunk)
+    return written
+
+
+def measure(export, size: int, batch_size: int) -> dict:
+    """Time and peak allocation of one export"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    written = asyncio.run(export(size, batch_size))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"docs_per_s": size / elapsed, "mb_per_s": written / elapsed / 2 ** 20, "peak_mb": peak / 2 ** 20}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="projects exported")
+    parser.add_argument("--batch-size", type=int, default=2000, help="documents per cursor batch")
+    args = parser.parse_args()
+
+    print(f"{'size':>8}  {'strategy':<10}{'docs/s':>10}{'MB/s':>8}{'peak MB':>9}")
+    for size in args.sizes:
+        for name, export in (("to_list", to_list_export), ("stream", streamed_export)):
+            result = measure(export, size, args.batch_size)
+            print(f"{size:>8}  {name:<10}{result['docs_per_s']:>10.0f}{result['mb_per_s']:>8.1f}{result['peak_mb']:>9.1f}")
@@ -0,0 +1,80 @@
+"""
+Benchmark concurrent acceptance of the same friend request.
+Fires N concurrent accepts per request against the database configured in .env and reports latency percentiles and how many friendships were created (expected: exactly one per request)
+
+USAGE:
+    python benchmarks/friend_accept_contention.py --requests 50 --concurrency 20
+
+MODULES:
+    - argparse: command line args
+    - asyncio: gather
+    - statistics: quantiles
+    - time: perf_counter
+    - services.friend_services: FriendServices
+    - repositories.registry: ensure_indexes
+
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from services.friend_services import FriendServices  # noqa: E402
+from repositories import registry  # noqa: E402
+
+
+async def accept(friend_services: FriendServices, request_id: str, timings: list):
+    """Accept a request and record the call latency"""
+    start = time.perf_counter()
+    result = await friend_services.update_friend_request_status(request_id, "accepted")
+    timings.append(time.perf_counter() - start)
+    return result
+
+
+async def run(n_requests: int, concurrency: int):
+    """Seed pending requests, accept each of them concurrently and verify the friendships"""
+    friend_services = FriendServices()
+    await registry.ensure_indexes()
+    requests = friend_services.requests.collection
+    friendships = friend_services.friendships.collection
+
+    run_id = str(int(time.time()))
+    pairs = [(f"benchsender{run_id}_{i}", f"benchrecipient{run_id}_{i}") for i in range(n_requests)]
+    insertion = await requests.insert_many([
+        {"sender_id": sender, "recipient_id": recipient, "status": "pending", "created_at": run_id}
+        for sender, recipient in pairs
+    ])
+    request_ids = [str(_id) for _id in insertion.inserted_ids]
+
+    timings = []
+    start = time.perf_counter()
+    for request_id in request_ids:
+        results = await asyncio.gather(*(accept(friend_services, request_id, timings) for _ in range(concurrency)))
+        assert all(result == 1 for result in results), results
+    elapsed = time.perf_counter() - start
+
+    created = await friendships.count_documents({"user1_id": {"$in": [sender for sender, _ in pairs]}})
+    quantiles = statistics.quantiles(timings, n=100)
+
+    print(f"accepts: {len(timings)} in {elapsed:.2f}s ({len(timings) / elapsed:.0f}/s)")
+    print(f"latency ms p50={quantiles[49] * 1000:.2f} p95={quantiles[94] * 1000:.2f} p99={quantiles[98] * 1000:.2f}")
+    print(f"friendships created: {created} (expected {n_requests})")
+
+    # clean up the seeded docs
+    await requests.delete_many({"_id": {"$in": insertion.inserted_ids}})
+    await friendships.delete_many({"user1_id": {"$in": [sender for sender, _ in pairs]}})
+
+    if created != n_requests:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=50, help="no of friend requests to seed")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent accepts per request")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency))
@@ -0,0 +1,86 @@
+"""
+Rows per second of the bulk user import.
+Creates --rows users (benchmarks/dataset.py names and emails) in an in-memory users collection twice: one AuthServices.create_user call per
+row, as one /auth/signup request each does it, with its email lookup and its bcrypt hash on the event loop, and with
+services.import_services from JSONL, hashing in --workers processes. bcrypt dominates both, so the import scales with the cores given to it
+
+USAGE:
+    python benchmarks/import_benchmarks.py
+    python benchmarks/import_benchmarks.py --rows 1000 --workers 8 --chunk-size 500
+
+MODULES:
+    - argparse: command line args
+    - asyncio: run
+    - json: rows
+    - os: cpu_count
+    - time: perf_counter
+    - models.users: UserSignup
+    - repositories.memory: MemoryRepository
+    - services.auth_services: AuthServices
+    - services.import_services: ImportServices
+    - dataset: realistic users
+
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.users import UserSignup  # noqa: E402
+from repositories.memory import MemoryRepository  # noqa: E402
+from services.auth_services import AuthServices  # noqa: E402
+from services.import_services import ImportServices  # noqa: E402
+import dataset  # noqa: E402
+
+
+def signups(rows: int) -> list:
+    """Signup rows of realistic users"""
+    users = dataset.users(range(rows), dataset.shard_rng(0, "import", rows), dataset.password_hash(0))
+    return [{"name": user["name"], "email": user["email"], "password": dataset.PASSWORD} for user in users]
+
+
+async def one_by_one(rows: list) -> float:
+    """Seconds to sign every row up with its own create_user call"""
+    services = AuthServices(MemoryRepository("users"))
+    start = time.perf_counter()
+    for row in rows:
+        await services.create_user(UserSignup(**row))
+    return time.perf_counter() - start
+
+
+async def bulk(rows: list, workers: int, chunk_size: int) -> float:
+    """Seconds to import the rows as JSONL, the hashing processes are started before the clock"""
+    services = ImportServices(MemoryRepository("users"), MemoryRepository("projects"), workers)
+    await services._hash(["warm up the pool"] * workers)
+    body = "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+    async def chunks():
+        yield body
+
+    try:
+        start = time.perf_counter()
+        report = await services.import_rows("users", chunks(), chunk_size)
+        assert report["inserted"] == len(rows), report["errors"][:5]
+        return time.perf_counter() - start
+    finally:
+        services.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=100, help="users created by each strategy")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes hashing passwords in the import")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows per chunk of the import")
+    args = parser.parse_args()
+
+    rows = signups(args.rows)
+    print(f"{'strategy':<24}{'seconds':>9}{'rows/s':>9}")
+    for name, measure in (("signup per row", lambda: one_by_one(rows)),
+                          (f"import, {args.workers} workers", lambda: bulk(rows, args.workers, args.chunk_size))):
+        seconds = asyncio.run(measure())
+        print(f"{name:<24}{seconds:>9.2f}{len(rows) / seconds:>9.1f}")
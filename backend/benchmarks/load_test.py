@@ -0,0 +1,421 @@
+"""
+Load test of the API.
+Seeds a synthetic dataset (benchmarks/dataset.py), then runs concurrent virtual users picking endpoints from a weighted mix for a fixed duration
+and reports requests per second and latency percentiles per endpoint. Results are written as JSON, tagged with the git commit, so runs can be
+compared across commits with --compare.
+
+By default the app runs in process against in-memory collections (repositories.registry.use_memory), which measures the app itself without
+network or database noise. With --url the load goes to a running server and the dataset is seeded in the mongodb configured in .env (the server
+must use the same database and JWT secret), then deleted after the run
+
+USAGE:
+    python benchmarks/load_test.py --users 2000 --projects 1000 --concurrency 50 --duration 30 --output bench.json
+    python benchmarks/load_test.py --url http://localhost:8000 --mix search_users=5,chat=2 --duration 60
+    python benchmarks/load_test.py --compare before.json after.json
+
+MODULES:
+    - argparse: command line args
+    - asyncio: gather, Queue
+    - json: results files
+    - random: Random
+    - statistics: quantiles
+    - subprocess: git commit of the run
+    - time: perf_counter
+    - httpx: AsyncClient, ASGITransport
+    - websockets: connect, websocket client for --url runs
+    - dataset: synthetic documents
+
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND)  # main.py imports app.routes.notifications
+sys.path.insert(0, os.path.join(BACKEND, "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")  # only used by in-process runs, --url runs get their tokens from the server
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+import httpx  # noqa: E402
+import dataset  # noqa: E402
+from repositories import registry  # noqa: E402
+
+
+DEFAULT_MIX = {
+    "login": 1, "signup": 1, "search_users": 4, "search_projects": 4, "suggest_projects": 2, "suggest_users": 2,
+    "project_create": 2, "project_get": 8, "project_update": 2, "project_delete": 1,
+    "notifications_list": 6, "notifications_summary": 6, "chat": 4,
+}
+
+
+class ASGIWebSocket:
+    """Websocket client talking to an ASGI app in process, through the same scope and messages a server would use"""
+    def __init__(self, app, path: str, query_string: str):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.outgoing: asyncio.Queue = asyncio.Queue()
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1", "path": path,
+            "raw_path": path.encode(), "root_path": "", "query_string": query_string.encode(), "headers": [],
+            "client": ("benchmark", 0), "server": ("benchmark", 80), "subprotocols": [],
+        }
+        self.task = asyncio.create_task(app(scope, self.incoming.get, self.outgoing.put))
+        # an app that fails closes the socket, instead of leaving the client waiting
+        self.task.add_done_callback(lambda task: self.outgoing.put_nowait({"type": "websocket.close", "code": 1011}))
+
+    async def connect(self):
+        await self.incoming.put({"type": "websocket.connect"})
+        message = await self.outgoing.get()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"websocket refused: {message}")
+
+    async def send_json(self, data: dict):
+        await self.incoming.put({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json(self) -> dict:
+        message = await self.outgoing.get()
+        if message["type"] != "websocket.send":
+            raise ConnectionError(f"websocket closed: {message}")
+        return json.loads(message.get("text") or message["bytes"])
+
+    async def close(self):
+        if not self.task.done():
+            await self.incoming.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.gather(asyncio.wait_for(self.task, 5), return_exceptions=True)
+
+
+class RemoteWebSocket:
+    """Websocket client for a running server"""
+    def __init__(self, url: str):
+        self.url = url
+        self.socket = None
+
+    async def connect(self):
+        import websockets
+        self.socket = await websockets.connect(self.url)
+
+    async def send_json(self, data: dict):
+        await self.socket.send(json.dumps(data))
+
+    async def receive_json(self) -> dict:
+        return json.loads(await self.socket.recv())
+
+    async def close(self):
+        await self.socket.close()
+
+
+class VirtualUser:
+    """State of one concurrent client: its seeded account, token, rng and the projects it created"""
+    def __init__(self, index: int, user_id: str, seed: int):
+        self.index = index
+        self.user_id = user_id
+        self.rng = random.Random(seed)
+        self.headers = {}
+        self.created_projects = []
+        self.signups = 0
+        self.chat = None  # (own socket, peer socket, peer id), opened on first use
+
+
+class LoadTest:
+    """
+    Seeds the dataset, runs the virtual users and collects the timings
+
+    ATTRIBUTES:
+        - args: argparse.Namespace, run settings
+        - prefix: str, prefix of the ids of the seeded documents
+        - timings: dict, endpoint -> list of latencies in seconds
+        - statuses: dict, endpoint -> Counter of status codes, "error" for exceptions
+
+    """
+    def __init__(self, args):
+        self.args = args
+        self.prefix = f"bench{int(time.time())}" if args.url else "bench"
+        self.timings = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.app = None
+        self.http = None
+
+    async def seed(self):
+        """Insert the dataset through the repositories, in batches"""
+        args = self.args
+        sizes = {name: getattr(args, name) for name in dataset.COLLECTIONS}
+        password_hash = dataset.password_hash(args.seed)
+        unread = Counter()
+        for collection, ids in dataset.shards(sizes, args.users):
+            rng = dataset.shard_rng(args.seed, collection, ids.start)
+            documents = dataset.generate(collection, ids, sizes, rng, password_hash, self.prefix)
+            if collection == "notifications":
+                documents = dataset.count_unread(documents, unread)
+            for batch in dataset.batched(documents, 1000):
+                await getattr(registry, collection).collection.insert_many(batch, ordered=False)
+        # the pairs of chatting virtual users already talk, so chat measures pushing a message rather than opening conversations
+        await registry.conversations.collection.insert_many([
+            {"_id": f"{self.prefix}chat{i}", "users": [self.virtual_user_id(i), self.peer_id(i)], "created_at": dataset.START.isoformat(),
+             "messages": []}
+            for i in range(args.concurrency)
+        ])
+        if unread:
+            await registry.notification_counters.collection.insert_many(list(dataset.counters(unread)), ordered=False)
+
+    async def cleanup(self):
+        """Delete the seeded and created documents of a --url run"""
+        prefix = {"$regex": f"^{self.prefix}"}
+        await registry.users.collection.delete_many({"$or": [{"_id": prefix}, {"email": prefix}]})
+        await registry.projects.collection.delete_many({"$or": [{"_id": prefix}, {"created_by": prefix}]})
+        await registry.friendships.collection.delete_many({"user1_id": prefix})
+        await registry.conversations.collection.delete_many({"users": prefix})
+        await registry.notifications.collection.delete_many({"user_id": prefix})
+        await registry.notification_counters.collection.delete_many({"_id": prefix})
+
+    def virtual_user_id(self, index: int) -> str:
+        """Seeded account of the index-th virtual user"""
+        return dataset.user_id(self.prefix, index % self.args.users)
+
+    def peer_id(self, index: int) -> str:
+        """Seeded account the index-th virtual user chats with"""
+        return dataset.user_id(self.prefix, (index + self.args.concurrency) % self.args.users)
+
+    async def request(self, endpoint: str, method: str, url: str, user: VirtualUser, **kwargs):
+        """Send a request and record its latency and status under endpoint"""
+        start = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, headers=user.headers, **kwargs)
+        except Exception:
+            self.statuses[endpoint]["error"] += 1
+            return None
+        self.timings[endpoint].append(time.perf_counter() - start)
+        self.statuses[endpoint][response.status_code] += 1
+        return response
+
+    def websocket(self, token: str):
+        """Websocket client of the messaging route"""
+        if self.args.url:
+            return RemoteWebSocket(self.args.url.replace("http", "ws", 1) + f"/messages/?token={token}")
+        return ASGIWebSocket(self.app, "/messages/", f"token={token}")
+
+    # Endpoints, each sends one request (or one chat message) for a virtual user
+    async def login(self, user: VirtualUser):
+        return await self.request("login", "POST", "/auth/login", user, json={
+            "email": f"{user.user_id}@example.com", "password": dataset.PASSWORD
+        })
+
+    async def signup(self, user: VirtualUser):
+        user.signups += 1
+        return await self.request("signup", "POST", "/auth/signup", user, json={
+            "name": "Bench Signup", "email": f"{self.prefix}new{user.index}x{user.signups}@example.com", "password": dataset.PASSWORD
+        })
+
+    async def search_users(self, user: VirtualUser):
+        return await self.request("search_users", "GET", "/search/users/", user, params={"skills": user.rng.choice(dataset.SKILLS)})
+
+    async def search_projects(self, user: VirtualUser):
+        return await self.request("search_projects", "GET", "/search/projects/", user, params={"tags": user.rng.choice(dataset.TAGS)})
+
+    async def suggest_projects(self, user: VirtualUser):
+        return await self.request("suggest_projects", "GET", "/suggestions/projects/", user)
+
+    async def suggest_users(self, user: VirtualUser):
+        return await self.request("suggest_users", "GET", "/suggestions/users/", user)
+
+    async def project_create(self, user: VirtualUser):
+        response = await self.request("project_create", "POST", "/projects/create", user, json={
+            "title": f"Load test project {user.index}", "description": "Created by the load test", "tags": ["#benchmark"]
+        })
+        if response is not None and response.status_code == 201:
+            user.created_projects.append(response.json()["project_id"])
+        return response
+
+    async def project_get(self, user: VirtualUser):
+        project_id = f"{self.prefix}project{user.rng.randrange(max(self.args.projects, 1))}"
+        return await self.request("project_get", "GET", f"/projects/{project_id}", user)
+
+    async def project_update(self, user: VirtualUser):
+        project_id = f"{self.prefix}project{user.rng.randrange(max(self.args.projects, 1))}"
+        return await self.request("project_update", "PUT", f"/projects/{project_id}", user, json={
+            "description": f"Updated by the load test {user.rng.random()}"
+        })
+
+    async def project_delete(self, user: VirtualUser):
+        if not user.created_projects:
+            return await self.project_create(user)
+        return await self.request("project_delete", "DELETE", f"/projects/{user.created_projects.pop()}", user)
+
+    async def notifications_list(self, user: VirtualUser):
+        return await self.request("notifications_list", "GET", f"/notifications/notifications/{user.user_id}", user)
+
+    async def notifications_summary(self, user: VirtualUser):
+        return await self.request("notifications_summary", "GET", f"/notifications/{user.user_id}/summary", user)
+
+    async def chat(self, user: VirtualUser):
+        """Round trip of a chat message between the user and its own peer connection"""
+        if user.chat is None:
+            peer_id = self.peer_id(user.index)
+            peer = VirtualUser(-1, peer_id, 0)
+            await self.authenticate(peer)
+            own, other = self.websocket(user.headers["Authorization"][7:]), self.websocket(peer.headers["Authorization"][7:])
+            await own.connect()
+            await other.connect()
+            user.chat = (own, other, peer_id)
+
+        own, other, peer_id = user.chat
+        start = time.perf_counter()
+        try:
+            await own.send_json({"type": "chat", "data": {"receiver_id": peer_id, "text": "load test message"}})
+            while (await asyncio.wait_for(other.receive_json(), 5)).get("type") != "chat":
+                pass  # presence frames
+        except Exception:
+            self.statuses["chat"]["error"] += 1
+            user.chat = None  # reconnect on the next chat
+            for socket in (own, other):
+                await asyncio.gather(socket.close(), return_exceptions=True)
+            return
+        self.timings["chat"].append(time.perf_counter() - start)
+        self.statuses["chat"]["ok"] += 1
+
+    async def authenticate(self, user: VirtualUser):
+        """Log a virtual user in and keep its bearer token"""
+        response = await self.http.post("/auth/login", json={"email": f"{user.user_id}@example.com", "password": dataset.PASSWORD})
+        response.raise_for_status()
+        user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def run_user(self, user: VirtualUser, mix: dict, deadline: float):
+        """Send requests picked from the mix until the deadline"""
+        endpoints, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            endpoint = user.rng.choices(endpoints, weights)[0]
+            await getattr(self, endpoint)(user)
+
+    async def run(self) -> dict:
+        """Seed, run the virtual users and return the report"""
+        args = self.args
+        if args.url:
+            transport, base_url = None, args.url
+        else:
+            from main import app
+            from services.notification_fanout import notification_fanout
+            self.app = app
+            transport, base_url = httpx.ASGITransport(app=app), "http://benchmark"
+            await notification_fanout.start()
+
+        await self.seed()
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30) as self.http:
+            users = [
+                VirtualUser(i, self.virtual_user_id(i), args.seed + i) for i in range(args.concurrency)
+            ]
+            await asyncio.gather(*(self.authenticate(user) for user in users))
+
+            start = time.perf_counter()
+            await asyncio.gather(*(self.run_user(user, args.mix, start + args.duration) for user in users))
+            elapsed = time.perf_counter() - start
+
+            for user in users:
+                if user.chat:
+                    for socket in user.chat[:2]:
+                        await socket.close()
+
+        if args.url:
+            await self.cleanup()
+        else:
+            from services.notification_fanout import notification_fanout
+            await notification_fanout.stop()
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        """Per endpoint throughput and latency percentiles"""
+        endpoints = {}
+        for endpoint in sorted(set(self.timings) | set(self.statuses)):
+            timings = self.timings[endpoint]
+            percentiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99 or [0] * 99
+            endpoints[endpoint] = {
+                "requests": len(timings), "rps": len(timings) / elapsed,
+                "p50_ms": percentiles[49] * 1000, "p95_ms": percentiles[94] * 1000, "p99_ms": percentiles[98] * 1000,
+                "statuses": {str(status): count for status, count in self.statuses[endpoint].items()},
+            }
+        return {
+            "commit": git_commit(), "date": datetime.now(timezone.utc).isoformat(), "mode": self.args.url or "in-process",
+            "settings": {key: value for key, value in vars(self.args).items() if key not in ("output", "compare")},
+            "elapsed": elapsed, "total_rps": sum(len(timings) for timings in self.timings.values()) / elapsed,
+            "endpoints": endpoints,
+        }
+
+
+def git_commit() -> str:
+    """Commit of the working tree, "unknown" outside of a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BACKEND).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def parse_mix(value: str) -> dict:
+    """Parse "endpoint=weight,..." into a mix, endpoints left out keep no weight"""
+    mix = {}
+    for item in value.split(","):
+        endpoint, _, weight = item.partition("=")
+        if endpoint.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {endpoint}, expected one of {', '.join(DEFAULT_MIX)}")
+        mix[endpoint.strip()] = float(weight or 1)
+    return mix
+
+
+def print_report(report: dict):
+    """Print a report as a table"""
+    print(f"commit {report['commit']} {report['mode']} {report['elapsed']:.1f}s {report['total_rps']:.0f} req/s")
+    print(f"{'endpoint':<22}{'requests':>9}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for endpoint, stats in report["endpoints"].items():
+        print(
+            f"{endpoint:<22}{stats['requests']:>9}{stats['rps']:>9.1f}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+            f"{stats['p99_ms']:>9.2f}  {stats['statuses']}"
+        )
+
+
+def compare(before_path: str, after_path: str):
+    """Print the change of rps and p95 per endpoint between two result files"""
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    print(f"{before['commit']} -> {after['commit']}")
+    print(f"{'endpoint':<22}{'rps':>18}{'p95 ms':>20}")
+    for endpoint, stats in after["endpoints"].items():
+        old = before["endpoints"].get(endpoint)
+        if not old:
+            continue
+        rps_change = (stats["rps"] / old["rps"] - 1) * 100 if old["rps"] else 0
+        p95_change = (stats["p95_ms"] / old["p95_ms"] - 1) * 100 if old["p95_ms"] else 0
+        print(f"{endpoint:<22}{stats['rps']:>10.1f} {rps_change:+6.1f}%{stats['p95_ms']:>12.2f} {p95_change:+6.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", help="base url of a running server, runs the app in process when left out")
+    parser.add_argument("--users", type=int, default=1000, help="no of seeded users")
+    parser.add_argument("--projects", type=int, default=500, help="no of seeded projects")
+    parser.add_argument("--friendships", type=int, default=3000, help="no of seeded friendships")
+    parser.add_argument("--conversations", type=int, default=500, help="no of seeded conversations")
+    parser.add_argument("--notifications", type=int, default=10000, help="no of seeded notifications")
+    parser.add_argument("--concurrency", type=int, default=20, help="no of concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="endpoint=weight,... e.g search_users=3,chat=1")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the dataset and of the request mix")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two JSON reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit()
+    if not args.url:
+        registry.use_memory()  # before main is imported, so every service sees the in-memory collections
+
+    result = asyncio.run(LoadTest(args).run())
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
@@ -0,0 +1,228 @@
+"""
+Microbenchmarks of the pydantic models.
+Times construction (model_construct), validation from python and from JSON, and dumping to python and to JSON of every model in models/ on
+payloads shaped like the stored documents (benchmarks/dataset.py). Times are reported in microseconds and as a ratio to the validation of a
+reference model of three plain fields timed alongside, which keeps the numbers comparable across machines.
+The ratios are checked against benchmarks/model_thresholds.json: a case slower than its threshold by more than the tolerance fails the run, so
+a model change (a validator, a nested model, a stricter type) shows its cost. Rerun with --update to accept new costs
+
+USAGE:
+    python benchmarks/model_benchmarks.py
+    python benchmarks/model_benchmarks.py --filter Conversation --repeat 9
+    python benchmarks/model_benchmarks.py --update
+
+MODULES:
+    - argparse: command line args
+    - inspect: getmembers, models of a module
+    - json: thresholds, JSON payloads
+    - random: Random
+    - re: --filter
+    - time: perf_counter
+    - pydantic: BaseModel
+    - models: every model module
+    - dataset: realistic payloads
+
+"""
+import argparse
+import importlib
+import inspect
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pydantic import BaseModel  # noqa: E402
+import dataset  # noqa: E402
+
+
+MODEL_MODULES = ["applications", "friends", "invitations", "messages", "notifications", "projects", "users"]
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_thresholds.json")
+OPERATIONS = ["construct", "validate", "validate_json", "dump", "dump_json"]
+
+
+class Reference(BaseModel):
+    """Reference model, the unit the cases are measured in"""
+    name: str
+    count: int
+    active: bool
+
+
+def models() -> dict:
+    """Every pydantic model defined in models/, by name"""
+    found = {}
+    for module_name in MODEL_MODULES:
+        module = importlib.import_module(f"models.{module_name}")
+        for name, member in inspect.getmembers(module, inspect.isclass):
+            if issubclass(member, BaseModel) and member.__module__ == module.__name__:
+                found[name] = member
+    return found
+
+
+def payloads() -> dict:
+    """Realistic input of every model, by model name"""
+    rng = dataset.shard_rng(0, "models", 0)
+    user = next(dataset.users(range(1), rng, dataset.password_hash(0)))
+    user.update(bio="Backend developer looking for weekend projects", skills=dataset.SKILLS[:6], friends_count=40)
+    project = next(dataset.projects(range(1), 100, rng))
+    conversation = next(dataset.conversations(range(1), 100, rng, messages=60))
+    notification = next(dataset.notifications(range(1), 50, rng))
+
+    user_response = {key: value for key, value in user.items() if key not in ("_id", "password")}
+    user_response["user_id"] = user["_id"]
+    project_response = {key: value for key, value in project.items() if key not in ("_id", "skills", "project_tools")}
+    project_response["project_id"] = project["_id"]
+    return {
+        "Reference": {"name": "reference", "count": 1, "active": True},
+        "UserSignup": {"name": user["name"], "email": user["email"], "password": dataset.PASSWORD},
+        "UserLogin": {"email": user["email"], "password": dataset.PASSWORD},
+        "Token": {"access_token": "e30." * 40, "token_type": "bearer"},
+        "UserCreate": user,
+        "UserResponse": user_response,
+        "UserUpdate": {"bio": user["bio"], "skills": user["skills"], "location": "Lagos"},
+        "RelatedUser": {"user_id": "benchuser2", "created_at": user["created_at"]},
+        "RelationPage": {
+            "users": [{"user_id": f"benchuser{i}", "created_at": user["created_at"]} for i in range(50)],
+            "next_cursor": f"{user['created_at']}|65f1c0ffee00000000000004",
+        },
+        "ProjectCreate": {key: value for key, value in project.items() if not key.endswith("_count")},  # counters are set by the server
+        "ProjectUpdate": {"description": "A longer description of the project " * 5, "skills": ["python", "react"], "deadline": "2025-06-01"},
+        "ProjectResponse": project_response,
+        "MessageCreate": {"receiver_id": "benchuser2", "text": "Are you free to pair on the API later today?"},
+        "MessageResponse": conversation["messages"][0],
+        "ConversationResponse": conversation,
+        "Notification": notification,
+        "FriendRequestNotification": {**notification, "sender_id": "benchuser1", "receiver_id": "benchuser2"},
+        "ApplicationCreate": {"project_id": project["_id"]},
+        "ApplicationResponse": {
+            "application_id": "65f1c0ffee00000000000001", "project_id": project["_id"], "applicant_id": "benchuser2",
+            "created_at": project["created_at"],
+        },
+        "FriendRequestCreate": {"recipient_id": "benchuser2"},
+        "FriendRequestResponse": {
+            "id": "65f1c0ffee00000000000002", "sender_id": "benchuser1", "recipient_id": "benchuser2", "created_at": user["created_at"]
+        },
+        "FriendshipResponse": {"user1_id": "benchuser1", "user2_id": "benchuser2", "name": user["name"], "created_at": user["created_at"]},
+        "InvitationCreate": {"project_id": project["_id"], "invitee_id": "benchuser2"},
+        "InvitationResponse": {
+            "invitation_id": "65f1c0ffee00000000000003", "project_id": project["_id"], "inviter_id": "benchuser1",
+            "invitee_id": "benchuser2", "created_at": project["created_at"],
+        },
+    }
+
+
+def operation(model, operation_name: str, payload: dict):
+    """Zero argument callable running one operation of a model on payload"""
+    raw = json.dumps(payload)
+    instance = model.model_validate(payload)
+    return {
+        "construct": lambda: model.model_construct(**payload),
+        "validate": lambda: model.model_validate(payload),
+        "validate_json": lambda: model.model_validate_json(raw),
+        "dump": lambda: instance.model_dump(by_alias=True),
+        "dump_json": lambda: instance.model_dump_json(by_alias=True),
+    }[operation_name]
+
+
+def calibrate(call, target: float) -> int:
+    """No of calls lasting about target seconds"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target / 10:
+            return max(int(number * target / elapsed), 1)
+        number *= 10
+
+
+def measure(call, reference, repeat: int, target: float) -> tuple:
+    """
+    Seconds per call of call and of reference, the best of repeat runs each lasting about target seconds
+
+    The runs of the two alternate, so both are measured under the same load of the machine and their ratio stays stable when the load changes
+    over the benchmark
+
+    """
+    numbers = calibrate(call, target), calibrate(reference, target)
+    best = [float("inf"), float("inf")]
+    for _ in range(repeat):
+        for i, function in enumerate((call, reference)):
+            start = time.perf_counter()
+            for _ in range(numbers[i]):
+                function()
+            best[i] = min(best[i], (time.perf_counter() - start) / numbers[i])
+    return tuple(best)
+
+
+def run(pattern: str, repeat: int, target: float) -> dict:
+    """Time every case matching pattern, returns case -> {"us", "ratio"}"""
+    inputs = payloads()
+    all_models = models()
+    missing = set(all_models) - set(inputs)
+    if missing:
+        raise SystemExit(f"no benchmark payload for {', '.join(sorted(missing))}, add one to payloads()")
+
+    reference = operation(Reference, "validate", inputs["Reference"])
+    results = {}
+    for name, model in sorted(all_models.items()):
+        for operation_name in OPERATIONS:
+            case = f"{name}.{operation_name}"
+            if not re.search(pattern, case):
+                continue
+            seconds, unit = measure(operation(model, operation_name, inputs[name]), reference, repeat, target)
+            results[case] = {"us": seconds * 1e6, "ratio": seconds / unit}
+    return results
+
+
+def check(results: dict, thresholds: dict) -> list:
+    """Cases whose ratio exceeds their threshold by more than the tolerance"""
+    tolerance = thresholds["tolerance"]
+    return [
+        case for case, result in results.items()
+        if case in thresholds["cases"] and result["ratio"] > thresholds["cases"][case] * (1 + tolerance)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--filter", default="", help="regex of the cases to run, e.g User|Conversation.validate")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case, the best is kept")
+    parser.add_argument("--target", type=float, default=0.02, help="seconds per run")
+    parser.add_argument("--tolerance", type=float, help="allowed slowdown over the thresholds, 0.5 is 50%%, defaults to the file's")
+    parser.add_argument("--update", action="store_true", help="write the measured ratios as the new thresholds")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.filter, args.repeat, args.target)
+    thresholds = {"tolerance": 0.5, "cases": {}}
+    if os.path.exists(THRESHOLDS):
+        with open(THRESHOLDS) as thresholds_file:
+            thresholds = json.load(thresholds_file)
+    if args.tolerance is not None:
+        thresholds["tolerance"] = args.tolerance
+
+    failures = check(results, thresholds)
+    print(f"{'case':<40}{'us':>10}{'ratio':>9}{'threshold':>11}")
+    for case, result in results.items():
+        threshold = thresholds["cases"].get(case)
+        flag = "  SLOWER" if case in failures else ""
+        threshold_text = f"{threshold:.2f}" if threshold is not None else "-"
+        print(f"{case:<40}{result['us']:>10.2f}{result['ratio']:>9.2f}{threshold_text:>11}{flag}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if args.update:
+        thresholds["cases"].update({case: round(result["ratio"], 2) for case, result in results.items()})
+        with open(THRESHOLDS, "w") as thresholds_file:
+            json.dump(thresholds, thresholds_file, indent=2, sort_keys=True)
+            thresholds_file.write("\n")
+        print(f"thresholds of {len(results)} cases written to {THRESHOLDS}")
+    elif failures:
+        print(f"{len(failures)} cases slower than their threshold by more than {thresholds['tolerance']:.0%}")
+        sys.exit(1)
@@ -0,0 +1,88 @@
+"""
+Measure the notification polling volume removed by websocket push.
+Replays a workload of clients and notifications twice, once with clients polling GET /notifications/notifications/{user_id} on an interval and once with the notifications pushed through the ConnectionManager to in-memory sockets, then reports request counts, delivery delay and the cost of a push
+
+USAGE:
+    python benchmarks/notification_polling.py --clients 5000 --online 0.6 --interval 30 --rate 2 --duration 3600
+
+MODULES:
+    - argparse: command line args
+    - asyncio: run
+    - random: Random
+    - time: perf_counter
+    - services.connection_manager: ConnectionManager
+
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from services.connection_manager import ConnectionManager  # noqa: E402
+
+
+class MemorySocket:
+    """Stand-in websocket that only keeps the frames it was sent"""
+    def __init__(self):
+        self.frames = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, frame):
+        self.frames.append(frame)
+
+
+async def run(clients: int, online: float, interval: float, rate: float, duration: float, seed: int):
+    """Replay the workload in polling and push modes and print the comparison"""
+    rng = random.Random(seed)
+    n_notifications = int(rate * duration)
+    notification_times = sorted(rng.uniform(0, duration) for _ in range(n_notifications))
+    recipients = [f"user{rng.randrange(clients)}" for _ in range(n_notifications)]
+    connected = {f"user{i}" for i in range(clients) if rng.random() < online}
+
+    # Polling: every client polls every interval, a notification waits for its user's next poll
+    polls = int(clients * duration / interval)
+    offsets = {}  # when in the interval each client polls
+    delays = []
+    useful_polls = set()  # (user_id, poll no) pairs that returned something new
+    for at, user_id in zip(notification_times, recipients):
+        offset = offsets.setdefault(user_id, rng.uniform(0, interval))
+        delay = (offset - at) % interval
+        delays.append(delay)
+        useful_polls.add((user_id, int((at + delay) // interval)))
+    polls_empty = polls - len(useful_polls)
+
+    # Push: connected clients receive frames and stop polling, the others keep polling
+    manager = ConnectionManager()
+    for user_id in connected:
+        await manager.connect(user_id, MemorySocket())
+    start = time.perf_counter()
+    for at, user_id in zip(notification_times, recipients):
+        await manager.send_frame(user_id, "notification", {"content": "benchmark", "created_at": at})
+    push_seconds = time.perf_counter() - start
+    remaining_polls = int((clients - len(connected)) * duration / interval)
+
+    print(f"clients={clients} connected={len(connected)} notifications={n_notifications} over {duration:.0f}s")
+    print(f"polling: {polls} requests ({polls / duration:.1f}/s), {polls_empty} returned nothing new, "
+          f"mean delivery delay {sum(delays) / max(len(delays), 1):.1f}s")
+    print(f"push:    {remaining_polls} requests ({remaining_polls / duration:.1f}/s) from offline clients, "
+          f"{manager.frames_sent['notification']} frames pushed")
+    print(f"removed: {polls - remaining_polls} requests ({(polls - remaining_polls) / max(polls, 1):.0%})")
+    print(f"push cost: {push_seconds / max(n_notifications, 1) * 1e6:.1f}us per notification")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--clients", type=int, default=5000, help="no of clients")
+    parser.add_argument("--online", type=float, default=0.6, help="fraction of clients with a websocket open")
+    parser.add_argument("--interval", type=float, default=30, help="polling interval in seconds")
+    parser.add_argument("--rate", type=float, default=2, help="notifications created per second")
+    parser.add_argument("--duration", type=float, default=3600, help="simulated seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.online, args.interval, args.rate, args.duration, args.seed))
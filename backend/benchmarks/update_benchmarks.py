@@ -0,0 +1,126 @@
+"""
+Benchmarks of user updates on large arrays.
+Updates users whose followers and projects arrays hold --sizes ids (benchmarks/dataset.py documents), the way the profile route does: once
+with every submitted field $set whole, as updates were sent before, and once with the minimal update of repositories.updates. Reports the
+BSON size of the update sent to the server, the time to compile it and the time to apply it to an in-memory collection, for adding a follower,
+removing a project, renaming the user and submitting the profile unchanged
+
+USAGE:
+    python benchmarks/update_benchmarks.py
+    python benchmarks/update_benchmarks.py --sizes 100 10000 --repeat 9
+
+MODULES:
+    - argparse: command line args
+    - asyncio: run
+    - json: --output
+    - time: perf_counter
+    - bson: encode, size of the update on the wire
+    - repositories.memory: MemoryCollection
+    - repositories.updates: compile_update
+    - dataset: realistic users
+
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bson  # noqa: E402
+from repositories.memory import MemoryCollection  # noqa: E402
+from repositories.updates import compile_update  # noqa: E402
+import dataset  # noqa: E402
+
+
+def user(size: int) -> dict:
+    """User document with size followers and size projects"""
+    rng = dataset.shard_rng(0, "updates", size)
+    document = next(dataset.users(range(1), rng, dataset.password_hash(0)))
+    document.update(followers=[f"user{i}" for i in range(size)], projects=[f"project{i}" for i in range(size)])
+    return document
+
+
+def scenarios(document: dict) -> dict:
+    """Profile submissions, name -> fields submitted, as the client sends back the arrays it shows"""
+    return {
+        "add follower": {"followers": document["followers"] + ["user-new"], "projects": document["projects"]},
+        "remove project": {"followers": document["followers"], "projects": document["projects"][1:]},
+        "rename": {"name": "Renamed User", "followers": document["followers"], "projects": document["projects"]},
+        "unchanged": {"name": document["name"], "followers": document["followers"], "projects": document["projects"]},
+    }
+
+
+def best_time(call, repeat: int) -> float:
+    """Fastest of repeat runs of call, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def apply_time(document: dict, update: dict, repeat: int) -> float:
+    """Fastest time to apply update to a fresh copy of document in a MemoryCollection, 0 for an update that is not sent"""
+    if not update:
+        return 0.0
+    best = float("inf")
+    for _ in range(repeat):
+        collection = MemoryCollection("users")
+        asyncio.run(collection.insert_one(dict(document, followers=list(document["followers"]), projects=list(document["projects"]))))
+        start = time.perf_counter()
+        asyncio.run(collection.update_one({"_id": document["_id"]}, update))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: list, repeat: int) -> list:
+    """
+    Measure every scenario on users of every size
+
+    ARGUMENTS:
+        - sizes: list, no of followers and of projects of the user
+        - repeat: int, runs per case, the best is kept
+
+    RETURNS:
+        - list: one dict per case
+
+    """
+    results = []
+    for size in sizes:
+        document = user(size)
+        for name, changes in scenarios(document).items():
+            cases = {
+                "$set whole": (lambda: {"$set": changes}),
+                "minimal": (lambda: compile_update(document, changes)),
+            }
+            for strategy, build in cases.items():
+                update = build()
+                results.append({
+                    "size": size, "scenario": name, "strategy": strategy,
+                    "bytes": len(bson.encode({"u": update})) if update else 0,
+                    "compile_us": best_time(build, repeat) * 1e6,
+                    "apply_us": apply_time(document, update, repeat) * 1e6,
+                })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="followers and projects of the user")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case, the best is kept")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    print(f"{'size':>7}  {'scenario':<16}{'strategy':<12}{'bytes':>10}{'compile us':>12}{'apply us':>10}")
+    for result in results:
+        print(f"{result['size']:>7}  {result['scenario']:<16}{result['strategy']:<12}{result['bytes']:>10}"
+              f"{result['compile_us']:>12.1f}{result['apply_us']:>10.1f}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
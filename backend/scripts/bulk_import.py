@@ -0,0 +1,64 @@
+"""
+Import users or projects from a JSONL file into the database configured in .env.
+Each line of the file is a JSON object: a user with name, email and password, or a project with its fields and created_by, the id or email
+of a user. The file is read a block at a time and imported in chunks, see services.import_services. The report, with the line number and
+error of every row not imported, is printed as JSON or written to --report
+
+USAGE:
+    python scripts/bulk_import.py users partner_users.jsonl
+    python scripts/bulk_import.py projects partner_projects.jsonl --chunk-size 500 --workers 8 --report report.json
+
+MODULES:
+    - argparse: command line args
+    - asyncio: run
+    - json: report
+    - config: IMPORT_CHUNK_SIZE, IMPORT_HASH_WORKERS
+    - services.import_services: ImportServices
+
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from config import (  # noqa: E402
+    IMPORT_CHUNK_SIZE, IMPORT_HASH_WORKERS
+)
+from services.import_services import ImportServices  # noqa: E402
+
+
+async def blocks(path: str, size: int = 1 << 20):
+    """Blocks of size bytes of a file"""
+    with open(path, "rb") as file:
+        while block := file.read(size):
+            yield block
+
+
+async def run(kind: str, path: str, chunk_size: int, workers: int) -> dict:
+    """Import the file and return the report"""
+    services = ImportServices(workers=workers)
+    try:
+        return await services.import_rows(kind, blocks(path), chunk_size)
+    finally:
+        services.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("kind", choices=["users", "projects"], help="what the rows are")
+    parser.add_argument("path", help="JSONL file")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="rows validated, hashed and inserted together")
+    parser.add_argument("--workers", type=int, default=IMPORT_HASH_WORKERS, help="processes hashing passwords")
+    parser.add_argument("--report", help="write the report to this JSON file instead of printing it")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.kind, args.path, args.chunk_size, args.workers))
+    if args.report:
+        with open(args.report, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"{report['inserted']}/{report['rows']} rows imported at {report['rows_per_second']} rows/s, {report['failed']} failed")
+    else:
+        print(json.dumps(report, indent=2))
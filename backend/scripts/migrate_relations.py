@@ -0,0 +1,43 @@
+"""
+Move the relation arrays of the user documents into the edge collections.
+Users written before the friendships, follows and collaborations collections held their relations in friends, followers, following, collabees
+and projects arrays. This creates the edges of those arrays in the database configured in .env, sets the relation counters of each user from
+the edges and removes the arrays. It can be run again, or while the app serves requests: edges are upserted and counters recounted
+
+USAGE:
+    python scripts/migrate_relations.py
+    python scripts/migrate_relations.py --batch-size 200
+
+MODULES:
+    - argparse: command line args
+    - asyncio: run
+    - time: perf_counter
+    - services.relation_services: RelationServices
+    - repositories.registry: ensure_indexes
+
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from services.relation_services import RelationServices  # noqa: E402
+from repositories import registry  # noqa: E402
+
+
+async def run(batch_size: int):
+    """Create the indexes of the edge collections, then migrate every user still holding relation arrays"""
+    await registry.ensure_indexes()
+    start = time.perf_counter()
+    migrated = await RelationServices().migrate_embedded(batch_size)
+    print(f"users migrated: {migrated} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--batch-size", type=int, default=500, help="users read at a time")
+    args = parser.parse_args()
+    asyncio.run(run(args.batch_size))
@@ -0,0 +1,42 @@
+"""
+Recount the denormalized counters of users and projects and repair the ones that drifted.
+The app runs the same reconciliation every COUNTER_RECONCILE_INTERVAL seconds; this runs it once against the database configured in .env, e.g
+after a restore or to backfill the counters of documents written before they existed. It is safe while the app serves requests: a counter
+moved during the run is left for the next one
+
+USAGE:
+    python scripts/reconcile_counters.py
+    python scripts/reconcile_counters.py --batch-size 200
+
+MODULES:
+    - argparse: command line args
+    - asyncio: run
+    - time: perf_counter
+    - services.counter_services: CounterServices
+
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from services.counter_services import CounterServices  # noqa: E402
+
+
+async def run(batch_size: int):
+    """Reconcile every counted collection and print the documents repaired in each"""
+    start = time.perf_counter()
+    repaired = await CounterServices().reconcile(batch_size)
+    for collection, count in repaired.items():
+        print(f"{collection}: {count} documents repaired")
+    print(f"done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--batch-size", type=int, default=500, help="documents checked per query")
+    args = parser.parse_args()
+    asyncio.run(run(args.batch_size))
@@ -0,0 +1,12 @@
+import time
+from app.models.projects import ProjectCreate, ProjectUpdate
+
+
+def test_project_timestamps_are_per_instance():
+    """created_at and updated_at are taken when each model is built"""
+    first = ProjectCreate(title="My new project", description="very important project")
+    time.sleep(0.001)
+    second = ProjectCreate(title="My new project", description="very important project")
+
+    assert second.created_at > first.created_at
+    assert ProjectUpdate().updated_at > first.created_at
@@ -0,0 +1,11 @@
+from datetime import datetime
+from app.models.users import UserCreate
+
+
+def test_user_create_timestamps_are_per_instance():
+    """created_at/updated_at default to the time the user is created, not the time the module was imported"""
+    before = datetime.now().isoformat()
+    user = UserCreate(name="John Doe", email="jdoe@example.com", password="jdoepassword")
+
+    assert user.created_at >= before
+    assert user.updated_at >= before
@@ -0,0 +1,62 @@
+"""
+Tests for the admin profiling routes
+
+MODULES:
+    - fastapi: FastAPI, TestClient
+    - app.routes.admin_routes: admin_router
+
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routes import admin_routes
+
+
+app = FastAPI()
+app.include_router(admin_routes.admin_router, prefix="/admin")
+client = TestClient(app)
+headers = {"Authorization": "Bearer token"}
+
+
+def as_user(monkeypatch, user_id):
+    """Make every token decode to user_id and only admit useradmin"""
+    monkeypatch.setattr(admin_routes, "verify_access_token", lambda token: {"sub": user_id})
+    monkeypatch.setattr(admin_routes, "ADMIN_USER_IDS", ["useradmin"])
+
+
+def test_profiling_is_admin_only(monkeypatch):
+    """Non admins are refused"""
+    as_user(monkeypatch, "userx")
+    response = client.get("/admin/profile/tasks", headers=headers)
+
+    assert response.status_code == 403
+    assert response.json()["detail"]["code"] == "FORBIDDEN"
+
+
+def test_cpu_profile_returns_collapsed_stacks(monkeypatch):
+    """Each line of the profile is a ; separated stack followed by its sample count"""
+    as_user(monkeypatch, "useradmin")
+    response = client.get("/admin/profile/cpu", params={"seconds": 0.2, "interval": 0.01}, headers=headers)
+
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert ";" in stack and int(count) > 0
+
+
+def test_memory_snapshots_diff(monkeypatch):
+    """Snapshots need tracing to be started and are diffed against the previous one"""
+    as_user(monkeypatch, "useradmin")
+    assert client.post("/admin/profile/memory/snapshot", headers=headers).status_code == 409
+
+    client.post("/admin/profile/memory/start", headers=headers)
+    try:
+        client.post("/admin/profile/memory/snapshot", headers=headers)
+        retained = [bytearray(1024) for _ in range(1000)]
+        diff = client.post("/admin/profile/memory/snapshot", params={"top": 5}, headers=headers).json()
+    finally:
+        client.post("/admin/profile/memory/stop", headers=headers)
+
+    assert len(diff) == 5
+    assert max(line["size_diff"] for line in diff) >= 1000 * 1024
+    assert retained
@@ -0,0 +1,69 @@
+"""
+Tests for the NDJSON export routes
+
+MODULES:
+    - json: loads
+    - asyncio: run
+    - bson: ObjectId
+    - fastapi: FastAPI, TestClient
+    - app.repositories: MemoryRepository
+    - app.routes: export_routes
+    - app.services.export_services: ExportServices
+
+"""
+import json
+import asyncio
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.repositories.memory import MemoryRepository
+from app.routes import export_routes
+from app.services.export_services import ExportServices
+
+
+headers = {"Authorization": "Bearer token"}
+
+
+def client(monkeypatch) -> TestClient:
+    """Client of an app serving the exports of 5 users and 3 applications, as an admin"""
+    users, applications = MemoryRepository("users"), MemoryRepository("applications")
+    asyncio.run(users.collection.insert_many([
+        {"_id": f"user{i}", "name": f"User {i}", "password": "hash", "skills": ["python"]} for i in range(5)
+    ]))
+    asyncio.run(applications.collection.insert_many([{"project_id": "project1", "status": "pending"} for _ in range(3)]))
+    monkeypatch.setattr(export_routes, "export_services", ExportServices({"users": users, "applications": applications}))
+
+    app = FastAPI()
+    app.include_router(export_routes.export_router, prefix="/admin/exports")
+    app.dependency_overrides[export_routes.require_admin] = lambda: "useradmin"
+    return TestClient(app)
+
+
+def test_export_streams_one_document_per_line_without_passwords(monkeypatch):
+    """Every user is a line of JSON in _id order, the password is left out even when asked for"""
+    test_client = client(monkeypatch)
+
+    response = test_client.get("/admin/exports/users", headers=headers)
+    projected = test_client.get("/admin/exports/users", params={"fields": "name,password"}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    users = [json.loads(line) for line in response.text.splitlines()]
+    assert [user["_id"] for user in users] == [f"user{i}" for i in range(5)]
+    assert all("password" not in user for user in users)
+    assert json.loads(projected.text.splitlines()[0]) == {"_id": "user0", "name": "User 0"}
+
+
+def test_export_resumes_after_the_last_id_received(monkeypatch):
+    """The _id of the last line received, as written, resumes the export right after it, ObjectIds included"""
+    test_client = client(monkeypatch)
+
+    users = test_client.get("/admin/exports/users", params={"after": '"user2"'}, headers=headers)
+    applications = test_client.get("/admin/exports/applications", headers=headers).text.splitlines()
+    last = json.dumps(json.loads(applications[0])["_id"])
+    resumed = test_client.get("/admin/exports/applications", params={"after": last}, headers=headers).text.splitlines()
+
+    assert [json.loads(line)["_id"] for line in users.text.splitlines()] == ["user3", "user4"]
+    assert ObjectId.is_valid(json.loads(applications[0])["_id"]["$oid"])
+    assert resumed == applications[1:]
+    assert test_client.get("/admin/exports/users", params={"after": "{not json"}, headers=headers).status_code == 400
@@ -0,0 +1,35 @@
+"""
+Tests for the messaging routes
+
+MODULES:
+    - unittest.mock: AsyncMock
+    - pytest: raises
+    - fastapi: FastAPI, TestClient
+    - app.routes: message_routes
+
+"""
+from unittest.mock import AsyncMock
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routes import message_routes
+
+
+app = FastAPI()
+app.include_router(message_routes.message_router, prefix="/ws/messages")
+client = TestClient(app)
+
+
+def test_websocket_is_disconnected_on_an_unexpected_error(monkeypatch):
+    """A frame the service fails on still unregisters the session, as a client disconnect does"""
+    monkeypatch.setattr(message_routes, "verify_access_token", lambda token: {"sub": "user1"})
+    service = AsyncMock()
+    service.receive_message.side_effect = TypeError("bad frame")
+    monkeypatch.setattr(message_routes, "messaging_service", service)
+
+    with pytest.raises(TypeError):
+        with client.websocket_connect("/ws/messages/?token=token") as websocket:
+            websocket.receive_json()
+
+    service.disconnect.assert_awaited_once()
+    assert service.disconnect.await_args.args[0] == "user1"
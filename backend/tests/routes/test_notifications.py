@@ -0,0 +1,29 @@
+"""
+Tests for the notification routes
+
+MODULES:
+    - unittest.mock: AsyncMock
+    - fastapi: FastAPI, TestClient
+    - app.routes: notifications
+    - app.services.notification_service: NotificationService
+
+"""
+from unittest.mock import AsyncMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routes import notifications
+from app.services.notification_service import NotificationService
+
+
+app = FastAPI()
+app.include_router(notifications.router)
+app.dependency_overrides[notifications.get_notification_service] = lambda: NotificationService(AsyncMock(), AsyncMock())
+client = TestClient(app)
+
+
+def test_malformed_cursor_is_a_bad_request():
+    """A cursor that was not returned by a previous page gets a 400 rather than a 500"""
+    response = client.get("/notifications/user1", params={"cursor": "2025-01-01T00:00:00|not-an-id"})
+
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()["detail"]
@@ -0,0 +1,145 @@
+"""
+Tests for the project routes
+
+MODULES:
+    - asyncio: run
+    - fastapi: FastAPI, TestClient
+    - unittest.mock: AsyncMock, MagicMock
+    - app.models.projects: ProjectResponse
+    - app.repositories: CONFLICT, MemoryRepository
+    - app.routes.project_routes: project_router
+    - app.services.project_services: ProjectServices
+
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.models.projects import ProjectResponse
+from app.repositories.base import CONFLICT
+from app.repositories.memory import MemoryRepository
+from app.routes import project_routes
+from app.services.project_services import ProjectServices
+
+
+app = FastAPI()
+app.include_router(project_routes.project_router, prefix="/projects")
+client = TestClient(app)
+headers = {"Authorization": "Bearer token"}
+
+
+def project(description: str) -> ProjectResponse:
+    """Project as returned by ProjectServices.get_project_by_id"""
+    return ProjectResponse(
+        project_id="project1", title="My new project", description=description, created_at="2025-01-01T00:00:00",
+        created_by="user1", updated_at=None, deadline=None, type=None, tags=["#creative"], collaborators=[], followers=[],
+        location=None,
+    )
+
+
+def test_get_project_revalidates_with_etag(monkeypatch):
+    """A client sending back the ETag of an unchanged project gets an empty 304, a changed project is sent with a new tag"""
+    monkeypatch.setattr(project_routes, "verify_access_token", lambda token: {"sub": "user1"})
+    get_project = AsyncMock(return_value=project("very important project"))
+    monkeypatch.setattr(project_routes.project_services, "get_project_by_id", get_project)
+
+    first = client.get("/projects/project1", headers=headers)
+    etag = first.headers["etag"]
+    unchanged = client.get("/projects/project1", headers={**headers, "If-None-Match": etag})
+    get_project.return_value = project("an even more important project")
+    changed = client.get("/projects/project1", headers={**headers, "If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert first.json()["project_id"] == "project1"
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["etag"] == etag
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_update_project_with_a_stale_etag_conflicts(monkeypatch):
+    """An update sent with the ETag of an older version gets a 409, one with the current tag gets the new tag"""
+    monkeypatch.setattr(project_routes, "verify_access_token", lambda token: {"sub": "user1"})
+    updated = project("very important project").model_copy(update={"version": 4})
+    monkeypatch.setattr(project_routes.project_services, "get_project_by_id", AsyncMock(return_value=updated))
+    update_project = AsyncMock(return_value=(CONFLICT, 0))
+    monkeypatch.setattr(project_routes.project_services, "update_project", update_project)
+
+    stale = client.put("/projects/project1", json={"title": "Renamed project"}, headers={**headers, "If-Match": '"v2"'})
+    update_project.return_value = (4, 1)
+    current = client.put("/projects/project1", json={"title": "Renamed project"}, headers={**headers, "If-Match": 'W/"v3"'})
+    foreign = client.put("/projects/project1", json={"title": "Renamed project"}, headers={**headers, "If-Match": '"1f2e"'})
+
+    assert stale.status_code == 409
+    assert stale.json()["detail"]["code"] == "CONFLICT"
+    assert update_project.call_args_list[0].args[2] == 2
+    assert current.status_code == 200
+    assert current.json()["version"] == 4
+    assert current.json()["fields_updated"] == 1
+    assert current.headers["etag"].startswith('"v4.')
+    assert update_project.call_args_list[1].args[2] == 3
+    assert foreign.status_code == 412
+
+
+def test_update_project_without_version_changing_nothing(monkeypatch):
+    """A PUT changing nothing on a project written before versions succeeds with version 0, without If-Match or with "v0" """
+    monkeypatch.setattr(project_routes, "verify_access_token", lambda token: {"sub": "user1"})
+    projects = MemoryRepository("projects")
+    asyncio.run(projects.collection.insert_one({
+        "_id": "project1", "title": "My new project", "created_at": "2025-01-01T00:00:00", "created_by": "user1",
+    }))
+    monkeypatch.setattr(project_routes, "project_services", ProjectServices(projects))
+
+    unconditional = client.put("/projects/project1", json={"title": "My new project"}, headers=headers)
+    conditional = client.put("/projects/project1", json={}, headers={**headers, "If-Match": '"v0"'})
+    etag = client.get("/projects/project1", headers=headers).headers["etag"]
+
+    for response in (unconditional, conditional):
+        assert response.status_code == 200
+        assert response.json()["version"] == 0
+        assert response.json()["fields_updated"] == 0
+        assert response.headers["etag"] == etag
+
+
+def test_follow_keeps_the_version_an_editor_holds(monkeypatch):
+    """A follow between reading and saving a project does not conflict with the save, but a revalidating GET sees the new count"""
+    monkeypatch.setattr(project_routes, "verify_access_token", lambda token: {"sub": "user2"})
+    projects = MemoryRepository("projects")
+    asyncio.run(projects.collection.insert_one({
+        "_id": "project1", "title": "My new project", "created_at": "2025-01-01T00:00:00", "created_by": "user1", "followers": [],
+        "followers_count": 0, "version": 3,
+    }))
+    monkeypatch.setattr(project_routes, "project_services", ProjectServices(projects))
+
+    etag = client.get("/projects/project1", headers=headers).headers["etag"]
+    followed = client.put("/projects/project1/follow", headers=headers)
+    revalidated = client.get("/projects/project1", headers={**headers, "If-None-Match": etag})
+    saved = client.put("/projects/project1", json={"title": "Renamed project"}, headers={**headers, "If-Match": etag})
+
+    assert etag.startswith('"v3.')
+    assert followed.status_code == 200
+    assert revalidated.status_code == 200
+    assert revalidated.json()["followers_count"] == 1
+    assert saved.status_code == 200
+    assert saved.json()["version"] == 4
+
+
+def test_update_project_is_tagged_as_the_next_get(monkeypatch):
+    """The ETag of a PUT is the one the next GET of the project gets, counters included, so it revalidates to a 304"""
+    monkeypatch.setattr(project_routes, "verify_access_token", lambda token: {"sub": "user1"})
+    projects = MemoryRepository("projects")
+    asyncio.run(projects.collection.insert_one({
+        "_id": "project1", "title": "My new project", "created_at": "2025-01-01T00:00:00", "created_by": "user1", "followers": [],
+        "followers_count": 2, "version": 3,
+    }))
+    monkeypatch.setattr(project_routes, "project_services", ProjectServices(projects))
+    monkeypatch.setattr(project_routes, "notification_fanout", MagicMock())
+
+    saved = client.put("/projects/project1", json={"title": "Renamed project"}, headers=headers)
+    revalidated = client.get("/projects/project1", headers={**headers, "If-None-Match": saved.headers["etag"]})
+
+    assert saved.json()["version"] == 4
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == saved.headers["etag"]
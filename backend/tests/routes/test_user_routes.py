@@ -0,0 +1,62 @@
+"""
+Tests for the user routes
+
+MODULES:
+    - asyncio: run
+    - fastapi: FastAPI, TestClient
+    - app.repositories: MemoryRepository
+    - app.routes.user_routes: user_router
+    - app.services.user_services: UserServices
+
+"""
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.repositories.memory import MemoryRepository
+from app.routes import user_routes
+from app.services.user_services import UserServices
+
+
+app = FastAPI()
+app.include_router(user_routes.user_router, prefix="/users")
+client = TestClient(app)
+headers = {"Authorization": "Bearer token"}
+
+
+def test_update_profile_without_version_changing_nothing(monkeypatch):
+    """A PUT changing nothing on a user written before versions succeeds with version 0, without If-Match or with "v0" """
+    monkeypatch.setattr(user_routes, "verify_access_token", lambda token: {"sub": "user1"})
+    users = MemoryRepository("users")
+    asyncio.run(users.collection.insert_one({
+        "_id": "user1", "name": "Ada", "email": "ada@example.com", "created_at": "2025-01-01T00:00:00",
+    }))
+    monkeypatch.setattr(user_routes, "user_services", UserServices(users))
+
+    unconditional = client.put("/users/profile/user1", json={"name": "Ada"}, headers=headers)
+    conditional = client.put("/users/profile/user1", json={}, headers={**headers, "If-Match": '"v0"'})
+    stale = client.put("/users/profile/user1", json={"name": "Grace"}, headers={**headers, "If-Match": '"v3"'})
+    etag = client.get("/users/profile/user1", headers=headers).headers["etag"]
+
+    for response in (unconditional, conditional):
+        assert response.status_code == 200
+        assert response.json()["version"] == 0
+        assert response.json()["fields_updated"] == 0
+        assert response.headers["etag"] == etag
+    assert stale.status_code == 409
+
+
+def test_update_profile_is_tagged_as_the_next_get(monkeypatch):
+    """The ETag of a PUT is the one the next GET of the profile gets, counters included, so it revalidates to a 304"""
+    monkeypatch.setattr(user_routes, "verify_access_token", lambda token: {"sub": "user1"})
+    users = MemoryRepository("users")
+    asyncio.run(users.collection.insert_one({
+        "_id": "user1", "name": "Ada", "email": "ada@example.com", "created_at": "2025-01-01T00:00:00", "followers_count": 5, "version": 2,
+    }))
+    monkeypatch.setattr(user_routes, "user_services", UserServices(users))
+
+    saved = client.put("/users/profile/user1", json={"name": "Grace"}, headers=headers)
+    revalidated = client.get("/users/profile/user1", headers={**headers, "If-None-Match": saved.headers["etag"]})
+
+    assert saved.json()["version"] == 3
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == saved.headers["etag"]
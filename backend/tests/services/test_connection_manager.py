@@ -0,0 +1,55 @@
+"""
+Tests for the websocket connection registry
+
+MODULES:
+    - asyncio: run
+    - unittest.mock: AsyncMock
+    - app.services.connection_manager: ConnectionManager
+
+"""
+import asyncio
+from unittest.mock import AsyncMock
+from app.services.connection_manager import ConnectionManager
+
+
+def test_send_frame_to_online_user():
+    """Frames are wrapped with their type and counted"""
+    manager = ConnectionManager()
+    websocket = AsyncMock()
+    asyncio.run(manager.connect("user1", websocket))
+
+    assert asyncio.run(manager.send_frame("user1", "notification", {"content": "hi"}))
+    websocket.send_json.assert_awaited_once_with({"type": "notification", "data": {"content": "hi"}})
+    assert manager.frames_sent["notification"] == 1
+    assert not asyncio.run(manager.send_frame("user2", "chat", {}))
+
+
+def test_dead_socket_is_dropped():
+    """A socket that fails on send is removed from the registry"""
+    manager = ConnectionManager()
+    websocket = AsyncMock()
+    websocket.send_json.side_effect = RuntimeError("closed")
+    asyncio.run(manager.connect("user1", websocket))
+
+    assert not asyncio.run(manager.send_frame("user1", "chat", {}))
+    assert not manager.is_online("user1")
+
+
+def test_disconnect_keeps_newer_connection():
+    """Closing an old socket does not unregister the user's newer one"""
+    manager = ConnectionManager()
+    old, new = AsyncMock(), AsyncMock()
+    asyncio.run(manager.connect("user1", old))
+    asyncio.run(manager.connect("user1", new))
+
+    manager.disconnect("user1", old)
+    assert manager.active_connections["user1"] is new
+
+
+def test_record_poll():
+    """Polls are split by whether the user had a socket open"""
+    manager = ConnectionManager()
+    asyncio.run(manager.connect("user1", AsyncMock()))
+    manager.record_poll("user1")
+    manager.record_poll("user2")
+    assert manager.polls == {"online": 1, "offline": 1}
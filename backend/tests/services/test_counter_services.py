@@ -0,0 +1,94 @@
+"""
+Tests for the denormalized counters and their reconciliation
+
+MODULES:
+    - asyncio: run
+    - app.repositories: MemoryRepository
+    - app.services.counter_services: CounterServices
+    - app.services.project_services: ProjectServices
+    - app.services.application_services: ApplicationServices
+
+"""
+import asyncio
+from app.repositories.memory import MemoryRepository
+from app.services.counter_services import CounterServices
+from app.services.project_services import ProjectServices
+from app.services.application_services import ApplicationServices
+
+
+def memory_counters() -> tuple:
+    """CounterServices over empty in-memory collections, and the collections by name"""
+    repositories = {name: MemoryRepository(name) for name in (
+        "users", "projects", "friendships", "follows", "collaborations", "applications", "invitations"
+    )}
+    return CounterServices(**repositories), repositories
+
+
+def test_project_counters_move_with_their_writes():
+    """Following twice counts once, unfollowing uncounts, an application is counted on its project"""
+    projects, applications = MemoryRepository("projects"), MemoryRepository("applications")
+    project_services, application_services = ProjectServices(projects), ApplicationServices(applications, projects)
+
+    async def writes():
+        await projects.collection.insert_one({"_id": "project1", "followers": [], "followers_count": 0, "applications_count": 0})
+        first = await project_services.follow_project("project1", "user1")
+        again = await project_services.follow_project("project1", "user1")
+        await project_services.follow_project("project1", "user2")
+        await project_services.unfollow_project("project1", "user2")
+        await application_services.submit_application({"project_id": "project1", "applicant_id": "user3"})
+        missing = await project_services.follow_project("project2", "user1")
+        return first, again, missing, await projects.collection.find_one({"_id": "project1"})
+
+    first, again, missing, project = asyncio.run(writes())
+
+    assert (first, again, missing) == (True, False, None)
+    assert project["followers"] == ["user1"]
+    assert (project["followers_count"], project["applications_count"]) == (1, 1)
+
+
+def test_reconciliation_repairs_drifted_counters():
+    """Counters off their recount, or never written, are set from the counted collections; correct ones are left alone"""
+    services, repositories = memory_counters()
+    users, projects = repositories["users"], repositories["projects"]
+
+    async def reconcile():
+        await users.collection.insert_many([
+            {"_id": "user1", "followers_count": 5, "following_count": 0, "friends_count": 1, "collabees_count": 0, "projects_count": 1},
+            {"_id": "user2", "followers_count": 0, "following_count": 1, "friends_count": 1, "collabees_count": 0, "projects_count": 0},
+        ])
+        await projects.collection.insert_one({"_id": "project1", "created_by": "user1", "followers": ["user2"], "collaborators": []})
+        await repositories["follows"].collection.insert_one({"follower_id": "user2", "followee_id": "user1"})
+        await repositories["friendships"].collection.insert_one({"user1_id": "user1", "user2_id": "user2"})
+        repaired = await services.reconcile(batch_size=1)
+        return repaired, await users.collection.find_one({"_id": "user1"}), await projects.collection.find_one({"_id": "project1"})
+
+    repaired, user, project = asyncio.run(reconcile())
+
+    assert repaired == {"users": 1, "projects": 1}
+    assert user["followers_count"] == 1 and "version" not in user  # repairs leave the version to the edits
+    assert (project["followers_count"], project["collaborators_count"], project["applications_count"]) == (1, 0, 0)
+
+
+def test_reconciliation_leaves_counters_moved_during_the_run():
+    """A repair is conditional on the counter read, so an increment that got in first is not overwritten"""
+    services, repositories = memory_counters()
+    users = repositories["users"]
+
+    async def reconcile():
+        await users.collection.insert_one({"_id": "user1", "followers_count": 3})
+        find = users.collection.find
+
+        def find_then_increment(query, *args, **kwargs):  # a follow lands between the read of the first batch and its repair
+            cursor = find(query, *args, **kwargs)
+            if not query:
+                cursor._evaluate()
+                users.collection.documents["user1"]["followers_count"] += 1
+            return cursor
+
+        users.collection.find = find_then_increment
+        return await services.reconcile_collection(users), await users.collection.find_one({"_id": "user1"})
+
+    repaired, user = asyncio.run(reconcile())
+
+    assert repaired == 0
+    assert user["followers_count"] == 4
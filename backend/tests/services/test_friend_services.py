@@ -0,0 +1,101 @@
+"""
+Tests for the friend services
+
+MODULES:
+    - asyncio: run
+    - unittest.mock: AsyncMock
+    - bson: ObjectId
+    - pymongo.errors: DuplicateKeyError
+    - app.services.friend_services: FriendServices
+    - app.repositories: Repository, MemoryRepository, friendship indexes
+
+"""
+import asyncio
+from unittest.mock import AsyncMock
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.services.friend_services import FriendServices
+from app.repositories.base import Repository
+from app.repositories.memory import MemoryRepository
+from app.repositories.registry import friendships as friendships_repository
+
+
+request_id = str(ObjectId())
+
+
+def mock_services(requests, friendships):
+    """FriendServices over the given mock collections"""
+    return FriendServices(
+        Repository("friend_requests").bind(requests), Repository("friendships").bind(friendships), Repository("users").bind(AsyncMock())
+    )
+
+
+def test_accept_pending_request():
+    """Accepting a pending request upserts one friendship on the ordered pair of ids"""
+    requests, friendships = AsyncMock(), AsyncMock()
+    requests.find_one_and_update.return_value = {"sender_id": "userb", "recipient_id": "usera", "status": "accepted"}
+
+    updated = asyncio.run(mock_services(requests, friendships).update_friend_request_status(request_id, "accepted"))
+
+    assert updated == 1
+    query = requests.find_one_and_update.call_args.args[0]
+    assert query["status"] == "pending"
+    friendships.update_one.assert_awaited_once()
+    assert friendships.update_one.call_args.args[0] == {"user1_id": "usera", "user2_id": "userb"}
+    assert friendships.update_one.call_args.kwargs["upsert"] is True
+
+
+def test_accept_already_accepted_request_is_idempotent():
+    """A second accept succeeds without failing on the existing friendship"""
+    requests, friendships = AsyncMock(), AsyncMock()
+    requests.find_one_and_update.return_value = None
+    requests.find_one.return_value = {"sender_id": "usera", "recipient_id": "userb", "status": "accepted"}
+    friendships.update_one.side_effect = DuplicateKeyError("E11000")
+
+    updated = asyncio.run(mock_services(requests, friendships).update_friend_request_status(request_id, "accepted"))
+
+    assert updated == 1
+
+
+def test_accept_rejected_request():
+    """A request that was rejected cannot be accepted afterwards"""
+    requests, friendships = AsyncMock(), AsyncMock()
+    requests.find_one_and_update.return_value = None
+    requests.find_one.return_value = {"sender_id": "usera", "recipient_id": "userb", "status": "rejected"}
+
+    updated = asyncio.run(mock_services(requests, friendships).update_friend_request_status(request_id, "accepted"))
+
+    assert updated == 0
+    friendships.update_one.assert_not_awaited()
+
+
+def test_update_missing_request():
+    """Unknown and invalid request ids return None"""
+    requests, friendships = AsyncMock(), AsyncMock()
+    requests.find_one_and_update.return_value = None
+    requests.find_one.return_value = None
+
+    service = mock_services(requests, friendships)
+    assert asyncio.run(service.update_friend_request_status(request_id, "rejected")) is None
+    assert asyncio.run(service.update_friend_request_status("notanid", "rejected")) is None
+
+
+def test_concurrent_accepts_create_one_friendship():
+    """Concurrent accepts of one request all succeed and leave a single friendship, counted once for each user"""
+    requests = MemoryRepository("friend_requests")
+    friendships = MemoryRepository("friendships", friendships_repository.indexes)
+    users = MemoryRepository("users")
+    service = FriendServices(requests, friendships, users)
+
+    async def accept_concurrently():
+        await friendships.ensure_indexes()
+        await users.collection.insert_many([{"_id": "usera", "friends_count": 0}, {"_id": "userb", "friends_count": 0}])
+        insertion = await requests.collection.insert_one({"sender_id": "userb", "recipient_id": "usera", "status": "pending"})
+        return await asyncio.gather(*(
+            service.update_friend_request_status(str(insertion.inserted_id), "accepted") for _ in range(5)
+        ))
+
+    assert asyncio.run(accept_concurrently()) == [1] * 5
+    assert list(friendships.collection.documents.values())[0]["user1_id"] == "usera"
+    assert len(friendships.collection.documents) == 1
+    assert [user["friends_count"] for user in users.collection.documents.values()] == [1, 1]
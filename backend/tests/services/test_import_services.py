@@ -0,0 +1,78 @@
+"""
+Tests for the bulk imports
+
+MODULES:
+    - asyncio: run
+    - app.repositories: MemoryRepository
+    - app.services.import_services: ImportServices, iter_lines
+    - app.utils.auth.password_utils: verify_password
+
+"""
+import asyncio
+from app.repositories.memory import MemoryRepository
+from app.services.import_services import ImportServices, iter_lines
+from app.utils.auth.password_utils import verify_password
+
+
+async def body(*chunks: bytes):
+    """Stream of the given chunks, like a request body"""
+    for chunk in chunks:
+        yield chunk
+
+
+def test_lines_are_numbered_across_chunks():
+    """Lines cut between chunks are joined, blank lines are skipped but counted"""
+    async def lines():
+        return [row async for row in iter_lines(body(b'{"a": 1}\n\n{"b"', b': 2}\n{"c": 3}'))]
+
+    assert asyncio.run(lines()) == [(1, b'{"a": 1}'), (3, b'{"b": 2}'), (4, b'{"c": 3}')]
+
+
+def test_users_are_imported_with_a_report_of_the_rows_refused():
+    """Valid users are hashed and inserted, invalid rows and emails already stored or repeated in the file are reported by line"""
+    users = MemoryRepository("users")
+    services = ImportServices(users, MemoryRepository("projects"), workers=1)
+
+    async def run():
+        await users.collection.insert_one({"_id": "user0", "email": "taken@example.com"})
+        return await services.import_rows("users", body(
+            b'{"name": "Ada", "email": "ada@example.com", "password": "password1"}\n'
+            b'{"name": "Taken", "email": "taken@example.com", "password": "password1"}\n'
+            b'{"name": "Short", "email": "short@example.com", "password": "short"}\n'
+            b'not json\n'
+            b'{"name": "Ada again", "email": "ada@example.com", "password": "password1"}\n'
+            b'{"name": "Bob", "email": "bob@example.com", "password": "password2"}\n'
+        ), chunk_size=2)
+
+    try:
+        report = asyncio.run(run())
+    finally:
+        services.close()
+
+    assert (report["rows"], report["inserted"], report["failed"]) == (6, 2, 4)
+    assert [error["line"] for error in report["errors"]] == [2, 3, 4, 5]
+    assert report["errors"][0]["error"] == "User already exists"
+    assert report["errors"][1]["error"].startswith("password")
+    bob = next(user for user in users.collection.documents.values() if user["email"] == "bob@example.com")
+    assert verify_password("password2", bob["password"]) and bob["version"] == 1
+
+
+def test_projects_are_imported_for_users_by_email_or_id():
+    """created_by is resolved from an email or an id, the creators projects_count counts the projects imported"""
+    users, projects = MemoryRepository("users"), MemoryRepository("projects")
+    services = ImportServices(users, projects, workers=1)
+
+    async def run():
+        await users.collection.insert_one({"_id": "user1", "email": "ada@example.com", "projects_count": 0})
+        report = await services.import_rows("projects", body(
+            b'{"title": "First project", "description": "one", "created_by": "ada@example.com"}\n'
+            b'{"title": "Second project", "description": "two", "created_by": "user1"}\n'
+            b'{"title": "Orphan project", "description": "three", "created_by": "nobody@example.com"}\n'
+        ))
+        return report, await users.collection.find_one({"_id": "user1"})
+
+    report, user = asyncio.run(run())
+
+    assert (report["inserted"], [error["line"] for error in report["errors"]]) == (2, [3])
+    assert {project["created_by"] for project in projects.collection.documents.values()} == {"user1"}
+    assert user["projects_count"] == 2
@@ -0,0 +1,32 @@
+"""
+Tests for the invitation services
+
+MODULES:
+    - asyncio: run
+    - app.repositories: MemoryRepository
+    - app.services.invitation_services: InvitationServices
+
+"""
+import asyncio
+from app.repositories.memory import MemoryRepository
+from app.services.invitation_services import InvitationServices
+
+
+def test_an_invitation_is_answered_once():
+    """The first answer is stored as a plain status, later answers change nothing and report the invitation as answered"""
+    invitations, projects = MemoryRepository("invitations"), MemoryRepository("projects")
+    services = InvitationServices(invitations, projects)
+
+    async def answer():
+        await projects.collection.insert_one({"_id": "project1", "invitations_count": 0})
+        invitation_id = await services.send_invitation({"project_id": "project1", "inviter_id": "user1", "invitee_id": "user2"})
+        answers = [
+            await services.update_invitation_status(invitation_id, status) for status in ("accepted", "rejected", "accepted")
+        ]
+        missing = await services.update_invitation_status("0" * 24, "accepted")
+        return answers, missing, await services.get_invitation_by_id(invitation_id)
+
+    answers, missing, invitation = asyncio.run(answer())
+
+    assert (answers, missing) == ([1, 0, 0], None)
+    assert invitation["status"] == "accepted"
@@ -0,0 +1,48 @@
+"""
+Tests for the messaging service
+
+MODULES:
+    - asyncio: run
+    - unittest.mock: AsyncMock, MagicMock
+    - app.services.messaging_service: MessagingService, websocket_messages
+    - app.services.connection_manager: ConnectionManager
+    - app.repositories.base: Repository
+
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+from app.services.messaging_service import MessagingService, websocket_messages
+from app.services.connection_manager import ConnectionManager
+from app.repositories.base import Repository
+
+
+def test_send_message_pushes_chat_frame():
+    """A message to a connected user is stored as delivered and pushed as a chat frame"""
+    manager = ConnectionManager()
+    websocket = AsyncMock()
+    asyncio.run(manager.connect("user2", websocket))
+    collection = AsyncMock()
+    collection.update_one.return_value = MagicMock(matched_count=1, modified_count=1)
+
+    pushed = websocket_messages.values.get(("pushed",), 0)
+    message = {"receiver_id": "user2", "text": "hi", "timestamp": "2025-01-01T00:00:00"}
+    asyncio.run(MessagingService(manager, Repository("conversations").bind(collection)).send_message(message, "user1"))
+
+    frame = websocket.send_json.call_args.args[0]
+    assert frame["type"] == "chat"
+    assert frame["data"]["sender_id"] == "user1"
+    assert frame["data"]["status"] == "delivered"
+    assert websocket_messages.values[("pushed",)] == pushed + 1
+
+
+def test_receive_message_skips_other_frames():
+    """Typed frames other than chat are skipped and chat frames are unwrapped"""
+    websocket = AsyncMock()
+    websocket.receive_json.side_effect = [
+        {"type": "presence", "data": {}},
+        {"type": "chat", "data": {"receiver_id": "user2", "text": "hi"}},
+    ]
+
+    message = asyncio.run(MessagingService(ConnectionManager()).receive_message(websocket))
+    assert message["text"] == "hi"
+    assert "timestamp" in message
@@ -0,0 +1,37 @@
+"""
+Tests for the notification fan-out worker
+
+MODULES:
+    - asyncio: run
+    - unittest.mock: AsyncMock
+    - app.services.notification_fanout: NotificationFanout
+
+"""
+import asyncio
+from unittest.mock import AsyncMock
+from app.services.notification_fanout import NotificationFanout
+
+
+def test_fanout_delivers_in_background():
+    """Queued fan-outs are bulk inserted by the workers and drained on stop"""
+    service = AsyncMock()
+
+    async def run():
+        fanout = NotificationFanout(service, maxsize=10, batch_size=500)
+        await fanout.start()
+        assert fanout.enqueue(["user1", None, "user2"], "project_update", "updated")
+        assert fanout.enqueue([], "project_update", "nobody to notify")
+        await fanout.stop()
+
+    asyncio.run(run())
+    service.create_notifications_bulk.assert_awaited_once_with(
+        ["user1", "user2"], "project_update", "updated", chunk_size=500
+    )
+
+
+def test_fanout_drops_when_queue_is_full():
+    """enqueue never blocks, a full queue drops the fan-out"""
+    fanout = NotificationFanout(AsyncMock(), maxsize=1)
+    assert fanout.enqueue(["user1"], "invitation", "invited")
+    assert not fanout.enqueue(["user2"], "invitation", "invited")
+    assert fanout.dropped == 1
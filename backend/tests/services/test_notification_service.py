@@ -0,0 +1,223 @@
+"""
+Tests for the notification service
+
+MODULES:
+    - asyncio: run
+    - datetime: datetime, timedelta, timezone
+    - pytest: raises
+    - unittest.mock: AsyncMock, MagicMock
+    - bson: ObjectId
+    - app.repositories: MemoryRepository, Lease
+    - app.services.notification_service: NotificationService
+
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from bson import ObjectId
+from app.repositories.memory import MemoryRepository
+from app.repositories.leases import Lease
+from app.services.notification_service import NotificationService
+
+
+def make_service():
+    """Build a NotificationService over mock collections"""
+    return NotificationService(AsyncMock(), AsyncMock())
+
+
+def test_create_notification_increments_unread():
+    """Creating a notification bumps the unread counter of its user"""
+    service = make_service()
+    service.collection.insert_one.return_value = MagicMock(inserted_id=ObjectId())
+
+    asyncio.run(service.create_notification("user1", "friend_request", "hello"))
+
+    inserted = service.collection.insert_one.call_args.args[0]
+    assert inserted["user_id"] == "user1"
+    service.counters.update_one.assert_awaited_once_with(
+        {"_id": "user1"}, {"$inc": {"unread": 1}}, upsert=True
+    )
+
+
+def test_mark_as_read_decrements_once():
+    """Only the call that flips the notification decrements the counter"""
+    service = make_service()
+    service.collection.find_one_and_update.side_effect = [{"user_id": "user1"}, None]
+
+    assert asyncio.run(service.mark_as_read(str(ObjectId()))) is True
+    assert asyncio.run(service.mark_as_read(str(ObjectId()))) is False
+    service.counters.update_one.assert_awaited_once_with(
+        {"_id": "user1"}, {"$inc": {"unread": -1}}, upsert=True
+    )
+
+
+def test_get_summary():
+    """The summary is read from the counter doc"""
+    service = make_service()
+    service.counters.find_one.return_value = {"_id": "user1", "unread": 3}
+    assert asyncio.run(service.get_summary("user1")) == {"user_id": "user1", "unread_count": 3}
+
+    service.counters.find_one.return_value = None
+    assert asyncio.run(service.get_summary("user1"))["unread_count"] == 0
+
+
+def test_get_notification_keyset_pagination():
+    """A full page returns a cursor which filters the next page on (created_at, _id)"""
+    service = make_service()
+    last_id = ObjectId()
+    docs = [
+        {"_id": ObjectId(), "user_id": "user1", "created_at": "2025-01-02T00:00:00"},
+        {"_id": last_id, "user_id": "user1", "created_at": "2025-01-01T00:00:00"},
+    ]
+    cursor = MagicMock()
+    cursor.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=docs)
+    service.collection.find = MagicMock(return_value=cursor)
+
+    notifications, next_cursor = asyncio.run(service.get_notification("user1", limit=2))
+    assert notifications[1]["notification_id"] == str(last_id)
+    assert next_cursor == f"2025-01-01T00:00:00|{last_id}"
+
+    cursor.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=[])
+    notifications, next_cursor = asyncio.run(service.get_notification("user1", limit=2, cursor=next_cursor))
+    query = service.collection.find.call_args.args[0]
+    assert query["$or"][1] == {"created_at": "2025-01-01T00:00:00", "_id": {"$lt": last_id}}
+    assert next_cursor is None
+
+
+def test_get_notification_refuses_malformed_cursors():
+    """A cursor without a separator or with a tail that is not an ObjectId is a ValueError, not a failed query"""
+    service = make_service()
+
+    for cursor in ("no-separator", "2025-01-01T00:00:00|not-an-id", f"|{ObjectId()}"):
+        with pytest.raises(ValueError):
+            asyncio.run(service.get_notification("user1", cursor=cursor))
+    service.collection.find.assert_not_called()
+
+
+def test_create_notifications_bulk_chunks_and_skips_failures():
+    """Notifications go out in unordered chunks and failed inserts are not counted"""
+    from pymongo.errors import BulkWriteError
+
+    service = make_service()
+    service.collection.insert_many.side_effect = [
+        None,
+        BulkWriteError({"writeErrors": [{"index": 0}], "nInserted": 0}),
+    ]
+
+    inserted = asyncio.run(service.create_notifications_bulk(
+        ["user1", "user2", "user1", "user3"], "project_update", "updated", chunk_size=2
+    ))
+
+    assert inserted == 2
+    assert service.collection.insert_many.await_count == 2
+    assert service.collection.insert_many.call_args.kwargs["ordered"] is False
+    counted = [op._filter["_id"] for call in service.counters.bulk_write.call_args_list for op in call.args[0]]
+    assert counted == ["user1", "user2"]
+
+
+def test_mark_all_read_adjusts_counter_by_modified():
+    """update_many marks the user's unread notifications and the counter drops by the same amount"""
+    service = make_service()
+    service.collection.update_many.return_value = MagicMock(modified_count=4)
+
+    assert asyncio.run(service.mark_all_read("user1", before="2025-01-01T00:00:00")) == 4
+    query = service.collection.update_many.call_args.args[0]
+    assert query == {"user_id": "user1", "is_read": False, "created_at": {"$lt": "2025-01-01T00:00:00"}}
+    service.counters.update_one.assert_awaited_once_with(
+        {"_id": "user1"}, {"$inc": {"unread": -4}}, upsert=True
+    )
+
+
+def test_mark_many_as_read_is_scoped_to_user():
+    """A batch only touches unread notifications of the given user"""
+    service = make_service()
+    service.collection.update_many.return_value = MagicMock(modified_count=0)
+    ids = [str(ObjectId()), str(ObjectId())]
+
+    assert asyncio.run(service.mark_many_as_read("user1", ids)) == 0
+    query = service.collection.update_many.call_args.args[0]
+    assert query["user_id"] == "user1" and query["is_read"] is False
+    assert query["_id"] == {"$in": [ObjectId(_id) for _id in ids]}
+    service.counters.update_one.assert_not_awaited()
+
+
+def test_archive_read_moves_batches():
+    """Read notifications are copied to the archive then deleted, batch by batch"""
+    service = NotificationService(AsyncMock(), AsyncMock(), AsyncMock())
+    batch = [{"_id": ObjectId(), "is_read": True}, {"_id": ObjectId(), "is_read": True}]
+    cursor = MagicMock()
+    cursor.limit.return_value.to_list = AsyncMock(side_effect=[batch, []])
+    service.collection.find = MagicMock(return_value=cursor)
+
+    assert asyncio.run(service.archive_read(30, batch_size=2)) == 2
+    service.archive.insert_many.assert_awaited_once_with(batch, ordered=False)
+    service.collection.delete_many.assert_awaited_once_with({"_id": {"$in": [n["_id"] for n in batch]}})
+
+
+def test_archive_read_counts_age_from_when_a_notification_was_read():
+    """As in the TTL mode, an old notification read today stays, one read past the retention moves"""
+    notifications, archive = MemoryRepository("notifications"), MemoryRepository("notifications_archive")
+    service = NotificationService(notifications.collection, AsyncMock(), archive.collection)
+    now = datetime.now(timezone.utc)
+
+    async def archive_read():
+        await notifications.collection.insert_many([
+            {"_id": "old_read_today", "created_at": "2020-01-01T00:00:00", "is_read": True, "read_at": now},
+            {"_id": "read_long_ago", "created_at": "2020-01-01T00:00:00", "is_read": True, "read_at": now - timedelta(days=40)},
+            {"_id": "unread", "created_at": "2020-01-01T00:00:00", "is_read": False},
+        ])
+        archived = await service.archive_read(30)
+        return archived, await archive.collection.find({}).to_list(length=None)
+
+    archived, moved = asyncio.run(archive_read())
+
+    assert archived == 1
+    assert [notification["_id"] for notification in moved] == ["read_long_ago"]
+
+
+def test_archive_periodically_waits_and_runs_in_the_lease_worker1_only():
+    """Nothing is archived at startup, then only the worker holding the lease archives"""
+    leases = MemoryRepository("leases")
+    worker1, worker2 = make_service(), make_service()
+    for service in (worker1, worker2):
+        service.archive_read = AsyncMock(return_value=0)
+
+    async def run():
+        tasks = [
+            asyncio.create_task(worker1.archive_periodically(30, 0.02, Lease(leases, "archiving", owner="worker1"))),
+            asyncio.create_task(worker2.archive_periodically(30, 0.02, Lease(leases, "archiving", owner="worker2"))),
+        ]
+        await asyncio.sleep(0.01)
+        started = worker1.archive_read.await_count + worker2.archive_read.await_count
+        await asyncio.sleep(0.08)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return started
+
+    assert asyncio.run(run()) == 0
+    assert worker1.archive_read.await_count + worker2.archive_read.await_count >= 2
+    assert 0 in (worker1.archive_read.await_count, worker2.archive_read.await_count)
+
+
+def test_create_notification_pushes_to_online_user():
+    """A connected user gets the notification as a frame on their socket"""
+    from app.services.connection_manager import ConnectionManager
+
+    publisher = ConnectionManager()
+    websocket = AsyncMock()
+    asyncio.run(publisher.connect("user1", websocket))
+    service = NotificationService(AsyncMock(), AsyncMock(), publisher=publisher)
+
+    async def insert_one(notification):
+        notification["_id"] = ObjectId()
+        return MagicMock(inserted_id=notification["_id"])
+
+    service.collection.insert_one.side_effect = insert_one
+
+    notification_id = asyncio.run(service.create_notification("user1", "invitation", "join us"))
+    frame = websocket.send_json.call_args.args[0]
+    assert frame["type"] == "notification"
+    assert frame["data"]["notification_id"] == notification_id
+    assert frame["data"]["content"] == "join us"
@@ -0,0 +1,160 @@
+"""
+Tests for the projection service
+
+MODULES:
+    - asyncio: run, sleep
+    - app.repositories: MemoryRepository
+    - app.services.projections: ChangeEvent, Projector, ProjectionService
+
+"""
+import asyncio
+from app.repositories.memory import MemoryRepository
+from app.services.projections import (
+    ChangeEvent, Projector, ProjectionService
+)
+
+
+class Recorder(Projector):
+    """Projector keeping the events it is given and the collections it is reset for"""
+    collections = ["projects"]
+
+    def __init__(self):
+        self.events = []
+        self.resets = []
+
+    async def project(self, event: ChangeEvent):
+        self.events.append((event.operation, event.document_id, (event.document or {}).get("title")))
+
+    async def reset(self, collection: str):
+        self.resets.append(collection)
+
+
+class Failing(Projector):
+    """Projector failing on every event"""
+    collections = ["projects"]
+
+    async def project(self, event: ChangeEvent):
+        raise RuntimeError("broken read model")
+
+
+def test_polling_dispatches_inserts_updates_and_deletes():
+    """Without change streams, each poll dispatches the documents added, the ones changed and the ones removed"""
+    projects = MemoryRepository("projects")
+    service = ProjectionService([projects], MemoryRepository("projection_checkpoints"))
+    recorder = Recorder()
+    service.register(Failing())
+    service.register(recorder)
+
+    async def poll():
+        await projects.collection.insert_many([
+            {"_id": "project1", "title": "One", "version": 1}, {"_id": "project2", "title": "Two", "version": 1}
+        ])
+        seen = await service.poll_once(projects, {})
+        await projects.collection.update_one({"_id": "project1"}, {"$set": {"title": "Uno"}, "$inc": {"version": 1}})
+        await projects.collection.delete_one({"_id": "project2"})
+        await projects.collection.insert_one({"_id": "project3", "title": "Three", "version": 1})
+        seen = await service.poll_once(projects, seen)
+        await service.poll_once(projects, seen)
+
+    asyncio.run(poll())
+
+    assert recorder.events == [
+        ("insert", "project1", "One"), ("insert", "project2", "Two"),
+        ("update", "project1", "Uno"), ("insert", "project3", "Three"), ("delete", "project2", None),
+    ]
+
+
+def test_polling_sees_writes_that_move_no_version():
+    """Counters, edges and notifications are written without a version, polling still dispatches their updates"""
+    follows = MemoryRepository("follows")
+    service = ProjectionService([follows], MemoryRepository("projection_checkpoints"))
+    events = []
+
+    class Follows(Projector):
+        collections = ["follows"]
+
+        async def project(self, event: ChangeEvent):
+            events.append((event.operation, event.document_id, event.document and event.document["muted"]))
+
+    service.register(Follows())
+
+    async def poll():
+        await follows.collection.insert_one({"_id": "follow1", "follower_id": "user1", "followee_id": "user2", "muted": False})
+        seen = await service.poll_once(follows, {})
+        await follows.collection.update_one({"_id": "follow1"}, {"$set": {"muted": True}})
+        seen = await service.poll_once(follows, seen)
+        await service.poll_once(follows, seen)
+
+    asyncio.run(poll())
+
+    assert events == [("insert", "follow1", False), ("update", "follow1", True)]
+
+
+def test_auto_mode_falls_back_to_polling_without_change_streams():
+    """A collection without watch is polled, the projectors are reset first since earlier changes cannot be replayed"""
+    projects = MemoryRepository("projects")
+    service = ProjectionService([projects], MemoryRepository("projection_checkpoints"), poll_interval=0.01)
+    recorder = Recorder()
+    service.register(recorder)
+
+    async def run():
+        await projects.collection.insert_one({"_id": "project1", "title": "Before", "version": 1})
+        await service.start()
+        await asyncio.sleep(0.01)
+        await projects.collection.insert_one({"_id": "project2", "title": "After", "version": 1})
+        await asyncio.sleep(0.05)
+        await service.stop()
+
+    asyncio.run(run())
+
+    assert recorder.resets == ["projects"]
+    assert recorder.events == [("insert", "project2", "After")]
+
+
+def test_streams_resume_from_the_last_checkpoint():
+    """The resume token is saved every checkpoint_every events and on stop, and the next stream is opened after it"""
+    projects, checkpoints = MemoryRepository("projects"), MemoryRepository("projection_checkpoints")
+    opened = []
+
+    class Stream:
+        def __init__(self, resume_after):
+            self.resume_token = resume_after
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+        async def __aiter__(self):
+            start = self.resume_token["n"] if self.resume_token else 0
+            for n in range(start + 1, start + 4):
+                self.resume_token = {"n": n}
+                yield {
+                    "_id": self.resume_token, "operationType": "insert", "ns": {"db": "app", "coll": "projects"},
+                    "documentKey": {"_id": f"project{n}"}, "fullDocument": {"_id": f"project{n}", "title": str(n)},
+                }
+            await asyncio.sleep(10)
+
+    def watch(pipeline, full_document=None, resume_after=None):
+        opened.append(resume_after)
+        return Stream(resume_after)
+
+    projects.collection.watch = watch
+    recorder = Recorder()
+
+    async def run():
+        for _ in range(2):
+            service = ProjectionService([projects], checkpoints, mode="stream", checkpoint_every=2)
+            service.register(recorder)
+            await service.start()
+            await asyncio.sleep(0.01)
+            await service.stop()
+        return await checkpoints.collection.find_one({"_id": "projects"})
+
+    checkpoint = asyncio.run(run())
+
+    assert opened == [None, {"n": 3}]
+    assert recorder.resets == ["projects"]
+    assert [document_id for _, document_id, _ in recorder.events] == [f"project{n}" for n in range(1, 7)]
+    assert checkpoint["token"] == {"n": 6}
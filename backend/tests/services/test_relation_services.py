@@ -0,0 +1,95 @@
+"""
+Tests for the relation services
+
+MODULES:
+    - asyncio: run
+    - app.repositories: MemoryRepository, edge collection indexes
+    - app.services.relation_services: RelationServices
+
+"""
+import asyncio
+from app.repositories.memory import MemoryRepository
+from app.repositories import registry
+from app.services.relation_services import RelationServices
+
+
+def memory_services() -> RelationServices:
+    """RelationServices over empty in-memory collections, users user1 to user3 without relations"""
+    services = RelationServices(
+        MemoryRepository("users"), MemoryRepository("friendships", registry.friendships.indexes),
+        MemoryRepository("follows", registry.follows.indexes), MemoryRepository("collaborations", registry.collaborations.indexes),
+        MemoryRepository("projects"),
+    )
+
+    async def seed():
+        for repository in (services.friendships, services.follows, services.collaborations):
+            await repository.ensure_indexes()
+        await services.users.collection.insert_many([
+            {"_id": f"user{i}", "name": f"User {i}", "followers_count": 0, "following_count": 0} for i in range(1, 4)
+        ])
+
+    asyncio.run(seed())
+    return services
+
+
+def test_follow_counts_each_edge_once():
+    """Following twice makes one edge, unfollowing removes it, the counters follow the edges"""
+    services = memory_services()
+
+    async def follow_unfollow():
+        first = await services.follow("user1", "user2")
+        again = await services.follow("user1", "user2")
+        await services.follow("user3", "user2")
+        await services.unfollow("user3", "user2")
+        users = services.users.collection
+        return first, again, await users.find_one({"_id": "user2"}), await users.find_one({"_id": "user1"})
+
+    first, again, followee, follower = asyncio.run(follow_unfollow())
+
+    assert (first, again) == (True, False)
+    assert followee["followers_count"] == 1
+    assert follower["following_count"] == 1
+    assert len(services.follows.collection.documents) == 1
+
+
+def test_followers_are_paged_newest_first():
+    """Pages follow each other through next_cursor without repeating or skipping a follower"""
+    services = memory_services()
+
+    async def pages():
+        await services.follows.collection.insert_many([
+            {"follower_id": f"fan{i}", "followee_id": "user1", "created_at": f"2025-01-01T00:00:{i % 3:02d}"} for i in range(7)
+        ])
+        seen, cursor = [], None
+        while True:
+            users, cursor = await services.followers("user1", cursor, limit=3)
+            seen.append([user["user_id"] for user in users])
+            if cursor is None:
+                return seen
+
+    seen = asyncio.run(pages())
+
+    assert [len(page) for page in seen] == [3, 3, 1]
+    assert sorted(user for page in seen for user in page) == [f"fan{i}" for i in range(7)]
+    assert seen[0][0] in ("fan2", "fan5")
+
+
+def test_migration_moves_arrays_into_edges():
+    """Relation arrays of a legacy user become edges and counters, and are removed from the document"""
+    services = memory_services()
+
+    async def migrate():
+        await services.users.collection.insert_one({
+            "_id": "legacy", "name": "Legacy", "friends": ["user1"], "followers": ["user2", "user3"], "following": ["user1"],
+            "collabees": [], "projects": ["project1"],
+        })
+        await services.projects.collection.insert_one({"_id": "project1", "created_by": "legacy", "created_at": "2025-01-01"})
+        migrated = await services.migrate_embedded()
+        return migrated, await services.users.collection.find_one({"_id": "legacy"}), await services.migrate_embedded()
+
+    migrated, user, again = asyncio.run(migrate())
+
+    assert (migrated, again) == (1, 0)
+    assert "followers" not in user and "friends" not in user
+    assert (user["friends_count"], user["followers_count"], user["following_count"], user["projects_count"]) == (1, 2, 1, 1)
+    assert len(services.follows.collection.documents) == 3
@@ -0,0 +1,38 @@
+"""
+Tests for the user services
+
+MODULES:
+    - asyncio: run
+    - app.models.users: UserUpdate
+    - app.repositories: MemoryRepository
+    - app.services.user_services: UserServices
+    - app.utils.auth.password_utils: hash_password, verify_password
+
+"""
+import asyncio
+from app.models.users import UserUpdate
+from app.repositories.memory import MemoryRepository
+from app.services.user_services import UserServices
+from app.utils.auth.password_utils import hash_password, verify_password
+
+
+def test_update_user_hashes_the_password_and_keeps_required_fields():
+    """A new password is stored hashed, and nulls sent for the name, email or password leave them as they are"""
+    users = MemoryRepository("users")
+    services = UserServices(users)
+
+    async def update():
+        await users.collection.insert_one({
+            "_id": "user1", "name": "Ada", "email": "ada@example.com", "password": hash_password("oldpassword1"), "version": 1,
+            "created_at": "2024-01-01T00:00:00",
+        })
+        changed = await services.update_user("user1", UserUpdate(password="newpassword1", email=None, name=None))
+        cleared = await services.update_user("user1", UserUpdate(password=None))
+        return changed, cleared, await users.collection.find_one({"_id": "user1"}), await services.get_user_by_id("user1")
+
+    changed, cleared, stored, user = asyncio.run(update())
+
+    assert changed == (2, 1)
+    assert cleared == (2, 0)
+    assert verify_password("newpassword1", stored["password"])
+    assert (user.name, user.email) == ("Ada", "ada@example.com")
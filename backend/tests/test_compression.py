@@ -0,0 +1,97 @@
+"""
+Tests for the response compression middleware
+
+MODULES:
+    - gzip: decompress
+    - fastapi: FastAPI, Response
+    - fastapi.responses: StreamingResponse
+    - fastapi.testclient: TestClient
+    - app.middleware.compression: CompressionMiddleware, cache_lookups
+    - app.utils.compression: negotiate
+
+"""
+import gzip
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.middleware.compression import CompressionMiddleware, cache_lookups
+from app.utils.compression import negotiate
+
+BODY = b'{"items": [' + b",".join(b'{"name": "project %d", "status": "Open"}' % i for i in range(100)) + b"]}"
+
+
+def client(minimum_size: int = 1024) -> TestClient:
+    """Test client of an app serving a large, a small and a streamed JSON body"""
+    app = FastAPI()
+
+    @app.get("/large")
+    async def large():
+        return Response(BODY, media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small():
+        return Response(b'{"ok": true}', media_type="application/json")
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for i in range(3):
+                yield b'{"line": %d}\n' % i
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware, encodings=["gzip"], minimum_size=minimum_size)
+    return TestClient(app)
+
+
+def test_negotiate_prefers_quality_then_server_order():
+    """The coding with the highest q is chosen, ties go to the server order, q=0 refuses"""
+    assert negotiate("gzip;q=0.5, br", ["zstd", "br", "gzip"]) == "br"
+    assert negotiate("gzip, br", ["zstd", "br", "gzip"]) == "br"
+    assert negotiate("*;q=0.1, br;q=0", ["br", "gzip"]) == "gzip"
+    assert negotiate("identity", ["gzip"]) is None
+
+
+def test_large_bodies_are_gzipped_and_small_sent_as_is():
+    """A body over the threshold is gzipped with a weak ETag and Vary, a small one is untouched"""
+    test_client = client()
+
+    large = test_client.get("/large", headers={"Accept-Encoding": "gzip"})
+    small = test_client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["etag"] == 'W/"v1"'
+    assert "Accept-Encoding" in large.headers["vary"]
+    assert large.content == BODY
+    assert int(large.headers["content-length"]) < len(BODY)
+    assert "content-encoding" not in small.headers
+    assert small.json() == {"ok": True}
+
+
+def test_identity_when_no_coding_is_accepted():
+    """Without Accept-Encoding the body is sent uncompressed"""
+    response = client().get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"v1"'
+
+
+def test_compressed_bodies_are_reused_by_etag():
+    """The second response of the same path and ETag comes from the cache"""
+    test_client = client()
+    hits = cache_lookups.values.get(("hit",), 0)
+
+    first = test_client.get("/large", headers={"Accept-Encoding": "gzip"})
+    second = test_client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert cache_lookups.values[("hit",)] == hits + 1
+    assert first.content == second.content == BODY
+
+
+def test_streamed_bodies_are_compressed_chunk_by_chunk():
+    """A streamed body is gzipped as one stream without Content-Length"""
+    with client(minimum_size=0).stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw) == b'{"line": 0}\n{"line": 1}\n{"line": 2}\n'
@@ -0,0 +1,54 @@
+"""
+Tests for the database command monitoring
+
+MODULES:
+    - logging: caplog levels
+    - types: SimpleNamespace, stand in for pymongo command events
+    - app.db: query_shape, CommandMetrics
+
+"""
+import logging
+from types import SimpleNamespace
+from app.db import query_shape, CommandMetrics
+
+
+def test_query_shape_strips_values():
+    """Fields and operators are kept, values are replaced"""
+    query = {"name": {"$regex": "ada", "$options": "i"}, "skills": {"$in": ["python", "go"]}, "$or": [{"a": 1}, {"a": 2}]}
+
+    assert query_shape(query) == {
+        "name": {"$regex": "?", "$options": "?"}, "skills": {"$in": ["?"]}, "$or": [{"a": "?"}]
+    }
+
+
+def test_command_metrics_labels_route_and_logs_slow_queries(caplog, monkeypatch):
+    """A command is measured under the route that issued it and logged with its filter shape when slow"""
+    listener = CommandMetrics(slow_ms=10)
+    monkeypatch.setattr("app.db.current_route", lambda: "/search/users")
+    listener.started(SimpleNamespace(
+        request_id=1, command_name="find", command={"find": "users", "filter": {"name": {"$regex": "ada"}}}
+    ))
+    monkeypatch.setattr("app.db.current_route", lambda: "background")
+
+    reply = {"cursor": {"firstBatch": [{"_id": "user1"}, {"_id": "user2"}], "id": 0}, "ok": 1}
+    with caplog.at_level(logging.WARNING):
+        listener.succeeded(SimpleNamespace(request_id=1, command_name="find", duration_micros=25000, reply=reply))
+
+    labels = ("users", "find", "/search/users")
+    assert listener.duration.count(*labels) >= 1
+    assert listener.documents.values[labels] >= 2
+    assert "{'name': {'$regex': '?'}}" in caplog.text
+    assert "ada" not in caplog.text
+    assert listener.reply_bytes.count(*labels) == 0  # replies are not encoded again unless sampled
+
+
+def test_command_metrics_samples_reply_sizes():
+    """With a sample rate, reply sizes are measured for that share of the replies"""
+    listener = CommandMetrics(slow_ms=0, reply_sample_rate=1)
+    listener.started(SimpleNamespace(request_id=2, command_name="find", command={"find": "projects", "filter": {}}))
+    listener.succeeded(SimpleNamespace(
+        request_id=2, command_name="find", duration_micros=1000, reply={"cursor": {"firstBatch": [], "id": 0}, "ok": 1}
+    ))
+
+    assert listener.reply_bytes.count("projects", "find", "background") == 1
+    assert listener.pending == {}
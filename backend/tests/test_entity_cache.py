@@ -0,0 +1,132 @@
+"""
+Tests for the entity cache of users and projects
+
+MODULES:
+    - asyncio: run, sleep, create_task
+    - app.models.users: UserUpdate
+    - app.repositories.cache: EntityCache, LocalSharedCache, LRUCache
+    - app.repositories.memory: MemoryRepository
+    - app.services.user_services: UserServices
+    - app.services.cache_invalidation: CacheInvalidator
+
+"""
+import asyncio
+from app.models.users import UserUpdate
+from app.repositories.cache import EntityCache, LocalSharedCache, LRUCache
+from app.repositories.memory import MemoryRepository
+from app.services.user_services import UserServices
+from app.services.cache_invalidation import CacheInvalidator
+
+
+def cached_users(shared=None):
+    """Users repository with a cache, holding user1, counting the find_one calls"""
+    repository = MemoryRepository("users")
+    repository.cache = EntityCache("users", 2 ** 20, 60, shared)
+    collection = repository.collection
+    find_one = collection.find_one
+    collection.calls = 0
+
+    async def counted_find_one(*args, **kwargs):
+        collection.calls += 1
+        await asyncio.sleep(0.01)
+        return await find_one(*args, **kwargs)
+
+    collection.find_one = counted_find_one
+    asyncio.run(collection.insert_one({
+        "_id": "user1", "name": "John Doe", "email": "jdoe@example.com", "password": "hash", "created_at": "2025-01-01T00:00:00",
+        "updated_at": None, "profile_pic": None, "bio": None, "skills": [], "friends": [], "collabees": [], "objs": [],
+        "interests": [], "projects": [], "followers": [], "following": [], "language": "eng", "location": None, "timezone": "UTC",
+    }))
+    return repository
+
+
+def test_lru_evicts_least_recently_used_past_the_budget():
+    """Entries are evicted oldest use first once the values exceed the byte budget"""
+    lru = LRUCache(max_bytes=30, ttl=60)
+    lru.set("a", b"x" * 10)
+    lru.set("b", b"x" * 10)
+    lru.set("c", b"x" * 10)
+    lru.get("a")
+    evicted = lru.set("d", b"x" * 10)
+
+    assert evicted == 1
+    assert lru.get("b") is None
+    assert lru.get("a") is not None and lru.size == 30
+
+
+def test_reads_are_cached_until_a_write():
+    """Repeated reads of a user hit the cache, an update invalidates it and the next read sees the write"""
+    repository = cached_users()
+    user_services = UserServices(repository)
+
+    async def read_update_read():
+        first = await user_services.get_user_by_id("user1")
+        first.name = "Changed by the caller"  # callers get copies, the cache is unaffected
+        second = await user_services.get_user_by_id("user1")
+        await user_services.update_user("user1", UserUpdate(name="Jane Doe"))
+        third = await user_services.get_user_by_id("user1")
+        return second, third
+
+    second, third = asyncio.run(read_update_read())
+
+    assert repository.collection.calls == 3  # the first read, the update reading the fields it diffs, the read after the update
+    assert second.name == "John Doe"
+    assert third.name == "Jane Doe"
+    assert EntityCache.requests.values[("users", "local", "hit")] >= 1
+
+
+def test_read_overtaken_by_a_write_is_not_cached():
+    """A read that started before an invalidation returns its result but does not store it"""
+    repository = cached_users()
+    user_services = UserServices(repository)
+
+    async def overtaken():
+        read = asyncio.create_task(user_services.get_user_by_id("user1"))
+        await asyncio.sleep(0)
+        await repository.changed("user1")
+        await read
+        return repository.cache.local.get("user1")
+
+    assert asyncio.run(overtaken()) is None
+
+
+def test_shared_tier_serves_other_processes():
+    """A user read by one process is served to another from the shared tier without a database read"""
+    shared = LocalSharedCache()
+    first, second = cached_users(shared), cached_users(shared)
+
+    asyncio.run(UserServices(first).get_user_by_id("user1"))
+    user = asyncio.run(UserServices(second).get_user_by_id("user1"))
+
+    assert user.name == "John Doe"
+    assert second.collection.calls == 0
+
+
+def test_change_stream_invalidates_writes_of_other_nodes():
+    """Changes seen on the stream invalidate the cached documents"""
+    repository = cached_users()
+
+    class Stream:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+        async def __aiter__(self):
+            yield {"operationType": "update", "documentKey": {"_id": "user1"}}
+            await asyncio.sleep(10)
+
+    repository.collection.watch = lambda pipeline: Stream()
+    invalidator = CacheInvalidator([repository])
+
+    async def listen():
+        await UserServices(repository).get_user_by_id("user1")
+        assert repository.cache.local.get("user1") is not None
+        await invalidator.start()
+        await asyncio.sleep(0.01)
+        await invalidator.stop()
+
+    asyncio.run(listen())
+
+    assert repository.cache.local.get("user1") is None
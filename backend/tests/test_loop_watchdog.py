@@ -0,0 +1,57 @@
+"""
+Tests for the event loop watchdog
+
+MODULES:
+    - asyncio: run, sleep
+    - logging: caplog levels
+    - time: sleep, the blocking call
+    - types: SimpleNamespace, stand in for a matched route
+    - app.utils.loop_watchdog: LoopWatchdog
+
+"""
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+from app.utils.loop_watchdog import LoopWatchdog
+
+
+def blocking_endpoint(scope):
+    """Stands for a middleware frame holding the request scope, with a blocking call further down"""
+    time.sleep(0.3)
+
+
+def test_blocked_loop_is_reported_with_route_and_stack(caplog):
+    """A blocking call is logged while it runs, with the route of the request and the blocking stack"""
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.05)
+    scope = {"type": "http", "route": SimpleNamespace(path="/auth/login")}
+
+    async def serve():
+        await watchdog.start()
+        await asyncio.sleep(0.05)
+        blocking_endpoint(scope)
+        await asyncio.sleep(0.05)
+        await watchdog.stop()
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(serve())
+
+    assert watchdog.blocked.values[("/auth/login",)] >= 1
+    assert "serving /auth/login" in caplog.text
+    assert "blocking_endpoint" in caplog.text
+    assert watchdog.lag.quantile(1.0) >= 0.25
+
+
+def test_idle_loop_is_not_reported(caplog):
+    """A loop that keeps coming back within the threshold is never reported"""
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.1)
+
+    async def idle():
+        await watchdog.start()
+        await asyncio.sleep(0.2)
+        await watchdog.stop()
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(idle())
+
+    assert "Event loop blocked" not in caplog.text
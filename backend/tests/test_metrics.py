@@ -0,0 +1,115 @@
+"""
+Tests for the in-process metrics
+
+MODULES:
+    - threading: Thread, labels added by a driver thread
+    - fastapi: FastAPI, TestClient
+    - app.utils.metrics: MetricsRegistry
+    - app.middleware.metrics: RequestMetricsMiddleware and its metrics
+    - utils.request_context: current_route
+
+"""
+import threading
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.utils.metrics import MetricsRegistry
+from app.middleware.metrics import (
+    RequestMetricsMiddleware, request_latency, responses, response_size, in_flight
+)
+from utils.request_context import current_route  # the module the middleware imports, app.utils.request_context is a separate copy
+
+
+def test_histogram_buckets_and_render():
+    """Observations land in the first bucket whose bound they do not exceed"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+    histogram.observe(0.1, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(3, "/a")
+
+    assert histogram.count("/a") == 3
+    assert histogram.quantile(0.5, "/a") == 1
+    rendered = registry.render()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in rendered
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in rendered
+    assert 'latency_seconds_sum{route="/a"} 3.6' in rendered
+
+
+def test_counter_and_gauge():
+    """Counters and gauges keep one value per label combination"""
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests", ("status",))
+    counter.inc("200")
+    counter.inc("200", amount=2)
+    gauge = registry.gauge("in_flight", "In flight")
+    gauge.inc()
+    gauge.dec()
+
+    assert registry.counter("requests_total", "Requests") is counter
+    assert 'requests_total{status="200"} 3' in registry.render()
+    assert "in_flight 0" in registry.render()
+
+
+def test_label_values_are_escaped():
+    """Backslashes, quotes and newlines in label values are escaped as the text format requires"""
+    registry = MetricsRegistry()
+    registry.counter("queries_total", "Queries", ("filter",)).inc('{"a": "b\\c"}\n')
+
+    assert 'queries_total{filter="{\\"a\\": \\"b\\\\c\\"}\\n"} 1' in registry.render()
+
+
+def test_render_while_another_thread_adds_labels():
+    """Rendering reads a snapshot, label values added meanwhile by another thread do not break it"""
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "Events", ("key",))
+    histogram = registry.histogram("sizes_bytes", "Sizes", ("key",))
+
+    def add_labels():
+        for i in range(20000):
+            counter.inc(str(i))
+            histogram.observe(i, str(i % 100))
+
+    thread = threading.Thread(target=add_labels)
+    thread.start()
+    try:
+        while thread.is_alive():
+            registry.render()
+    finally:
+        thread.join()
+
+    assert 'events_total{key="19999"} 1' in registry.render()
+
+
+def test_request_metrics_middleware_labels_route_template():
+    """Requests are recorded under their route template, whatever the path params"""
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        return {"item_id": item_id}
+
+    before = request_latency.count("GET", "/items/{item_id}")
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+
+    assert request_latency.count("GET", "/items/{item_id}") == before + 2
+    assert response_size.count("GET", "/items/{item_id}") >= 2
+    assert responses.values[("GET", "/items/{item_id}", "200")] >= 2
+    assert responses.values[("GET", "unmatched", "404")] >= 1
+    assert in_flight.values[("GET",)] == 0
+
+
+def test_request_scope_is_published_during_the_request():
+    """Code running inside a request sees its route template through the request context"""
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+
+    @app.get("/projects/{project_id}")
+    async def get_project(project_id: str):
+        return {"route": current_route()}
+
+    assert TestClient(app).get("/projects/p1").json() == {"route": "/projects/{project_id}"}
+    assert current_route() == "background"
@@ -0,0 +1,186 @@
+"""
+Tests for the repositories and the in-memory collection
+
+MODULES:
+    - asyncio: run
+    - pytest: raises
+    - pymongo: IndexModel, ReturnDocument, UpdateOne, DuplicateKeyError
+    - app.repositories: Repository, CONFLICT, MemoryCollection, MemoryRepository
+    - app.repositories.updates: compile_update
+    - app.repositories.leases: Lease
+
+"""
+import asyncio
+import pytest
+from pymongo import IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.repositories.base import (
+    Repository, CONFLICT
+)
+from app.repositories.memory import MemoryCollection, MemoryRepository
+from app.repositories.updates import compile_update
+from app.repositories.leases import Lease
+
+
+def test_repository_resolves_handle_once():
+    """The collection handle is built on first use and then reused"""
+    repository = Repository("users")
+    assert repository.collection is repository.collection
+    assert repository.collection.name == "users"
+
+
+def test_memory_collection_queries():
+    """Queries, sorting, limits and projections follow mongodb semantics"""
+    collection = MemoryCollection()
+
+    async def query():
+        await collection.insert_many([
+            {"_id": "user1", "name": "Ada", "skills": ["python", "go"], "age": 30},
+            {"_id": "user2", "name": "adam", "skills": ["rust"], "age": 25},
+            {"_id": "user3", "name": "Bob", "skills": [], "password": "hash"},
+        ])
+        return (
+            await collection.find({"name": {"$regex": "ad", "$options": "i"}}).sort("age", 1).to_list(None),
+            await collection.find_one({"skills": {"$in": ["go"]}}, {"name": 1}),
+            await collection.find_one({"_id": "user3"}, {"password": 0}),
+            await collection.count_documents({"$or": [{"age": {"$gt": 26}}, {"age": {"$exists": False}}]}),
+        )
+
+    found, projected, excluded, count = asyncio.run(query())
+    assert [user["_id"] for user in found] == ["user2", "user1"]
+    assert projected == {"_id": "user1", "name": "Ada"}
+    assert "password" not in excluded
+    assert count == 2
+
+
+def test_memory_collection_updates():
+    """Update operators, upserts and bulk writes change the stored documents"""
+    collection = MemoryCollection()
+
+    async def update():
+        await collection.insert_one({"_id": "user1", "skills": ["python"]})
+        await collection.update_one({"_id": "user1"}, {"$addToSet": {"skills": {"$each": ["python", "go"]}}, "$inc": {"n": 2}})
+        after = await collection.find_one_and_update(
+            {"_id": "user1"}, {"$pull": {"skills": "python"}}, return_document=ReturnDocument.AFTER
+        )
+        upsert = await collection.update_one({"_id": "user2"}, {"$setOnInsert": {"n": 0}}, upsert=True)
+        bulk = await collection.bulk_write([UpdateOne({"_id": "user2"}, {"$inc": {"n": 1}}, upsert=True)])
+        return after, upsert, bulk, await collection.find_one({"_id": "user2"})
+
+    after, upsert, bulk, upserted = asyncio.run(update())
+    assert after == {"_id": "user1", "skills": ["go"], "n": 2}
+    assert upsert.upserted_id == "user2"
+    assert bulk.modified_count == 1
+    assert upserted["n"] == 1
+
+
+def test_memory_collection_aggregates():
+    """$match and $group count and total documents per key, later stages apply to the groups"""
+    collection = MemoryCollection()
+
+    async def aggregate():
+        await collection.insert_many([
+            {"project_id": "project1", "n": 1}, {"project_id": "project2", "n": 2}, {"project_id": "project1", "n": 3}, {"project_id": "project3"},
+        ])
+        return await collection.aggregate([
+            {"$match": {"project_id": {"$in": ["project1", "project2"]}}},
+            {"$group": {"_id": "$project_id", "count": {"$sum": 1}, "total": {"$sum": "$n"}}},
+            {"$sort": {"count": -1}},
+        ]).to_list(length=None)
+
+    assert asyncio.run(aggregate()) == [{"_id": "project1", "count": 2, "total": 4}, {"_id": "project2", "count": 1, "total": 2}]
+
+
+def test_memory_repository_enforces_unique_indexes():
+    """A declared unique index rejects duplicates once ensure_indexes has run"""
+    repository = MemoryRepository("friendships", [IndexModel([("user1_id", 1), ("user2_id", 1)], unique=True)])
+
+    async def insert_twice():
+        await repository.ensure_indexes()
+        await repository.collection.insert_one({"user1_id": "a", "user2_id": "b"})
+        await repository.collection.insert_one({"user1_id": "a", "user2_id": "b"})
+
+    with pytest.raises(DuplicateKeyError):
+        asyncio.run(insert_twice())
+
+
+def test_versioned_updates_fail_on_a_stale_version():
+    """An update made on the current version moves it, one made on an older version is refused with CONFLICT"""
+    repository = MemoryRepository("projects")
+
+    async def update_twice():
+        await repository.collection.insert_one({"_id": "project1", "title": "Old title"})
+        first = await repository.update_versioned("project1", {"$set": {"title": "First"}}, None)
+        second = await repository.update_versioned("project1", {"$set": {"title": "Second"}}, first)
+        stale = await repository.update_versioned("project1", {"$set": {"title": "Stale"}}, first)
+        missing = await repository.update_versioned("project2", {"$set": {"title": "Missing"}}, 1)
+        return first, second, stale, missing, await repository.collection.find_one({"_id": "project1"})
+
+    first, second, stale, missing, document = asyncio.run(update_twice())
+
+    assert (first, second, stale, missing) == (1, 2, CONFLICT, None)
+    assert document["title"] == "Second" and document["version"] == 2
+
+
+def test_compile_update_writes_only_the_difference():
+    """Unchanged fields are left out, arrays are patched item by item and cleared fields unset"""
+    document = {"_id": "user1", "name": "Ada", "bio": "Hi", "followers": ["user2", "user3"], "projects": ["p1", "p2"], "skills": ["go"]}
+
+    update = compile_update(document, {
+        "name": "Ada", "bio": None, "followers": ["user2", "user3", "user4"], "projects": ["p2"], "skills": ["rust", "go"],
+    })
+
+    assert update == {
+        "$unset": {"bio": ""},
+        "$addToSet": {"followers": {"$each": ["user4"]}},
+        "$pull": {"projects": {"$in": ["p1"]}},
+        "$set": {"skills": ["rust", "go"]},
+    }
+    assert compile_update(document, {"name": "Ada", "followers": ["user2", "user3"]}) == {}
+
+
+def test_apply_changes_skips_no_op_writes():
+    """Changes the document already holds write nothing and keep the version, real changes bump it once"""
+    repository = MemoryRepository("users")
+
+    async def update():
+        await repository.collection.insert_one({"_id": "user1", "name": "Ada", "followers": ["user2"], "version": 3})
+        unchanged = await repository.apply_changes("user1", {"name": "Ada", "followers": ["user2"]})
+        changed = await repository.apply_changes("user1", {"name": "Ada", "followers": ["user2", "user3"]}, version=3)
+        return unchanged, changed, await repository.collection.find_one({"_id": "user1"})
+
+    unchanged, changed, document = asyncio.run(update())
+
+    assert unchanged == (3, 0)
+    assert changed == (4, 1)
+    assert document["followers"] == ["user2", "user3"] and "updated_at" in document
+
+
+def test_apply_changes_on_a_document_without_version():
+    """A no-op on a document written before versions is version 0, not a conflict, with or without the version given"""
+    repository = MemoryRepository("users")
+
+    async def update():
+        await repository.collection.insert_one({"_id": "user1", "name": "Ada"})
+        return (
+            await repository.apply_changes("user1", {}),
+            await repository.apply_changes("user1", {"name": "Ada"}, version=0),
+            await repository.apply_changes("user1", {"name": "Ada"}, version=2),
+            await repository.apply_changes("user1", {"name": "Grace"}, version=0),
+        )
+
+    assert asyncio.run(update()) == ((0, 0), (0, 0), (CONFLICT, 0), (1, 1))
+
+
+def test_a_lease_is_held_by_one_process_until_it_expires():
+    """The holder renews its lease, another process gets it only once it has expired"""
+    leases = MemoryRepository("leases")
+    first, second = Lease(leases, "job", owner="worker1"), Lease(leases, "job", owner="worker2")
+
+    async def acquire():
+        taken = [await first.acquire(60), await second.acquire(60), await first.acquire(60)]
+        leases.collection.documents["job"]["expires_at"] = 0  # worker1 stopped renewing
+        taken += [await second.acquire(60), await first.acquire(60)]
+        return taken
+
+    assert asyncio.run(acquire()) == [True, False, True, True, False]
@@ -0,0 +1,94 @@
+"""
+Tests for the coalescing of identical concurrent reads
+
+MODULES:
+    - asyncio: run, gather, sleep
+    - pytest: raises
+    - app.models.projects: ProjectUpdate
+    - app.repositories.memory: MemoryRepository
+    - app.services.project_services: ProjectServices
+    - app.utils.single_flight: SingleFlight
+
+"""
+import asyncio
+import pytest
+from app.models.projects import ProjectUpdate
+from app.repositories.memory import MemoryRepository
+from app.services.project_services import ProjectServices
+from app.utils.single_flight import SingleFlight
+
+
+def slow_projects():
+    """Projects repository holding project1 whose find_one takes a while and counts its calls"""
+    repository = MemoryRepository("projects")
+    collection = repository.collection
+    find_one = collection.find_one
+    collection.calls = 0
+
+    async def slow_find_one(*args, **kwargs):
+        collection.calls += 1
+        await asyncio.sleep(0.05)
+        return await find_one(*args, **kwargs)
+
+    collection.find_one = slow_find_one
+    asyncio.run(collection.insert_one({
+        "_id": "project1", "title": "My new project", "description": "very important project", "created_by": "user1",
+        "created_at": "2025-01-01T00:00:00", "updated_at": None, "deadline": None, "type": None, "tags": [],
+        "collaborators": [], "followers": [], "location": None,
+    }))
+    return repository
+
+
+def test_concurrent_identical_reads_share_one_query():
+    """Fifty concurrent reads of a project cost one find_one, each caller gets its own copy"""
+    repository = slow_projects()
+    project_services = ProjectServices(repository)
+
+    async def spike():
+        return await asyncio.gather(*(project_services.get_project_by_id("project1") for _ in range(50)))
+
+    projects = asyncio.run(spike())
+
+    assert repository.collection.calls == 1
+    assert all(project == projects[0] for project in projects)
+    assert len({id(project.collaborators) for project in projects}) == 50
+
+
+def test_reads_after_a_write_do_not_join_older_reads():
+    """A read started after an update queries again instead of joining the read in flight before it"""
+    repository = slow_projects()
+    project_services = ProjectServices(repository)
+
+    async def read_write_read():
+        before = asyncio.create_task(project_services.get_project_by_id("project1"))
+        await asyncio.sleep(0)
+        await project_services.update_project("project1", ProjectUpdate(title="Renamed project"))
+        after = await project_services.get_project_by_id("project1")
+        return await before, after
+
+    _, after = asyncio.run(read_write_read())
+
+    assert repository.collection.calls == 3  # the read before, the update reading the fields it diffs, the read after
+    assert after.title == "Renamed project"
+
+
+def test_failures_reach_every_caller():
+    """An exception of the shared read is raised to each caller, and the next read runs again"""
+    group = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ConnectionError("mongodb unreachable")
+
+    async def spike():
+        results = await asyncio.gather(*(group.do(("db", "key"), failing) for _ in range(3)), return_exceptions=True)
+        with pytest.raises(ConnectionError):
+            await group.do(("db", "key"), failing)
+        return results
+
+    results = asyncio.run(spike())
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(calls) == 2